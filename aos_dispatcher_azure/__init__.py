@@ -0,0 +1,7 @@
+"""Runtime support for the AOS Dispatcher Azure Functions wrapper.
+
+``function_app.py`` stays a thin binding layer; the helpers in this package
+cover the Azure Functions-side concerns that don't belong in the
+``aos_dispatcher`` library itself (how dispatcher calls are executed, how
+messages are batched and settled, and so on).
+"""
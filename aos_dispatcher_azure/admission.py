@@ -0,0 +1,505 @@
+"""Admission control for orchestration submissions.
+
+Every orchestration runs all of its agents on Foundry until it finishes, so
+the number of orchestrations running at once — not the submission rate — is
+what exhausts model quota.  :class:`AdmissionController` sits in front of
+``process_orchestration_request`` and hands out *slots*:
+
+- A slot is taken before the dispatcher is called and held until the
+  orchestration reaches a terminal status (seen by
+  :class:`~aos_dispatcher_azure.orchestrations.OrchestrationTracker`), or
+  returned at once if the submission fails.  Orchestrations are not polled
+  just for their slot: while requests are queued, :attr:`on_queue` is given
+  the orchestrations holding slots so they can be watched.  Slots whose
+  orchestration is never seen to finish are reclaimed after ``lease_timeout``.
+- At most ``max_running`` slots are held in total and at most the app's
+  quota (``app_max_running`` unless configured per app) by one app.
+- Only known apps — listed in ``AOS_ADMISSION_APP_QUOTAS`` /
+  ``AOS_ADMISSION_APP_WEIGHTS`` or registered through ``register_app`` on
+  this worker — get a quota and queue of their own.  Submissions naming any
+  other app share the :data:`SHARED_APP` bucket, so rotating app names does
+  not buy extra slots.  At most ``max_apps`` registrations are remembered;
+  the least recently used is forgotten first.
+- Requests that cannot start wait in a queue per app and priority class
+  (``high``, ``normal``, ``low``).  When a slot frees, the highest non-empty
+  priority class goes first; within a class, apps are served by weighted
+  fair queueing (start-time fair queueing over virtual time), so an app with
+  weight 2 is admitted twice as often as one with weight 1 while both have
+  work queued, and an app flooding the queue only delays itself.
+- A request that would exceed its app's queue (``max_queue``) or waits longer
+  than ``max_wait`` is rejected with :class:`AdmissionRejected`, which the
+  HTTP endpoint turns into ``429`` with ``Retry-After``.
+
+Limits are per worker instance; with several instances the effective limits
+multiply accordingly.
+
+Configuration:
+    AOS_ADMISSION                       Enable admission control (default: true)
+    AOS_ADMISSION_MAX_RUNNING           Running orchestrations per worker
+                                        (default: 64)
+    AOS_ADMISSION_APP_MAX_RUNNING       Running orchestrations per app
+                                        (default: 16)
+    AOS_ADMISSION_APP_QUOTAS            Per-app overrides, ``app=32,other=4``
+    AOS_ADMISSION_APP_WEIGHTS           Fair-queueing weights, ``app=3,other=1``
+                                        (default weight: 1)
+    AOS_ADMISSION_MAX_QUEUE             Queued requests per app (default: 100)
+    AOS_ADMISSION_MAX_APPS              Registered apps remembered per worker
+                                        (default: 1024)
+    AOS_ADMISSION_MAX_WAIT              Seconds an HTTP submission may queue
+                                        (default: 10)
+    AOS_ADMISSION_SERVICE_BUS_MAX_WAIT  Seconds a Service Bus submission may
+                                        queue (default: 60)
+    AOS_ADMISSION_LEASE_TIMEOUT         Seconds before an unfinished
+                                        orchestration's slot is reclaimed
+                                        (default: 3600)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from .config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+DEFAULT_MAX_RUNNING = 64
+DEFAULT_APP_MAX_RUNNING = 16
+DEFAULT_MAX_QUEUE = 100
+DEFAULT_MAX_APPS = 1024
+#: Bucket shared by submissions from apps that are not configured or registered.
+SHARED_APP = "*"
+DEFAULT_MAX_WAIT = 10.0
+DEFAULT_SERVICE_BUS_MAX_WAIT = 60.0
+DEFAULT_LEASE_TIMEOUT = 3600.0
+#: Assumed orchestration duration (seconds) until one has been observed.
+DEFAULT_HOLD_ESTIMATE = 30.0
+WAIT_SAMPLES = 1024
+
+#: ``call()`` → library ``(body, status_code)`` response.
+Submission = Callable[[], Awaitable[tuple]]
+
+
+class AdmissionRejected(Exception):
+    """The submission was not admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_app_map(raw: str) -> Dict[str, float]:
+    """Parse ``app=value,other=value`` settings, skipping malformed entries."""
+    values: Dict[str, float] = {}
+    for part in raw.split(","):
+        app, _, value = part.partition("=")
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        if app.strip() and 0 < number < math.inf:
+            values[app.strip()] = number
+    return values
+
+
+def priority_of(value: Any) -> str:
+    """Normalise a requested priority class; unknown values are ``normal``."""
+    value = str(value).strip().lower() if value is not None else ""
+    return value if value in PRIORITIES else DEFAULT_PRIORITY
+
+
+@dataclass
+class Lease:
+    """One admitted submission's slot."""
+
+    app: str
+    priority: str
+    granted_at: float
+    orchestration_id: Optional[str] = None
+    released: bool = False
+
+
+@dataclass
+class _Waiter:
+    tag: float
+    seq: int
+    priority: str
+    enqueued_at: float
+    future: asyncio.Future
+
+
+@dataclass
+class AppState:
+    """Scheduling state and counters for one app."""
+
+    weight: float = 1.0
+    max_running: int = DEFAULT_APP_MAX_RUNNING
+    running: int = 0
+    last_tag: float = 0.0
+    queues: Dict[str, Deque[_Waiter]] = field(
+        default_factory=lambda: {priority: deque() for priority in PRIORITIES}
+    )
+    admitted: int = 0
+    rejected: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLES))
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class AdmissionController:
+    """Per-app quotas, priority classes and weighted fair queueing for submissions.
+
+    Args:
+        max_running: Slots in total.  Defaults to ``AOS_ADMISSION_MAX_RUNNING``.
+        app_max_running: Default slots per app.  Defaults to
+            ``AOS_ADMISSION_APP_MAX_RUNNING``.
+        max_queue: Queued requests per app.  Defaults to
+            ``AOS_ADMISSION_MAX_QUEUE``.
+        max_wait: Default seconds a request may queue.  Defaults to
+            ``AOS_ADMISSION_MAX_WAIT``.
+        lease_timeout: Seconds before an unfinished slot is reclaimed.
+            Defaults to ``AOS_ADMISSION_LEASE_TIMEOUT``.
+        max_apps: Registered apps remembered.  Defaults to
+            ``AOS_ADMISSION_MAX_APPS``.
+
+    Attributes:
+        on_queue: Called with the ids of the orchestrations holding slots
+            whenever a request has to queue, so their completion is noticed.
+    """
+
+    def __init__(
+        self,
+        max_running: Optional[int] = None,
+        app_max_running: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        lease_timeout: Optional[float] = None,
+        max_apps: Optional[int] = None,
+    ) -> None:
+        self.enabled = env_bool("AOS_ADMISSION", True)
+        self.max_running = max_running or env_int(
+            "AOS_ADMISSION_MAX_RUNNING", DEFAULT_MAX_RUNNING
+        )
+        self.app_max_running = app_max_running or env_int(
+            "AOS_ADMISSION_APP_MAX_RUNNING", DEFAULT_APP_MAX_RUNNING
+        )
+        self.max_queue = max_queue or env_int(
+            "AOS_ADMISSION_MAX_QUEUE", DEFAULT_MAX_QUEUE
+        )
+        self.max_wait = max_wait or env_float(
+            "AOS_ADMISSION_MAX_WAIT", DEFAULT_MAX_WAIT
+        )
+        self.lease_timeout = lease_timeout or env_float(
+            "AOS_ADMISSION_LEASE_TIMEOUT", DEFAULT_LEASE_TIMEOUT
+        )
+        self._quotas = parse_app_map(os.environ.get("AOS_ADMISSION_APP_QUOTAS", ""))
+        self._weights = parse_app_map(os.environ.get("AOS_ADMISSION_APP_WEIGHTS", ""))
+        self.max_apps = max_apps or env_int("AOS_ADMISSION_MAX_APPS", DEFAULT_MAX_APPS)
+        # register_app settings (weight, max_running) by app, least recently used first.
+        self._registered: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._apps: Dict[str, AppState] = {}
+        self._leases: Dict[str, Lease] = {}
+        self._running = 0
+        self._vtime = 0.0
+        self._seq = itertools.count()
+        self._hold_estimate = DEFAULT_HOLD_ESTIMATE
+        self.expired = 0
+        self.on_queue: Optional[Callable[[List[str]], None]] = None
+
+    def configure_app(
+        self, app: str, weight: Any = None, max_running: Any = None
+    ) -> None:
+        """Register *app* and set its fair-queueing weight and/or slot quota.
+
+        Missing, non-positive or non-finite values leave the current setting
+        unchanged.
+        """
+        settings = self._registered.pop(app, {})
+        try:
+            if weight is not None and 0 < float(weight) < math.inf:
+                settings["weight"] = float(weight)
+            if max_running is not None and int(max_running) > 0:
+                settings["max_running"] = int(max_running)
+        except (TypeError, ValueError, OverflowError):
+            logger.warning("Ignoring invalid admission settings for app '%s'", app)
+        self._registered[app] = settings
+        while len(self._registered) > self.max_apps:
+            forgotten, _ = self._registered.popitem(last=False)
+            self._drop_idle(forgotten)
+        state = self._apps.get(app)
+        if state is not None:
+            state.weight = settings.get("weight", state.weight)
+            state.max_running = settings.get("max_running", state.max_running)
+        self._dispatch()
+
+    def forget_app(self, app: str) -> None:
+        """Drop *app*'s registration; its later submissions use the shared bucket."""
+        self._registered.pop(app, None)
+        self._drop_idle(app)
+
+    def bucket_of(self, app: Optional[str]) -> str:
+        """Admission bucket of *app*: its own if known, else :data:`SHARED_APP`."""
+        if not app:
+            return SHARED_APP
+        if app in self._registered:
+            self._registered.move_to_end(app)
+            return app
+        if app in self._quotas or app in self._weights:
+            return app
+        return SHARED_APP
+
+    def _known(self, bucket: str) -> bool:
+        return (
+            bucket == SHARED_APP
+            or bucket in self._registered
+            or bucket in self._quotas
+            or bucket in self._weights
+        )
+
+    def _drop_idle(self, bucket: str) -> None:
+        state = self._apps.get(bucket)
+        if state is not None and not (
+            self._known(bucket) or state.running or state.queued
+        ):
+            del self._apps[bucket]
+
+    def _app(self, bucket: str) -> AppState:
+        state = self._apps.get(bucket)
+        if state is None:
+            settings = self._registered.get(bucket, {})
+            state = self._apps[bucket] = AppState(
+                weight=settings.get("weight", self._weights.get(bucket, 1.0)),
+                max_running=settings.get(
+                    "max_running", int(self._quotas.get(bucket, self.app_max_running))
+                ),
+            )
+        return state
+
+    async def submit(
+        self,
+        app: str,
+        call: Submission,
+        priority: str = DEFAULT_PRIORITY,
+        max_wait: Optional[float] = None,
+    ) -> tuple:
+        """Admit, then run *call*; its slot is held until the orchestration ends.
+
+        Raises:
+            AdmissionRejected: No slot became free within *max_wait* seconds,
+                or the app's queue is full.
+        """
+        if not self.enabled:
+            return await call()
+        lease = await self.acquire(app, priority, max_wait)
+        try:
+            result = await call()
+        except BaseException:
+            self.release(lease)
+            raise
+        body, status_code = result
+        orch_id = body.get("orchestration_id") if isinstance(body, dict) else None
+        if status_code < 400 and isinstance(orch_id, str) and orch_id:
+            self.bind(lease, orch_id)
+        else:
+            self.release(lease)
+        return result
+
+    async def acquire(
+        self,
+        app: str,
+        priority: str = DEFAULT_PRIORITY,
+        max_wait: Optional[float] = None,
+    ) -> Lease:
+        """Wait for a slot in *app*'s bucket (see :meth:`bucket_of`).
+
+        Raises:
+            AdmissionRejected: See :meth:`submit`.
+        """
+        self._expire()
+        bucket = self.bucket_of(app)
+        state = self._app(bucket)
+        priority = priority_of(priority)
+        now = time.monotonic()
+        if not state.queued and self._has_slot(state):
+            return self._grant(state, bucket, priority, now)
+        if state.queued >= self.max_queue:
+            state.rejected += 1
+            raise AdmissionRejected(
+                f"Too many queued orchestrations for '{app}'", self._retry_after(state)
+            )
+        # Start-time fair queueing: a new request starts no earlier than the
+        # current virtual time or the app's previous request.
+        tag = max(self._vtime, state.last_tag)
+        state.last_tag = tag + 1.0 / state.weight
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(tag, next(self._seq), priority, now, future)
+        state.queues[priority].append(waiter)
+        self._dispatch()
+        if self.on_queue is not None and not waiter.future.done():
+            self.on_queue(list(self._leases))
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(waiter.future), max_wait or self.max_wait
+            )
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                return waiter.future.result()
+            self._abandon(state, waiter)
+            self._drop_idle(bucket)
+            state.rejected += 1
+            raise AdmissionRejected(
+                f"No capacity for '{app}' within {max_wait or self.max_wait:g}s",
+                self._retry_after(state),
+            ) from None
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result())
+            else:
+                self._abandon(state, waiter)
+                self._drop_idle(bucket)
+            raise
+
+    def _abandon(self, state: AppState, waiter: _Waiter) -> None:
+        waiter.future.cancel()
+        try:
+            state.queues[waiter.priority].remove(waiter)
+        except ValueError:
+            pass
+
+    def _has_slot(self, state: AppState) -> bool:
+        return self._running < self.max_running and state.running < state.max_running
+
+    def _grant(
+        self, state: AppState, app: str, priority: str, enqueued_at: float
+    ) -> Lease:
+        now = time.monotonic()
+        self._running += 1
+        state.running += 1
+        state.admitted += 1
+        state.waits.append(now - enqueued_at)
+        return Lease(app, priority, now)
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued requests: by class, then lowest start tag."""
+        while self._running < self.max_running:
+            best: Optional[tuple] = None
+            for priority in PRIORITIES:
+                for app, state in self._apps.items():
+                    queue = state.queues[priority]
+                    if queue and state.running < state.max_running:
+                        head = queue[0]
+                        if best is None or (head.tag, head.seq) < (
+                            best[2].tag,
+                            best[2].seq,
+                        ):
+                            best = (app, state, head)
+                if best is not None:
+                    break
+            if best is None:
+                return
+            app, state, waiter = best
+            state.queues[waiter.priority].popleft()
+            if waiter.future.done():
+                continue
+            self._vtime = max(self._vtime, waiter.tag)
+            waiter.future.set_result(
+                self._grant(state, app, waiter.priority, waiter.enqueued_at)
+            )
+
+    def bind(self, lease: Lease, orchestration_id: str) -> None:
+        """Hold *lease* until :meth:`finish` is called for *orchestration_id*."""
+        if orchestration_id in self._leases:
+            # Already running (a duplicate submission): one slot is enough.
+            self.release(lease)
+            return
+        lease.orchestration_id = orchestration_id
+        self._leases[orchestration_id] = lease
+
+    def finish(self, orchestration_id: str) -> None:
+        """Release the slot of a finished orchestration, if this worker holds one."""
+        lease = self._leases.pop(orchestration_id, None)
+        if lease is not None:
+            held = time.monotonic() - lease.granted_at
+            self._hold_estimate = 0.9 * self._hold_estimate + 0.1 * held
+            self.release(lease)
+
+    def release(self, lease: Lease) -> None:
+        """Return *lease*'s slot and admit the next queued request."""
+        if lease.released:
+            return
+        lease.released = True
+        if lease.orchestration_id is not None:
+            self._leases.pop(lease.orchestration_id, None)
+        self._running -= 1
+        state = self._apps.get(lease.app)
+        if state is not None:
+            state.running -= 1
+            self._drop_idle(lease.app)
+        self._dispatch()
+
+    async def on_status_change(self, state: Any, previous: Optional[str]) -> None:
+        """``OrchestrationTracker`` listener: free the slot on a terminal status."""
+        if state.terminal:
+            self.finish(state.orchestration_id)
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.lease_timeout
+        for orch_id, lease in list(self._leases.items()):
+            if lease.granted_at < deadline:
+                logger.warning(
+                    "Reclaiming admission slot of orchestration '%s' after %.0fs",
+                    orch_id,
+                    self.lease_timeout,
+                )
+                self.expired += 1
+                self.release(lease)
+
+    def _retry_after(self, state: AppState) -> int:
+        """Seconds until a request queued now would likely start."""
+        capacity = max(1, min(state.max_running, self.max_running))
+        estimate = self._hold_estimate * (state.queued + 1) / capacity
+        return max(1, min(300, math.ceil(estimate)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings, queue depths and wait times as a JSON-ready dict."""
+        self._expire()
+        apps: Dict[str, Any] = {}
+        for app, state in sorted(self._apps.items()):
+            waits: List[float] = sorted(state.waits)
+            apps[app] = {
+                "weight": state.weight,
+                "max_running": state.max_running,
+                "running": state.running,
+                "queued": {p: len(q) for p, q in state.queues.items()},
+                "admitted": state.admitted,
+                "rejected": state.rejected,
+                "wait_ms_avg": (
+                    round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0
+                ),
+                "wait_ms_p95": (
+                    round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0
+                ),
+                "wait_ms_max": round(waits[-1] * 1000, 3) if waits else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "max_running": self.max_running,
+            "running": self._running,
+            "queued": sum(state.queued for state in self._apps.values()),
+            "max_queue_per_app": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "hold_estimate_s": round(self._hold_estimate, 3),
+            "expired_leases": self.expired,
+            "apps": apps,
+        }
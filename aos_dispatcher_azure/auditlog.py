@@ -0,0 +1,1201 @@
+"""Append-only, hash-chained decision log with indexed queries.
+
+``log_decision`` in the dispatcher library keeps decisions in memory, and
+``get_decision_history`` / ``get_audit_trail`` scan all of them on every
+call.  :class:`AuditLog` keeps every decision logged through this app in a
+segmented log on disk (``AOS_AUDIT_LOG_PATH``) and answers both endpoints
+from it:
+
+- Appends go to the end of the *active* segment — one ``pwrite`` per request
+  or batch, whatever the size of the log.  The active segment is indexed in
+  memory by ``orchestration_id``, ``agent_id`` and time.
+- Once the active segment reaches ``AOS_AUDIT_SEGMENT_BYTES`` it is *sealed*:
+  its index is written to an ``.idx`` sidecar and both files are
+  memory-mapped from then on.  Key lookups binary-search the sidecar's
+  sorted key table and read posting lists in place; time windows bisect the
+  timestamps.  A filtered history query reads only the matching records.
+- Each record carries ``sha256(previous hash ‖ record header ‖ payload)`` and
+  each segment header the hash it continues from, so the chain runs across
+  segments.  :meth:`AuditLog.verify` (``GET /api/audit/verify``) detects an
+  altered, removed or reordered record.
+- Sealed segments are merged in the background, four adjacent segments of
+  the same size tier at a time, up to ``AOS_AUDIT_COMPACT_BYTES``, so queries
+  open few files.  Records are copied byte for byte: sequence numbers and
+  hashes do not change.
+
+Workers sharing the directory (e.g. an Azure Files mount) serialise appends
+with a lock file and pick up each other's records before answering queries,
+at most ``AOS_AUDIT_REFRESH_INTERVAL`` seconds late.
+
+The library stays the system of record: a decision is appended once the
+library has accepted it.  Until the log is open — and, when it is empty,
+bootstrapped from ``dispatcher.get_audit_trail`` — queries fall through to
+the library.  So they do while the log is *behind*: when appending decisions
+the library accepted fails, they are kept (:meth:`AuditLog.append_failed`)
+and written ahead of the next append, or by the next
+:meth:`AuditLog.ensure_ready` retry; queries are served from the log again
+once it has caught up.
+
+Configuration:
+    AOS_AUDIT_LOG_PATH          Log directory; unset disables the log
+    AOS_AUDIT_SEGMENT_BYTES     Active segment size before it is sealed
+                                (default: 64 MiB)
+    AOS_AUDIT_COMPACT_BYTES     Largest segment compaction produces
+                                (default: 1 GiB)
+    AOS_AUDIT_LOG_SHARED        Other workers append to the same directory
+                                (default: true)
+    AOS_AUDIT_REFRESH_INTERVAL  Seconds between checks for other workers'
+                                appends (default: 1)
+    AOS_AUDIT_FSYNC             ``fsync`` after every append (default: false)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .config import env_bool, env_float, env_int
+from .filelock import file_lock
+from .pagination import PaginationError, decode_cursor, encode_cursor
+from .timeseries import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("orchestration_id", "agent_id")
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_COMPACT_BYTES = 1024 * 1024 * 1024
+DEFAULT_REFRESH_INTERVAL = 1.0
+COMPACT_FANIN = 4
+BOOTSTRAP_RETRY_INTERVAL = 30.0
+GENESIS = bytes(32)
+
+#: ``fetch()`` → library ``get_audit_trail`` response.
+TrailFetcher = Callable[[], Awaitable[tuple]]
+
+
+class AuditLogError(RuntimeError):
+    """The log on disk cannot be appended to (e.g. a record fails its hash)."""
+
+
+# ── File format ─────────────────────────────────────────────────────────────
+#
+#   <first_seq>.log, or <first_seq>-<last_seq>.log once compacted
+#     header    SEGMENT_HEADER: first sequence number and the hash of the
+#               record before it (zeros for the first segment)
+#     records   RECORD header + JSON payload, back to back
+#
+#   <stem>.idx (sealed segments only)
+#     header    INDEX_HEADER
+#     offsets   u64 × n      record offset in the .log
+#     times     f64 × n      record timestamp (epoch seconds)
+#     by_time   u32 × n      record numbers sorted by timestamp
+#     keys      KEY × n_keys per field, sorted by key bytes
+#     postings  u32 record numbers per key, ascending
+#     blob      key strings
+
+MAGIC = b"AOSAUD01"
+INDEX_MAGIC = b"AOSAIX01"
+VERSION = 1
+SEGMENT_HEADER = struct.Struct("<8sI4xQ32s")  # magic, version, first_seq, anchor
+RECORD = struct.Struct("<IQd32s")  # payload_len, seq, timestamp, hash
+CHAINED = struct.Struct("<IQd")  # the hashed part of RECORD
+INDEX_HEADER = struct.Struct("<8sIIQQQ32s" + "Q" * 9)
+KEY = struct.Struct("<QIIQ")  # key_off, key_len, count, postings_off
+TIME_ORDERED = 1
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def chain_hash(previous: bytes, head: bytes, payload: bytes) -> bytes:
+    """Hash of a record: ``sha256(previous ‖ CHAINED header ‖ payload)``."""
+    digest = hashlib.sha256(previous)
+    digest.update(head)
+    digest.update(payload)
+    return digest.digest()
+
+
+def decision_time(decision: Dict[str, Any]) -> float:
+    """Epoch seconds of the decision's ``timestamp`` (now if it has none)."""
+    value = decision.get("timestamp")
+    if value is not None:
+        try:
+            return parse_timestamp(value)
+        except (TypeError, ValueError):
+            pass
+    return time.time()
+
+
+def _stem(first_seq: int, last_seq: Optional[int] = None) -> str:
+    if last_seq is None:
+        return f"{first_seq:020d}"
+    return f"{first_seq:020d}-{last_seq:020d}"
+
+
+def write_index(
+    path: str,
+    log_bytes: int,
+    first_seq: int,
+    last_hash: bytes,
+    offsets: Sequence[int],
+    times: Sequence[float],
+    postings: Dict[str, Dict[str, Sequence[int]]],
+) -> None:
+    """Write the ``.idx`` sidecar of a sealed segment (atomically)."""
+    n = len(offsets)
+    by_time = array("I", range(n))
+    ordered = all(times[i] <= times[i + 1] for i in range(n - 1))
+    if not ordered:
+        by_time = array("I", sorted(range(n), key=times.__getitem__))
+    out = bytearray(INDEX_HEADER.size)
+
+    def section(data: bytes) -> int:
+        out.extend(bytes(_align(len(out)) - len(out)))
+        start = len(out)
+        out.extend(data)
+        return start
+
+    offsets_at = section(array("Q", offsets).tobytes())
+    times_at = section(array("d", times).tobytes())
+    by_time_at = section(by_time.tobytes())
+    blob = bytearray()
+    lists = bytearray()
+    tables = []
+    for field in FIELDS:
+        table = bytearray()
+        entries = sorted(
+            (key.encode("utf-8"), ids) for key, ids in postings[field].items()
+        )
+        for key, ids in entries:
+            table += KEY.pack(len(blob), len(key), len(ids), len(lists))
+            blob += key
+            lists += array("I", ids).tobytes()
+        tables += [section(table), len(entries)]
+    lists_at = section(lists)
+    blob_at = section(blob)
+    INDEX_HEADER.pack_into(
+        out,
+        0,
+        INDEX_MAGIC,
+        VERSION,
+        TIME_ORDERED if ordered else 0,
+        log_bytes,
+        first_seq,
+        n,
+        last_hash,
+        offsets_at,
+        times_at,
+        by_time_at,
+        *tables,
+        lists_at,
+        blob_at,
+    )
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(out)
+    os.replace(tmp, path)
+
+
+# ── Segments ────────────────────────────────────────────────────────────────
+
+
+class _Segment:
+    """Query logic shared by sealed and active segments.
+
+    Records are numbered ``0 .. count-1`` within a segment; record *i* has
+    sequence number ``first_seq + i``.
+    """
+
+    first_seq: int
+    anchor: bytes
+    last_hash: bytes
+    times: Sequence[float]
+    time_ordered: bool
+
+    @property
+    def count(self) -> int:
+        return len(self.times)
+
+    @property
+    def end_seq(self) -> int:
+        """Sequence number of the record after this segment's last."""
+        return self.first_seq + self.count
+
+    def lookup(self, field: str, key: str) -> Sequence[int]:
+        raise NotImplementedError
+
+    def record(self, index: int) -> Tuple[bytes, bytes, bytes]:
+        """``(CHAINED header, hash, payload)`` of record *index*."""
+        raise NotImplementedError
+
+    def decision(self, index: int) -> Dict[str, Any]:
+        return json.loads(self.record(index)[2])
+
+    def _unordered_window(
+        self, start: Optional[float], end: Optional[float], first: int, n: int
+    ) -> Iterable[int]:
+        return range(first, n)
+
+    def matching(
+        self,
+        keys: Dict[str, str],
+        start: Optional[float],
+        end: Optional[float],
+        after_seq: int,
+    ) -> Iterator[int]:
+        """Record numbers matching every key and the time window, in log order."""
+        n = self.count
+        first = max(0, after_seq + 1 - self.first_seq)
+        if first >= n:
+            return
+        if keys:
+            lists = sorted(
+                (self.lookup(field, key) for field, key in keys.items()), key=len
+            )
+            candidates = _intersect(lists[0], lists[1:], first)
+        elif self.time_ordered:
+            lo = (
+                bisect.bisect_left(self.times, start, first, n)
+                if start is not None
+                else first
+            )
+            hi = bisect.bisect_left(self.times, end, lo, n) if end is not None else n
+            candidates = range(lo, hi)
+        else:
+            candidates = self._unordered_window(start, end, first, n)
+        for index in candidates:
+            if index >= n:
+                break
+            if start is not None or end is not None:
+                timestamp = self.times[index]
+                if (start is not None and timestamp < start) or (
+                    end is not None and timestamp >= end
+                ):
+                    continue
+            yield index
+
+
+def _intersect(
+    smallest: Sequence[int], others: List[Sequence[int]], first: int
+) -> Iterator[int]:
+    """Ascending record numbers ≥ *first* present in every posting list."""
+    for position in range(bisect.bisect_left(smallest, first), len(smallest)):
+        index = smallest[position]
+        if all(_contains(other, index) for other in others):
+            yield index
+
+
+def _contains(postings: Sequence[int], index: int) -> bool:
+    position = bisect.bisect_left(postings, index)
+    return position < len(postings) and postings[position] == index
+
+
+class SealedSegment(_Segment):
+    """A read-only segment and its index, both memory-mapped."""
+
+    def __init__(self, log_path: str, idx_path: str) -> None:
+        self.log_path = log_path
+        self.idx_path = idx_path
+        with open(log_path, "rb") as handle:
+            self._log = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with open(idx_path, "rb") as handle:
+                self._idx = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._log.close()
+            raise
+        magic, version, self.first_seq, self.anchor = SEGMENT_HEADER.unpack_from(
+            self._log, 0
+        )
+        fields = INDEX_HEADER.unpack_from(self._idx, 0)
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or fields[0] != INDEX_MAGIC
+            or fields[1] != VERSION
+            or fields[3] != len(self._log)
+            or fields[4] != self.first_seq
+        ):
+            self.close()
+            raise ValueError(f"{idx_path} does not index {log_path}")
+        self.time_ordered = bool(fields[2] & TIME_ORDERED)
+        n, self.last_hash = fields[5], fields[6]
+        offsets, times, by_time = fields[7:10]
+        self._keys = {FIELDS[0]: fields[10:12], FIELDS[1]: fields[12:14]}
+        self._postings, self._blob = fields[14:16]
+        view = memoryview(self._idx)
+        self.offsets = view[offsets : offsets + 8 * n].cast("Q")
+        self.times = view[times : times + 8 * n].cast("d")
+        self.by_time = view[by_time : by_time + 4 * n].cast("I")
+        self._view = view
+
+    @property
+    def size(self) -> int:
+        return len(self._log)
+
+    def body(self) -> memoryview:
+        """The records, without the segment header."""
+        return memoryview(self._log)[SEGMENT_HEADER.size :]
+
+    def record(self, index: int) -> Tuple[bytes, bytes, bytes]:
+        offset = self.offsets[index]
+        length = RECORD.unpack_from(self._log, offset)[0]
+        head_end = offset + CHAINED.size
+        payload = head_end + 32
+        return (
+            self._log[offset:head_end],
+            self._log[head_end:payload],
+            self._log[payload : payload + length],
+        )
+
+    def _key_at(self, field: str, index: int) -> Tuple[bytes, int, int]:
+        table = self._keys[field][0]
+        key_off, key_len, count, postings_off = KEY.unpack_from(
+            self._idx, table + index * KEY.size
+        )
+        start = self._blob + key_off
+        return self._idx[start : start + key_len], count, postings_off
+
+    def _postings_at(self, count: int, offset: int) -> memoryview:
+        start = self._postings + offset
+        return self._view[start : start + 4 * count].cast("I")
+
+    def lookup(self, field: str, key: str) -> Sequence[int]:
+        """Record numbers with ``field == key``, by binary search of the key table."""
+        target = key.encode("utf-8")
+        lo, hi = 0, self._keys[field][1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate, count, offset = self._key_at(field, mid)
+            if candidate < target:
+                lo = mid + 1
+            elif candidate > target:
+                hi = mid
+            else:
+                return self._postings_at(count, offset)
+        return ()
+
+    def iter_keys(self, field: str) -> Iterator[Tuple[str, memoryview]]:
+        """``(key, record numbers)`` in key order."""
+        for index in range(self._keys[field][1]):
+            key, count, offset = self._key_at(field, index)
+            yield key.decode("utf-8"), self._postings_at(count, offset)
+
+    def _unordered_window(
+        self, start: Optional[float], end: Optional[float], first: int, n: int
+    ) -> Iterable[int]:
+        lo, hi = 0, n
+        if start is not None:
+            lo = self._bisect_time(start)
+        if end is not None:
+            hi = self._bisect_time(end)
+        return sorted(index for index in self.by_time[lo:hi] if index >= first)
+
+    def _bisect_time(self, value: float) -> int:
+        lo, hi = 0, len(self.by_time)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[self.by_time[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self) -> None:
+        for name in ("offsets", "times", "by_time", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        for mapping in (self._log, getattr(self, "_idx", None)):
+            try:
+                if mapping is not None:
+                    mapping.close()
+            except BufferError:
+                # A posting list from this segment is still referenced; the
+                # mapping is released when it is garbage-collected.
+                pass
+
+
+class ActiveSegment(_Segment):
+    """The segment being appended to, indexed in memory.
+
+    Args:
+        path: Segment file.
+        first_seq: With *anchor*, create the file (it must not exist).
+        anchor: Hash of the record before *first_seq*.
+        fsync: ``fsync`` after every append.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        first_seq: Optional[int] = None,
+        anchor: bytes = GENESIS,
+        fsync: bool = False,
+    ) -> None:
+        self.path = path
+        self.fsync = fsync
+        if first_seq is not None:
+            # Written aside and renamed so a reader never sees a headerless file.
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as handle:
+                handle.write(SEGMENT_HEADER.pack(MAGIC, VERSION, first_seq, anchor))
+            os.replace(tmp, path)
+        # Unbuffered so pread/pwrite see the file itself; closed when the
+        # last query holding this segment lets go of it.
+        self._file = open(path, "r+b", buffering=0)
+        header = os.pread(self._file.fileno(), SEGMENT_HEADER.size, 0)
+        if len(header) < SEGMENT_HEADER.size:
+            raise ValueError(f"{path} has no segment header")
+        magic, version, self.first_seq, self.anchor = SEGMENT_HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} audit segment")
+        self.size = SEGMENT_HEADER.size
+        self.last_hash = self.anchor
+        self.corrupt_at: Optional[int] = None
+        self.offsets = array("Q")
+        self.times = array("d")
+        self.time_ordered = True
+        self.postings: Dict[str, Dict[str, array]] = {field: {} for field in FIELDS}
+
+    def _index(self, offset: int, timestamp: float, decision: Any) -> None:
+        if self.times and timestamp < self.times[-1]:
+            self.time_ordered = False
+        self.offsets.append(offset)
+        self.times.append(timestamp)
+        index = len(self.times) - 1
+        if isinstance(decision, dict):
+            for field in FIELDS:
+                key = decision.get(field)
+                if isinstance(key, str):
+                    postings = self.postings[field].get(key)
+                    if postings is None:
+                        postings = self.postings[field][key] = array("I")
+                    postings.append(index)
+
+    def catch_up(self, repair: bool = False) -> int:
+        """Index records appended to the file since it was last read.
+
+        A trailing partial record is another worker's append in progress —
+        or, with *repair* (the append lock held), the remains of a crashed
+        one, which is truncated.  A complete record that does not continue
+        the hash chain stops indexing and is never overwritten.
+
+        Returns:
+            The number of records indexed.
+        """
+        end = os.fstat(self._file.fileno()).st_size
+        if end <= self.size or self.corrupt_at is not None:
+            return 0
+        data = os.pread(self._file.fileno(), end - self.size, self.size)
+        position = added = 0
+        while position + RECORD.size <= len(data):
+            length, seq, timestamp, digest = RECORD.unpack_from(data, position)
+            stop = position + RECORD.size + length
+            if stop > len(data):
+                break
+            head = data[position : position + CHAINED.size]
+            payload = data[position + RECORD.size : stop]
+            try:
+                if (
+                    seq != self.end_seq
+                    or chain_hash(self.last_hash, head, payload) != digest
+                ):
+                    raise ValueError("hash chain broken")
+                decision = json.loads(payload)
+            except ValueError:
+                self.corrupt_at = self.size + position
+                logger.error(
+                    "Audit segment %s: record at offset %d does not continue "
+                    "the hash chain",
+                    self.path,
+                    self.corrupt_at,
+                )
+                break
+            self._index(self.size + position, timestamp, decision)
+            self.last_hash = digest
+            position = stop
+            added += 1
+        self.size += position
+        if repair and self.corrupt_at is None and self.size < end:
+            logger.warning(
+                "Audit segment %s: truncating %d bytes of an incomplete append",
+                self.path,
+                end - self.size,
+            )
+            self._file.truncate(self.size)
+        return added
+
+    def append(self, records: Sequence[Tuple[Any, bytes, float]]) -> None:
+        """Append ``(decision, payload, timestamp)`` records and index them."""
+        if self.corrupt_at is not None:
+            raise AuditLogError(
+                f"Audit segment {self.path} is corrupt at offset {self.corrupt_at}"
+            )
+        data = bytearray()
+        entries = []
+        digest, seq = self.last_hash, self.end_seq
+        for decision, payload, timestamp in records:
+            head = CHAINED.pack(len(payload), seq, timestamp)
+            digest = chain_hash(digest, head, payload)
+            entries.append((self.size + len(data), timestamp, decision))
+            data += head
+            data += digest
+            data += payload
+            seq += 1
+        view = memoryview(data)
+        written = 0
+        while written < len(data):
+            written += os.pwrite(
+                self._file.fileno(), view[written:], self.size + written
+            )
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        for entry in entries:
+            self._index(*entry)
+        self.size += len(data)
+        self.last_hash = digest
+
+    def record(self, index: int) -> Tuple[bytes, bytes, bytes]:
+        offset = self.offsets[index]
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else self.size
+        data = os.pread(self._file.fileno(), end - offset, offset)
+        return (
+            data[: CHAINED.size],
+            data[CHAINED.size : RECORD.size],
+            data[RECORD.size :],
+        )
+
+    def lookup(self, field: str, key: str) -> Sequence[int]:
+        return self.postings[field].get(key, ())
+
+    def seal(self, idx_path: str) -> None:
+        """Write this segment's index sidecar."""
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        write_index(
+            idx_path,
+            self.size,
+            self.first_seq,
+            self.last_hash,
+            self.offsets,
+            self.times,
+            self.postings,
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# ── Log ─────────────────────────────────────────────────────────────────────
+
+
+class AuditLog:
+    """Segmented decision log in one directory.
+
+    Args:
+        path: Log directory.  Defaults to ``AOS_AUDIT_LOG_PATH``; ``""``
+            disables the log.
+        segment_bytes: Active segment size before it is sealed.  Defaults to
+            ``AOS_AUDIT_SEGMENT_BYTES``.
+        compact_bytes: Largest segment compaction produces.  Defaults to
+            ``AOS_AUDIT_COMPACT_BYTES``.
+        shared: Other workers append to the same directory.  Defaults to
+            ``AOS_AUDIT_LOG_SHARED``.
+        refresh_interval: Seconds between checks for other workers' appends.
+            Defaults to ``AOS_AUDIT_REFRESH_INTERVAL``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        compact_bytes: Optional[int] = None,
+        shared: Optional[bool] = None,
+        refresh_interval: Optional[float] = None,
+    ) -> None:
+        if path is None:
+            path = os.environ.get("AOS_AUDIT_LOG_PATH")
+        self.path = path or None
+        self.segment_bytes = segment_bytes or env_int(
+            "AOS_AUDIT_SEGMENT_BYTES", DEFAULT_SEGMENT_BYTES, minimum=4096
+        )
+        self.compact_bytes = compact_bytes or env_int(
+            "AOS_AUDIT_COMPACT_BYTES", DEFAULT_COMPACT_BYTES, minimum=4096
+        )
+        self.shared = (
+            env_bool("AOS_AUDIT_LOG_SHARED", True) if shared is None else shared
+        )
+        self.refresh_interval = (
+            env_float("AOS_AUDIT_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+            if refresh_interval is None
+            else refresh_interval
+        )
+        self.fsync = env_bool("AOS_AUDIT_FSYNC", False)
+        self.complete = False
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._ready_lock = asyncio.Lock()
+        self._opened = False
+        self._bootstrap_at: Optional[float] = None
+        self._missed: List[Dict[str, Any]] = []  # accepted, not yet appended
+        self._refreshed_at = 0.0
+        self._names: Optional[frozenset] = None
+        self._replaced: List[str] = []
+        self._sealed: List[SealedSegment] = []
+        self._active: Optional[ActiveSegment] = None
+        self._compact_task: Optional[asyncio.Task] = None
+        self._compaction_due = False
+        self.appended = 0
+        self.compactions = 0
+        self.compaction_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    @property
+    def behind(self) -> int:
+        """Accepted decisions that failed to append and are not in the log yet."""
+        return len(self._missed)
+
+    def _segments(self) -> List[_Segment]:
+        with self._lock:
+            segments: List[_Segment] = list(self._sealed)
+            if self._active is not None:
+                segments.append(self._active)
+            return segments
+
+    @property
+    def count(self) -> int:
+        """Number of records in the log."""
+        segments = self._segments()
+        return segments[-1].end_seq - 1 if segments else 0
+
+    # ── opening ──
+
+    def open(self) -> None:
+        """Open (or create) the log directory.  Blocking."""
+        with self._lock:
+            if self._opened:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with self._append_lock():
+                self._reload(repair=True)
+                if self._active is None:
+                    self._roll()
+            self._opened = True
+
+    def _file(self, stem: str, suffix: str) -> str:
+        return os.path.join(self.path, stem + suffix)
+
+    def _append_lock(self):
+        if not self.shared:
+            return contextlib.nullcontext()
+        return file_lock(os.path.join(self.path, "append"))
+
+    def _listing(self) -> List[Tuple[int, Optional[int], str]]:
+        """``(first_seq, last_seq, stem)`` of every segment, covering ones first."""
+        entries = []
+        for name in self._names:
+            if not name.endswith(".log"):
+                continue
+            first, _, last = name[:-4].partition("-")
+            try:
+                entries.append((int(first), int(last) if last else None, name[:-4]))
+            except ValueError:
+                continue
+        # A compacted segment sorts before the segments it replaced.
+        entries.sort(
+            key=lambda entry: (entry[0], -entry[1] if entry[1] is not None else 1)
+        )
+        return entries
+
+    def _reload(self, repair: bool = False) -> None:
+        """Re-read the directory: segments sealed, compacted or created elsewhere."""
+        names = frozenset(os.listdir(self.path))
+        if names == self._names:
+            if self._active is not None:
+                self._active.catch_up(repair)
+            return
+        self._names = names
+        known = {segment.log_path: segment for segment in self._sealed}
+        entries = self._listing()
+        sealed: List[SealedSegment] = []
+        active: Optional[ActiveSegment] = None
+        logs = {stem for _, _, stem in entries}
+        # Index files whose log was never renamed into place (compaction crashed).
+        replaced = [
+            name[:-4]
+            for name in names
+            if name.endswith(".idx") and name[:-4] not in logs
+        ]
+        next_seq = 1
+        for position, (first_seq, _, stem) in enumerate(entries):
+            if first_seq < next_seq:
+                replaced.append(stem)  # covered by a compacted segment
+                continue
+            if first_seq > next_seq:
+                logger.error(
+                    "Audit log %s: records %d-%d are missing",
+                    self.path,
+                    next_seq,
+                    first_seq - 1,
+                )
+            log_path = self._file(stem, ".log")
+            if stem + ".idx" not in names and position == len(entries) - 1:
+                if self._active is not None and self._active.path == log_path:
+                    active = self._active
+                else:
+                    active = ActiveSegment(log_path, fsync=self.fsync)
+                active.catch_up(repair)
+                break
+            segment = known.get(log_path) or self._open_sealed(stem)
+            sealed.append(segment)
+            next_seq = segment.end_seq
+        self._sealed = sealed
+        self._active = active
+        self._replaced = replaced
+
+    def _open_sealed(self, stem: str) -> SealedSegment:
+        log_path, idx_path = self._file(stem, ".log"), self._file(stem, ".idx")
+        try:
+            return SealedSegment(log_path, idx_path)
+        except (FileNotFoundError, ValueError):
+            logger.warning("Audit log: rebuilding the index of %s", log_path)
+        segment = ActiveSegment(log_path)
+        try:
+            segment.catch_up()
+            segment.seal(idx_path)
+        finally:
+            segment.close()
+        return SealedSegment(log_path, idx_path)
+
+    def _roll(self) -> None:
+        """Seal the active segment (if any) and start a new one after it."""
+        if self._active is not None:
+            active = self._active
+            stem = os.path.basename(active.path)[:-4]
+            active.seal(self._file(stem, ".idx"))
+            self._sealed.append(SealedSegment(active.path, self._file(stem, ".idx")))
+            first_seq, anchor = active.end_seq, active.last_hash
+            self._compaction_due = True
+        elif self._sealed:
+            first_seq, anchor = self._sealed[-1].end_seq, self._sealed[-1].last_hash
+        else:
+            first_seq, anchor = 1, GENESIS
+        self._active = ActiveSegment(
+            self._file(_stem(first_seq), ".log"), first_seq, anchor, fsync=self.fsync
+        )
+        self._names = frozenset(os.listdir(self.path))
+
+    def _refresh(self) -> None:
+        if not self.shared:
+            return
+        now = time.monotonic()
+        if now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._refreshed_at = now
+            self._reload()
+
+    async def ensure_ready(self, fetch: TrailFetcher) -> bool:
+        """Open the log, bootstrapping an empty one from the library.
+
+        Returns:
+            ``True`` once the log holds every decision and answers queries.
+        """
+        if self.complete:
+            return True
+        if not self.enabled:
+            return False
+        async with self._ready_lock:
+            if self.complete:
+                return True
+            now = time.monotonic()
+            if (
+                self._bootstrap_at is not None
+                and now - self._bootstrap_at < BOOTSTRAP_RETRY_INTERVAL
+            ):
+                return False
+            self._bootstrap_at = now
+            try:
+                await asyncio.to_thread(self.open)
+                if self._missed and self.count:
+                    # Catch up on decisions an earlier append failed to write.
+                    await asyncio.to_thread(self.append, [])
+                    return self.complete
+                if self.count:
+                    self.complete = True
+                    return True
+                body, status_code = await fetch()
+                if status_code >= 400 or not isinstance(body, dict):
+                    return False
+                await asyncio.to_thread(self.bootstrap, body.get("trail") or [])
+            except Exception:  # noqa: BLE001 — queries fall back to the library
+                logger.exception("Audit log %s could not be opened", self.path)
+                return False
+            return self.complete
+
+    def bootstrap(self, decisions: Sequence[Dict[str, Any]]) -> None:
+        """Append *decisions* (the library's trail) if the log is still empty."""
+        with self._lock:
+            with self._append_lock():
+                self._reload(repair=True)
+                if not self.count:
+                    self._append(decisions)
+                    self._missed = []  # the library's trail holds them
+            self.complete = True
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._sealed:
+                segment.close()
+            if self._active is not None:
+                self._active.close()
+            self._sealed, self._active = [], None
+            self._names = None
+            self._opened = self.complete = False
+
+    # ── writes ──
+
+    def append(self, decisions: Sequence[Dict[str, Any]]) -> int:
+        """Append *decisions* in order; returns the last sequence number.
+
+        Decisions an earlier append failed to write go first; once they are
+        in, the log answers queries again.  Blocking; run it through
+        ``DispatcherExecutor.run``.
+        """
+        with self._lock:
+            with self._append_lock():
+                if self.shared:
+                    self._reload(repair=True)
+                missed = self._missed
+                sequence = self._append(
+                    missed + list(decisions) if missed else decisions
+                )
+            if missed:
+                self._missed = []
+                self.complete = True
+                logger.info(
+                    "Audit log %s caught up with %d decision(s)", self.path, len(missed)
+                )
+            return sequence
+
+    def append_failed(self, decisions: Sequence[Dict[str, Any]]) -> None:
+        """Keep *decisions* that :meth:`append` could not write.
+
+        The log is missing decisions the library holds, so it stops answering
+        queries (``complete`` is cleared) until they have been appended.
+        """
+        with self._lock:
+            self._missed.extend(decisions)
+            self.complete = False
+
+    def _append(self, decisions: Sequence[Dict[str, Any]]) -> int:
+        batch: List[Tuple[Any, bytes, float]] = []
+        size = self._active.size
+        for decision in decisions:
+            payload = json.dumps(decision, separators=(",", ":"), default=str).encode(
+                "utf-8"
+            )
+            record_size = RECORD.size + len(payload)
+            if size + record_size > self.segment_bytes and (
+                batch or self._active.count
+            ):
+                if batch:
+                    self._active.append(batch)
+                    batch = []
+                self._roll()
+                size = self._active.size
+            batch.append((decision, payload, decision_time(decision)))
+            size += record_size
+        if batch:
+            self._active.append(batch)
+        self.appended += len(decisions)
+        return self._active.end_seq - 1
+
+    def schedule_compaction(self, run: Callable[..., Awaitable[Any]]) -> None:
+        """Start a background :meth:`compact` through *run* after a segment was sealed.
+
+        *run* is ``DispatcherExecutor.run``; at most one compaction is in flight.
+        """
+        if not self._compaction_due or (
+            self._compact_task and not self._compact_task.done()
+        ):
+            return
+        self._compaction_due = False
+        self._compact_task = asyncio.get_running_loop().create_task(
+            self._compact_via(run)
+        )
+
+    async def _compact_via(self, run: Callable[..., Awaitable[Any]]) -> None:
+        try:
+            await run("audit_log_compaction", self.compact)
+        except Exception:  # noqa: BLE001 — retried after the next seal
+            logger.exception("Audit log compaction in %s failed", self.path)
+
+    def _tier(self, segment: SealedSegment) -> int:
+        tier = 0
+        while segment.size > self.segment_bytes * COMPACT_FANIN**tier:
+            tier += 1
+        return tier
+
+    def _compaction_run(self) -> List[SealedSegment]:
+        with self._lock:
+            sealed = list(self._sealed)
+        for start in range(len(sealed) - COMPACT_FANIN + 1):
+            run = sealed[start : start + COMPACT_FANIN]
+            tiers = {self._tier(segment) for segment in run}
+            if (
+                len(tiers) == 1
+                and sum(segment.size for segment in run) <= self.compact_bytes
+            ):
+                return run
+        return []
+
+    def compact(self) -> int:
+        """Merge runs of adjacent sealed segments; returns the number of merges.
+
+        Blocking; run it through ``DispatcherExecutor.run``.
+        """
+        merges = 0
+        with self._compact_lock, contextlib.ExitStack() as stack:
+            if self.shared:
+                stack.enter_context(
+                    file_lock(os.path.join(self.path, "compact"), timeout=300)
+                )
+                with self._lock:
+                    self._reload()
+            self._remove_replaced()
+            while True:
+                run = self._compaction_run()
+                if not run:
+                    return merges
+                started = time.perf_counter()
+                self._merge(run)
+                with self._lock:
+                    self._reload()
+                self._remove_replaced()
+                merges += 1
+                self.compactions += 1
+                self.compaction_seconds += time.perf_counter() - started
+
+    def _merge(self, run: List[SealedSegment]) -> None:
+        first, last = run[0], run[-1]
+        stem = _stem(first.first_seq, last.end_seq - 1)
+        log_path, idx_path = self._file(stem, ".log"), self._file(stem, ".idx")
+        offsets, times = array("Q"), array("d")
+        postings: Dict[str, Dict[str, array]] = {field: {} for field in FIELDS}
+        tmp = f"{log_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as out:
+            out.write(
+                SEGMENT_HEADER.pack(MAGIC, VERSION, first.first_seq, first.anchor)
+            )
+            position, base = SEGMENT_HEADER.size, 0
+            for segment in run:
+                body = segment.body()
+                out.write(body)
+                shift = position - SEGMENT_HEADER.size
+                offsets.extend(offset + shift for offset in segment.offsets)
+                times.extend(segment.times)
+                for field in FIELDS:
+                    for key, ids in segment.iter_keys(field):
+                        target = postings[field].get(key)
+                        if target is None:
+                            target = postings[field][key] = array("I")
+                        target.extend(index + base for index in ids)
+                position += len(body)
+                base += segment.count
+            out.flush()
+            os.fsync(out.fileno())
+        # The index goes first: a .log without its .idx would be re-indexed,
+        # but an .idx without its .log is simply ignored.
+        write_index(
+            idx_path,
+            position,
+            first.first_seq,
+            last.last_hash,
+            offsets,
+            times,
+            postings,
+        )
+        os.replace(tmp, log_path)
+        logger.info(
+            "Audit log: merged %d segments into %s (%d records)",
+            len(run),
+            stem,
+            len(offsets),
+        )
+
+    def _remove_replaced(self) -> None:
+        """Delete segment files covered by a compacted segment.
+
+        Workers still reading them keep their mappings until they reload.
+        """
+        with self._lock:
+            replaced, self._replaced = self._replaced, []
+        for stem in replaced:
+            for suffix in (".log", ".idx"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self._file(stem, suffix))
+
+    # ── reads ──
+
+    def _select(
+        self,
+        keys: Dict[str, str],
+        start: Optional[float],
+        end: Optional[float],
+        after_seq: int,
+        limit: Optional[int],
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Matching decisions after *after_seq*, in log order.
+
+        Returns:
+            ``(decisions, last_seq)``; *last_seq* is the sequence number of
+            the last decision returned when more match, else ``None``.
+        """
+        self._refresh()
+        decisions: List[Dict[str, Any]] = []
+        last_seq = after_seq
+        for segment in self._segments():
+            if segment.end_seq <= after_seq + 1:
+                continue
+            for index in segment.matching(keys, start, end, after_seq):
+                if limit is not None and len(decisions) == limit:
+                    return decisions, last_seq
+                decisions.append(segment.decision(index))
+                last_seq = segment.first_seq + index
+        return decisions, None
+
+    def _page(
+        self,
+        collection: str,
+        list_key: str,
+        keys: Dict[str, str],
+        start: Optional[float],
+        end: Optional[float],
+        limit: Optional[int],
+        cursor: Optional[str],
+    ) -> tuple:
+        try:
+            after_seq = decode_cursor(cursor, collection)[0] if cursor else 0
+        except PaginationError as exc:
+            return {"error": str(exc)}, 400
+        decisions, last_seq = self._select(keys, start, end, after_seq, limit)
+        body: Dict[str, Any] = {list_key: decisions}
+        if limit is not None:
+            body["next_cursor"] = (
+                encode_cursor(collection, last_seq, decisions[-1].get("id"))
+                if last_seq is not None
+                else None
+            )
+        return body, 200
+
+    def decision_history(
+        self,
+        orch_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> tuple:
+        """``get_decision_history`` from the log, optionally within ``[start, end)``."""
+        keys = {
+            field: value
+            for field, value in zip(FIELDS, (orch_id, agent_id))
+            if value is not None
+        }
+        return self._page(
+            "get_decision_history", "decisions", keys, start, end, limit, cursor
+        )
+
+    def audit_trail(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> tuple:
+        """``get_audit_trail`` from the log."""
+        return self._page("get_audit_trail", "trail", {}, None, None, limit, cursor)
+
+    def verify(self) -> Dict[str, Any]:
+        """Walk the hash chain over every record.  Blocking.
+
+        Returns:
+            ``{"valid", "records", "segments", "head"}``; when invalid, also
+            ``first_invalid_seq`` and ``reason``.
+        """
+        self._refresh()
+        segments = self._segments()
+        previous, next_seq = GENESIS, 1
+        report: Dict[str, Any] = {
+            "valid": True,
+            "records": 0,
+            "segments": len(segments),
+        }
+
+        def broken(seq: int, reason: str) -> Dict[str, Any]:
+            report.update(valid=False, first_invalid_seq=seq, reason=reason)
+            return report
+
+        for segment in segments:
+            if segment.first_seq != next_seq or segment.anchor != previous:
+                return broken(next_seq, "segment does not continue the chain")
+            for index in range(segment.count):
+                head, digest, payload = segment.record(index)
+                if CHAINED.unpack(head)[1] != next_seq:
+                    return broken(next_seq, "sequence number out of order")
+                if chain_hash(previous, head, payload) != digest:
+                    return broken(next_seq, "hash mismatch")
+                previous = digest
+                next_seq += 1
+                report["records"] += 1
+            if segment.last_hash != previous:
+                return broken(next_seq - 1, "segment index does not match its records")
+            corrupt_at = getattr(segment, "corrupt_at", None)
+            if corrupt_at is not None:
+                return broken(
+                    next_seq, f"record at offset {corrupt_at} of the active segment"
+                )
+        report["head"] = previous.hex()
+        return report
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Size, head hash and compaction counters as a JSON-ready dict."""
+        segments = self._segments()
+        return {
+            "enabled": self.enabled,
+            "ready": self.complete,
+            "behind": self.behind,
+            "shared": self.shared,
+            "records": self.count,
+            "segments": len(segments),
+            "bytes": sum(getattr(segment, "size", 0) for segment in segments),
+            "head": segments[-1].last_hash.hex() if segments else None,
+            "appended": self.appended,
+            "compactions": self.compactions,
+            "compaction_ms": round(self.compaction_seconds * 1000, 3),
+        }
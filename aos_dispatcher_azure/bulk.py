@@ -0,0 +1,184 @@
+"""Batch ingest for the single-item write endpoints.
+
+``record_metric``, ``create_document`` and ``log_decision`` take one item per
+HTTP call.  Agents emit thousands of metric points and decision records per
+orchestration, so the ``/batch`` variants of those endpoints accept many
+items in one request and report a result per item.
+
+Request bodies:
+    application/json        A JSON array, or ``{"items": [...]}``
+    application/x-ndjson    One JSON object per line (also ``application/jsonl``)
+    application/msgpack     A MessagePack array or ``{"items": [...]}`` (when
+                            enabled, see ``aos_dispatcher_azure.codec``)
+
+A line of NDJSON that is not valid JSON fails on its own (``400`` in its
+result entry); the rest of the batch is still written.
+
+Writes go to the dispatcher's bulk function (``record_metrics``,
+``create_documents``, ``log_decisions``) when the library exports one: it
+takes the list of items and returns one ``(body, status_code)`` per item.
+Otherwise the single-item function is called for each item inside one
+executor job, which still saves the per-item HTTP, invocation and thread
+hand-off cost.
+
+Configuration:
+    AOS_BULK_MAX_ITEMS   Max items per request (default: 5000); larger
+                         requests are rejected with 413
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .codec import Codec, CodecError
+from .config import env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ITEMS = 5000
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+)
+
+
+class BulkRequestError(ValueError):
+    """The request body as a whole cannot be processed."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class InvalidItem:
+    """Placeholder for an NDJSON line that could not be parsed."""
+
+    error: str
+
+
+def _parse_ndjson(text: str, codec: Codec) -> List[Any]:
+    items: List[Any] = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(codec.loads(line))
+        except ValueError:
+            items.append(InvalidItem(f"Invalid JSON on line {line_no}"))
+    return items
+
+
+def _unwrap(parsed: Any) -> List[Any]:
+    if isinstance(parsed, dict) and isinstance(parsed.get("items"), list):
+        return parsed["items"]
+    if isinstance(parsed, list):
+        return parsed
+    raise BulkRequestError("Expected a JSON array or an object with 'items'")
+
+
+def parse_items(
+    body: bytes,
+    content_type: str = "",
+    max_items: Optional[int] = None,
+    codec: Optional[Codec] = None,
+) -> List[Any]:
+    """Split a batch request body into items.
+
+    Raises:
+        BulkRequestError: The body is not a JSON array, an ``{"items": [...]}``
+            object, NDJSON or MessagePack equivalent (400), or holds more than
+            *max_items* (413).
+    """
+    max_items = max_items or env_int("AOS_BULK_MAX_ITEMS", DEFAULT_MAX_ITEMS)
+    codec = codec or Codec()
+    if codec.is_msgpack(content_type):
+        try:
+            items = _unwrap(codec.decode_body(body, content_type))
+        except CodecError as exc:
+            raise BulkRequestError(str(exc)) from None
+        return _check_size(items, max_items)
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise BulkRequestError("Request body must be UTF-8") from None
+    if content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        items = _parse_ndjson(text, codec)
+    else:
+        try:
+            parsed = codec.loads(text)
+        except ValueError:
+            # Tolerate NDJSON sent without its content type.
+            if len([line for line in text.splitlines() if line.strip()]) < 2:
+                raise BulkRequestError("Invalid JSON body") from None
+            items = _parse_ndjson(text, codec)
+        else:
+            items = _unwrap(parsed)
+    return _check_size(items, max_items)
+
+
+def _check_size(items: List[Any], max_items: int) -> List[Any]:
+    if not items:
+        raise BulkRequestError("Batch contains no items")
+    if len(items) > max_items:
+        raise BulkRequestError(f"Batch exceeds {max_items} items", status_code=413)
+    return items
+
+
+def _item_error(item: Any) -> Optional[tuple]:
+    if isinstance(item, InvalidItem):
+        return {"error": item.error}, 400
+    if not isinstance(item, dict):
+        return {"error": "Each item must be a JSON object"}, 400
+    return None
+
+
+def write_items(
+    items: Sequence[Any],
+    single_fn: Callable[[Dict[str, Any]], tuple],
+    bulk_fn: Optional[Callable[[List[Dict[str, Any]]], Sequence[tuple]]] = None,
+) -> tuple:
+    """Write *items* through the dispatcher and summarise per-item results.
+
+    Blocking; run it through ``DispatcherExecutor.run``.
+
+    Returns:
+        Library-style ``(body, status_code)``: ``200`` when every item
+        succeeded, ``207`` when any failed.
+    """
+    responses: List[Optional[tuple]] = [_item_error(item) for item in items]
+    pending = [index for index, response in enumerate(responses) if response is None]
+    if pending and bulk_fn is not None:
+        try:
+            written = list(bulk_fn([items[index] for index in pending]))
+            if len(written) != len(pending):
+                raise ValueError(
+                    f"bulk call returned {len(written)} results for {len(pending)}"
+                )
+        except Exception:  # noqa: BLE001 — reported per item
+            logger.exception("Bulk dispatcher call failed for %d item(s)", len(pending))
+            written = [({"error": "Internal error"}, 500)] * len(pending)
+        for index, response in zip(pending, written):
+            responses[index] = response
+    else:
+        for index in pending:
+            try:
+                responses[index] = single_fn(items[index])
+            except Exception:  # noqa: BLE001 — one item must not fail the batch
+                logger.exception("Dispatcher call failed for batch item %d", index)
+                responses[index] = ({"error": "Internal error"}, 500)
+    return summarise(responses)
+
+
+def summarise(responses: Sequence[tuple]) -> tuple:
+    """Build the batch response body from per-item ``(body, status_code)``."""
+    results = [
+        {"index": index, "status": status_code, "body": body}
+        for index, (body, status_code) in enumerate(responses)
+    ]
+    failed = sum(1 for result in results if result["status"] >= 400)
+    body = {"results": results, "succeeded": len(results) - failed, "failed": failed}
+    return body, 207 if failed else 200
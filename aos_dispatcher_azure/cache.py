@@ -0,0 +1,182 @@
+"""Read-through response cache for catalog proxy calls.
+
+``list_agents`` and ``get_agent_descriptor`` proxy to the aos-realm-of-agents
+function app on every request, although agent descriptors rarely change.
+:class:`ResponseCache` keeps successful ``(body, status_code)`` responses per
+key in process:
+
+- Entries younger than ``ttl`` are served directly (*hit*).
+- Entries older than ``ttl`` but within ``ttl + stale_ttl`` are served while
+  one background call refreshes them (*stale hit*, stale-while-revalidate).
+- Misses are coalesced: concurrent requests for the same key share a single
+  upstream call.
+- At most ``max_entries`` keys are kept; the least recently used is evicted.
+- Error responses (status >= 400) are passed through and never cached.
+
+:meth:`ResponseCache.invalidate` and :meth:`ResponseCache.clear` drop entries
+(``register_agent`` uses them); a call that was already in flight when the
+cache was invalidated returns its result to its callers but does not store it.
+
+The cache is per worker, so a registration handled by another worker is seen
+here after at most ``ttl`` seconds (plus one stale read).
+
+Configuration:
+    AOS_AGENT_CACHE               Enable the agent catalog cache (default: true)
+    AOS_AGENT_CACHE_TTL           Seconds an entry is fresh (default: 60)
+    AOS_AGENT_CACHE_STALE_TTL     Further seconds a stale entry may be served
+                                  while it is refreshed (default: 300)
+    AOS_AGENT_CACHE_MAX_ENTRIES   Keys kept per cache (default: 1024)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0
+DEFAULT_STALE_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+
+#: ``loader()`` → library response ``(body, status_code)``.
+Loader = Callable[[], Awaitable[tuple]]
+
+
+@dataclass
+class CacheStats:
+    """Counters for one cache."""
+
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class ResponseCache:
+    """TTL/LRU cache of library responses with stale-while-revalidate.
+
+    Args:
+        name: Label used in logs and stats.
+        ttl: Seconds an entry is fresh.  Defaults to ``AOS_AGENT_CACHE_TTL``.
+        stale_ttl: Further seconds a stale entry is served while refreshing.
+            Defaults to ``AOS_AGENT_CACHE_STALE_TTL``.
+        max_entries: Keys kept.  Defaults to ``AOS_AGENT_CACHE_MAX_ENTRIES``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.enabled = env_bool("AOS_AGENT_CACHE", True)
+        self.ttl = ttl or env_float("AOS_AGENT_CACHE_TTL", DEFAULT_TTL)
+        self.stale_ttl = stale_ttl or env_float(
+            "AOS_AGENT_CACHE_STALE_TTL", DEFAULT_STALE_TTL
+        )
+        self.max_entries = max_entries or env_int(
+            "AOS_AGENT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+        )
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, Tuple[float, tuple]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable, loader: Loader) -> tuple:
+        """Return the cached response for *key*, calling *loader* on a miss."""
+        if not self.enabled:
+            return await loader()
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stats.stale_hits += 1
+                if key not in self._loading:
+                    self.stats.refreshes += 1
+                    self._start_load(key, loader).add_done_callback(self._log_refresh)
+                return entry[1]
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending)
+        self.stats.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def _start_load(self, key: Hashable, loader: Loader) -> asyncio.Future:
+        future = asyncio.ensure_future(self._load(key, loader, self._epoch))
+        self._loading[key] = future
+        return future
+
+    async def _load(self, key: Hashable, loader: Loader, epoch: int) -> tuple:
+        try:
+            result = await loader()
+        finally:
+            self._loading.pop(key, None)
+        if result[1] < 400 and epoch == self._epoch:
+            self._store(key, result)
+        return result
+
+    def _store(self, key: Hashable, result: tuple) -> None:
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _log_refresh(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            self.stats.refresh_errors += 1
+            logger.warning(
+                "Background refresh of %s cache entry failed: %s", self.name, exc
+            )
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop *key*; an in-flight load for any key will not be stored."""
+        self._entries.pop(key, None)
+        self._epoch += 1
+        self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+        self._epoch += 1
+        self.stats.invalidations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and counters as a JSON-ready dict."""
+        lookups = self.stats.hits + self.stats.stale_hits + self.stats.misses
+        lookups += self.stats.coalesced
+        served = self.stats.hits + self.stats.stale_hits + self.stats.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "stale_ttl_s": self.stale_ttl,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            **asdict(self.stats),
+        }
@@ -0,0 +1,265 @@
+"""Request/response body codecs: fast JSON, MessagePack and compression.
+
+Every handler parses its body through ``_require_json`` and returns through
+``_make_response``; both go through this module so the serializer is chosen
+in one place:
+
+- JSON uses `orjson <https://pypi.org/project/orjson/>`_ when it is installed
+  (several times faster than :mod:`json` in both directions) and the standard
+  library otherwise.  Objects ``orjson`` rejects (integers beyond 64 bits,
+  for example) fall back to :mod:`json` per call.  Output is compact UTF-8.
+- MessagePack (``application/msgpack``, needs ``msgpack``) is used for a
+  request body sent with that ``Content-Type`` and for a response when the
+  client prefers it in ``Accept`` (a higher ``q`` than JSON).  Responses are
+  JSON whenever the client does not ask for it.
+- Responses of at least ``AOS_COMPRESSION_MIN_BYTES`` are compressed with
+  ``br`` (needs ``brotli``) or ``gzip``, whichever the client accepts and
+  prefers in ``Accept-Encoding``.
+
+Missing optional packages only disable their feature; nothing here is
+required at import time.
+
+Configuration:
+    AOS_JSON_CODEC              ``orjson`` (default, when installed) or
+                                ``stdlib``
+    AOS_MSGPACK                 Accept/produce MessagePack (default: true)
+    AOS_COMPRESSION             Compress large responses (default: true)
+    AOS_COMPRESSION_MIN_BYTES   Smallest body compressed (default: 1024)
+    AOS_GZIP_LEVEL              gzip level 1–9 (default: 5)
+    AOS_BROTLI_QUALITY          Brotli quality 0–11 (default: 4)
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import env_bool, env_int
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = frozenset(
+    {MSGPACK_MIMETYPE, "application/x-msgpack", "application/vnd.msgpack"}
+)
+
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+DEFAULT_GZIP_LEVEL = 5
+DEFAULT_BROTLI_QUALITY = 4
+
+
+class CodecError(ValueError):
+    """A request body could not be decoded."""
+
+
+def _media_type(content_type: str) -> str:
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+def _parse_header(value: str) -> Dict[str, float]:
+    """Parse ``Accept``-style ``token;q=0.5, ...`` into ``{token: q}``."""
+    weights: Dict[str, float] = {}
+    for part in value.split(","):
+        token, *params = part.split(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, raw = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        weights[token] = max(q, weights.get(token, 0.0))
+    return weights
+
+
+class Codec:
+    """Body serializer with content negotiation and response compression.
+
+    Args:
+        json_codec: ``"orjson"`` or ``"stdlib"``.  Defaults to
+            ``AOS_JSON_CODEC``; ``orjson`` falls back to ``stdlib`` when it
+            is not installed.
+        msgpack_enabled: Defaults to ``AOS_MSGPACK`` (when installed).
+        compression: Defaults to ``AOS_COMPRESSION``.
+        min_compress_bytes: Defaults to ``AOS_COMPRESSION_MIN_BYTES``.
+    """
+
+    def __init__(
+        self,
+        json_codec: Optional[str] = None,
+        msgpack_enabled: Optional[bool] = None,
+        compression: Optional[bool] = None,
+        min_compress_bytes: Optional[int] = None,
+    ) -> None:
+        json_codec = (
+            json_codec or os.environ.get("AOS_JSON_CODEC", "orjson").strip().lower()
+        )
+        self.json_codec = (
+            "orjson" if json_codec != "stdlib" and orjson is not None else "stdlib"
+        )
+        if msgpack_enabled is None:
+            msgpack_enabled = env_bool("AOS_MSGPACK", True)
+        self.msgpack_enabled = msgpack_enabled and msgpack is not None
+        self.compression = (
+            env_bool("AOS_COMPRESSION", True) if compression is None else compression
+        )
+        self.min_compress_bytes = (
+            env_int(
+                "AOS_COMPRESSION_MIN_BYTES", DEFAULT_COMPRESSION_MIN_BYTES, minimum=0
+            )
+            if min_compress_bytes is None
+            else min_compress_bytes
+        )
+        self.gzip_level = min(env_int("AOS_GZIP_LEVEL", DEFAULT_GZIP_LEVEL), 9)
+        self.brotli_quality = min(
+            env_int("AOS_BROTLI_QUALITY", DEFAULT_BROTLI_QUALITY, minimum=0), 11
+        )
+        self._orjson = self.json_codec == "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize *obj* as compact UTF-8 JSON."""
+        if self._orjson:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # orjson.JSONEncodeError: > 64-bit ints, unsupported types, ...
+                pass
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+    def loads(self, data: Any) -> Any:
+        """Parse JSON from ``bytes`` or ``str``.
+
+        Raises:
+            ValueError: *data* is not valid JSON.
+        """
+        if self._orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def is_msgpack(self, content_type: str) -> bool:
+        """Whether a body of *content_type* is MessagePack this codec decodes."""
+        return self.msgpack_enabled and _media_type(content_type) in MSGPACK_MIMETYPES
+
+    def decode_body(self, body: bytes, content_type: str = "") -> Any:
+        """Decode a request body by its ``Content-Type`` (JSON unless MessagePack).
+
+        Raises:
+            CodecError: The body is empty or not valid in its format.
+        """
+        if self.is_msgpack(content_type):
+            try:
+                return msgpack.unpackb(body, raw=False, strict_map_key=False)
+            except Exception:  # noqa: BLE001 — msgpack raises several unrelated types
+                raise CodecError("Invalid MessagePack body") from None
+        try:
+            return self.loads(body)
+        except ValueError:
+            raise CodecError("Invalid JSON body") from None
+
+    def negotiate_mimetype(self, accept: str) -> str:
+        """Pick the response media type for an ``Accept`` header.
+
+        MessagePack is chosen only when the client ranks it above JSON; a
+        missing header, ``*/*`` or a tie gives JSON.
+        """
+        if not self.msgpack_enabled or "msgpack" not in accept.lower():
+            return JSON_MIMETYPE
+        weights = _parse_header(accept)
+        msgpack_q = max(weights.get(mimetype, 0.0) for mimetype in MSGPACK_MIMETYPES)
+        json_q = max(
+            weights.get(JSON_MIMETYPE, 0.0),
+            weights.get("application/*", 0.0),
+            weights.get("*/*", 0.0),
+        )
+        return MSGPACK_MIMETYPE if msgpack_q > json_q else JSON_MIMETYPE
+
+    @staticmethod
+    def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+        """Pick ``br``, ``gzip`` or ``None`` for an ``Accept-Encoding`` header."""
+        if not accept_encoding:
+            return None
+        weights = _parse_header(accept_encoding)
+        wildcard = weights.get("*", 0.0)
+        candidates: List[Tuple[float, int, str]] = [
+            (weights.get("gzip", weights.get("x-gzip", wildcard)), 0, "gzip")
+        ]
+        if brotli is not None:
+            candidates.append((weights.get("br", wildcard), 1, "br"))
+        q, _, encoding = max(candidates)
+        return encoding if q > 0 else None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """Compress *body* with ``br`` or ``gzip``."""
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def encode_response(
+        self, body: Any, accept: str = "", accept_encoding: str = ""
+    ) -> Tuple[bytes, str, Dict[str, str]]:
+        """Serialize and, when worthwhile, compress a response body.
+
+        Args:
+            body: Object to serialize, or ``bytes`` that are already JSON
+                (proxy responses), which are only compressed.
+            accept: The request's ``Accept`` header.
+            accept_encoding: The request's ``Accept-Encoding`` header.
+
+        Returns:
+            ``(payload, mimetype, headers)``; *headers* holds
+            ``Content-Encoding`` and ``Vary`` as applicable.
+        """
+        vary: List[str] = []
+        mimetype = JSON_MIMETYPE
+        payload = b""
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            if self.msgpack_enabled:
+                vary.append("Accept")
+                mimetype = self.negotiate_mimetype(accept)
+            if mimetype == MSGPACK_MIMETYPE:
+                try:
+                    payload = msgpack.packb(body, use_bin_type=True)
+                except (TypeError, ValueError, OverflowError) as exc:
+                    logger.debug(
+                        "Falling back to JSON for a MessagePack response: %s", exc
+                    )
+                    mimetype = JSON_MIMETYPE
+            if mimetype == JSON_MIMETYPE:
+                payload = self.dumps(body)
+        headers: Dict[str, str] = {}
+        if self.compression and len(payload) >= self.min_compress_bytes:
+            vary.append("Accept-Encoding")
+            encoding = self.negotiate_encoding(accept_encoding)
+            if encoding is not None:
+                payload = self.compress(payload, encoding)
+                headers["Content-Encoding"] = encoding
+        if vary:
+            headers["Vary"] = ", ".join(vary)
+        return payload, mimetype, headers
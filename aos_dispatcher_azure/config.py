@@ -0,0 +1,44 @@
+"""Environment-variable helpers shared by the wrapper runtime modules.
+
+Settings are read when an object is constructed rather than at import time, so
+values set in App Settings (or by a benchmark harness) before the first request
+take effect.  Invalid values fall back to the documented default instead of
+failing the worker at start-up.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Read an integer setting of at least *minimum* (default: positive)."""
+    try:
+        value = int(os.environ.get(name, ""))
+    except ValueError:
+        return default
+    return value if value >= minimum else default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a positive float setting from the environment."""
+    try:
+        value = float(os.environ.get(name, ""))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean flag (``1``/``true``/``yes``/``on``) from the environment."""
+    return parse_bool(os.environ.get(name), default)
+
+
+def parse_bool(raw: Optional[str], default: bool = False) -> bool:
+    """Interpret *raw* as :func:`env_bool` does; *default* if it is empty or missing."""
+    if raw is None or not raw.strip():
+        return default
+    return raw.strip().lower() in _TRUE_VALUES
@@ -0,0 +1,295 @@
+"""Memoized and batched covenant validation.
+
+``validate_covenant`` re-evaluates a covenant in the dispatcher library on
+every call, and agents validate the same covenants over and over during an
+orchestration.  :class:`CovenantValidator` keeps the last successful result
+per covenant, tagged with the version of the covenant it was computed for:
+
+- A covenant version is compiled once, when a ``sign_covenant`` or
+  ``list_covenants`` response shows the full covenant, into a
+  :class:`CompiledCovenant`: the SHA-256 of its canonical JSON (signatures
+  included) and the time it expires.  A memoized result is served while the
+  covenant's digest is still the one it was computed for, it is younger than
+  ``AOS_COVENANT_CACHE_TTL`` and the covenant has not expired since — a
+  dictionary lookup and two comparisons, without re-serialising the covenant.
+- Signing or creating a covenant drops its memoized result at once; a
+  validation that was in flight at that moment is not stored.
+- Concurrent validations of one covenant share a single library call.
+- :meth:`CovenantValidator.validate_many` answers memoized covenants directly
+  and validates the rest in one executor job (:func:`validate_all`): through
+  the library's ``validate_covenants`` when it exports one, else with
+  ``validate_covenant`` per covenant.
+
+The rules themselves are evaluated by the library.  Results are per worker:
+a covenant signed through another worker is seen after at most
+``AOS_COVENANT_CACHE_TTL`` seconds, or as soon as a ``list_covenants``
+response here shows the new version.
+
+Configuration:
+    AOS_COVENANT_CACHE              Memoize validation results (default: true)
+    AOS_COVENANT_CACHE_TTL          Seconds a result is reused (default: 30)
+    AOS_COVENANT_CACHE_MAX_ENTRIES  Covenants kept (default: 10000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .config import env_bool, env_float, env_int
+from .timeseries import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30.0
+DEFAULT_MAX_ENTRIES = 10_000
+
+#: ``loader()`` → library ``validate_covenant`` response.
+Loader = Callable[[], Awaitable[tuple]]
+#: ``fetch(covenant_ids)`` → one library response per id.
+BatchFetcher = Callable[[List[str]], Awaitable[Sequence[tuple]]]
+
+
+@dataclass(frozen=True)
+class CompiledCovenant:
+    """What validation memoization needs from one covenant version."""
+
+    id: str
+    digest: str
+    expires_at: float = math.inf
+
+    @classmethod
+    def compile(cls, covenant: Any) -> Optional["CompiledCovenant"]:
+        """Compile a full covenant object; ``None`` if it has no ``id``."""
+        if not isinstance(covenant, dict) or not isinstance(covenant.get("id"), str):
+            return None
+        canonical = json.dumps(
+            covenant, sort_keys=True, separators=(",", ":"), default=str
+        )
+        expires_at = math.inf
+        if covenant.get("expires_at") is not None:
+            try:
+                expires_at = parse_timestamp(covenant["expires_at"])
+            except (TypeError, ValueError):
+                pass
+        return cls(
+            covenant["id"],
+            hashlib.sha256(canonical.encode("utf-8")).hexdigest(),
+            expires_at,
+        )
+
+
+@dataclass
+class _Result:
+    digest: Optional[str]
+    deadline: float  # wall-clock seconds
+    response: tuple
+
+
+@dataclass
+class ValidationStats:
+    """Counters for the validation memo."""
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    stale_versions: int = 0
+    invalidations: int = 0
+    batches: int = 0
+    evictions: int = 0
+
+
+def validate_all(
+    cov_ids: Sequence[str],
+    single_fn: Callable[[str], tuple],
+    bulk_fn: Optional[Callable[[List[str]], Sequence[tuple]]] = None,
+) -> List[tuple]:
+    """Validate *cov_ids* through the dispatcher; one response per id.
+
+    Blocking; run it through ``DispatcherExecutor.run``.
+    """
+    cov_ids = list(cov_ids)
+    if bulk_fn is not None:
+        try:
+            results = list(bulk_fn(cov_ids))
+            if len(results) != len(cov_ids):
+                raise ValueError(
+                    f"bulk call returned {len(results)} results for {len(cov_ids)}"
+                )
+            return results
+        except Exception:  # noqa: BLE001 — reported per covenant
+            logger.exception(
+                "Bulk covenant validation failed for %d covenant(s)", len(cov_ids)
+            )
+            return [({"error": "Internal error"}, 500)] * len(cov_ids)
+    results = []
+    for cov_id in cov_ids:
+        try:
+            results.append(single_fn(cov_id))
+        except Exception:  # noqa: BLE001 — one covenant must not fail the batch
+            logger.exception("Validation of covenant %s failed", cov_id)
+            results.append(({"error": "Internal error"}, 500))
+    return results
+
+
+class CovenantValidator:
+    """Per-worker memo of covenant validation results.
+
+    Args:
+        ttl: Seconds a result is reused.  Defaults to ``AOS_COVENANT_CACHE_TTL``.
+        max_entries: Covenants kept.  Defaults to ``AOS_COVENANT_CACHE_MAX_ENTRIES``.
+    """
+
+    def __init__(
+        self, ttl: Optional[float] = None, max_entries: Optional[int] = None
+    ) -> None:
+        self.enabled = env_bool("AOS_COVENANT_CACHE", True)
+        self.ttl = ttl or env_float("AOS_COVENANT_CACHE_TTL", DEFAULT_TTL)
+        self.max_entries = max_entries or env_int(
+            "AOS_COVENANT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+        )
+        self.stats = ValidationStats()
+        self._versions: "OrderedDict[str, CompiledCovenant]" = OrderedDict()
+        self._results: "OrderedDict[str, _Result]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._epoch = 0
+        # observe_list() runs on executor threads.
+        self._lock = threading.Lock()
+
+    # ── covenant versions ──
+
+    def observe(self, covenant: Any) -> None:
+        """Record the current version of a full covenant object."""
+        compiled = CompiledCovenant.compile(covenant)
+        if compiled is None or not self.enabled:
+            return
+        with self._lock:
+            self._versions[compiled.id] = compiled
+            self._versions.move_to_end(compiled.id)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def observe_list(self, result: tuple) -> None:
+        """Record every covenant in a library ``list_covenants`` response."""
+        body, status_code = result
+        if status_code < 400 and isinstance(body, dict):
+            for covenant in body.get("covenants") or ():
+                self.observe(covenant)
+
+    def invalidate(self, cov_id: str) -> None:
+        """Forget the covenant's version and result (it was signed or created)."""
+        with self._lock:
+            self._versions.pop(cov_id, None)
+        self._results.pop(cov_id, None)
+        self._epoch += 1
+        self.stats.invalidations += 1
+
+    def _version(self, cov_id: str) -> Optional[CompiledCovenant]:
+        return self._versions.get(cov_id)
+
+    # ── results ──
+
+    def _cached(self, cov_id: str) -> Optional[tuple]:
+        entry = self._results.get(cov_id)
+        if entry is None:
+            return None
+        version = self._version(cov_id)
+        if entry.digest != (version.digest if version else None):
+            self.stats.stale_versions += 1
+            del self._results[cov_id]
+            return None
+        if time.time() >= entry.deadline:
+            del self._results[cov_id]
+            return None
+        self._results.move_to_end(cov_id)
+        return entry.response
+
+    def _store(
+        self,
+        cov_id: str,
+        version: Optional[CompiledCovenant],
+        epoch: int,
+        result: tuple,
+    ) -> None:
+        if result[1] >= 400 or epoch != self._epoch:
+            return
+        deadline = time.time() + self.ttl
+        if version is not None:
+            deadline = min(deadline, version.expires_at)
+        self._results[cov_id] = _Result(
+            version.digest if version else None, deadline, result
+        )
+        self._results.move_to_end(cov_id)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def validate(self, cov_id: str, loader: Loader) -> tuple:
+        """The memoized result for *cov_id*, calling *loader* when there is none."""
+        if not self.enabled:
+            return await loader()
+        cached = self._cached(cov_id)
+        if cached is not None:
+            self.stats.hits += 1
+            return cached
+        pending = self._loading.get(cov_id)
+        if pending is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending)
+        self.stats.misses += 1
+        future = asyncio.ensure_future(self._load(cov_id, loader))
+        self._loading[cov_id] = future
+        return await asyncio.shield(future)
+
+    async def _load(self, cov_id: str, loader: Loader) -> tuple:
+        version, epoch = self._version(cov_id), self._epoch
+        try:
+            result = await loader()
+        finally:
+            self._loading.pop(cov_id, None)
+        self._store(cov_id, version, epoch, result)
+        return result
+
+    async def validate_many(
+        self, cov_ids: Sequence[str], fetch: BatchFetcher
+    ) -> List[tuple]:
+        """One result per id in *cov_ids*; those not memoized come from one *fetch*."""
+        if not self.enabled:
+            return list(await fetch(list(cov_ids)))
+        results: List[Optional[tuple]] = [self._cached(cov_id) for cov_id in cov_ids]
+        missing = list(dict.fromkeys(c for c, r in zip(cov_ids, results) if r is None))
+        self.stats.hits += len(cov_ids) - sum(1 for result in results if result is None)
+        self.stats.batches += 1
+        if missing:
+            self.stats.misses += len(missing)
+            versions, epoch = {c: self._version(c) for c in missing}, self._epoch
+            fetched = dict(zip(missing, await fetch(missing)))
+            for cov_id in missing:
+                self._store(cov_id, versions[cov_id], epoch, fetched[cov_id])
+            results = [
+                fetched[cov_id] if result is None else result
+                for cov_id, result in zip(cov_ids, results)
+            ]
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and counters as a JSON-ready dict."""
+        lookups = self.stats.hits + self.stats.misses + self.stats.coalesced
+        served = self.stats.hits + self.stats.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._results),
+            "versions": len(self._versions),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            **asdict(self.stats),
+        }
@@ -0,0 +1,217 @@
+"""Execution layer for dispatcher calls made from async Azure Functions handlers.
+
+Most ``aos_dispatcher.dispatcher`` functions are synchronous.  Calling them
+directly from an ``async def`` handler blocks the worker's event loop, so one
+slow call stalls every other in-flight request.  :class:`DispatcherExecutor`
+sends blocking calls to a bounded thread pool instead, and awaits native
+coroutine functions (or a coroutine variant registered for the synchronous
+function with :func:`register_async`) directly.  Blocking calls run in a copy
+of the caller's ``contextvars`` context, as with ``asyncio.to_thread``.
+
+Every call is timed per endpoint:
+
+    queue   time between submission and a pool thread picking the call up
+    exec    time spent inside the dispatcher function
+
+A growing queue time with a flat exec time means the pool is too small.  The
+whole await also counts as the ``dispatcher`` phase of the calling request
+(``aos_dispatcher_azure.instrumentation``).
+
+Configuration:
+    AOS_DISPATCHER_MAX_WORKERS   Pool size (default: 32)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .config import env_int
+from .instrumentation import phase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 32
+
+
+@dataclass
+class EndpointStats:
+    """Accumulated timings for one endpoint."""
+
+    calls: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    queue_total: float = 0.0
+    queue_max: float = 0.0
+    exec_total: float = 0.0
+    exec_max: float = 0.0
+
+    def record(self, queue: float, execution: float, failed: bool) -> None:
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.queue_total += queue
+        self.queue_max = max(self.queue_max, queue)
+        self.exec_total += execution
+        self.exec_max = max(self.exec_max, execution)
+
+    def as_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "queue_ms_avg": round(self.queue_total / calls * 1000, 3),
+            "queue_ms_max": round(self.queue_max * 1000, 3),
+            "exec_ms_avg": round(self.exec_total / calls * 1000, 3),
+            "exec_ms_max": round(self.exec_max * 1000, 3),
+        }
+
+
+# Synchronous function -> coroutine function awaited in its place.
+_async_variants: Dict[Callable[..., Any], Callable[..., Any]] = {}
+
+
+def register_async(fn: Callable[..., Any], variant: Callable[..., Any]) -> None:
+    """Await *variant* instead of running *fn* on the pool.
+
+    *variant* must be a coroutine function taking the same arguments as
+    *fn*.  Only *fn* itself is replaced; wrappers around it still run on the
+    pool.
+
+    Raises:
+        TypeError: *variant* is not a coroutine function.
+    """
+    if not inspect.iscoroutinefunction(variant):
+        raise TypeError(f"{variant!r} is not a coroutine function")
+    _async_variants[fn] = variant
+
+
+def native_async(fn: Callable[..., Any]) -> Optional[Callable[..., Any]]:
+    """Return a coroutine function that can replace *fn*, if one exists.
+
+    *fn* itself qualifies when it is a coroutine function; otherwise it is the
+    variant registered for *fn* with :func:`register_async`, if any.
+    """
+    if inspect.iscoroutinefunction(fn):
+        return fn
+    try:
+        return _async_variants.get(fn)
+    except TypeError:  # unhashable callable
+        return None
+
+
+class DispatcherExecutor:
+    """Run dispatcher calls without blocking the event loop.
+
+    Args:
+        max_workers: Pool size.  Defaults to ``AOS_DISPATCHER_MAX_WORKERS``.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self.max_workers = max_workers or env_int(
+            "AOS_DISPATCHER_MAX_WORKERS", DEFAULT_MAX_WORKERS
+        )
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """The thread pool, created on first use."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="aos-dispatcher",
+                    )
+        return self._pool
+
+    async def run(
+        self, endpoint: str, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """Call *fn* for *endpoint* and return its result.
+
+        Coroutine functions (and variants registered with
+        :func:`register_async`) are awaited on the event loop; everything else
+        runs on the pool.
+        """
+        with phase("dispatcher"):
+            return await self._run(endpoint, fn, *args, **kwargs)
+
+    async def _run(
+        self, endpoint: str, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        coro_fn = native_async(fn)
+        if coro_fn is not None:
+            self._begin(endpoint)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await coro_fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._end(endpoint, 0.0, time.perf_counter() - started, failed)
+
+        submitted = time.perf_counter()
+        self._begin(endpoint)
+
+        def call() -> Any:
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                finished = time.perf_counter()
+                self._end(endpoint, started - submitted, finished - started, failed)
+
+        loop = asyncio.get_running_loop()
+        # As with asyncio.to_thread, the call sees the caller's context variables.
+        return await loop.run_in_executor(
+            self.pool, contextvars.copy_context().run, call
+        )
+
+    def _begin(self, endpoint: str) -> None:
+        with self._stats_lock:
+            self._stats.setdefault(endpoint, EndpointStats()).in_flight += 1
+
+    def _end(self, endpoint: str, queue: float, execution: float, failed: bool) -> None:
+        with self._stats_lock:
+            stats = self._stats[endpoint]
+            stats.in_flight -= 1
+            stats.record(queue, execution, failed)
+        if failed:
+            logger.debug("Dispatcher call for '%s' raised", endpoint)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return pool settings and per-endpoint timings as a JSON-ready dict."""
+        with self._stats_lock:
+            endpoints = {name: s.as_dict() for name, s in sorted(self._stats.items())}
+        return {"max_workers": self.max_workers, "endpoints": endpoints}
+
+    def reset(self) -> None:
+        """Discard collected timings."""
+        with self._stats_lock:
+            self._stats = {
+                name: EndpointStats(in_flight=s.in_flight)
+                for name, s in self._stats.items()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool.  A new pool is created if the executor is used again."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -0,0 +1,122 @@
+"""Concurrent fan-out of one prompt to several agents under a shared deadline.
+
+``ask_agent`` addresses a single agent, so a boardroom-style review (CEO,
+CFO, CTO, …) made one request at a time takes the sum of the agents'
+latencies.  :func:`fan_out` starts one call per agent at once and collects
+the replies in the order they complete until every agent has answered or the
+deadline passes, so the wall time is that of the slowest agent (or the
+deadline).  Agents that have not answered by then are reported as timed out
+and their calls are abandoned: a native ``async`` call is cancelled, a
+blocking one finishes on its pool thread and its reply is dropped.
+
+Each reply records its latency from the start of the fan-out.  A call that
+raises is reported as a ``500`` for that agent and does not affect the others.
+An agent listed more than once is asked once, at its first position.
+
+Configuration:
+    AOS_FANOUT_TIMEOUT      Longest deadline a request may set, and the
+                            default (seconds, default: 30)
+    AOS_FANOUT_MAX_AGENTS   Agents per request (default: 16)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FANOUT_TIMEOUT = 30.0
+DEFAULT_MAX_AGENTS = 16
+
+#: ``call(agent_id)`` → library ``ask_agent`` response ``(body, status_code)``.
+AgentCall = Callable[[str], Awaitable[tuple]]
+
+
+@dataclass
+class AgentReply:
+    """One agent's response and when it arrived."""
+
+    agent_id: str
+    status_code: int
+    body: Any
+    latency: float  # seconds since the fan-out started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_id": self.agent_id,
+            "status": self.status_code,
+            "latency_ms": round(self.latency * 1000, 3),
+            "body": self.body,
+        }
+
+
+@dataclass
+class FanOutResult:
+    """Replies in completion order, plus the agents that missed the deadline."""
+
+    replies: List[AgentReply]
+    timed_out: List[str]
+    elapsed: float
+    timeout: float
+
+    @property
+    def status_code(self) -> int:
+        """``200`` when every agent answered successfully, else ``207``."""
+        if self.timed_out or any(reply.status_code >= 400 for reply in self.replies):
+            return 207
+        return 200
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and timings, without the replies."""
+        failed = sum(1 for reply in self.replies if reply.status_code >= 400)
+        return {
+            "succeeded": len(self.replies) - failed,
+            "failed": failed,
+            "timed_out": self.timed_out,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "timeout_s": self.timeout,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "results": [reply.to_dict() for reply in self.replies],
+            **self.summary(),
+        }
+
+
+async def fan_out(
+    agent_ids: Sequence[str], call: AgentCall, timeout: float
+) -> FanOutResult:
+    """Call *call* for every agent concurrently; stop waiting after *timeout* s."""
+    started = time.perf_counter()
+    agent_ids = list(dict.fromkeys(agent_ids))  # ask each agent once, keep the order
+
+    async def ask(agent_id: str) -> AgentReply:
+        try:
+            body, status_code = await call(agent_id)
+        except Exception:  # noqa: BLE001 — one agent must not fail the fan-out
+            logger.exception("Fan-out call to agent %s failed", agent_id)
+            body, status_code = {"error": "Internal error"}, 500
+        return AgentReply(agent_id, status_code, body, time.perf_counter() - started)
+
+    tasks = [asyncio.ensure_future(ask(agent_id)) for agent_id in agent_ids]
+    replies: List[AgentReply] = []
+    try:
+        for completed in asyncio.as_completed(tasks, timeout=timeout):
+            replies.append(await completed)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+    answered = {reply.agent_id for reply in replies}
+    return FanOutResult(
+        replies=replies,
+        timed_out=[agent_id for agent_id in agent_ids if agent_id not in answered],
+        elapsed=time.perf_counter() - started,
+        timeout=timeout,
+    )
@@ -0,0 +1,47 @@
+"""Advisory lock files for state shared between workers.
+
+Workers of one app (and instances scaled out on an Azure Files mount) share
+on-disk state such as the search segment and the audit log.  ``fcntl`` locks
+are not reliable on SMB mounts, so writers serialise on a ``<path>.lock``
+file created with ``O_CREAT | O_EXCL`` instead.  A lock file left behind by a
+crashed worker is broken once it is older than :data:`LOCK_STALE_AFTER`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import time
+from typing import Iterator
+
+LOCK_STALE_AFTER = 120.0
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = 30.0) -> Iterator[None]:
+    """Hold ``<path>.lock`` for the duration of the block.
+
+    Raises:
+        TimeoutError: The lock was not acquired within *timeout* seconds.
+    """
+    lock = path + ".lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            with contextlib.suppress(FileNotFoundError):
+                if time.time() - os.stat(lock).st_mtime > LOCK_STALE_AFTER:
+                    os.unlink(lock)
+                    continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock}") from None
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(lock)
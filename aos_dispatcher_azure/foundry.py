@@ -0,0 +1,382 @@
+"""Pooling of Foundry agent handles and conversation threads.
+
+The dispatcher library reaches the Foundry Agent Service through an
+``azure-ai-projects`` ``AIProjectClient``.  For each message it resolves the
+agent (``agents.get_agent``), creates a thread (``agents.threads.create``)
+and deletes it afterwards, so a short exchange spends more time on setup
+round trips than on the model.  :class:`FoundryPool` removes those:
+
+- Agent handles are kept by Foundry agent id for ``AOS_FOUNDRY_AGENT_TTL``
+  seconds, filled by ``get_agent`` and ``create_agent`` / ``update_agent``
+  results and dropped by ``delete_agent``.
+- Threads are kept per ``(agent_id, orchestration_id)`` conversation.  Inside
+  a :meth:`FoundryPool.conversation` block, the first ``threads.create()``
+  (without initial ``messages``) leases the conversation's idle thread, or
+  creates one; the library's ``threads.delete`` of a leased thread is
+  skipped and the thread goes back to the pool when the block ends.  A thread
+  is leased by one call at a time, since Foundry runs one run per thread; a
+  concurrent call in the same conversation gets a new thread, and only one
+  idle thread per conversation is kept.  At most ``AOS_FOUNDRY_MAX_THREADS``
+  idle threads are kept, least recently used first out, and threads idle
+  for ``AOS_FOUNDRY_THREAD_IDLE`` seconds are deleted.  Evicted and expired
+  threads are deleted in Foundry by the next call that leases a thread.
+
+:class:`PooledProjectClient` wraps the library's client and forwards every
+other attribute unchanged.  :meth:`FoundryPool.install` puts it in place of
+the library's module-level ``project_client``; a library that does not
+expose its client that way is left alone and the pool stays idle.  Only the
+synchronous client is wrapped.
+
+Calls outside a conversation block, and conversations without an
+orchestration id, do not share threads, so unrelated callers never see each
+other's history.
+
+Handlers pass the dispatcher call through :meth:`FoundryPool.bind`, so the
+block opens and closes on the pool thread that makes the blocking call.  A
+leased thread then goes back to the pool only once the library call has
+returned, not when the awaiting handler is cancelled (a fan-out deadline)
+while a run is still active on it.
+
+Configuration:
+    AOS_FOUNDRY_POOL           Pool agent handles and threads (default: true)
+    AOS_FOUNDRY_AGENT_TTL      Seconds an agent handle is reused (default: 300)
+    AOS_FOUNDRY_MAX_THREADS    Idle threads kept per worker (default: 1000)
+    AOS_FOUNDRY_THREAD_IDLE    Seconds an idle thread is kept (default: 900)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import env_bool, env_float, env_int
+from .execution import native_async
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AGENT_TTL = 300.0
+DEFAULT_MAX_THREADS = 1000
+DEFAULT_THREAD_IDLE = 900.0
+
+#: ``(agent_id, orchestration_id)`` of a conversation.
+ConversationKey = Tuple[str, str]
+
+
+@dataclass
+class _Thread:
+    key: ConversationKey
+    thread: Any
+    released_at: float = 0.0  # monotonic
+
+
+@dataclass
+class _Scope:
+    key: ConversationKey
+    lease: Optional[_Thread] = None
+
+
+_scope: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar(
+    "aos_foundry_conversation", default=None
+)
+
+
+@dataclass
+class PoolStats:
+    """Counters for the handle and thread pool."""
+
+    agent_hits: int = 0
+    agent_misses: int = 0
+    threads_created: int = 0
+    threads_reused: int = 0
+    deletes_skipped: int = 0
+    threads_evicted: int = 0
+    threads_expired: int = 0
+    threads_deleted: int = 0
+    delete_errors: int = 0
+
+
+class FoundryPool:
+    """Per-worker pool of Foundry agent handles and conversation threads.
+
+    Thread-safe: the library calls the client from dispatcher pool threads.
+
+    Args:
+        agent_ttl: Seconds an agent handle is reused.
+            Defaults to ``AOS_FOUNDRY_AGENT_TTL``.
+        max_threads: Idle threads kept.  Defaults to ``AOS_FOUNDRY_MAX_THREADS``.
+        thread_idle: Seconds an idle thread is kept.
+            Defaults to ``AOS_FOUNDRY_THREAD_IDLE``.
+    """
+
+    def __init__(
+        self,
+        agent_ttl: Optional[float] = None,
+        max_threads: Optional[int] = None,
+        thread_idle: Optional[float] = None,
+    ) -> None:
+        self.enabled = env_bool("AOS_FOUNDRY_POOL", True)
+        self.agent_ttl = agent_ttl or env_float(
+            "AOS_FOUNDRY_AGENT_TTL", DEFAULT_AGENT_TTL
+        )
+        self.max_threads = max_threads or env_int(
+            "AOS_FOUNDRY_MAX_THREADS", DEFAULT_MAX_THREADS
+        )
+        self.thread_idle = thread_idle or env_float(
+            "AOS_FOUNDRY_THREAD_IDLE", DEFAULT_THREAD_IDLE
+        )
+        self.stats = PoolStats()
+        self.installed = False
+        self._agents: Dict[str, Tuple[Any, float]] = {}
+        self._idle: "OrderedDict[ConversationKey, _Thread]" = OrderedDict()
+        self._leased: Dict[str, _Thread] = {}
+        self._doomed: List[str] = []
+        self._lock = threading.Lock()
+
+    def install(self, module: Any) -> bool:
+        """Wrap *module*'s ``project_client`` (once); ``True`` if it is pooled."""
+        if self.installed or not self.enabled:
+            return self.installed
+        with self._lock:
+            client = getattr(module, "project_client", None)
+            if client is None or self.installed:
+                return self.installed
+            module.project_client = PooledProjectClient(client, self)
+            self.installed = True
+        logger.info("Foundry agent handles and threads are pooled")
+        return True
+
+    # ── agent handles ──
+
+    def agent(self, agent_id: str, load: Callable[[], Any]) -> Any:
+        """The handle of *agent_id*, calling *load* when there is no fresh one."""
+        if not self.enabled:
+            return load()
+        now = time.monotonic()
+        with self._lock:
+            cached = self._agents.get(agent_id)
+            if cached is not None and cached[1] > now:
+                self.stats.agent_hits += 1
+                return cached[0]
+            self.stats.agent_misses += 1
+        handle = load()
+        self.remember_agent(handle, agent_id)
+        return handle
+
+    def remember_agent(self, handle: Any, agent_id: Optional[str] = None) -> None:
+        """Keep *handle* (an ``Agent`` returned by Foundry)."""
+        agent_id = agent_id or getattr(handle, "id", None)
+        if not self.enabled or not agent_id or handle is None:
+            return
+        with self._lock:
+            self._agents[agent_id] = (handle, time.monotonic() + self.agent_ttl)
+
+    def forget_agent(self, agent_id: str) -> None:
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    # ── threads ──
+
+    @contextlib.contextmanager
+    def conversation(self, agent_id: Any, orchestration_id: Any) -> Iterator[None]:
+        """Share one thread across the block's calls for this agent and orchestration.
+
+        A no-op without an orchestration id.  The scope is a context variable,
+        so it follows the call onto a dispatcher pool thread.
+        """
+        if not (self.enabled and self.installed and agent_id and orchestration_id):
+            yield
+            return
+        scope = _Scope((str(agent_id), str(orchestration_id)))
+        token = _scope.set(scope)
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+            if scope.lease is not None:
+                self._release(scope.lease)
+
+    def bind(
+        self, fn: Callable[..., Any], agent_id: Any, orchestration_id: Any
+    ) -> Callable[..., Any]:
+        """*fn* wrapped to run inside :meth:`conversation`, for the dispatcher executor.
+
+        Coroutine functions (and functions with a variant registered with
+        :func:`~aos_dispatcher_azure.execution.register_async`) are returned
+        as they are: they use the library's async client, which
+        is not pooled.
+        """
+        if (
+            not (self.enabled and agent_id and orchestration_id)
+            or native_async(fn) is not None
+        ):
+            return fn
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with self.conversation(agent_id, orchestration_id):
+                return fn(*args, **kwargs)
+
+        return call
+
+    def lease_thread(
+        self, create: Callable[[], Any], delete: Callable[[str], Any]
+    ) -> Any:
+        """Return the current conversation's thread, calling *create* when it has none.
+
+        Outside a conversation (or for a second thread in one) this is just
+        ``create()``.
+        """
+        self._delete_doomed(delete)
+        scope = _scope.get()
+        if scope is None or scope.lease is not None:
+            return create()
+        with self._lock:
+            entry = self._idle.pop(scope.key, None)
+            if (
+                entry is not None
+                and time.monotonic() - entry.released_at > self.thread_idle
+            ):
+                self._doom(entry)
+                self.stats.threads_expired += 1
+                entry = None
+            if entry is not None:
+                self.stats.threads_reused += 1
+        if entry is None:
+            entry = _Thread(scope.key, create())
+            with self._lock:
+                self.stats.threads_created += 1
+        with self._lock:
+            self._leased[entry.thread.id] = entry
+        scope.lease = entry
+        return entry.thread
+
+    def holds(self, thread_id: str) -> bool:
+        """Whether the pool owns *thread_id* (its deletion is then skipped)."""
+        with self._lock:
+            if thread_id in self._leased:
+                self.stats.deletes_skipped += 1
+                return True
+            return False
+
+    def _release(self, entry: _Thread) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._leased.pop(entry.thread.id, None)
+            if entry.key in self._idle:
+                # A concurrent call in the conversation already returned one.
+                self._doom(entry)
+                return
+            entry.released_at = now
+            self._idle[entry.key] = entry
+            while len(self._idle) > self.max_threads:
+                self._doom(self._idle.popitem(last=False)[1])
+                self.stats.threads_evicted += 1
+            for key, idle in list(self._idle.items()):
+                if now - idle.released_at <= self.thread_idle:
+                    break
+                del self._idle[key]
+                self._doom(idle)
+                self.stats.threads_expired += 1
+
+    def _doom(self, entry: _Thread) -> None:
+        self._doomed.append(entry.thread.id)
+
+    def _delete_doomed(self, delete: Callable[[str], Any]) -> None:
+        with self._lock:
+            doomed, self._doomed = self._doomed, []
+        for thread_id in doomed:
+            try:
+                delete(thread_id)
+                self.stats.threads_deleted += 1
+            except Exception:  # noqa: BLE001 — Foundry expires the thread eventually
+                self.stats.delete_errors += 1
+                logger.warning("Deleting pooled Foundry thread %s failed", thread_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and counters as a JSON-ready dict."""
+        lookups = self.stats.agent_hits + self.stats.agent_misses
+        leases = self.stats.threads_created + self.stats.threads_reused
+        return {
+            "enabled": self.enabled,
+            "installed": self.installed,
+            "agents": len(self._agents),
+            "idle_threads": len(self._idle),
+            "leased_threads": len(self._leased),
+            "max_threads": self.max_threads,
+            "agent_hit_ratio": (
+                round(self.stats.agent_hits / lookups, 4) if lookups else 0.0
+            ),
+            "thread_reuse_ratio": (
+                round(self.stats.threads_reused / leases, 4) if leases else 0.0
+            ),
+            **asdict(self.stats),
+        }
+
+
+class _Forwarding:
+    """Forwards attributes it does not define to the wrapped object."""
+
+    def __init__(self, wrapped: Any) -> None:
+        self._wrapped = wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+
+class _PooledThreads(_Forwarding):
+    def __init__(self, threads: Any, pool: FoundryPool) -> None:
+        super().__init__(threads)
+        self._pool = pool
+
+    def create(self, *args: Any, **kwargs: Any) -> Any:
+        if args or kwargs.get("messages"):
+            # Initial messages belong to a fresh thread.
+            return self._wrapped.create(*args, **kwargs)
+        return self._pool.lease_thread(
+            lambda: self._wrapped.create(*args, **kwargs), self._wrapped.delete
+        )
+
+    def delete(self, thread_id: str, *args: Any, **kwargs: Any) -> Any:
+        if self._pool.holds(thread_id):
+            return None
+        return self._wrapped.delete(thread_id, *args, **kwargs)
+
+
+class _PooledAgents(_Forwarding):
+    def __init__(self, agents: Any, pool: FoundryPool) -> None:
+        super().__init__(agents)
+        self._pool = pool
+        self.threads = _PooledThreads(agents.threads, pool)
+
+    def get_agent(self, agent_id: str, *args: Any, **kwargs: Any) -> Any:
+        if args or kwargs:
+            return self._wrapped.get_agent(agent_id, *args, **kwargs)
+        return self._pool.agent(agent_id, lambda: self._wrapped.get_agent(agent_id))
+
+    def create_agent(self, *args: Any, **kwargs: Any) -> Any:
+        handle = self._wrapped.create_agent(*args, **kwargs)
+        self._pool.remember_agent(handle)
+        return handle
+
+    def update_agent(self, agent_id: str, *args: Any, **kwargs: Any) -> Any:
+        self._pool.forget_agent(agent_id)
+        handle = self._wrapped.update_agent(agent_id, *args, **kwargs)
+        self._pool.remember_agent(handle, agent_id)
+        return handle
+
+    def delete_agent(self, agent_id: str, *args: Any, **kwargs: Any) -> Any:
+        self._pool.forget_agent(agent_id)
+        return self._wrapped.delete_agent(agent_id, *args, **kwargs)
+
+
+class PooledProjectClient(_Forwarding):
+    """``AIProjectClient`` whose agent lookups and threads go through the pool."""
+
+    def __init__(self, client: Any, pool: FoundryPool) -> None:
+        super().__init__(client)
+        self.agents = _PooledAgents(client.agents, pool)
@@ -0,0 +1,265 @@
+"""Deduplication of orchestration submissions.
+
+``process_orchestration_request`` starts a Foundry run of every agent in the
+request, and the same submission can arrive several times: client retries of
+``POST /api/orchestrations`` and Service Bus redeliveries (``host.json``
+retry policy, lost message locks).  :class:`IdempotencyGuard` makes the
+submission idempotent per key:
+
+- The first request for a key runs; a successful response (status < 400) is
+  stored for ``ttl`` seconds.
+- A later request with the same key returns the stored response without
+  calling the dispatcher (*replay*).
+- A request that arrives while the first is still running waits for it and
+  returns its response (*coalesced*), whatever its status.
+- Failed responses are not stored, so a retry after an error runs again.
+
+Keys are the ``Idempotency-Key`` header when given, else the request's
+``orchestration_id``, scoped to the submitting app; requests without either
+are never deduplicated.  A key is bound to a fingerprint of the request body:
+reusing an ``Idempotency-Key`` for a different body is rejected with ``422``
+and reusing an ``orchestration_id`` with ``409``.
+
+Stored responses live in an :class:`IdempotencyStore`.  The default
+:class:`MemoryIdempotencyStore` is per worker, bounded to ``max_entries`` (the
+oldest entries are evicted first) and expires entries after ``ttl``; pass a
+shared store (Redis, Table Storage, ...) to deduplicate across workers.
+Concurrent duplicates are coalesced per worker either way.
+
+Configuration:
+    AOS_IDEMPOTENCY               Enable deduplication (default: true)
+    AOS_IDEMPOTENCY_TTL           Seconds a response is replayed (default: 86400)
+    AOS_IDEMPOTENCY_MAX_ENTRIES   Keys kept by the in-memory store
+                                  (default: 10000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol, Tuple
+from urllib.parse import quote
+
+from .config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 86400.0
+DEFAULT_MAX_ENTRIES = 10_000
+
+#: ``call()`` → library ``(body, status_code)`` response.
+Submission = Callable[[], Awaitable[tuple]]
+
+
+@dataclass
+class StoredResponse:
+    """A response recorded for an idempotency key."""
+
+    fingerprint: str
+    result: tuple
+    expires_at: float
+
+
+class IdempotencyStore(Protocol):
+    """Storage for responses by idempotency key."""
+
+    async def get(self, key: str) -> Optional[StoredResponse]: ...
+
+    async def put(self, key: str, response: StoredResponse) -> None: ...
+
+
+class MemoryIdempotencyStore:
+    """Per-worker store bounded to *max_entries*, expiring entries lazily."""
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self.max_entries = max_entries or env_int(
+            "AOS_IDEMPOTENCY_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+        )
+        self.evictions = 0
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        response = self._entries.get(key)
+        if response is not None and response.expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return response
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        # Entries share one TTL, so insertion order is expiry order.
+        now = time.time()
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if oldest.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[oldest_key]
+            if oldest.expires_at > now:
+                self.evictions += 1
+
+
+@dataclass
+class IdempotencyStats:
+    """Counters for one guard."""
+
+    submitted: int = 0
+    replayed: int = 0
+    coalesced: int = 0
+    conflicts: int = 0
+    unkeyed: int = 0
+    store_errors: int = 0
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different request body.
+
+    Attributes:
+        status_code: ``422`` for a reused ``Idempotency-Key``, ``409`` for a
+            reused ``orchestration_id``.
+    """
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fingerprint(body: Any) -> str:
+    """Stable hash of a request body."""
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def submission_key(
+    app_name: str, body: Any, idempotency_key: Optional[str] = None
+) -> Optional[str]:
+    """The deduplication key for *app_name*'s submission, or ``None``.
+
+    The app name is quoted so that it cannot contain the ``:`` separator; two
+    apps never share a key.
+    """
+    scope = quote(app_name, safe="")
+    if idempotency_key and idempotency_key.strip():
+        return f"key:{scope}:{idempotency_key.strip()}"
+    orch_id = body.get("orchestration_id") if isinstance(body, dict) else None
+    if isinstance(orch_id, str) and orch_id:
+        return f"orchestration:{scope}:{orch_id}"
+    return None
+
+
+class IdempotencyGuard:
+    """Run each keyed submission at most once per ``ttl``.
+
+    Args:
+        store: Where responses are kept.  Defaults to a
+            :class:`MemoryIdempotencyStore`.
+        ttl: Seconds a response is replayed.  Defaults to
+            ``AOS_IDEMPOTENCY_TTL``.
+    """
+
+    def __init__(
+        self, store: Optional[IdempotencyStore] = None, ttl: Optional[float] = None
+    ) -> None:
+        self.enabled = env_bool("AOS_IDEMPOTENCY", True)
+        self.store = store if store is not None else MemoryIdempotencyStore()
+        self.ttl = ttl or env_float("AOS_IDEMPOTENCY_TTL", DEFAULT_TTL)
+        self.stats = IdempotencyStats()
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def run(
+        self, key: Optional[str], body: Any, call: Submission
+    ) -> Tuple[tuple, bool]:
+        """Run *call* unless *key* already has (or is producing) a response.
+
+        Returns:
+            ``(result, replayed)``; *replayed* is true when *result* is the
+            response of an earlier or concurrent submission.
+
+        Raises:
+            IdempotencyConflict: *key* was used with a different *body*.
+        """
+        if not self.enabled or key is None:
+            self.stats.unkeyed += 1
+            return await call(), False
+        digest = fingerprint(body)
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._check(key, pending[0], digest)
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending[1]), True
+        stored = await self._lookup(key)
+        if stored is not None:
+            self._check(key, stored.fingerprint, digest)
+            self.stats.replayed += 1
+            return stored.result, True
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            # Another submission started while the store was consulted.
+            self._check(key, pending[0], digest)
+            self.stats.coalesced += 1
+            return await asyncio.shield(pending[1]), True
+        future = asyncio.ensure_future(self._submit(key, digest, call))
+        self._in_flight[key] = (digest, future)
+        self.stats.submitted += 1
+        return await asyncio.shield(future), False
+
+    async def _submit(self, key: str, digest: str, call: Submission) -> tuple:
+        try:
+            result = await call()
+            if result[1] < 400:
+                try:
+                    await self.store.put(
+                        key, StoredResponse(digest, result, time.time() + self.ttl)
+                    )
+                except Exception:  # noqa: BLE001 — the submission itself succeeded
+                    self.stats.store_errors += 1
+                    logger.exception("Failed to store idempotent response for %s", key)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _lookup(self, key: str) -> Optional[StoredResponse]:
+        try:
+            return await self.store.get(key)
+        except (
+            Exception
+        ):  # noqa: BLE001 — an unavailable store must not block submissions
+            self.stats.store_errors += 1
+            logger.exception("Idempotency store lookup failed for %s", key)
+            return None
+
+    def _check(self, key: str, expected: str, digest: str) -> None:
+        if expected == digest:
+            return
+        self.stats.conflicts += 1
+        if key.startswith("key:"):
+            raise IdempotencyConflict(
+                "Idempotency-Key was already used with a different body", 422
+            )
+        raise IdempotencyConflict(
+            "orchestration_id was already submitted with a different body", 409
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and counters as a JSON-ready dict."""
+        snapshot: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "ttl_s": self.ttl,
+            "in_flight": len(self._in_flight),
+            **asdict(self.stats),
+        }
+        if isinstance(self.store, MemoryIdempotencyStore):
+            snapshot.update(
+                entries=len(self.store),
+                max_entries=self.store.max_entries,
+                evictions=self.store.evictions,
+            )
+        return snapshot
@@ -0,0 +1,514 @@
+"""Per-endpoint latency instrumentation, Prometheus exposition and sampling profiles.
+
+:meth:`Instrumentation.wrap` is applied to every HTTP handler registered on the
+function app.  Each request's wall time is split into phases, recorded by
+:func:`phase` blocks that run inside the handler:
+
+    parse        request body decoding
+    dispatcher   awaiting dispatcher and upstream calls (``DispatcherExecutor.run``)
+    serialize    response encoding
+    total        the whole handler
+
+Concurrent blocks of one request add up, so ``dispatcher`` can exceed
+``total`` for handlers that fan out.  :meth:`Instrumentation.render_prometheus`
+exposes (text format 0.0.4):
+
+    aos_http_request_duration_seconds{endpoint,phase}   histogram
+    aos_http_request_size_bytes{endpoint}                histogram
+    aos_http_response_size_bytes{endpoint}               histogram
+    aos_http_responses_total{endpoint,status}            counter
+    aos_http_requests_in_flight{endpoint}                gauge
+
+When ``opentelemetry-api`` is installed and the host has configured a tracer
+provider (e.g. Azure Monitor), each request is also an ``aos.<endpoint>``
+span with one child span per :func:`phase` block; without a provider no spans
+are created.
+
+With ``AOS_PROFILING`` on, a request carrying ``X-AOS-Profile: true`` runs
+under a :class:`SamplingProfiler`, which samples the stacks of the event-loop
+thread and of busy dispatcher pool threads.  The response carries
+``X-AOS-Profile-Id``; the profile (folded stacks, the input format of flame
+graph tools) is kept for later retrieval.  One profile runs at a time per
+worker; other requests are not profiled meanwhile.
+
+Configuration:
+    AOS_INSTRUMENTATION        Record per-endpoint metrics (default: true)
+    AOS_OTEL_SPANS             Emit OpenTelemetry spans when the API is
+                               installed (default: true)
+    AOS_PROFILING              Honour ``X-AOS-Profile`` (default: false)
+    AOS_PROFILER_INTERVAL_MS   Sampling interval (default: 5)
+    AOS_PROFILER_MAX_SECONDS   Longest profile; sampling stops after it
+                               (default: 30)
+    AOS_PROFILES_KEPT          Profiles kept per worker (default: 20)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import env_bool, env_float, env_int, parse_bool
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover - optional dependency
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROFILE_REQUEST_HEADER = "X-AOS-Profile"
+PROFILE_ID_HEADER = "X-AOS-Profile-Id"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS = tuple(64 * 4**k for k in range(11))  # 64 B … 64 MiB
+
+DEFAULT_PROFILER_INTERVAL_MS = 5.0
+DEFAULT_PROFILER_MAX_SECONDS = 30.0
+DEFAULT_PROFILES_KEPT = 20
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: ``value <= le``)."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        """``(le, count)`` pairs, ending with ``+Inf``."""
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield f"{bound:g}", running
+        yield "+Inf", self.count
+
+
+@dataclass
+class RequestTiming:
+    """Phase durations of the request running in the current context."""
+
+    tracer: Any = None
+    phases: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    closed: bool = False
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar(
+    "aos_request_timing", default=None
+)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the enclosed block to phase *name* of the current request.
+
+    A no-op outside an instrumented request (background tasks, start-up).
+    """
+    timing = _current.get()
+    if timing is None or timing.closed:
+        yield
+        return
+    started = time.perf_counter()
+    span = timing.tracer.start_as_current_span(f"aos.{name}") if timing.tracer else None
+    try:
+        if span is None:
+            yield
+        else:
+            with span:
+                yield
+    finally:
+        timing.phases[name] += time.perf_counter() - started
+
+
+# ── Sampling profiler ─────────────────────────────────────────────────────────
+
+
+@dataclass
+class Profile:
+    """Stack samples collected for one request."""
+
+    profile_id: str
+    endpoint: str
+    started_at: str
+    interval_ms: float
+    duration_s: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+
+    def folded(self) -> str:
+        """``frame;frame;... count`` lines, most frequent first."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """Metadata plus the functions most often on top of the stack."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = self.samples or 1
+        return {
+            "profile_id": self.profile_id,
+            "endpoint": self.endpoint,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_s * 1000, 3),
+            "interval_ms": self.interval_ms,
+            "samples": self.samples,
+            "top_self": [
+                {"frame": frame, "samples": count, "share": round(count / total, 4)}
+                for frame, count in leaves.most_common(top)
+            ],
+        }
+
+
+def _frame_label(code: Any) -> str:
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _idle_pool_thread(frame: Any) -> bool:
+    code = frame.f_code
+    return code.co_name == "_worker" and code.co_filename.endswith(
+        os.path.join("concurrent", "futures", "thread.py")
+    )
+
+
+class SamplingProfiler:
+    """Sample thread stacks (``sys._current_frames``) on a background thread.
+
+    Samples the thread that called :meth:`start` (the event loop) and every
+    thread whose name starts with *pool_prefix* while it is running a call.
+
+    Args:
+        profile: Receives the samples.
+        interval: Seconds between samples.
+        max_seconds: Sampling stops after this long even without :meth:`stop`.
+        pool_prefix: Thread name prefix of the dispatcher pool.
+    """
+
+    def __init__(
+        self,
+        profile: Profile,
+        interval: float,
+        max_seconds: float,
+        pool_prefix: str = "aos-dispatcher",
+    ) -> None:
+        self.profile = profile
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.pool_prefix = pool_prefix
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target = 0
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="aos-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.profile.duration_s = time.perf_counter() - self._started
+        return self.profile
+
+    def _run(self) -> None:
+        deadline = self._started + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            self._sample()
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._target:
+                label = "event-loop"
+            elif names.get(ident, "").startswith(self.pool_prefix):
+                if _idle_pool_thread(frame):
+                    continue
+                label = self.pool_prefix
+            else:
+                continue
+            frames: List[str] = []
+            while frame is not None:
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            frames.append(label)
+            self.profile.stacks[";".join(reversed(frames))] += 1
+        self.profile.samples += 1
+
+
+# ── Instrumentation ───────────────────────────────────────────────────────────
+
+
+@dataclass
+class EndpointMetrics:
+    """Histograms and counters for one endpoint."""
+
+    phases: Dict[str, Histogram] = field(
+        default_factory=lambda: defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+    )
+    request_bytes: Histogram = field(default_factory=lambda: Histogram(SIZE_BUCKETS))
+    response_bytes: Histogram = field(default_factory=lambda: Histogram(SIZE_BUCKETS))
+    statuses: Counter = field(default_factory=Counter)
+    in_flight: int = 0
+
+
+def _body_size(message: Any) -> int:
+    get_body = getattr(message, "get_body", None)
+    if get_body is None:
+        return 0
+    body = get_body()
+    return len(body) if isinstance(body, (bytes, bytearray, str)) else 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+class Instrumentation:
+    """Per-endpoint metrics, spans and on-demand profiles for HTTP handlers.
+
+    Metrics are recorded on the event-loop thread only.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = env_bool("AOS_INSTRUMENTATION", True)
+        self.spans = trace is not None and env_bool("AOS_OTEL_SPANS", True)
+        self.profiling = env_bool("AOS_PROFILING", False)
+        self.profiler_interval = (
+            env_float("AOS_PROFILER_INTERVAL_MS", DEFAULT_PROFILER_INTERVAL_MS) / 1000
+        )
+        self.profiler_max_seconds = env_float(
+            "AOS_PROFILER_MAX_SECONDS", DEFAULT_PROFILER_MAX_SECONDS
+        )
+        self.profiles_kept = env_int("AOS_PROFILES_KEPT", DEFAULT_PROFILES_KEPT)
+        self.endpoints: Dict[str, EndpointMetrics] = defaultdict(EndpointMetrics)
+        self.profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._profiling_now = False
+        self._provider: Any = None
+        self._tracer: Any = None
+
+    @property
+    def tracer(self) -> Any:
+        """Tracer of the configured provider; ``None`` until the host configures one."""
+        if not self.spans:
+            return None
+        provider = trace.get_tracer_provider()
+        if provider is not self._provider:
+            # The default proxy provider only hands out no-op spans; skip them.
+            configured = not isinstance(provider, trace.ProxyTracerProvider)
+            self._tracer = provider.get_tracer(__name__) if configured else None
+            self._provider = provider
+        return self._tracer
+
+    def wrap(
+        self, endpoint: str, handler: Callable[..., Any], route: Optional[str] = None
+    ):
+        """Instrument async HTTP *handler* as *endpoint*.
+
+        The request is the ``req`` keyword or the first positional argument;
+        it and the response need ``get_body()``, ``headers`` and (response)
+        ``status_code``.
+        """
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        async def instrumented(*args: Any, **kwargs: Any) -> Any:
+            req = kwargs.get("req", args[0] if args else None)
+            metrics = self.endpoints[endpoint]
+            metrics.in_flight += 1
+            tracer = self.tracer
+            timing = RequestTiming(tracer=tracer)
+            token = _current.set(timing)
+            profiler = self._start_profiler(endpoint, req)
+            started = time.perf_counter()
+            response = None
+            try:
+                with self._span(tracer, endpoint, route, req) as span:
+                    response = await handler(*args, **kwargs)
+                    if span is not None:
+                        span.set_attribute(
+                            "http.response.status_code", response.status_code
+                        )
+                        for name, seconds in timing.phases.items():
+                            span.set_attribute(
+                                f"aos.{name}_ms", round(seconds * 1000, 3)
+                            )
+            finally:
+                elapsed = time.perf_counter() - started
+                timing.closed = True
+                _current.reset(token)
+                metrics.in_flight -= 1
+                self._record(metrics, timing, elapsed, req, response)
+                if profiler is not None:
+                    self._finish_profiler(profiler, response)
+            return response
+
+        return instrumented
+
+    @contextlib.contextmanager
+    def _span(
+        self, tracer: Any, endpoint: str, route: Optional[str], req: Any
+    ) -> Iterator[Any]:
+        if tracer is None:
+            yield None
+            return
+        attributes = {"http.request.method": getattr(req, "method", None) or ""}
+        if route is not None:
+            attributes["http.route"] = f"/api/{route}"
+        with tracer.start_as_current_span(
+            f"aos.{endpoint}", kind=trace.SpanKind.SERVER, attributes=attributes
+        ) as span:
+            yield span
+
+    def _record(
+        self,
+        metrics: EndpointMetrics,
+        timing: RequestTiming,
+        elapsed: float,
+        req: Any,
+        response: Any,
+    ) -> None:
+        metrics.phases["total"].observe(elapsed)
+        for name, seconds in timing.phases.items():
+            metrics.phases[name].observe(seconds)
+        metrics.request_bytes.observe(_body_size(req))
+        if response is None:
+            metrics.statuses["500"] += 1
+            return
+        metrics.statuses[str(response.status_code)] += 1
+        metrics.response_bytes.observe(_body_size(response))
+
+    def _start_profiler(self, endpoint: str, req: Any) -> Optional[SamplingProfiler]:
+        if not self.profiling or self._profiling_now or req is None:
+            return None
+        if not parse_bool(req.headers.get(PROFILE_REQUEST_HEADER)):
+            return None
+        self._profiling_now = True
+        profile = Profile(
+            profile_id=uuid.uuid4().hex,
+            endpoint=endpoint,
+            started_at=datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            interval_ms=self.profiler_interval * 1000,
+        )
+        profiler = SamplingProfiler(
+            profile, self.profiler_interval, self.profiler_max_seconds
+        )
+        profiler.start()
+        return profiler
+
+    def _finish_profiler(self, profiler: SamplingProfiler, response: Any) -> None:
+        profile = profiler.stop()
+        self._profiling_now = False
+        self.profiles[profile.profile_id] = profile
+        while len(self.profiles) > self.profiles_kept:
+            self.profiles.popitem(last=False)
+        if response is not None:
+            response.headers[PROFILE_ID_HEADER] = profile.profile_id
+        logger.info(
+            "Profiled %s: %d samples in %.0f ms (profile %s)",
+            profile.endpoint,
+            profile.samples,
+            profile.duration_s * 1000,
+            profile.profile_id,
+        )
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        endpoints = sorted(self.endpoints.items())
+
+        def histogram(
+            name: str, help_text: str, rows: List[Tuple[Dict[str, str], Histogram]]
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in rows:
+                for le, count in hist.cumulative():
+                    lines.append(f"{name}_bucket{{{_labels(**labels, le=le)}}} {count}")
+                lines.append(f"{name}_sum{{{_labels(**labels)}}} {hist.sum:.6f}")
+                lines.append(f"{name}_count{{{_labels(**labels)}}} {hist.count}")
+
+        histogram(
+            "aos_http_request_duration_seconds",
+            "Handler time by phase (parse, dispatcher, serialize, total).",
+            [
+                ({"endpoint": endpoint, "phase": name}, hist)
+                for endpoint, metrics in endpoints
+                for name, hist in sorted(metrics.phases.items())
+            ],
+        )
+        histogram(
+            "aos_http_request_size_bytes",
+            "Request body size.",
+            [
+                ({"endpoint": endpoint}, metrics.request_bytes)
+                for endpoint, metrics in endpoints
+            ],
+        )
+        histogram(
+            "aos_http_response_size_bytes",
+            "Response body size as sent (after compression).",
+            [
+                ({"endpoint": endpoint}, metrics.response_bytes)
+                for endpoint, metrics in endpoints
+            ],
+        )
+        lines.append("# HELP aos_http_responses_total Responses by status code.")
+        lines.append("# TYPE aos_http_responses_total counter")
+        for endpoint, metrics in endpoints:
+            for status, count in sorted(metrics.statuses.items()):
+                labels = _labels(endpoint=endpoint, status=status)
+                lines.append(f"aos_http_responses_total{{{labels}}} {count}")
+        lines.append("# HELP aos_http_requests_in_flight Requests being handled.")
+        lines.append("# TYPE aos_http_requests_in_flight gauge")
+        for endpoint, metrics in endpoints:
+            labels = _labels(endpoint=endpoint)
+            lines.append(f"aos_http_requests_in_flight{{{labels}}} {metrics.in_flight}")
+        return "\n".join(lines) + "\n"
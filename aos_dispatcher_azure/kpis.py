@@ -0,0 +1,227 @@
+"""Materialised KPI dashboard, maintained as metric points are written.
+
+``dispatcher.get_kpi_dashboard`` recomputes every KPI from its metric history
+on each call.  :class:`KpiBoard` keeps the dashboard materialised instead:
+
+- ``create_kpi`` adds the definition (``name``, ``target`` and any other
+  fields) to the board.
+- Each recorded metric point whose ``name`` matches a KPI folds into that
+  KPI's ``current`` value and re-evaluates its ``status`` against ``target``
+  in O(1).  ``current`` is aggregated over the points the way the KPI's
+  ``aggregation`` field says (``AGGREGATIONS``; ``last`` when absent, as in
+  ``get_kpi_dashboard``): ``last`` takes the newest point by timestamp and
+  ignores older ones, the others fold every point into the seeded value.
+  ``avg`` needs the number of points behind the seeded value (``count`` in
+  the dashboard entry); without it the KPI is re-seeded on the next read.
+- The dashboard body and its ``ETag`` are rebuilt in O(KPIs) only after a
+  change and cached until the next one, so unchanged reads cost nothing and
+  ``If-None-Match`` can be answered with ``304``.
+
+The board is per worker.  It is seeded from ``dispatcher.get_kpi_dashboard``
+on first read and re-seeded every ``AOS_KPI_RESYNC_INTERVAL`` seconds to pick
+up writes handled by other workers.  The ``ETag`` is a hash of the body, so it
+is the same on every worker holding the same dashboard.
+
+Configuration:
+    AOS_KPI_RESYNC_INTERVAL   Seconds between re-seeds from the dispatcher
+                              (default: 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import env_float
+from .timeseries import parse_timestamp
+
+DEFAULT_RESYNC_INTERVAL = 60.0
+
+#: Values of a KPI's ``aggregation`` field the board can maintain.
+AGGREGATIONS = ("last", "sum", "count", "min", "max", "avg")
+#: Aggregations that give the same result when a point is applied twice.
+_IDEMPOTENT = ("last", "min", "max")
+
+#: ``fetch()`` → library ``get_kpi_dashboard`` response ``(body, status_code)``.
+DashboardFetcher = Callable[[], Awaitable[tuple]]
+
+
+def kpi_status(current: Any, target: Any) -> str:
+    """``on_track`` when *current* has reached *target*, else ``at_risk``."""
+    if isinstance(current, (int, float)) and isinstance(target, (int, float)):
+        return "on_track" if current >= target else "at_risk"
+    return "at_risk"
+
+
+def aggregation_of(entry: Dict[str, Any]) -> str:
+    """The KPI's ``aggregation``, or ``last`` when it is missing or unknown."""
+    aggregation = entry.get("aggregation")
+    return aggregation if aggregation in AGGREGATIONS else "last"
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def fold(entry: Dict[str, Any], value: float) -> Optional[Any]:
+    """*entry*'s ``current`` after one more point of *value*.
+
+    Updates ``count`` for ``avg``.  Returns ``None`` when the value cannot be
+    derived from the entry (``avg`` without a ``count``).
+    """
+    aggregation = aggregation_of(entry)
+    current = entry.get("current")
+    if aggregation == "last" or not _number(current):
+        if aggregation == "avg":
+            entry["count"] = 1
+        return 1 if aggregation == "count" else value
+    if aggregation == "sum":
+        return current + value
+    if aggregation == "count":
+        return current + 1
+    if aggregation == "min":
+        return min(current, value)
+    if aggregation == "max":
+        return max(current, value)
+    count = entry.get("count")
+    if not _number(count) or count < 1:
+        return None
+    entry["count"] = count + 1
+    return current + (value - current) / (count + 1)
+
+
+class KpiBoard:
+    """Dashboard entries keyed by KPI name, plus a cached snapshot.
+
+    Args:
+        resync_interval: Seconds between re-seeds from the dispatcher.
+            Defaults to ``AOS_KPI_RESYNC_INTERVAL``.
+    """
+
+    def __init__(self, resync_interval: Optional[float] = None) -> None:
+        self.resync_interval = resync_interval or env_float(
+            "AOS_KPI_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL
+        )
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._updated: Dict[str, float] = {}
+        self._version = 0
+        self._snapshot: Optional[Tuple[int, bytes, str]] = None
+        self._buffer: Optional[List[Tuple[str, Any, float]]] = None
+        self._lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self.synced_at: Optional[float] = None
+
+    def define(self, definition: Dict[str, Any]) -> None:
+        """Add or replace a KPI definition (the ``create_kpi`` body)."""
+        name = definition.get("name") if isinstance(definition, dict) else None
+        if not name:
+            return
+        with self._lock:
+            entry = dict(self._entries.get(name, {}), **definition)
+            entry.setdefault("current", None)
+            entry["status"] = kpi_status(entry["current"], entry.get("target"))
+            self._entries[name] = entry
+            self._version += 1
+
+    def record(self, name: Any, value: Any, timestamp: Any = None) -> bool:
+        """Apply one metric point; returns ``True`` if a KPI changed."""
+        if not name or isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        if self._buffer is None and name not in self._entries:
+            return False
+        try:
+            epoch = parse_timestamp(timestamp) if timestamp is not None else time.time()
+        except ValueError:
+            return False
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append((name, value, epoch))
+            return self._apply(name, value, epoch)
+
+    def _apply(self, name: str, value: Any, epoch: float) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        if aggregation_of(entry) == "last":
+            if epoch < self._updated.get(name, float("-inf")):
+                return False
+            self._updated[name] = epoch
+        current = fold(entry, value)
+        if current is None:
+            # Cannot be maintained from the seeded value; re-seed on next read.
+            self.synced_at = None
+            return False
+        if entry.get("current") == current:
+            return False
+        entry["current"] = current
+        entry["status"] = kpi_status(current, entry.get("target"))
+        self._version += 1
+        return True
+
+    def needs_sync(self) -> bool:
+        return (
+            self.synced_at is None
+            or time.monotonic() - self.synced_at > self.resync_interval
+        )
+
+    async def ensure_synced(self, fetch: DashboardFetcher) -> Optional[tuple]:
+        """Seed the board from the dispatcher if it is empty or stale.
+
+        Returns the library error response if the fetch failed, else ``None``.
+        """
+        if not self.needs_sync():
+            return None
+        async with self._sync_lock:
+            if not self.needs_sync():
+                return None
+            with self._lock:
+                self._buffer = []
+            kpis: Optional[List[Any]] = None
+            try:
+                body, status_code = await fetch()
+                if status_code >= 400:
+                    return body, status_code
+                kpis = (body or {}).get("kpis") or []
+            finally:
+                self._load(kpis)
+            return None
+
+    def _load(self, kpis: Optional[List[Any]]) -> None:
+        with self._lock:
+            buffered = self._buffer or []
+            self._buffer = None
+            if kpis is None:
+                return
+            self._entries = {
+                kpi["name"]: dict(kpi)
+                for kpi in kpis
+                if isinstance(kpi, dict) and kpi.get("name")
+            }
+            self._updated = {}
+            # Points recorded while the fetch was in flight may not be in it.
+            # Re-applying one that is would count it twice in a sum, count or
+            # avg, so those KPIs pick such points up at the next re-seed.
+            for name, value, epoch in buffered:
+                entry = self._entries.get(name)
+                if entry is not None and aggregation_of(entry) in _IDEMPOTENT:
+                    self._apply(name, value, epoch)
+            self._version += 1
+            self.synced_at = time.monotonic()
+
+    def snapshot(self) -> Tuple[bytes, str]:
+        """Return the dashboard body (JSON bytes) and its ``ETag``."""
+        with self._lock:
+            cached = self._snapshot
+            if cached is not None and cached[0] == self._version:
+                return cached[1], cached[2]
+            body = json.dumps({"kpis": list(self._entries.values())}).encode("utf-8")
+            etag = hashlib.sha1(body).hexdigest()[:16]
+            self._snapshot = (self._version, body, etag)
+            return body, etag
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,309 @@
+"""Network membership table with versioned snapshots and deltas.
+
+``dispatcher.discover_peers`` and ``dispatcher.list_networks`` rebuild their
+answer from every registered app on each call.  :class:`NetworkMembership`
+keeps the peers and networks per worker instead, updated in place as
+``register_app``, ``deregister_app`` and ``join_network`` succeed:
+
+- Every change to a peer or network bumps the table's version and is
+  appended to a change log of the last ``AOS_NETWORK_CHANGELOG`` changes.
+- The full peer and network lists are built once per version and served as
+  they are until the next change.
+- A client that passes the ``version`` it last saw as ``since`` gets only the
+  entries added or changed after it and the keys removed, in O(changes).
+  When that version is older than the change log, or comes from another
+  worker (versions carry a per-worker epoch), the full list is returned with
+  ``"delta": false``.
+
+The table is seeded from the library on first read and re-seeded every
+``AOS_NETWORK_RESYNC_INTERVAL`` seconds to pick up writes handled by other
+workers.  A re-seed is recorded as changes too, so deltas stay valid across
+it.  A peer added by ``register_app`` is listed as ``online`` until a re-seed
+returns the library's own entry.
+
+Configuration:
+    AOS_NETWORK_CACHE              Serve discovery and network lists from the
+                                   table (default: true)
+    AOS_NETWORK_RESYNC_INTERVAL    Seconds between re-seeds from the
+                                   dispatcher (default: 60)
+    AOS_NETWORK_CHANGELOG          Changes kept for deltas (default: 10000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import env_bool, env_float, env_int
+
+DEFAULT_RESYNC_INTERVAL = 60.0
+DEFAULT_CHANGELOG = 10_000
+
+#: Table name → (list key in library responses, key field of an entry).
+TABLES: Dict[str, Tuple[str, str]] = {
+    "peers": ("peers", "app_name"),
+    "networks": ("networks", "network_id"),
+}
+
+#: ``fetch()`` → library ``(body, status_code)`` response.
+Fetcher = Callable[[], Awaitable[tuple]]
+
+# (table, key, entry or None for a removal)
+_Write = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class VersionError(ValueError):
+    """A ``since`` value that is not a version this API issued."""
+
+
+class NetworkMembership:
+    """Peers and networks keyed by name, with a version and change log.
+
+    Writes are applied on the event loop; list calls may run on dispatcher
+    threads, so both hold ``_lock``.
+
+    Args:
+        resync_interval: Seconds between re-seeds from the dispatcher.
+            Defaults to ``AOS_NETWORK_RESYNC_INTERVAL``.
+        changelog: Changes kept for deltas.  Defaults to
+            ``AOS_NETWORK_CHANGELOG``.
+    """
+
+    def __init__(
+        self, resync_interval: Optional[float] = None, changelog: Optional[int] = None
+    ) -> None:
+        self.enabled = env_bool("AOS_NETWORK_CACHE", True)
+        self.resync_interval = resync_interval or env_float(
+            "AOS_NETWORK_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL
+        )
+        self.changelog = changelog or env_int(
+            "AOS_NETWORK_CHANGELOG", DEFAULT_CHANGELOG
+        )
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self._tables: Dict[str, Dict[str, Dict[str, Any]]] = {
+            name: {} for name in TABLES
+        }
+        self._log_versions: List[int] = []
+        self._log: List[Tuple[str, str]] = []  # (table, key), parallel to _log_versions
+        self._snapshots: Dict[str, Optional[Dict[str, Any]]] = {
+            name: None for name in TABLES
+        }
+        self._buffer: Optional[List[_Write]] = None
+        self._lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self.synced_at: Optional[float] = None
+        self.full_served = 0
+        self.deltas_served = 0
+
+    @property
+    def token(self) -> str:
+        """The current version as clients see it: ``<epoch>:<n>``."""
+        return f"{self.epoch}:{self.version}"
+
+    # ── writes ──
+
+    def peer_registered(self, app_name: str) -> None:
+        """Record a successful ``register_app``."""
+        self._write("peers", app_name, {"app_name": app_name, "status": "online"})
+
+    def peer_deregistered(self, app_name: str) -> None:
+        """Record a successful ``deregister_app``."""
+        self._write("peers", app_name, None)
+
+    def network_joined(self, network_id: str, response: Any = None) -> None:
+        """Record a successful ``join_network`` (this app joins as one more member)."""
+        with self._lock:
+            current = self._tables["networks"].get(network_id)
+        members = response.get("members") if isinstance(response, dict) else None
+        if not isinstance(members, int):
+            members = (current or {}).get("members", 0) + 1
+        entry = dict(current or {"network_id": network_id}, members=members)
+        self._write("networks", network_id, entry)
+
+    def invalidate(self) -> None:
+        """Re-seed from the dispatcher on the next read."""
+        self.synced_at = None
+
+    def _write(self, table: str, key: str, entry: Optional[Dict[str, Any]]) -> None:
+        if not key:
+            return
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append((table, key, entry))
+            elif self.synced_at is None:
+                return  # The first read seeds the whole table anyway.
+            self._set(table, key, entry)
+
+    def _set(self, table: str, key: str, entry: Optional[Dict[str, Any]]) -> None:
+        rows = self._tables[table]
+        previous = rows.get(key)
+        if entry is None:
+            if previous is None:
+                return
+            del rows[key]
+        else:
+            entry = dict(previous, **entry) if previous is not None else dict(entry)
+            if entry == previous:
+                return
+            rows[key] = entry
+        self.version += 1
+        self._log_versions.append(self.version)
+        self._log.append((table, key))
+        if len(self._log) > 2 * self.changelog:
+            del self._log_versions[: -self.changelog]
+            del self._log[: -self.changelog]
+        self._snapshots[table] = None
+
+    # ── seeding ──
+
+    def needs_sync(self) -> bool:
+        return (
+            self.synced_at is None
+            or time.monotonic() - self.synced_at > self.resync_interval
+        )
+
+    async def ensure_synced(
+        self, fetch_peers: Fetcher, fetch_networks: Fetcher
+    ) -> Optional[tuple]:
+        """Seed the table from the dispatcher if it is empty or stale.
+
+        Returns the library error response if a fetch failed, else ``None``.
+        """
+        if not self.needs_sync():
+            return None
+        async with self._sync_lock:
+            if not self.needs_sync():
+                return None
+            with self._lock:
+                self._buffer = []
+            fetched: Optional[Dict[str, List[Any]]] = None
+            try:
+                responses = await asyncio.gather(fetch_peers(), fetch_networks())
+                for body, status_code in responses:
+                    if status_code >= 400:
+                        return body, status_code
+                fetched = {
+                    table: (body or {}).get(TABLES[table][0]) or []
+                    for table, (body, _) in zip(TABLES, responses)
+                }
+            finally:
+                self._load(fetched)
+            return None
+
+    def load(self, peers: List[Any], networks: List[Any]) -> None:
+        """Replace the table with library ``peers`` and ``networks`` lists."""
+        with self._lock:
+            self._replace({"peers": peers, "networks": networks})
+
+    def _load(self, fetched: Optional[Dict[str, List[Any]]]) -> None:
+        with self._lock:
+            buffered = self._buffer or []
+            self._buffer = None
+            if fetched is not None:
+                self._replace(fetched)
+                # Writes applied while the fetch was in flight may not be in it.
+                for write in buffered:
+                    self._set(*write)
+
+    def _replace(self, fetched: Dict[str, List[Any]]) -> None:
+        for table, (_, key_field) in TABLES.items():
+            rows: Dict[str, Dict[str, Any]] = {}
+            for entry in fetched.get(table) or []:
+                if isinstance(entry, dict) and isinstance(entry.get(key_field), str):
+                    rows[entry[key_field]] = dict(entry)
+            current = self._tables[table]
+            for key in [key for key in current if key not in rows]:
+                self._set(table, key, None)
+            for key, entry in rows.items():
+                if current.get(key) != entry:
+                    current.pop(key, None)  # Replace rather than merge.
+                    self._set(table, key, entry)
+            # List in the library's order.
+            self._tables[table] = {key: current[key] for key in rows}
+            self._snapshots[table] = None
+        self.synced_at = time.monotonic()
+
+    # ── queries ──
+
+    def _parse(self, since: str) -> Optional[int]:
+        """The version *since* names on this worker, or ``None`` if not servable."""
+        epoch, _, number = since.partition(":")
+        try:
+            version = int(number)
+        except ValueError:
+            raise VersionError(
+                "'since' must be a version returned by this API"
+            ) from None
+        if epoch != self.epoch or version > self.version:
+            return None
+        oldest = self._log_versions[0] if self._log_versions else self.version + 1
+        return version if version >= oldest - 1 else None
+
+    def listing(self, table: str, since: Optional[str] = None) -> Dict[str, Any]:
+        """The full *table* list, or the changes after version *since*.
+
+        Raises:
+            VersionError: *since* is not a version token.
+        """
+        list_key, _ = TABLES[table]
+        with self._lock:
+            version = self._parse(since) if since else None
+            if version is None:
+                self.full_served += 1
+                return self._snapshot(table)
+            self.deltas_served += 1
+            changed: Dict[str, None] = {}
+            start = bisect_right(self._log_versions, version)
+            for changed_table, key in self._log[start:]:
+                if changed_table == table:
+                    changed[key] = None
+            rows = self._tables[table]
+            return {
+                list_key: [rows[key] for key in changed if key in rows],
+                "removed": [key for key in changed if key not in rows],
+                "version": self.token,
+                "since": since,
+                "delta": True,
+            }
+
+    def _snapshot(self, table: str) -> Dict[str, Any]:
+        snapshot = self._snapshots[table]
+        if snapshot is None:
+            snapshot = {
+                TABLES[table][0]: list(self._tables[table].values()),
+                "version": self.token,
+                "delta": False,
+            }
+            self._snapshots[table] = snapshot
+        return snapshot
+
+    def discover_peers(self) -> tuple:
+        """Library-style ``discover_peers`` response from the table."""
+        return self.listing("peers"), 200
+
+    def list_networks(self) -> tuple:
+        """Library-style ``list_networks`` response from the table."""
+        return self.listing("networks"), 200
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Size, version and counters as a JSON-ready dict."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "version": self.token,
+                "peers": len(self._tables["peers"]),
+                "networks": len(self._tables["networks"]),
+                "changes_retained": len(self._log),
+                "synced_age_s": (
+                    round(time.monotonic() - self.synced_at, 1)
+                    if self.synced_at
+                    else None
+                ),
+                "full_served": self.full_served,
+                "deltas_served": self.deltas_served,
+            }
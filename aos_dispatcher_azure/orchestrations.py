@@ -0,0 +1,350 @@
+"""In-process tracking of orchestration status changes.
+
+The dispatcher library exposes orchestration state only through point-in-time
+reads (``get_orchestration_status``).  :class:`OrchestrationTracker` turns
+those reads into change notifications for the rest of the wrapper:
+
+- Every status body the wrapper sees (submission responses and status
+  reads) is passed to :meth:`OrchestrationTracker.observe`.  Other bodies
+  (results, cancellations) differ from the status body and would read as a
+  change; after those the wrapper calls :meth:`OrchestrationTracker.refresh`
+  instead, which re-reads the status of an orchestration it already knows.
+- Orchestrations registered with :meth:`OrchestrationTracker.track` (or
+  :meth:`OrchestrationTracker.watch`) are polled by one background watcher
+  per worker until they reach a terminal status, instead of by every
+  interested client.  The wrapper only registers orchestrations somebody
+  consumes: a result subscriber, a request waiting for a change, or queued
+  admission requests waiting for slots to free.
+- Listeners are called once per change of the status body (a new status,
+  or new partial agent outputs under the same status).
+- Requests can wait for the next change of an orchestration
+  (:meth:`OrchestrationTracker.wait_for_change`) without polling: waiters
+  block on an ``asyncio.Event`` and use no CPU until the body changes.
+
+An orchestration the dispatcher no longer knows (a ``404`` while it is
+watched) ends with the terminal status ``not_found``, so listeners holding
+resources for it (admission slots, result subscribers) are not left waiting.
+
+Changes are identified by an ``etag`` — a hash of the status body — so the
+same state has the same tag on every worker instance.
+
+Configuration:
+    AOS_ORCHESTRATION_WATCH_INTERVAL   Seconds between watcher polls of
+                                       in-flight orchestrations (default: 2)
+    AOS_ORCHESTRATION_STATE_LIMIT      Max orchestrations whose last state is
+                                       kept in memory (default: 10000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from .config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = "not_found"
+TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled", NOT_FOUND})
+DEFAULT_WATCH_INTERVAL = 2.0
+DEFAULT_STATE_LIMIT = 10_000
+HISTORY_LENGTH = 32
+
+#: ``status_fn(orchestration_id)`` → library ``(body, status_code)`` response.
+StatusFetcher = Callable[[str], Awaitable[tuple]]
+
+#: ``listener(state, previous_status)`` — called on every change.
+StatusListener = Callable[["OrchestrationState", Optional[str]], Awaitable[None]]
+
+
+def body_etag(body: Dict[str, Any]) -> str:
+    """Content hash of a status body, stable across worker instances."""
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value matches *etag*.
+
+    The header may list several tags (``"a", W/"b"``) or be ``*``; tags are
+    compared weakly, so a ``W/`` prefix is ignored.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag[:2] in ("W/", "w/"):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
+
+
+@dataclass
+class StatusChange:
+    """One entry in an orchestration's recent change history."""
+
+    etag: str
+    status: str
+    previous_status: Optional[str]
+    body: Dict[str, Any]
+
+    @property
+    def kind(self) -> str:
+        """``"status"`` for a new status, ``"progress"`` for new output only."""
+        return "progress" if self.status == self.previous_status else "status"
+
+
+@dataclass
+class OrchestrationState:
+    """Last known state of one orchestration."""
+
+    orchestration_id: str
+    status: Optional[str] = None
+    body: Optional[Dict[str, Any]] = None
+    app_name: Optional[str] = None
+    tracked: bool = False
+    version: int = 0
+    etag: Optional[str] = None
+    history: Deque[StatusChange] = field(
+        default_factory=lambda: deque(maxlen=HISTORY_LENGTH)
+    )
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    waiters: int = 0
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def changes_since(self, etag: Optional[str]) -> List[StatusChange]:
+        """Changes after the one tagged *etag*.
+
+        Returns only the current state when *etag* is ``None`` or no longer in
+        the history (e.g. it was produced on another worker).
+        """
+        changes = list(self.history)
+        if etag is not None:
+            for index, change in enumerate(changes):
+                if change.etag == etag:
+                    return changes[index + 1 :]
+        return changes[-1:]
+
+
+class OrchestrationTracker:
+    """Track orchestration status and notify listeners of transitions.
+
+    Args:
+        status_fn: Coroutine returning the library response of
+            ``get_orchestration_status`` for one orchestration.
+        interval: Watcher poll interval in seconds.  Defaults to
+            ``AOS_ORCHESTRATION_WATCH_INTERVAL``.
+        limit: Max states kept.  Defaults to ``AOS_ORCHESTRATION_STATE_LIMIT``;
+            the least recently seen states that are not being watched are
+            evicted first.
+    """
+
+    def __init__(
+        self,
+        status_fn: StatusFetcher,
+        interval: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> None:
+        self.status_fn = status_fn
+        self.interval = interval or env_float(
+            "AOS_ORCHESTRATION_WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL
+        )
+        self.limit = limit or env_int(
+            "AOS_ORCHESTRATION_STATE_LIMIT", DEFAULT_STATE_LIMIT
+        )
+        self._states: "OrderedDict[str, OrchestrationState]" = OrderedDict()
+        self._watched: Dict[str, OrchestrationState] = {}
+        self._listeners: List[StatusListener] = []
+        self._watcher: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: StatusListener) -> None:
+        """Call *listener* on every status transition."""
+        self._listeners.append(listener)
+
+    def get(self, orchestration_id: str) -> Optional[OrchestrationState]:
+        """Return the last known state of *orchestration_id*, if any."""
+        return self._states.get(orchestration_id)
+
+    def track(
+        self, orchestration_id: str, app_name: Optional[str] = None
+    ) -> OrchestrationState:
+        """Watch *orchestration_id* in the background until it is terminal."""
+        state = self._state_for(orchestration_id)
+        state.tracked = True
+        if app_name:
+            state.app_name = app_name
+        if not state.terminal:
+            self._watched[orchestration_id] = state
+            self._ensure_watcher()
+        return state
+
+    def watch(self, orchestration_ids: Iterable[str]) -> None:
+        """Watch each of *orchestration_ids* in the background until it is terminal."""
+        for orchestration_id in orchestration_ids:
+            if orchestration_id not in self._watched:
+                self.track(orchestration_id)
+
+    async def observe(
+        self, orchestration_id: str, body: Any
+    ) -> Optional[OrchestrationState]:
+        """Record a status body seen by the wrapper; notify on a transition."""
+        if not orchestration_id or not isinstance(body, dict):
+            return None
+        status = body.get("status")
+        if not isinstance(status, str):
+            return None
+        state = self._state_for(orchestration_id)
+        previous = state.status
+        etag = body_etag(body)
+        if etag == state.etag:
+            return state
+        if previous in TERMINAL_STATUSES and status not in TERMINAL_STATUSES:
+            # Stale read racing a terminal update — keep the terminal state.
+            return state
+        state.status = status
+        state.body = body
+        state.etag = etag
+        state.version += 1
+        state.history.append(StatusChange(etag, status, previous, body))
+        if state.terminal:
+            self._watched.pop(orchestration_id, None)
+        # Wake every waiter, then arm a fresh event for the next change.
+        state.changed.set()
+        state.changed = asyncio.Event()
+        for listener in list(self._listeners):
+            try:
+                await listener(state, previous)
+            except Exception:  # noqa: BLE001 — one listener must not break the others
+                logger.exception(
+                    "Orchestration status listener failed for '%s'", orchestration_id
+                )
+        return state
+
+    async def refresh(self, orchestration_id: str) -> Optional[OrchestrationState]:
+        """Re-read the status of a known, non-terminal orchestration now.
+
+        For use after a write or read that implies a new status (a
+        cancellation, a result) but does not return the status body itself.
+        """
+        state = self._states.get(orchestration_id)
+        if state is not None and not state.terminal:
+            await self._poll(orchestration_id)
+        return state
+
+    async def wait_for_change(
+        self, orchestration_id: str, etag: Optional[str], timeout: float
+    ) -> Optional[OrchestrationState]:
+        """Wait up to *timeout* seconds for the body to differ from *etag*.
+
+        The orchestration is watched while anyone waits on it.  Returns the
+        (possibly unchanged) state, or ``None`` if it is unknown.
+        """
+        state = self._states.get(orchestration_id)
+        if state is None:
+            return None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        state.waiters += 1
+        if not state.terminal:
+            self._watched[orchestration_id] = state
+            self._ensure_watcher()
+        try:
+            while state.etag == etag and not state.terminal:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(state.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            state.waiters -= 1
+            if state.waiters == 0 and not state.tracked:
+                # Nobody is interested any more; stop polling for it.
+                self._watched.pop(orchestration_id, None)
+        return state
+
+    def _state_for(self, orchestration_id: str) -> OrchestrationState:
+        state = self._states.get(orchestration_id)
+        if state is not None:
+            self._states.move_to_end(orchestration_id)
+            return state
+        state = self._states[orchestration_id] = OrchestrationState(orchestration_id)
+        if len(self._states) > self.limit:
+            for candidate in list(self._states):
+                if len(self._states) <= self.limit:
+                    break
+                if (
+                    candidate not in self._watched
+                    and candidate != orchestration_id
+                    and not self._states[candidate].waiters
+                ):
+                    del self._states[candidate]
+        return state
+
+    def forget(self, orchestration_id: str) -> None:
+        """Drop all state for *orchestration_id*."""
+        self._states.pop(orchestration_id, None)
+        self._watched.pop(orchestration_id, None)
+
+    @property
+    def watched(self) -> int:
+        """Number of in-flight orchestrations being polled."""
+        return len(self._watched)
+
+    async def poll_once(self) -> None:
+        """Fetch the status of every watched orchestration once (concurrently)."""
+        await asyncio.gather(*(self._poll(orch_id) for orch_id in list(self._watched)))
+
+    async def _poll(self, orchestration_id: str) -> None:
+        try:
+            body, status_code = await self.status_fn(orchestration_id)
+        except Exception:  # noqa: BLE001 — retried on the next poll
+            logger.exception(
+                "Status poll failed for orchestration '%s'", orchestration_id
+            )
+            return
+        if status_code == 404:
+            await self.observe(
+                orchestration_id,
+                {"orchestration_id": orchestration_id, "status": NOT_FOUND},
+            )
+        elif status_code < 400:
+            await self.observe(orchestration_id, body)
+
+    def _ensure_watcher(self) -> None:
+        if self._watcher is not None and not self._watcher.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._watcher = loop.create_task(
+            self._watch(), name="aos-orchestration-watcher"
+        )
+
+    async def _watch(self) -> None:
+        while self._watched:
+            await asyncio.sleep(self.interval)
+            await self.poll_once()
+
+    async def close(self) -> None:
+        """Stop the background watcher."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
@@ -0,0 +1,367 @@
+"""Cursor pagination and NDJSON export for list endpoints.
+
+List endpoints (``list_risks``, ``list_covenants``, ``get_decision_history``,
+``get_audit_trail``, ``list_networks``, ``list_agents``) accept:
+
+    limit    Page size (max ``AOS_LIST_MAX_LIMIT``)
+    cursor   Opaque ``next_cursor`` from the previous page
+    format   ``ndjson`` for an export (also ``Accept: application/x-ndjson``)
+
+Without any of them the full collection is returned as before.
+
+Cursors encode the position in the collection and the key of the last item
+returned, so a page boundary survives items being added or removed before
+it.  When the library function accepts ``limit`` and ``cursor`` itself, they
+are passed through and its own ``next_cursor`` is used; otherwise the
+wrapper slices the library response.
+
+Slicing needs the whole collection, so the wrapper keeps the response it
+fetched for the first JSON page in a :class:`ListSnapshots` entry and names it
+in the cursor; later pages are cut from that snapshot without calling the
+library again.  Snapshots are bounded by count and by the total number of
+items they hold; a collection larger than that budget is not kept at all.  A
+cursor without a live snapshot (expired, evicted, never kept, or on another
+worker) re-fetches the collection and locates its anchor, which costs one
+full list call and a scan.
+
+The Azure Functions HTTP binding buffers response bodies, so an NDJSON export
+is also paged: each response holds at most ``AOS_EXPORT_PAGE_SIZE`` lines,
+and the ``X-Next-Cursor`` / ``Link: rel="next"`` headers point at the rest.
+Export pages of sliced collections are never snapshotted: each one re-fetches
+the collection and is dropped once served, so an export holds no more than
+one fetched collection at a time.
+
+Configuration:
+    AOS_LIST_MAX_LIMIT          Max ``limit`` for JSON pages (default: 1000)
+    AOS_EXPORT_PAGE_SIZE        Lines per NDJSON export response (default: 10000)
+    AOS_LIST_SNAPSHOT_TTL       Seconds a sliced collection is kept for its
+                                next page (default: 300)
+    AOS_LIST_SNAPSHOTS          Sliced collections kept per worker (default: 32)
+    AOS_LIST_SNAPSHOT_ITEMS     Items kept across those collections
+                                (default: 100000)
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import inspect
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .config import env_float, env_int
+
+DEFAULT_MAX_LIMIT = 1000
+DEFAULT_EXPORT_PAGE_SIZE = 10_000
+DEFAULT_SNAPSHOT_TTL = 300.0
+DEFAULT_MAX_SNAPSHOTS = 32
+DEFAULT_MAX_SNAPSHOT_ITEMS = 100_000
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+class PaginationError(ValueError):
+    """Invalid ``limit``, ``cursor`` or ``format`` parameter."""
+
+
+@dataclass
+class PageRequest:
+    """Paging parameters of one list request."""
+
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    export: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.limit is not None or self.cursor is not None or self.export
+
+    @property
+    def size(self) -> int:
+        if self.export:
+            page_size = env_int("AOS_EXPORT_PAGE_SIZE", DEFAULT_EXPORT_PAGE_SIZE)
+            return min(self.limit or page_size, page_size)
+        return self.limit or env_int("AOS_LIST_MAX_LIMIT", DEFAULT_MAX_LIMIT)
+
+
+def parse_page_request(params: Mapping[str, str], accept: str = "") -> PageRequest:
+    """Read ``limit``, ``cursor`` and ``format`` from query parameters."""
+    fmt = (params.get("format") or "").lower()
+    if fmt not in ("", "json", "ndjson"):
+        raise PaginationError("'format' must be 'json' or 'ndjson'")
+    page = PageRequest(
+        cursor=params.get("cursor") or None,
+        export=fmt == "ndjson" or (not fmt and NDJSON_MIMETYPE in accept),
+    )
+    raw_limit = params.get("limit")
+    if raw_limit is not None:
+        try:
+            page.limit = int(raw_limit)
+        except ValueError:
+            raise PaginationError("'limit' must be an integer") from None
+        if page.limit < 1:
+            raise PaginationError("'limit' must be at least 1")
+        if not page.export:
+            page.limit = min(
+                page.limit, env_int("AOS_LIST_MAX_LIMIT", DEFAULT_MAX_LIMIT)
+            )
+    return page
+
+
+def encode_cursor(
+    collection: str, offset: int, anchor: Any = None, snapshot: Optional[str] = None
+) -> str:
+    fields = {"c": collection, "o": offset, "a": anchor}
+    if snapshot is not None:
+        fields["s"] = snapshot
+    payload = json.dumps(fields, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str, collection: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        payload["o"] = int(payload["o"])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeEncodeError):
+        raise PaginationError("Invalid cursor") from None
+    if payload.get("c") != collection or payload["o"] < 0:
+        raise PaginationError("Cursor does not belong to this collection")
+    return payload
+
+
+def decode_cursor(cursor: str, collection: str) -> Tuple[int, Any]:
+    """Return ``(offset, anchor)``; raises :class:`PaginationError` if invalid."""
+    payload = _decode(cursor, collection)
+    return payload["o"], payload.get("a")
+
+
+class ListSnapshots:
+    """Full list responses kept between the pages the wrapper slices from them.
+
+    Entries expire ``ttl`` seconds after their last use; at most
+    ``max_entries`` are kept, holding at most ``max_items`` list items between
+    them (least recently used evicted).  The entry is dropped once its last
+    page has been served.
+
+    Args:
+        ttl: Defaults to ``AOS_LIST_SNAPSHOT_TTL``.
+        max_entries: Defaults to ``AOS_LIST_SNAPSHOTS``.
+        max_items: Defaults to ``AOS_LIST_SNAPSHOT_ITEMS``.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_items: Optional[int] = None,
+    ) -> None:
+        self.ttl = ttl or env_float("AOS_LIST_SNAPSHOT_TTL", DEFAULT_SNAPSHOT_TTL)
+        self.max_entries = max_entries or env_int(
+            "AOS_LIST_SNAPSHOTS", DEFAULT_MAX_SNAPSHOTS
+        )
+        self.max_items = max_items or env_int(
+            "AOS_LIST_SNAPSHOT_ITEMS", DEFAULT_MAX_SNAPSHOT_ITEMS
+        )
+        self.hits = 0
+        self.misses = 0
+        self.too_large = 0
+        self.items = 0
+        # snapshot id -> (last used, (collection, scope), body, item count)
+        self._entries: "OrderedDict[str, Tuple[float, tuple, Dict[str, Any], int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self, cursor: Optional[str], collection: str, scope: Hashable = None
+    ) -> Optional[Dict[str, Any]]:
+        """The response *cursor* was cut from, if it is still kept for *scope*.
+
+        Raises:
+            PaginationError: *cursor* is invalid or belongs to another collection.
+        """
+        if cursor is None:
+            return None
+        snapshot_id = _decode(cursor, collection).get("s")
+        if snapshot_id is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(snapshot_id)
+            if entry is None or entry[1] != (collection, scope):
+                self.misses += 1
+                return None
+            self._entries[snapshot_id] = (now, *entry[1:])
+            self._entries.move_to_end(snapshot_id)
+            self.hits += 1
+            return entry[2]
+
+    def store(
+        self,
+        collection: str,
+        body: Dict[str, Any],
+        scope: Hashable = None,
+        size: int = 0,
+    ) -> Optional[str]:
+        """Keep *body* and return the id to put in its cursors.
+
+        *scope* identifies the query (filters) *body* answers; a cursor only
+        finds the snapshot again with the same scope.  *size* is the number of
+        items in *body*; ``None`` is returned (and nothing kept) when it
+        exceeds ``max_items``.
+        """
+        if size > self.max_items:
+            self.too_large += 1
+            return None
+        snapshot_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._entries[snapshot_id] = (now, (collection, scope), body, size)
+            self.items += size
+            while len(self._entries) > self.max_entries or self.items > self.max_items:
+                self._evict()
+        return snapshot_id
+
+    def holds(self, snapshot_id: Optional[str], body: Dict[str, Any]) -> bool:
+        """Whether *body* is the response kept as *snapshot_id*."""
+        with self._lock:
+            entry = self._entries.get(snapshot_id) if snapshot_id is not None else None
+        return entry is not None and entry[2] is body
+
+    def discard(self, snapshot_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(snapshot_id, None)
+            if entry is not None:
+                self.items -= entry[3]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "snapshots": len(self._entries),
+            "items": self.items,
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "too_large": self.too_large,
+        }
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            used = next(iter(self._entries.values()))[0]
+            if now - used < self.ttl:
+                break
+            self._evict()
+
+    def _evict(self) -> None:
+        _, entry = self._entries.popitem(last=False)
+        self.items -= entry[3]
+
+
+def _start(items: Sequence[Any], offset: int, anchor: Any, key: str) -> int:
+    """Index of the first item after the cursor."""
+    if anchor is None or offset == 0:
+        return offset
+    if 0 < offset <= len(items) and _key(items[offset - 1], key) == anchor:
+        return offset
+    # The collection shifted since the cursor was issued; find the anchor.
+    for index, item in enumerate(items):
+        if _key(item, key) == anchor:
+            return index + 1
+    return min(offset, len(items))
+
+
+def _key(item: Any, key: str) -> Any:
+    return item.get(key) if isinstance(item, dict) else None
+
+
+def paginate(
+    body: Dict[str, Any],
+    list_key: str,
+    page: PageRequest,
+    collection: str,
+    key: str = "id",
+    snapshots: Optional[ListSnapshots] = None,
+    scope: Hashable = None,
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Slice ``body[list_key]`` to one page.
+
+    With *snapshots*, a *body* that has further JSON pages is kept there under
+    *scope* and its id is carried in ``next_cursor``; pass the body returned by
+    :meth:`ListSnapshots.lookup` for those cursors instead of re-fetching.
+    Export pages are never kept: their cursors carry only the anchor.
+
+    Returns:
+        ``(page_body, next_cursor)``; *page_body* is *body* with the list
+        replaced by the page and ``next_cursor`` added.
+    """
+    items = body.get(list_key)
+    if not isinstance(items, list):
+        return body, None
+    start = 0
+    snapshot_id = None
+    if page.cursor is not None:
+        cursor = _decode(page.cursor, collection)
+        snapshot_id = cursor.get("s")
+        if snapshots is not None and snapshots.holds(snapshot_id, body):
+            start = min(cursor["o"], len(items))
+        else:
+            snapshot_id = None
+            start = _start(items, cursor["o"], cursor.get("a"), key)
+    end = start + page.size
+    chunk = items[start:end]
+    next_cursor = None
+    if end < len(items):
+        if snapshots is not None and snapshot_id is None and not page.export:
+            snapshot_id = snapshots.store(collection, body, scope, len(items))
+        anchor = _key(chunk[-1], key) if chunk else None
+        next_cursor = encode_cursor(collection, end, anchor, snapshot_id)
+    elif snapshots is not None and snapshot_id is not None:
+        snapshots.discard(snapshot_id)
+    paged = dict(body)
+    paged[list_key] = chunk
+    paged["next_cursor"] = next_cursor
+    return paged, next_cursor
+
+
+def supports_pagination(fn: Callable[..., Any]) -> bool:
+    """Whether library function *fn* takes ``limit`` and ``cursor`` itself."""
+    try:
+        parameters = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    return "limit" in parameters and "cursor" in parameters
+
+
+def ndjson_lines(items: List[Any]) -> str:
+    """Encode *items* as newline-delimited JSON."""
+    return "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items)
+
+
+def next_link(url: str, cursor: str) -> str:
+    """*url* with its ``cursor`` query parameter set to *cursor*."""
+    parts = urlsplit(url)
+    query = [
+        (name, value) for name, value in parse_qsl(parts.query) if name != "cursor"
+    ]
+    query.append(("cursor", cursor))
+    return urlunsplit(parts._replace(query=urlencode(query)))
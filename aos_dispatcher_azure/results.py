@@ -0,0 +1,539 @@
+"""Publishing of orchestration results to the ``aos-orchestration-results`` topic.
+
+Client apps registered with ``POST /api/apps/register`` own a subscription on
+the ``aos-orchestration-results`` topic filtered by ``app_name``.
+:class:`ResultPublisher` pushes an event there as soon as an orchestration
+submitted by that app completes, fails or is cancelled, so clients don't have
+to poll ``GET /api/orchestrations/{id}``.
+
+Events are buffered per app and sent in batches (``AOS_RESULTS_MAX_BATCH``
+events, or whatever is pending after ``AOS_RESULTS_LINGER_MS``).  Each app
+gets one pooled sender, created on first use and reused for every batch;
+all senders share the broker's single connection.
+
+At most ``AOS_RESULTS_MAX_PENDING`` events wait across all apps; further
+events are dropped.  A batch that fails ``AOS_RESULTS_MAX_ATTEMPTS`` sends
+in a row is dropped too, so one unreachable subscription cannot hold the
+buffer.  Both are counted in ``dropped`` and logged.  :func:`close_on_exit`
+flushes what is pending and closes the senders on shutdown.
+
+Brokers:
+    ServiceBusResultBroker   Azure Service Bus (``azure.servicebus.aio``)
+    InMemoryResultBroker     In-process fake for tests and benchmarks
+
+Configuration:
+    SERVICE_BUS_CONNECTION                         Connection string, or
+    SERVICE_BUS_CONNECTION__fullyQualifiedNamespace  namespace for managed identity
+    AOS_RESULTS_TOPIC          Topic name (default: aos-orchestration-results)
+    AOS_RESULTS_MAX_BATCH      Events per send (default: 100)
+    AOS_RESULTS_LINGER_MS      Max time an event waits for a batch (default: 50)
+    AOS_RESULTS_MAX_PENDING    Events buffered across apps (default: 10000)
+    AOS_RESULTS_MAX_ATTEMPTS   Sends of a batch before it is dropped (default: 5)
+    AOS_RESULTS_DRAIN_TIMEOUT  Seconds the shutdown flush may take (default: 10)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Sequence
+
+from .config import env_float, env_int
+from .orchestrations import NOT_FOUND, OrchestrationState
+from .shutdown import on_shutdown
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOPIC = "aos-orchestration-results"
+SERVICE_BUS_SCOPE = "https://servicebus.azure.net/.default"
+DEFAULT_MAX_BATCH = 100
+DEFAULT_LINGER_MS = 50.0
+DEFAULT_MAX_PENDING = 10_000
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_DRAIN_TIMEOUT = 10.0
+RETRY_DELAY = 1.0
+
+EVENT_TYPES = {
+    "completed": "orchestration.completed",
+    "failed": "orchestration.failed",
+    "cancelled": "orchestration.cancelled",
+    NOT_FOUND: "orchestration.failed",  # gone from the dispatcher while watched
+}
+
+#: ``result_fn(orchestration_id)`` → library ``(body, status_code)`` response.
+ResultFetcher = Callable[[str], Awaitable[tuple]]
+
+
+@dataclass
+class ResultEvent:
+    """One result notification for a client app."""
+
+    orchestration_id: str
+    app_name: str
+    event_type: str
+    data: Dict[str, Any]
+    published_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z")
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event_type": self.event_type,
+            "orchestration_id": self.orchestration_id,
+            "app_name": self.app_name,
+            "published_at": self.published_at,
+            "data": self.data,
+        }
+
+
+class ResultSender(Protocol):
+    """A sender bound to one app's results."""
+
+    async def send_events(self, events: Sequence[ResultEvent]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class ResultBroker(Protocol):
+    """Creates per-app senders that share one underlying connection."""
+
+    def create_sender(self, app_name: str) -> ResultSender: ...
+
+    async def warm_up(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+# ── Azure Service Bus ────────────────────────────────────────────────────────
+
+
+class _ServiceBusResultSender:
+    def __init__(self, sender: Any, app_name: str) -> None:
+        self._sender = sender
+        self.app_name = app_name
+
+    async def send_events(self, events: Sequence[ResultEvent]) -> None:
+        from azure.servicebus import ServiceBusMessage
+        from azure.servicebus.exceptions import MessageSizeExceededError
+
+        batch = await self._sender.create_message_batch()
+        for event in events:
+            message = ServiceBusMessage(
+                json.dumps(event.to_dict()),
+                content_type="application/json",
+                subject=event.event_type,
+                correlation_id=event.orchestration_id,
+                application_properties={
+                    "app_name": event.app_name,
+                    "event_type": event.event_type,
+                },
+            )
+            try:
+                batch.add_message(message)
+            except MessageSizeExceededError:
+                await self._sender.send_messages(batch)
+                batch = await self._sender.create_message_batch()
+                batch.add_message(message)
+        if len(batch):
+            await self._sender.send_messages(batch)
+
+    async def close(self) -> None:
+        await self._sender.close()
+
+
+class ServiceBusResultBroker:
+    """Publish result events to a Service Bus topic.
+
+    The ``ServiceBusClient`` (and, with ``namespace``, its
+    ``DefaultAzureCredential``) is built on first use rather than at
+    construction, so loading the function app does not pay for it.
+
+    Args:
+        client: An ``azure.servicebus.aio.ServiceBusClient``; when omitted,
+            one is built from *connection* or *namespace*.
+        topic: Topic name.
+        connection: Service Bus connection string.
+        namespace: Fully qualified namespace, authenticated with
+            ``DefaultAzureCredential``.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        topic: str = DEFAULT_TOPIC,
+        connection: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> None:
+        if client is None and not connection and not namespace:
+            raise ValueError(
+                "ServiceBusResultBroker needs a client, connection or namespace"
+            )
+        self._client = client
+        self._credential: Any = None
+        self._connection = connection
+        self._namespace = namespace
+        self.topic = topic
+
+    @classmethod
+    def from_environment(cls) -> Optional["ServiceBusResultBroker"]:
+        """Build a broker from ``SERVICE_BUS_CONNECTION``; ``None`` when unset."""
+        topic = os.environ.get("AOS_RESULTS_TOPIC") or DEFAULT_TOPIC
+        connection = os.environ.get("SERVICE_BUS_CONNECTION")
+        namespace = os.environ.get("SERVICE_BUS_CONNECTION__fullyQualifiedNamespace")
+        if not connection and not namespace:
+            return None
+        return cls(topic=topic, connection=connection or None, namespace=namespace)
+
+    @property
+    def client(self) -> Any:
+        """The ``ServiceBusClient``, created on first use."""
+        if self._client is None:
+            from azure.servicebus.aio import ServiceBusClient
+
+            if self._connection:
+                self._client = ServiceBusClient.from_connection_string(self._connection)
+            else:
+                from azure.identity.aio import DefaultAzureCredential
+
+                self._credential = DefaultAzureCredential()
+                self._client = ServiceBusClient(self._namespace, self._credential)
+        return self._client
+
+    def create_sender(self, app_name: str) -> ResultSender:
+        return _ServiceBusResultSender(
+            self.client.get_topic_sender(self.topic), app_name
+        )
+
+    async def warm_up(self) -> None:
+        """Build the client; with ``DefaultAzureCredential``, fetch its first token."""
+        self.client  # noqa: B018 — builds the client on first access
+        if self._credential is not None:
+            await self._credential.get_token(SERVICE_BUS_SCOPE)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+        if self._credential is not None:
+            await self._credential.close()
+
+
+# ── In-process fake ──────────────────────────────────────────────────────────
+
+
+class _InMemoryResultSender:
+    def __init__(self, broker: "InMemoryResultBroker", app_name: str) -> None:
+        self._broker = broker
+        self.app_name = app_name
+
+    async def send_events(self, events: Sequence[ResultEvent]) -> None:
+        if self._broker.latency:
+            await asyncio.sleep(self._broker.latency)
+        if self._broker.fail_next:
+            self._broker.fail_next -= 1
+            raise ConnectionError("InMemoryResultBroker: injected send failure")
+        self._broker.send_calls += 1
+        for event in events:
+            self._broker.subscriptions[event.app_name].append(event.to_dict())
+
+    async def close(self) -> None:
+        self._broker.senders_closed += 1
+
+
+class InMemoryResultBroker:
+    """In-process stand-in for the results topic.
+
+    Events land in ``subscriptions[app_name]`` — the equivalent of the
+    per-app filtered subscription.  ``senders_created`` and ``send_calls``
+    make pooling and batching observable.
+
+    Args:
+        latency: Seconds each send takes.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.subscriptions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.senders_created = 0
+        self.senders_closed = 0
+        self.send_calls = 0
+        self.fail_next = 0
+
+    def create_sender(self, app_name: str) -> ResultSender:
+        self.senders_created += 1
+        return _InMemoryResultSender(self, app_name)
+
+    async def warm_up(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+# ── Publisher ────────────────────────────────────────────────────────────────
+
+
+class ResultPublisher:
+    """Buffer result events per app and send them in batches.
+
+    Args:
+        broker: Destination; when ``None`` publishing is disabled and events
+            are dropped (local development without Service Bus).
+        result_fn: Coroutine used to fetch the full result of a completed
+            orchestration for the event payload.
+        max_batch: Events per send.  Defaults to ``AOS_RESULTS_MAX_BATCH``.
+        linger: Seconds an event may wait for its batch to fill.  Defaults
+            to ``AOS_RESULTS_LINGER_MS``.
+        max_pending: Events buffered across apps.  Defaults to
+            ``AOS_RESULTS_MAX_PENDING``.
+        max_attempts: Consecutive failed sends of a batch before it is
+            dropped.  Defaults to ``AOS_RESULTS_MAX_ATTEMPTS``.
+    """
+
+    def __init__(
+        self,
+        broker: Optional[ResultBroker],
+        result_fn: Optional[ResultFetcher] = None,
+        max_batch: Optional[int] = None,
+        linger: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+    ) -> None:
+        self.broker = broker
+        self.result_fn = result_fn
+        self.max_batch = max_batch or env_int(
+            "AOS_RESULTS_MAX_BATCH", DEFAULT_MAX_BATCH
+        )
+        self.linger = (
+            linger or env_float("AOS_RESULTS_LINGER_MS", DEFAULT_LINGER_MS) / 1000
+        )
+        self.max_pending = max_pending or env_int(
+            "AOS_RESULTS_MAX_PENDING", DEFAULT_MAX_PENDING
+        )
+        self.max_attempts = max_attempts or env_int(
+            "AOS_RESULTS_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS
+        )
+        self._senders: Dict[str, ResultSender] = {}
+        self._pending: Dict[str, List[ResultEvent]] = defaultdict(list)
+        self._attempts: Dict[str, int] = defaultdict(
+            int
+        )  # failed sends of the head batch
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._flusher: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.failed_sends = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.broker is not None
+
+    @property
+    def pending(self) -> int:
+        """Events waiting to be sent, across apps."""
+        return sum(len(events) for events in self._pending.values())
+
+    async def publish(self, event: ResultEvent) -> None:
+        """Queue *event* for its app; sends at once when the batch is full.
+
+        The event is dropped when ``max_pending`` events are already waiting.
+        """
+        if self.broker is None:
+            return
+        self.loop = asyncio.get_running_loop()
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            logger.error(
+                "Result buffer full (%d events); dropped %s for orchestration '%s' "
+                "(app '%s')",
+                self.max_pending,
+                event.event_type,
+                event.orchestration_id,
+                event.app_name,
+            )
+            return
+        pending = self._pending[event.app_name]
+        pending.append(event)
+        if len(pending) >= self.max_batch:
+            await self._flush_app(event.app_name)
+        if self._pending.get(event.app_name):
+            # Not full yet, or the send failed: the flusher sends or retries it.
+            self._ensure_flusher()
+
+    async def on_status_change(
+        self, state: OrchestrationState, previous: Optional[str]
+    ) -> None:
+        """``OrchestrationTracker`` listener: publish moves to a terminal status."""
+        if self.broker is None or not state.terminal or not state.app_name:
+            return
+        if previous == state.status:
+            return
+        data = state.body or {}
+        if state.status == "completed" and self.result_fn is not None:
+            try:
+                body, status_code = await self.result_fn(state.orchestration_id)
+                if status_code < 400 and isinstance(body, dict):
+                    data = body
+            except Exception:  # noqa: BLE001 — fall back to the status body
+                logger.exception(
+                    "Could not fetch result for orchestration '%s'",
+                    state.orchestration_id,
+                )
+        await self.publish(
+            ResultEvent(
+                orchestration_id=state.orchestration_id,
+                app_name=state.app_name,
+                event_type=EVENT_TYPES[state.status],
+                data=data,
+            )
+        )
+
+    async def flush(self) -> None:
+        """Send everything that is pending."""
+        await asyncio.gather(*(self._flush_app(app) for app in list(self._pending)))
+
+    def _sender(self, app_name: str) -> ResultSender:
+        sender = self._senders.get(app_name)
+        if sender is None:
+            sender = self._senders[app_name] = self.broker.create_sender(app_name)
+        return sender
+
+    async def _flush_app(self, app_name: str) -> None:
+        async with self._locks[app_name]:
+            while self._pending.get(app_name):
+                batch = self._pending[app_name][: self.max_batch]
+                try:
+                    await self._sender(app_name).send_events(batch)
+                except Exception:  # noqa: BLE001 — retried on the next flush
+                    self.failed_sends += 1
+                    self._attempts[app_name] += 1
+                    if self._attempts[app_name] < self.max_attempts:
+                        logger.exception(
+                            "Failed to publish %d result event(s) for app '%s'",
+                            len(batch),
+                            app_name,
+                        )
+                        return
+                    logger.exception(
+                        "Dropping %d result event(s) for app '%s' "
+                        "after %d failed sends",
+                        len(batch),
+                        app_name,
+                        self._attempts[app_name],
+                    )
+                    self.dropped += len(batch)
+                else:
+                    self.published += len(batch)
+                self._attempts.pop(app_name, None)
+                del self._pending[app_name][: len(batch)]
+            self._pending.pop(app_name, None)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self._flusher = asyncio.get_running_loop().create_task(
+            self._linger_then_flush(), name="aos-results-flusher"
+        )
+
+    async def _linger_then_flush(self) -> None:
+        delay = self.linger
+        while True:
+            await asyncio.sleep(delay)
+            await self.flush()
+            if not any(self._pending.values()):
+                return
+            # A send failed; back off before retrying.
+            delay = max(self.linger, RETRY_DELAY)
+
+    async def warm_up(self) -> None:
+        """Connect the broker ahead of the first result event."""
+        if self.broker is not None:
+            await self.broker.warm_up()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "published": self.published,
+            "failed_sends": self.failed_sends,
+            "dropped": self.dropped,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "senders": len(self._senders),
+        }
+
+    async def close(self) -> None:
+        """Flush pending events and close every pooled sender."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self.broker is None:
+            return
+        await self.flush()
+        while self.pending:
+            # Failed sends are retried until sent or dropped after max_attempts.
+            await asyncio.sleep(RETRY_DELAY)
+            await self.flush()
+        for sender in self._senders.values():
+            await sender.close()
+        self._senders.clear()
+        await self.broker.close()
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """:meth:`close` from outside the publisher's event loop.  Blocking.
+
+        Runs on the loop the events were published from when it is still
+        running (on another thread) or can still be run, else on a new one.
+        Waits up to *timeout* seconds (default ``AOS_RESULTS_DRAIN_TIMEOUT``).
+        Returns the number of events sent or dropped.
+        """
+        if self.broker is None:
+            return 0
+        if timeout is None:
+            timeout = env_float("AOS_RESULTS_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT)
+        before = self.pending
+        loop = self.loop
+        try:
+            if loop is not None and loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout)
+            elif loop is not None and not loop.is_closed():
+                loop.run_until_complete(asyncio.wait_for(self.close(), timeout))
+            else:
+                asyncio.run(asyncio.wait_for(self.close(), timeout))
+        except Exception:  # noqa: BLE001 — shutting down; report what is lost
+            logger.exception("Closing the result publisher failed")
+        if self.pending:
+            logger.error("%d result event(s) not published at shutdown", self.pending)
+        return before - self.pending
+
+
+def close_on_exit(publisher: ResultPublisher, timeout: Optional[float] = None) -> None:
+    """Flush and close *publisher* at interpreter exit and on ``SIGTERM`` (scale-in).
+
+    Registered with :func:`~aos_dispatcher_azure.shutdown.on_shutdown`.  A
+    ``SIGTERM`` that arrives on the publisher's own event loop thread (the
+    usual case) schedules :meth:`ResultPublisher.close` there, bounded by
+    *timeout* seconds (default ``AOS_RESULTS_DRAIN_TIMEOUT``); elsewhere the
+    publisher is drained first, blocking.
+    """
+    if timeout is None:
+        timeout = env_float("AOS_RESULTS_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT)
+
+    def shutdown() -> Optional[Awaitable[None]]:
+        try:
+            on_loop = asyncio.get_running_loop() is publisher.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            return asyncio.wait_for(publisher.close(), timeout)
+        if publisher.pending or publisher._senders:
+            publisher.drain(timeout)
+        return None
+
+    on_shutdown(shutdown)
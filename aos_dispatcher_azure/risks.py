@@ -0,0 +1,370 @@
+"""Indexed risk registry with maintained aggregates.
+
+``dispatcher.list_risks`` filters the whole registry on every call and keeps
+no derived views.  :class:`RiskRegistry` holds the registry per worker and
+keeps, as risks are registered, assessed, re-statused and mitigated:
+
+- Secondary indexes on ``status``, ``category`` and score band: for each
+  value, the registration positions of its risks in sorted order.  A filtered
+  list walks the smallest matching index from the cursor and checks the other
+  filters per risk, so a page costs O(page) rather than O(registry).
+- Counts and exposure (the sum of ``score``) per category and status, and
+  counts per score band, adjusted in O(1) per write.
+- The risks ordered by ``score``, highest first, for top-N views.
+
+Score bands (``score`` is ``likelihood × impact``, 0–1):
+
+    low          score < 0.25
+    medium       0.25 ≤ score < 0.5
+    high         0.5 ≤ score < 0.75
+    critical     score ≥ 0.75
+    unassessed   no numeric ``score`` yet
+
+The registry is seeded from ``dispatcher.list_risks`` on first read and
+re-seeded every ``AOS_RISK_RESYNC_INTERVAL`` seconds to pick up writes handled
+by other workers.  Risks are listed in registration order, as the library
+lists them.
+
+Configuration:
+    AOS_RISK_INDEX              Serve risk lists and the summary from the
+                                registry (default: true)
+    AOS_RISK_RESYNC_INTERVAL    Seconds between re-seeds from the dispatcher
+                                (default: 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import env_bool, env_float
+from .pagination import PaginationError, decode_cursor, encode_cursor
+
+DEFAULT_RESYNC_INTERVAL = 60.0
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+#: Upper bound (exclusive) of each score band, in order.
+SCORE_BANDS: Tuple[Tuple[str, float], ...] = (
+    ("low", 0.25),
+    ("medium", 0.5),
+    ("high", 0.75),
+    ("critical", math.inf),
+)
+UNASSESSED = "unassessed"
+BAND_NAMES = tuple(name for name, _ in SCORE_BANDS) + (UNASSESSED,)
+
+#: Indexed fields, in the order of :data:`_Keys`.
+FIELDS = ("status", "category", "score_band")
+
+#: ``fetch()`` → library ``list_risks`` response ``(body, status_code)``.
+RiskFetcher = Callable[[], Awaitable[tuple]]
+
+# (status, category, score_band) of one risk.
+_Keys = Tuple[Any, Any, str]
+
+
+def risk_score(risk: Dict[str, Any]) -> Optional[float]:
+    """The risk's numeric ``score``, or ``None`` if it has not been assessed."""
+    score = risk.get("score")
+    if (
+        isinstance(score, bool)
+        or not isinstance(score, (int, float))
+        or math.isnan(score)
+    ):
+        return None
+    return float(score)
+
+
+def band_for(score: Optional[float]) -> str:
+    """Name of the band *score* falls in."""
+    if score is None:
+        return UNASSESSED
+    for name, upper in SCORE_BANDS:
+        if score < upper:
+            return name
+    return SCORE_BANDS[-1][0]
+
+
+class RiskRegistry:
+    """Risks keyed by id, with secondary indexes and aggregates.
+
+    Writes are applied on the event loop; queries may run on dispatcher
+    threads, so both hold ``_lock``.
+
+    Args:
+        resync_interval: Seconds between re-seeds from the dispatcher.
+            Defaults to ``AOS_RISK_RESYNC_INTERVAL``.
+    """
+
+    def __init__(self, resync_interval: Optional[float] = None) -> None:
+        self.enabled = env_bool("AOS_RISK_INDEX", True)
+        self.resync_interval = resync_interval or env_float(
+            "AOS_RISK_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL
+        )
+        self._risks: Dict[str, Dict[str, Any]] = {}
+        self._position: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._keys: Dict[str, _Keys] = {}
+        self._index: Dict[str, Dict[Any, List[int]]] = {field: {} for field in FIELDS}
+        self._cells: Dict[Tuple[Any, Any], List[float]] = (
+            {}
+        )  # (category, status) → [n, sum]
+        self._bands: Counter = Counter()
+        self._ranked: List[Tuple[float, int]] = []  # (-score, position), ascending
+        self._buffer: Optional[List[Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self.synced_at: Optional[float] = None
+
+    # ── writes ──
+
+    def apply(self, risk: Any) -> bool:
+        """Merge a risk object from a library response into the registry.
+
+        Returns ``False`` if *risk* has no ``id``; the caller should then
+        :meth:`invalidate` so the next read re-seeds.
+        """
+        if not isinstance(risk, dict) or not isinstance(risk.get("id"), str):
+            return False
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append(risk)
+            elif self.synced_at is None:
+                return True  # The first read seeds the whole registry anyway.
+            self._put(risk)
+        return True
+
+    def invalidate(self) -> None:
+        """Re-seed from the dispatcher on the next read."""
+        self.synced_at = None
+
+    def _put(self, risk: Dict[str, Any], rank: bool = True) -> None:
+        risk_id = risk["id"]
+        previous = self._risks.get(risk_id)
+        if previous is None:
+            position = len(self._ids)
+            self._ids.append(risk_id)
+            self._position[risk_id] = position
+            merged = dict(risk)
+        else:
+            position = self._position[risk_id]
+            self._remove(risk_id, previous, position, rank)
+            # Responses may omit fields the registry already has (e.g. a
+            # registration echoing only some of them).
+            merged = dict(previous, **risk)
+        score = risk_score(merged)
+        keys = (merged.get("status"), merged.get("category"), band_for(score))
+        self._risks[risk_id] = merged
+        self._keys[risk_id] = keys
+        for field, value in zip(FIELDS, keys):
+            postings = self._index[field].setdefault(value, [])
+            if previous is None:
+                postings.append(position)  # The highest position so far.
+            else:
+                insort(postings, position)
+        cell = self._cells.setdefault((keys[1], keys[0]), [0, 0.0])
+        cell[0] += 1
+        cell[1] += score or 0.0
+        self._bands[keys[2]] += 1
+        if score is not None and rank:
+            insort(self._ranked, (-score, position))
+
+    def _remove(
+        self, risk_id: str, risk: Dict[str, Any], position: int, rank: bool
+    ) -> None:
+        keys, score = self._keys[risk_id], risk_score(risk)
+        for field, value in zip(FIELDS, keys):
+            postings = self._index[field][value]
+            del postings[bisect_left(postings, position)]
+            if not postings:
+                del self._index[field][value]
+        cell = self._cells[(keys[1], keys[0])]
+        cell[0] -= 1
+        cell[1] -= score or 0.0
+        if not cell[0]:
+            del self._cells[(keys[1], keys[0])]
+        self._bands[keys[2]] -= 1
+        if score is not None and rank:
+            del self._ranked[bisect_left(self._ranked, (-score, position))]
+
+    # ── seeding ──
+
+    def needs_sync(self) -> bool:
+        return (
+            self.synced_at is None
+            or time.monotonic() - self.synced_at > self.resync_interval
+        )
+
+    async def ensure_synced(self, fetch: RiskFetcher) -> Optional[tuple]:
+        """Seed the registry from the dispatcher if it is empty or stale.
+
+        Returns the library error response if the fetch failed, else ``None``.
+        """
+        if not self.needs_sync():
+            return None
+        async with self._sync_lock:
+            if not self.needs_sync():
+                return None
+            with self._lock:
+                self._buffer = []
+            risks: Optional[List[Any]] = None
+            try:
+                body, status_code = await fetch()
+                if status_code >= 400:
+                    return body, status_code
+                risks = (body or {}).get("risks") or []
+            finally:
+                self._load(risks)
+            return None
+
+    def load(self, risks: Iterable[Any]) -> None:
+        """Replace the registry with *risks* (a ``list_risks`` body's ``risks``)."""
+        with self._lock:
+            self._replace(risks)
+
+    def _load(self, risks: Optional[List[Any]]) -> None:
+        with self._lock:
+            buffered = self._buffer or []
+            self._buffer = None
+            if risks is not None:
+                # Writes applied while the fetch was in flight may not be in it.
+                self._replace(list(risks) + buffered)
+
+    def _replace(self, risks: Iterable[Any]) -> None:
+        self._reset()
+        for risk in risks:
+            if isinstance(risk, dict) and isinstance(risk.get("id"), str):
+                self._put(risk, rank=False)
+        scores = (
+            (risk_score(self._risks[risk_id]), p) for p, risk_id in enumerate(self._ids)
+        )
+        self._ranked = sorted((-score, p) for score, p in scores if score is not None)
+        self.synced_at = time.monotonic()
+
+    def _reset(self) -> None:
+        self._risks, self._position, self._ids, self._keys = {}, {}, [], {}
+        self._index = {field: {} for field in FIELDS}
+        self._cells, self._bands, self._ranked = {}, Counter(), []
+
+    # ── queries ──
+
+    def list_risks(
+        self,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        score_band: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> tuple:
+        """``list_risks`` from the indexes, optionally by score band."""
+        try:
+            start = decode_cursor(cursor, "list_risks")[0] if cursor else 0
+        except PaginationError as exc:
+            return {"error": str(exc)}, 400
+        wanted = [
+            (offset, value)
+            for offset, value in enumerate((status, category, score_band))
+            if value is not None
+        ]
+        with self._lock:
+            if wanted:
+                postings = min(
+                    (
+                        self._index[FIELDS[offset]].get(value, [])
+                        for offset, value in wanted
+                    ),
+                    key=len,
+                )
+                candidates: Iterable[int] = postings[bisect_left(postings, start) :]
+            else:
+                candidates = range(start, len(self._ids))
+            risks: List[Dict[str, Any]] = []
+            last = None
+            for position in candidates:
+                risk_id = self._ids[position]
+                keys = self._keys[risk_id]
+                if any(keys[offset] != value for offset, value in wanted):
+                    continue
+                if limit is not None and len(risks) == limit:
+                    break
+                risks.append(self._risks[risk_id])
+                last = position
+            else:
+                last = None
+        body: Dict[str, Any] = {"risks": risks}
+        if limit is not None:
+            body["next_cursor"] = None
+            if last is not None:
+                body["next_cursor"] = encode_cursor(
+                    "list_risks", last + 1, risks[-1]["id"]
+                )
+        return body, 200
+
+    def summary(
+        self,
+        top: int = DEFAULT_TOP,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Counts, exposure and the *top* highest-scored risks.
+
+        *status* and *category* narrow ``top_risks`` only; the aggregates
+        always cover the whole registry.
+        """
+        by_status: Dict[Any, List[float]] = {}
+        by_category: Dict[Any, Dict[str, Any]] = {}
+        total = [0, 0.0]
+        with self._lock:
+            for (cat, stat), (count, exposure) in self._cells.items():
+                for bucket in (by_status.setdefault(stat, [0, 0.0]), total):
+                    bucket[0] += count
+                    bucket[1] += exposure
+                entry = by_category.setdefault(
+                    cat, {"count": 0, "exposure": 0.0, "by_status": {}}
+                )
+                entry["count"] += count
+                entry["exposure"] += exposure
+                entry["by_status"][stat] = _aggregate(count, exposure)
+            bands = {name: self._bands.get(name, 0) for name in BAND_NAMES}
+            top_risks = []
+            for _, position in self._ranked:
+                if len(top_risks) >= top:
+                    break
+                risk_id = self._ids[position]
+                keys = self._keys[risk_id]
+                if (status is None or keys[0] == status) and (
+                    category is None or keys[1] == category
+                ):
+                    top_risks.append(self._risks[risk_id])
+        for entry in by_category.values():
+            entry["exposure"] = round(entry["exposure"], 4)
+        return {
+            "total": total[0],
+            "exposure": round(total[1], 4),
+            "by_status": {stat: _aggregate(*cell) for stat, cell in by_status.items()},
+            "by_category": by_category,
+            "by_score_band": bands,
+            "top_risks": top_risks,
+        }
+
+    def __len__(self) -> int:
+        return len(self._risks)
+
+
+def _aggregate(count: float, exposure: float) -> Dict[str, Any]:
+    return {"count": int(count), "exposure": round(exposure, 4)}
+
+
+def summarise_risks(
+    risks: Iterable[Any], top: int = DEFAULT_TOP, **filters: Any
+) -> Dict[str, Any]:
+    """:meth:`RiskRegistry.summary` over a ``list_risks`` result, without keeping it."""
+    registry = RiskRegistry(resync_interval=math.inf)
+    registry.load(risks)
+    return registry.summary(top, **filters)
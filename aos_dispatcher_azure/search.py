@@ -0,0 +1,1030 @@
+"""Inverted-index full-text search for the knowledge base.
+
+``search_documents`` in the dispatcher library scans the corpus linearly.
+:class:`SearchIndex` answers ``GET /api/knowledge/documents`` from an inverted
+index instead:
+
+- Documents are tokenised (lower-cased word characters, common English stop
+  words dropped; title terms count twice, tags are indexed as terms) and
+  ranked with BM25 (``k1=1.2``, ``b=0.75``).
+- ``doc_type`` is indexed as a facet term, so filtering by type and facet
+  counts (``facets=doc_type``) read a posting list instead of every document.
+- ``create_document``, ``update_document`` and ``delete_document`` update the
+  index incrementally: new versions go to an in-memory delta, replaced and
+  deleted documents are tombstoned.  The handlers only queue the change
+  (:meth:`SearchIndex.queue_update`, no lock taken on the event loop); the
+  queue is applied on the thread pool, by the next search or by the
+  background apply/flush task.
+
+Persistence (``AOS_SEARCH_INDEX_PATH``):
+    The index is flushed to a single segment file that is memory-mapped on
+    load.  Term lookups binary-search the sorted term table inside the
+    mapping and posting lists are read in place, so a cold start opens the
+    file instead of rebuilding the index.  A flush appends the delta to the
+    previous segment's postings (tombstones are kept as a deleted bitmap) and
+    atomically replaces the file; once more than 30% of the documents are
+    deleted the segment is compacted from the live documents instead.
+
+    Workers sharing the path (e.g. an Azure Files mount) serialise flushes
+    with a lock file.  A worker that finds a newer segment on disk (written
+    by another instance) loads it and re-applies its own unflushed changes.
+    Changes are flushed once ``AOS_SEARCH_FLUSH_THRESHOLD`` are buffered, or
+    ``AOS_SEARCH_FLUSH_INTERVAL`` seconds after the first of them, so other
+    workers see them within that interval plus ``AOS_SEARCH_RELOAD_INTERVAL``.
+
+Until the index holds the corpus — loaded from a segment, or bootstrapped from
+``dispatcher.search_documents`` — searches fall through to the library.  The
+bootstrap asks the library for ``AOS_SEARCH_BOOTSTRAP_LIMIT + 1`` documents;
+if it returns more than the limit the corpus is not fully listed, and the
+index is not used (retried every ``AOS_SEARCH_RESYNC_INTERVAL``).  Loading,
+bootstrapping and rebuilding run on the thread pool; a rebuilt index is
+swapped in under the lock once it is complete.
+
+Without a segment file each worker only sees its own writes, so an in-memory
+index is rebuilt from the library every ``AOS_SEARCH_RESYNC_INTERVAL``
+seconds, in the background; searches keep using the current index meanwhile,
+and writes made during the rebuild are applied on top of it.
+
+Configuration:
+    AOS_SEARCH_INDEX              Enable the index (default: true)
+    AOS_SEARCH_INDEX_PATH         Segment file; unset keeps the index in memory
+    AOS_SEARCH_FLUSH_THRESHOLD    Changes buffered before a flush (default: 1000)
+    AOS_SEARCH_FLUSH_INTERVAL     Seconds a change waits for a flush at most
+                                  (default: 5)
+    AOS_SEARCH_RELOAD_INTERVAL    Seconds between checks for a newer segment
+                                  on disk (default: 30)
+    AOS_SEARCH_BOOTSTRAP_LIMIT    Largest corpus bootstrapped from the
+                                  library into an index without a segment
+                                  (default: 100000)
+    AOS_SEARCH_RESYNC_INTERVAL    Seconds between rebuilds of an in-memory
+                                  index from the library (default: 300)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import env_bool, env_float, env_int
+from .filelock import file_lock
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+MAX_TF = 0xFFFF
+COMPACT_RATIO = 0.3
+TYPE_PREFIX = "\x00type:"
+DEFAULT_FLUSH_THRESHOLD = 1000
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_RESYNC_INTERVAL = 300.0
+DEFAULT_RELOAD_INTERVAL = 30.0
+DEFAULT_BOOTSTRAP_LIMIT = 100_000
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the "
+    "this to was were will with".split()
+)
+
+# (op, doc_id, document) of a write: "upsert" with the document, or "delete".
+_Op = Tuple[str, str, Optional[Dict[str, Any]]]
+
+#: ``fetch(limit)`` → library ``search_documents`` response listing up to
+#: *limit* documents of the corpus.
+CorpusFetcher = Callable[[int], Awaitable[tuple]]
+
+#: ``DispatcherExecutor.run``: ``run(endpoint, fn, *args)`` on the thread pool.
+Runner = Callable[..., Awaitable[Any]]
+
+# Index state replaced wholesale by a bootstrap or rebuild (see _adopt).
+_STATE = (
+    "_base",
+    "_n_base",
+    "_deleted",
+    "_types",
+    "_type_codes",
+    "_live",
+    "_total_len",
+    "_d_ids",
+    "_d_stored",
+    "_d_len",
+    "_d_type",
+    "_d_index",
+    "_d_postings",
+)
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lower-cased word tokens of *text* without stop words."""
+    if not isinstance(text, str):
+        return []
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def document_terms(doc: Dict[str, Any]) -> Counter:
+    """Term frequencies of a document (title weighted twice, tags included)."""
+    terms = Counter(tokenize(doc.get("content")))
+    for token in tokenize(doc.get("title")):
+        terms[token] += 2
+    tags = doc.get("tags")
+    if isinstance(tags, list):
+        for tag in tags:
+            terms.update(tokenize(tag))
+    return terms
+
+
+# ── Segment file format ─────────────────────────────────────────────────────
+#
+#   header     HEADER (fixed size, little-endian)
+#   doc_len    u32 × n_docs    indexed length of each document
+#   doc_type   u16 × n_docs    index into the type table
+#   deleted    u8  × n_docs    tombstones
+#   stored_off u64 × n_docs    stored JSON document (offset into blob)
+#   stored_len u32 × n_docs
+#   terms      TERM × n_terms  sorted by term bytes
+#   ids        ID × n_ids      live documents, sorted by id bytes
+#   types      TYPE × n_types
+#   postings   per term: u32 doc ids × df, then u16 term frequencies × df
+#   blob       term, id and type strings; stored documents
+
+MAGIC = b"AOSIDX01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQI4x" + "Q" * 11)
+TERM = struct.Struct("<QIIQ")  # term_off, term_len, df, postings_off
+ID = struct.Struct("<QII")  # id_off, id_len, doc
+TYPE = struct.Struct("<QI4x")  # type_off, type_len
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class Segment:
+    """A read-only, memory-mapped index segment."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.stat = os.stat(path)
+        view = memoryview(self._mmap)
+        fields = HEADER.unpack_from(self._mmap, 0)
+        magic, version, self.generation = fields[0], fields[1], fields[2]
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} search segment")
+        self.n_docs, self.n_live, self.total_len, self.n_terms, self.n_ids = fields[3:8]
+        n_types = fields[8]
+        (
+            doc_len,
+            doc_type,
+            deleted,
+            stored_off,
+            stored_len,
+            self._terms,
+            self._ids,
+            types,
+            self._postings,
+            self._blob,
+            self._blob_len,
+        ) = fields[9:]
+        n = self.n_docs
+        self.doc_len = view[doc_len : doc_len + 4 * n].cast("I")
+        self.doc_type = view[doc_type : doc_type + 2 * n].cast("H")
+        self.deleted = view[deleted : deleted + n]
+        self.stored_off = view[stored_off : stored_off + 8 * n].cast("Q")
+        self.stored_len = view[stored_len : stored_len + 4 * n].cast("I")
+        self.types = []
+        for index in range(n_types):
+            offset, length = TYPE.unpack_from(self._mmap, types + index * TYPE.size)
+            self.types.append(self._string(offset, length).decode("utf-8"))
+        self._view = view
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._blob + offset
+        return self._mmap[start : start + length]
+
+    def blob(self) -> memoryview:
+        return self._view[self._blob : self._blob + self._blob_len]
+
+    def _term_at(self, index: int) -> Tuple[bytes, int, int, int]:
+        term_off, term_len, df, postings_off = TERM.unpack_from(
+            self._mmap, self._terms + index * TERM.size
+        )
+        return self._string(term_off, term_len), df, postings_off, term_off
+
+    def find_term(self, term: str) -> Optional[Tuple[int, int]]:
+        """``(df, postings_off)`` of *term*, by binary search of the term table."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate, df, postings_off, _ = self._term_at(mid)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return df, postings_off
+        return None
+
+    def postings(self, term: str) -> Tuple[memoryview, memoryview]:
+        """Doc ids (u32) and term frequencies (u16) of *term*."""
+        found = self.find_term(term)
+        if found is None:
+            return memoryview(b"").cast("I"), memoryview(b"").cast("H")
+        df, offset = found
+        start = self._postings + offset
+        ids = self._view[start : start + 4 * df].cast("I")
+        tfs = self._view[start + 4 * df : start + 6 * df].cast("H")
+        return ids, tfs
+
+    def iter_terms(self) -> Iterator[Tuple[bytes, int, int, int]]:
+        """``(term, df, postings_off, term_off)`` in term order."""
+        for index in range(self.n_terms):
+            yield self._term_at(index)
+
+    def raw_postings(self, df: int, offset: int) -> Tuple[memoryview, memoryview]:
+        start = self._postings + offset
+        return (
+            self._view[start : start + 4 * df],
+            self._view[start + 4 * df : start + 6 * df],
+        )
+
+    def find_id(self, doc_id: str) -> Optional[int]:
+        key = doc_id.encode("utf-8")
+        lo, hi = 0, self.n_ids
+        while lo < hi:
+            mid = (lo + hi) // 2
+            id_off, id_len, doc = ID.unpack_from(self._mmap, self._ids + mid * ID.size)
+            candidate = self._string(id_off, id_len)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return doc
+        return None
+
+    def iter_ids(self) -> Iterator[Tuple[bytes, int, int]]:
+        """``(id, doc, id_off)`` in id order."""
+        for index in range(self.n_ids):
+            id_off, id_len, doc = ID.unpack_from(
+                self._mmap, self._ids + index * ID.size
+            )
+            yield self._string(id_off, id_len), doc, id_off
+
+    def stored(self, doc: int) -> Dict[str, Any]:
+        start = self._blob + self.stored_off[doc]
+        return json.loads(self._mmap[start : start + self.stored_len[doc]])
+
+    def close(self) -> None:
+        for name in (
+            "doc_len",
+            "doc_type",
+            "deleted",
+            "stored_off",
+            "stored_len",
+            "_view",
+        ):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A posting list from this segment is still referenced; the
+            # mapping is released when it is garbage-collected.
+            pass
+
+
+def read_generation(path: str) -> Optional[int]:
+    """Generation of the segment at *path* without mapping it."""
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size or header[:8] != MAGIC:
+        return None
+    return HEADER.unpack(header)[2]
+
+
+# ── Index ───────────────────────────────────────────────────────────────────
+
+
+class SearchIndex:
+    """BM25 index over a memory-mapped base segment plus an in-memory delta.
+
+    Documents have global integer ids: ``0 .. base.n_docs-1`` live in the
+    segment, higher ids in the delta.
+
+    Args:
+        path: Segment file.  Defaults to ``AOS_SEARCH_INDEX_PATH``; ``""``
+            keeps the index in memory only.
+        flush_threshold: Changes buffered before :meth:`should_flush` is true.
+            Defaults to ``AOS_SEARCH_FLUSH_THRESHOLD``.
+        reload_interval: Seconds between checks for a newer segment on disk.
+            Defaults to ``AOS_SEARCH_RELOAD_INTERVAL``.
+        flush_interval: Seconds after the first buffered change by which a
+            flush is started.  Defaults to ``AOS_SEARCH_FLUSH_INTERVAL``.
+        resync_interval: Seconds between rebuilds of an index without a
+            segment file.  Defaults to ``AOS_SEARCH_RESYNC_INTERVAL``.
+        bootstrap_limit: Largest corpus bootstrapped from the library.
+            Defaults to ``AOS_SEARCH_BOOTSTRAP_LIMIT``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_threshold: Optional[int] = None,
+        reload_interval: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        resync_interval: Optional[float] = None,
+        bootstrap_limit: Optional[int] = None,
+    ) -> None:
+        self.enabled = env_bool("AOS_SEARCH_INDEX", True)
+        if path is None:
+            path = os.environ.get("AOS_SEARCH_INDEX_PATH")
+        self.path = path or None
+        self.flush_threshold = flush_threshold or env_int(
+            "AOS_SEARCH_FLUSH_THRESHOLD", DEFAULT_FLUSH_THRESHOLD
+        )
+        self.reload_interval = reload_interval or env_float(
+            "AOS_SEARCH_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL
+        )
+        self.flush_interval = flush_interval or env_float(
+            "AOS_SEARCH_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL
+        )
+        self.resync_interval = resync_interval or env_float(
+            "AOS_SEARCH_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL
+        )
+        self.bootstrap_limit = bootstrap_limit or env_int(
+            "AOS_SEARCH_BOOTSTRAP_LIMIT", DEFAULT_BOOTSTRAP_LIMIT
+        )
+        self.complete = False
+        self._lock = threading.RLock()
+        self._ready_lock = asyncio.Lock()
+        self._loaded = False
+        self._checked_at = 0.0
+        self._bootstrap_at: Optional[float] = None
+        self._oversized = False  # the library listed more than bootstrap_limit
+        self._ops: List[_Op] = []
+        # (op, doc_id, changes) queued by the event loop; appended without
+        # the lock and applied under it on the thread pool.
+        self._incoming: "deque[Tuple[str, str, tuple]]" = deque()
+        self._pending_since = 0.0  # monotonic time of the oldest unflushed change
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        self._synced_at: Optional[float] = None
+        self._resync_ops: Optional[List[_Op]] = None  # writes made during a rebuild
+        self._resync_task: Optional[asyncio.Task] = None
+        self._reset(None)
+
+    # ── state ──
+
+    def _reset(self, base: Optional[Segment]) -> None:
+        self._base = base
+        self._n_base = base.n_docs if base else 0
+        self._deleted = bytearray(base.deleted) if base else bytearray()
+        self._types: List[str] = list(base.types) if base else []
+        self._type_codes = {name: code for code, name in enumerate(self._types)}
+        self._live = base.n_live if base else 0
+        self._total_len = base.total_len if base else 0
+        self._d_ids: List[str] = []
+        self._d_stored: List[Dict[str, Any]] = []
+        self._d_len = array("I")
+        self._d_type = array("H")
+        self._d_index: Dict[str, int] = {}
+        self._d_postings: Dict[str, Tuple[array, array]] = {}
+
+    @property
+    def generation(self) -> int:
+        return self._base.generation if self._base else 0
+
+    @property
+    def size(self) -> int:
+        """Number of live documents."""
+        return self._live
+
+    @property
+    def pending(self) -> int:
+        """Changes not yet applied, or not yet flushed to the segment."""
+        return len(self._ops) + len(self._incoming)
+
+    def should_flush(self) -> bool:
+        return self.path is not None and self.pending >= self.flush_threshold
+
+    def needs_resync(self) -> bool:
+        """Whether an in-memory index is due for a rebuild from the library."""
+        return (
+            self.path is None
+            and self._synced_at is not None
+            and time.monotonic() - self._synced_at > self.resync_interval
+        )
+
+    def _type_code(self, doc_type: Any) -> int:
+        name = doc_type if isinstance(doc_type, str) else ""
+        code = self._type_codes.get(name)
+        if code is None:
+            code = self._type_codes[name] = len(self._types)
+            self._types.append(name)
+        return code
+
+    def _doc_len(self, doc: int) -> int:
+        if doc < self._n_base:
+            return self._base.doc_len[doc]
+        return self._d_len[doc - self._n_base]
+
+    def _doc_type(self, doc: int) -> int:
+        if doc < self._n_base:
+            return self._base.doc_type[doc]
+        return self._d_type[doc - self._n_base]
+
+    def _lookup(self, doc_id: str) -> Optional[int]:
+        doc = self._d_index.get(doc_id)
+        if doc is None and self._base is not None:
+            doc = self._base.find_id(doc_id)
+        if doc is None or self._deleted[doc]:
+            return None
+        return doc
+
+    def stored(self, doc: int) -> Dict[str, Any]:
+        if doc < self._n_base:
+            return self._base.stored(doc)
+        return self._d_stored[doc - self._n_base]
+
+    # ── writes ──
+
+    def queue_update(self, doc_id: str, *changes: Optional[Dict[str, Any]]) -> None:
+        """Queue :meth:`update`; safe on the event loop (takes no lock)."""
+        self._queue("update", doc_id, changes)
+
+    def queue_delete(self, doc_id: str) -> None:
+        """Queue :meth:`delete`; safe on the event loop (takes no lock)."""
+        self._queue("delete", doc_id, ())
+
+    def _queue(self, op: str, doc_id: str, changes: tuple) -> None:
+        if not self.pending:
+            self._pending_since = time.monotonic()
+        self._incoming.append((op, doc_id, changes))
+
+    def apply_queued(self) -> int:
+        """Apply queued writes; returns how many.  Blocking (takes the lock)."""
+        with self._lock:
+            return self._apply_incoming()
+
+    def _apply_incoming(self) -> int:
+        count = 0
+        while True:
+            try:
+                op, doc_id, changes = self._incoming.popleft()
+            except IndexError:
+                return count
+            if op == "delete":
+                self.delete(doc_id)
+            else:
+                self.update(doc_id, *changes)
+            count += 1
+
+    def upsert(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        """Index (or re-index) *doc* under *doc_id*."""
+        with self._lock:
+            self._log("upsert", doc_id, doc)
+            self._upsert(doc_id, doc)
+
+    def update(self, doc_id: str, *changes: Optional[Dict[str, Any]]) -> None:
+        """Merge *changes* into the stored document and re-index it."""
+        with self._lock:
+            current = self._lookup(doc_id)
+            doc = dict(self.stored(current)) if current is not None else {"id": doc_id}
+            for change in changes:
+                if isinstance(change, dict):
+                    doc.update(change)
+            self.upsert(doc_id, doc)
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock:
+            self._log("delete", doc_id, None)
+            self._delete(doc_id)
+
+    def _log(self, op: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+        # Unflushed changes, re-applied on top of a newer segment from disk.
+        if self.path:
+            if not self.pending:
+                self._pending_since = time.monotonic()
+            self._ops.append((op, doc_id, doc))
+        # Writes racing a rebuild, re-applied on top of the rebuilt index.
+        if self._resync_ops is not None:
+            self._resync_ops.append((op, doc_id, doc))
+
+    def _delete(self, doc_id: str) -> None:
+        doc = self._lookup(doc_id)
+        if doc is None:
+            return
+        self._deleted[doc] = 1
+        self._live -= 1
+        self._total_len -= self._doc_len(doc)
+        self._d_index.pop(doc_id, None)
+
+    def _upsert(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        self._delete(doc_id)
+        stored = dict(doc, id=doc_id)
+        terms = document_terms(stored)
+        length = sum(terms.values())
+        code = self._type_code(stored.get("doc_type"))
+        terms[TYPE_PREFIX + self._types[code]] = 1
+        number = self._n_base + len(self._d_ids)
+        self._d_ids.append(doc_id)
+        self._d_stored.append(stored)
+        self._d_len.append(length)
+        self._d_type.append(code)
+        self._d_index[doc_id] = number
+        self._deleted.append(0)
+        self._live += 1
+        self._total_len += length
+        postings = self._d_postings
+        for term, tf in terms.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("H"))
+            entry[0].append(number)
+            entry[1].append(min(tf, MAX_TF))
+
+    # ── reads ──
+
+    def _postings(self, term: str) -> List[Tuple[Any, Any, Any, Any, int]]:
+        """``(ids, tfs, doc_len, doc_type, first_doc)`` for the segment and delta."""
+        lists = []
+        if self._base is not None:
+            ids, tfs = self._base.postings(term)
+            if len(ids):
+                lists.append((ids, tfs, self._base.doc_len, self._base.doc_type, 0))
+        entry = self._d_postings.get(term)
+        if entry is not None:
+            lists.append((entry[0], entry[1], self._d_len, self._d_type, self._n_base))
+        return lists
+
+    def search(
+        self,
+        query: str = "",
+        doc_type: Optional[str] = None,
+        limit: int = 10,
+        facets: bool = False,
+    ) -> Dict[str, Any]:
+        """BM25-ranked documents matching *query* (all terms optional).
+
+        An empty query lists the documents of *doc_type* (most recent first).
+        """
+        with self._lock:
+            self._maybe_reload()
+            self._apply_incoming()
+            type_code = self._type_codes.get(doc_type) if doc_type else None
+            if doc_type and type_code is None:
+                return {
+                    "documents": [],
+                    **({"facets": {"doc_type": {}}} if facets else {}),
+                }
+            terms = list(dict.fromkeys(tokenize(query)))
+            scores = (
+                self._score(terms, type_code) if terms else self._list_type(type_code)
+            )
+            top = heapq.nlargest(
+                limit, scores.items(), key=lambda item: (item[1], item[0])
+            )
+            documents = [
+                dict(self.stored(doc), score=round(score, 6)) for doc, score in top
+            ]
+            body: Dict[str, Any] = {"documents": documents}
+            if facets:
+                counts: Counter = Counter(
+                    self._types[self._doc_type(doc)] for doc in scores
+                )
+                counts.pop("", None)  # documents without a doc_type
+                body["facets"] = {"doc_type": dict(counts.most_common())}
+            return body
+
+    def _score(self, terms: List[str], type_code: Optional[int]) -> Dict[int, float]:
+        n = max(self._live, 1)
+        avgdl = self._total_len / n or 1.0
+        # BM25 length normalisation:
+        # K1 * (1 - B + B * dl / avgdl) = fixed + per_len * dl
+        fixed, per_len = K1 * (1 - B), K1 * B / avgdl
+        deleted = self._deleted
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for term in terms:
+            lists = self._postings(term)
+            df = sum(len(entry[0]) for entry in lists)
+            if not df:
+                continue
+            weight = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (K1 + 1)
+            for ids, tfs, lengths, types, first in lists:
+                for doc, tf in zip(ids, tfs):
+                    if deleted[doc]:
+                        continue
+                    local = doc - first
+                    if type_code is not None and types[local] != type_code:
+                        continue
+                    norm = fixed + per_len * lengths[local]
+                    scores[doc] = get(doc, 0.0) + weight * tf / (tf + norm)
+        return scores
+
+    def _list_type(self, type_code: Optional[int]) -> Dict[int, float]:
+        deleted = self._deleted
+        if type_code is None:
+            return {doc: 0.0 for doc in range(len(deleted)) if not deleted[doc]}
+        docs: Dict[int, float] = {}
+        for ids, *_ in self._postings(TYPE_PREFIX + self._types[type_code]):
+            for doc in ids:
+                if not deleted[doc]:
+                    docs[doc] = 0.0
+        return docs
+
+    # ── loading and persistence ──
+
+    def load(self) -> bool:
+        """Open the segment at :attr:`path`; returns ``True`` if one was loaded."""
+        with self._lock:
+            self._loaded = True
+            if not self.path or not os.path.exists(self.path):
+                return False
+            self._open_segment()
+            self.complete = True
+            return True
+
+    def _open_segment(self) -> None:
+        segment = Segment(self.path)
+        old = self._base
+        ops, pending_since = self._ops, self._pending_since
+        self._reset(segment)
+        self._ops = []
+        # Re-apply changes this worker has not flushed yet.
+        self._replay(ops)
+        self._pending_since = pending_since
+        if old is not None:
+            old.close()
+        self._checked_at = time.monotonic()
+
+    def _replay(self, ops: List[_Op]) -> None:
+        for op, doc_id, doc in ops:
+            if op == "upsert" and doc is not None:
+                self.upsert(doc_id, doc)
+            else:
+                self.delete(doc_id)
+
+    def _maybe_reload(self) -> None:
+        if not self.path or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        generation = read_generation(self.path)
+        if generation is not None and generation != self.generation:
+            logger.info(
+                "Loading search segment generation %d from %s", generation, self.path
+            )
+            self._open_segment()
+            self.complete = True
+
+    def bootstrap(self, documents: List[Any]) -> int:
+        """Index *documents* from the library; marks the index complete if any.
+
+        Replaces the current contents.  Blocking; the new index is built
+        before the lock is taken.
+        """
+        self._begin_sync()
+        return self._finish_sync(documents)
+
+    async def ensure_ready(self, fetch: CorpusFetcher, run: Runner) -> bool:
+        """Load the segment or bootstrap from the library; ``True`` if usable.
+
+        *run* is ``DispatcherExecutor.run``; loading and indexing happen on
+        the thread pool.  An empty bootstrap is retried at most every
+        ``reload_interval``.
+        """
+        if not self.enabled:
+            return False
+        if self.complete:
+            resyncing = self._resync_task is not None and not self._resync_task.done()
+            if self.needs_resync() and not resyncing:
+                self._resync_task = asyncio.get_running_loop().create_task(
+                    self._sync(fetch, run)
+                )
+            return True
+        async with self._ready_lock:
+            if not self._loaded and await run("search_index_load", self.load):
+                return True
+            if self.complete:
+                return True
+            now = time.monotonic()
+            retry = self.resync_interval if self._oversized else self.reload_interval
+            if self._bootstrap_at is not None and now - self._bootstrap_at < retry:
+                return False
+            self._bootstrap_at = now
+            await self._sync(fetch, run)
+            self.schedule_apply(run)  # persist the bootstrap to the segment file
+            return self.complete
+
+    async def _sync(self, fetch: CorpusFetcher, run: Runner) -> None:
+        """(Re)build the index from the library, keeping writes made meanwhile."""
+        await run("search_index_sync", self._begin_sync)
+        documents = await self._fetch_corpus(fetch)
+        await run("search_index_sync", self._finish_sync, documents)
+
+    async def _fetch_corpus(self, fetch: CorpusFetcher) -> Optional[List[Any]]:
+        try:
+            body, status_code = await fetch(self.bootstrap_limit + 1)
+        except Exception:  # noqa: BLE001 — searches fall back to the library
+            logger.exception("Search index bootstrap failed")
+            return None
+        if status_code >= 400 or not isinstance(body, dict):
+            return None
+        documents = body.get("documents") or []
+        self._oversized = len(documents) > self.bootstrap_limit
+        if self._oversized:
+            logger.warning(
+                "The library listed more than %d documents; the search index "
+                "is not used until AOS_SEARCH_BOOTSTRAP_LIMIT covers the corpus",
+                self.bootstrap_limit,
+            )
+            return None
+        return documents
+
+    def _begin_sync(self) -> None:
+        with self._lock:
+            # Writes applied from now on are replayed over the new index.
+            self._resync_ops = []
+
+    def _finish_sync(self, documents: Optional[List[Any]]) -> int:
+        if documents is None:
+            with self._lock:
+                # Keep serving the current index; try again after the interval.
+                self._resync_ops = None
+                self._synced_at = time.monotonic()
+            return 0
+        fresh = SearchIndex(path="")
+        for doc in documents:
+            if isinstance(doc, dict) and doc.get("id"):
+                stored = {k: v for k, v in doc.items() if k != "score"}
+                fresh._upsert(doc["id"], stored)
+        count = len(fresh._d_ids)
+        with self._lock:
+            ops, self._resync_ops = self._resync_ops or [], None
+            if not count:
+                # An empty listing replaces nothing; writes made meanwhile
+                # are already applied to the current index.
+                self._synced_at = time.monotonic()
+                return 0
+            old = self._base
+            self._adopt(fresh)
+            if old is not None:
+                old.close()
+            if self.path:
+                if not self.pending:
+                    self._pending_since = time.monotonic()
+                self._ops += [
+                    ("upsert", doc_id, stored)
+                    for doc_id, stored in zip(fresh._d_ids, fresh._d_stored)
+                ]
+            self._replay(ops)
+            self.complete = True
+            self._synced_at = time.monotonic()
+            return count
+
+    def _adopt(self, other: "SearchIndex") -> None:
+        for name in _STATE:
+            setattr(self, name, getattr(other, name))
+
+    def flush(self) -> bool:
+        """Write base + delta to :attr:`path`; returns ``True`` if written.
+
+        Applies queued writes first.  Blocking; run it through
+        ``DispatcherExecutor.run``.
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            self._apply_incoming()
+            if not self._ops:
+                return False
+            with file_lock(self.path):
+                on_disk = read_generation(self.path)
+                if on_disk is not None and on_disk != self.generation:
+                    self._open_segment()
+                generation = max(on_disk or 0, self.generation) + 1
+                n_docs = len(self._deleted)
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                if n_docs and (n_docs - self._live) / n_docs > COMPACT_RATIO:
+                    self._write_compacted(tmp, generation)
+                else:
+                    self._write(tmp, generation)
+                os.replace(tmp, self.path)
+                self._ops = []
+                self._open_segment()
+            self.complete = True
+            return True
+
+    def schedule_apply(self, run: Runner) -> None:
+        """Start a background task applying queued writes through *run*.
+
+        *run* is ``DispatcherExecutor.run``.  An in-memory index applies them
+        at once; with a segment file they are applied and flushed when enough
+        changes are buffered, else ``flush_interval`` seconds after the oldest
+        of them.  At most one task is pending or in flight.
+        """
+        if not self.pending or not (self.path or self._incoming):
+            return
+        if self.should_flush():
+            self._flush_now.set()
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._apply_via(run))
+
+    async def _apply_via(self, run: Runner) -> None:
+        while True:
+            delay = self._pending_since + self.flush_interval - time.monotonic()
+            if self.path and delay > 0 and not self._flush_now.is_set():
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._flush_now.clear()
+            try:
+                if self.path:
+                    await run("search_index_flush", self.flush)
+                else:
+                    await run("search_index_apply", self.apply_queued)
+            except Exception:  # noqa: BLE001 — retried after the next write
+                logger.exception("Search index flush to %s failed", self.path)
+                return
+            if not self._incoming:
+                return
+
+    def _write_compacted(self, tmp: str, generation: int) -> None:
+        live = SearchIndex(path="")
+        for doc in range(len(self._deleted)):
+            if not self._deleted[doc]:
+                stored = self.stored(doc)
+                live._upsert(stored["id"], stored)
+        live._write(tmp, generation)
+
+    def _write(self, tmp: str, generation: int) -> None:
+        base = self._base
+        n_base = self._n_base
+        n_docs = n_base + len(self._d_ids)
+        blob = bytearray(base.blob()) if base else bytearray()
+
+        def put(data: bytes) -> int:
+            offset = len(blob)
+            blob.extend(data)
+            return offset
+
+        doc_len = array("I", base.doc_len if base else b"") + self._d_len
+        doc_type = array("H", base.doc_type if base else b"") + self._d_type
+        stored_off = array("Q", base.stored_off if base else b"")
+        stored_len = array("I", base.stored_len if base else b"")
+        for stored in self._d_stored:
+            encoded = json.dumps(stored, separators=(",", ":")).encode("utf-8")
+            stored_off.append(put(encoded))
+            stored_len.append(len(encoded))
+
+        # Terms: merge the base term table with the delta's terms.
+        delta_terms = sorted((term.encode("utf-8"), term) for term in self._d_postings)
+        base_terms = base.iter_terms() if base else iter(())
+        term_table = bytearray()
+        postings = bytearray()
+        next_base = next(base_terms, None)
+        index = 0
+        while next_base is not None or index < len(delta_terms):
+            take_base = next_base is not None and (
+                index >= len(delta_terms) or next_base[0] <= delta_terms[index][0]
+            )
+            ids_parts: List[bytes] = []
+            tfs_parts: List[bytes] = []
+            df = 0
+            if take_base:
+                term_bytes, base_df, base_off, term_off = next_base
+                ids, tfs = base.raw_postings(base_df, base_off)
+                ids_parts.append(ids)
+                tfs_parts.append(tfs)
+                df += base_df
+                next_base = next(base_terms, None)
+                if index < len(delta_terms) and delta_terms[index][0] == term_bytes:
+                    term = delta_terms[index][1]
+                    index += 1
+                else:
+                    term = None
+            else:
+                term_bytes, term = delta_terms[index]
+                term_off = put(term_bytes)
+                index += 1
+            if term is not None:
+                d_ids, d_tfs = self._d_postings[term]
+                ids_parts.append(d_ids.tobytes())
+                tfs_parts.append(d_tfs.tobytes())
+                df += len(d_ids)
+            term_table += TERM.pack(term_off, len(term_bytes), df, len(postings))
+            for part in ids_parts:
+                postings += part
+            for part in tfs_parts:
+                postings += part
+        n_terms = len(term_table) // TERM.size
+
+        # Ids: live documents only, sorted for binary search.
+        entries: List[Tuple[bytes, int, int]] = []
+        if base:
+            entries.extend(
+                (key, doc, off)
+                for key, doc, off in base.iter_ids()
+                if not self._deleted[doc]
+            )
+        for doc_id, number in self._d_index.items():
+            if not self._deleted[number]:
+                key = doc_id.encode("utf-8")
+                entries.append((key, number, put(key)))
+        entries.sort()
+        id_table = bytearray()
+        for key, doc, offset in entries:
+            id_table += ID.pack(offset, len(key), doc)
+
+        type_table = bytearray()
+        for name in self._types:
+            encoded = name.encode("utf-8")
+            type_table += TYPE.pack(put(encoded), len(encoded))
+
+        sections = [
+            doc_len.tobytes(),
+            doc_type.tobytes(),
+            bytes(self._deleted),
+            stored_off.tobytes(),
+            stored_len.tobytes(),
+            bytes(term_table),
+            bytes(id_table),
+            bytes(type_table),
+            bytes(postings),
+        ]
+        offsets = []
+        position = HEADER.size
+        for section in sections:
+            position = _align(position)
+            offsets.append(position)
+            position += len(section)
+        blob_off = _align(position)
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            generation,
+            n_docs,
+            self._live,
+            self._total_len,
+            n_terms,
+            len(entries),
+            len(self._types),
+            *offsets,
+            blob_off,
+            len(blob),
+        )
+        with open(tmp, "wb") as handle:
+            handle.write(header)
+            for offset, section in zip(offsets, sections):
+                handle.write(b"\0" * (offset - handle.tell()))
+                handle.write(section)
+            handle.write(b"\0" * (blob_off - handle.tell()))
+            handle.write(blob)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "complete": self.complete,
+            "documents": self._live,
+            "segment_documents": self._n_base,
+            "delta_documents": len(self._d_ids),
+            "pending_changes": len(self._ops),
+            "synced_age_s": (
+                round(time.monotonic() - self._synced_at, 1)
+                if self._synced_at
+                else None
+            ),
+            "generation": self.generation,
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._base is not None:
+                self._base.close()
+                self._base = None
@@ -0,0 +1,218 @@
+"""Batch processing for the ``aos-orchestration-requests`` Service Bus trigger.
+
+The trigger receives messages in batches (``cardinality=MANY``).
+:class:`OrchestrationBatchProcessor` parses every envelope up front, then
+processes the valid ones concurrently with a per-batch cap.  Each message is
+settled on its own, so a single poison message never fails the batch:
+
+    complete     handler returned a 2xx/3xx status
+    abandon      handler raised or returned a 5xx status (transient — the
+                 message is redelivered until the queue's max delivery count)
+    deadletter   the envelope is not valid JSON / not an object, or the
+                 handler returned a 4xx status (permanent — retrying won't help)
+
+Configuration:
+    AOS_SERVICE_BUS_BATCH_CONCURRENCY   Max messages processed concurrently
+                                        within one batch (default: 16)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Sequence
+
+from .config import env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_CONCURRENCY = 16
+
+#: ``handler(app_name, payload)`` → ``(body, status_code)`` library response.
+OrchestrationHandler = Callable[[str, Dict[str, Any]], Awaitable[tuple]]
+
+
+class MessageSettler(Protocol):
+    """The settlement subset of ``ServiceBusMessageActions``."""
+
+    def complete(self, message: Any) -> None: ...
+
+    def abandon(self, message: Any) -> None: ...
+
+    def deadletter(
+        self,
+        message: Any,
+        deadletter_reason: Optional[str] = None,
+        deadletter_error_description: Optional[str] = None,
+    ) -> None: ...
+
+
+@dataclass
+class OrchestrationEnvelope:
+    """A parsed ``{"app_name": ..., "payload": {...}}`` message."""
+
+    message: Any
+    app_name: str
+    payload: Dict[str, Any]
+
+
+@dataclass
+class BatchResult:
+    """Settlement counts for one batch."""
+
+    completed: int = 0
+    abandoned: int = 0
+    dead_lettered: int = 0
+    responses: List[Optional[tuple]] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return self.completed + self.abandoned + self.dead_lettered
+
+
+def message_body(message: Any) -> bytes:
+    """Return the body of a Service Bus message as bytes.
+
+    Accepts ``func.ServiceBusMessage`` (``get_body()``), the SDK-type
+    ``ServiceBusReceivedMessage`` (``body`` is an iterable of sections) and
+    raw ``bytes``.
+    """
+    if isinstance(message, (bytes, bytearray)):
+        return bytes(message)
+    get_body = getattr(message, "get_body", None)
+    if callable(get_body):
+        return get_body()
+    body = getattr(message, "body", b"")
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return b"".join(bytes(section) for section in body)
+
+
+def parse_envelope(message: Any) -> OrchestrationEnvelope:
+    """Parse an orchestration request envelope.
+
+    Raises:
+        ValueError: The body is not UTF-8 JSON or not a JSON object.
+    """
+    raw = message_body(message)
+    try:
+        envelope = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError(f"Invalid JSON in Service Bus message: {raw[:200]!r}") from exc
+    if not isinstance(envelope, dict):
+        raise ValueError("Service Bus message envelope must be a JSON object")
+    payload = envelope.get("payload", {})
+    if not isinstance(payload, dict):
+        raise ValueError("Service Bus message 'payload' must be a JSON object")
+    return OrchestrationEnvelope(
+        message=message,
+        app_name=envelope.get("app_name", "unknown"),
+        payload=payload,
+    )
+
+
+class OrchestrationBatchProcessor:
+    """Process a batch of orchestration request messages concurrently.
+
+    Args:
+        handler: Coroutine that processes one request and returns the library
+            ``(body, status_code)`` response.
+        concurrency: Max messages in flight per batch.  Defaults to
+            ``AOS_SERVICE_BUS_BATCH_CONCURRENCY``.
+    """
+
+    def __init__(
+        self, handler: OrchestrationHandler, concurrency: Optional[int] = None
+    ) -> None:
+        self.handler = handler
+        self.concurrency = concurrency or env_int(
+            "AOS_SERVICE_BUS_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY
+        )
+
+    async def process(
+        self, messages: Sequence[Any], settler: MessageSettler
+    ) -> BatchResult:
+        """Parse, process and settle every message in *messages*."""
+        result = BatchResult(responses=[None] * len(messages))
+        envelopes: List[tuple] = []
+        for index, message in enumerate(messages):
+            try:
+                envelopes.append((index, parse_envelope(message)))
+            except ValueError as exc:
+                logger.error("%s", exc)
+                await self._settle(
+                    settler.deadletter, message, "InvalidEnvelope", str(exc)
+                )
+                result.dead_lettered += 1
+
+        gate = asyncio.Semaphore(self.concurrency)
+
+        async def run(index: int, envelope: OrchestrationEnvelope) -> None:
+            async with gate:
+                outcome = await self._process_one(envelope, settler)
+            result.responses[index] = outcome[1]
+            if outcome[0] == "completed":
+                result.completed += 1
+            elif outcome[0] == "abandoned":
+                result.abandoned += 1
+            else:
+                result.dead_lettered += 1
+
+        await asyncio.gather(*(run(index, envelope) for index, envelope in envelopes))
+        logger.info(
+            "Processed Service Bus batch of %d: %d completed, %d abandoned, "
+            "%d dead-lettered",
+            len(messages),
+            result.completed,
+            result.abandoned,
+            result.dead_lettered,
+        )
+        return result
+
+    async def _process_one(
+        self, envelope: OrchestrationEnvelope, settler: MessageSettler
+    ) -> tuple:
+        logger.info(
+            "Received orchestration request via Service Bus from app '%s'",
+            envelope.app_name,
+        )
+        try:
+            response = await self.handler(envelope.app_name, envelope.payload)
+        except Exception:  # noqa: BLE001 — one failure must not fail the batch
+            logger.exception(
+                "Orchestration request from app '%s' failed; abandoning message",
+                envelope.app_name,
+            )
+            await self._settle(settler.abandon, envelope.message)
+            return "abandoned", None
+
+        status_code = response[1] if isinstance(response, tuple) else 200
+        if status_code >= 500:
+            await self._settle(settler.abandon, envelope.message)
+            return "abandoned", response
+        if status_code >= 400:
+            body = response[0] if isinstance(response, tuple) else None
+            error = body.get("error", "") if isinstance(body, dict) else ""
+            await self._settle(
+                settler.deadletter,
+                envelope.message,
+                f"Rejected{status_code}",
+                str(error),
+            )
+            return "dead_lettered", response
+        await self._settle(settler.complete, envelope.message)
+        return "completed", response
+
+    @staticmethod
+    async def _settle(action: Callable[..., None], message: Any, *args: Any) -> None:
+        # Settlement is a blocking gRPC call to the Functions host.
+        try:
+            await asyncio.to_thread(action, message, *args)
+        except (
+            Exception
+        ):  # noqa: BLE001 — the lock expires and the message is redelivered
+            logger.exception("Failed to settle Service Bus message")
@@ -0,0 +1,103 @@
+"""One shutdown hook for everything that must be flushed before the worker exits.
+
+Several components buffer work in memory (write-behind ingest buffers, the
+result publisher) and must flush it at interpreter exit and on ``SIGTERM``
+(scale-in).  They register with :func:`on_shutdown`; this module installs a
+single ``atexit`` callback and a single ``SIGTERM`` handler that run every
+hook in registration order and then hand the signal to the handler that was
+there before.
+
+A hook is called with no arguments and flushes synchronously, returning
+``None``.  When it cannot block because the signal arrived on the event loop
+thread it needs (see :func:`~aos_dispatcher_azure.results.close_on_exit`), it
+returns an awaitable instead; the handler runs those on the current loop and
+hands the signal on once they are done.  The ``SIGTERM`` handler is only
+installed from the main thread; elsewhere flushing relies on exit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import os
+import signal
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+#: ``hook()`` → ``None`` once flushed, or an awaitable to run on the event loop.
+ShutdownHook = Callable[[], Optional[Awaitable[Any]]]
+
+_hooks: List[ShutdownHook] = []
+_installed = False
+
+
+def on_shutdown(hook: ShutdownHook) -> None:
+    """Run *hook* at interpreter exit and on ``SIGTERM``."""
+    _hooks.append(hook)
+    _install()
+
+
+def _install() -> None:
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    atexit.register(_run_at_exit)
+    try:
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def on_sigterm(signum: int, frame: Any) -> None:
+            _run_on_sigterm(lambda: _hand_on(previous, signum, frame))
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+    except ValueError:  # not the main thread
+        logger.debug("SIGTERM shutdown hook not installed (not on the main thread)")
+
+
+def _run_hooks() -> List[Awaitable[Any]]:
+    awaitables = []
+    for hook in list(_hooks):
+        try:
+            result = hook()
+        except Exception:  # noqa: BLE001 — shutting down; the other hooks still run
+            logger.exception("Shutdown hook %r failed", hook)
+            continue
+        if result is not None:
+            awaitables.append(result)
+    return awaitables
+
+
+def _run_at_exit() -> None:
+    for awaitable in _run_hooks():
+        # No loop is running at exit, so hooks flush synchronously.
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+
+
+def _run_on_sigterm(hand_on: Callable[[], None]) -> None:
+    awaitables = _run_hooks()
+    if not awaitables:
+        hand_on()
+        return
+
+    async def finish() -> None:
+        for result in await asyncio.gather(*awaitables, return_exceptions=True):
+            if isinstance(result, BaseException):
+                logger.error("Shutdown hook failed: %r", result)
+
+    def done(_: asyncio.Task) -> None:
+        hand_on()
+
+    asyncio.get_running_loop().create_task(finish()).add_done_callback(done)
+
+
+def _hand_on(previous: Any, signum: int, frame: Any) -> None:
+    if previous is signal.SIG_IGN:
+        return
+    if callable(previous):
+        previous(signum, frame)
+        return
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
@@ -0,0 +1,202 @@
+"""Cold-start support: deferred dispatcher import and warm-up.
+
+Importing ``aos_dispatcher.dispatcher`` pulls in the Foundry and Azure SDKs
+and builds the library's clients, and the Functions host cannot serve any
+request (not even ``GET /api/health``) until ``function_app`` has been
+imported.  :class:`LazyModule` stands in for the dispatcher module and imports
+it on first attribute access, so indexing the functions only pays for the
+wrapper itself.
+
+:class:`WarmUp` pays the deferred cost ahead of traffic.  It runs a list of
+named steps at most once each:
+
+- *Loop-independent* steps (the dispatcher import, the library's own
+  ``warmup()``) may run on a background thread as soon as the worker loads
+  ``function_app`` (``AOS_WARMUP_ON_LOAD``).
+- *Loop-bound* steps (HTTP sessions, Service Bus clients, credential tokens)
+  belong to the worker's event loop and only run from :meth:`WarmUp.run` —
+  the Functions warm-up trigger, or the first health probe.
+
+A failing step is logged and recorded; it never fails the worker, and the
+same work is simply done again on first use.
+
+Configuration:
+    AOS_LAZY_DISPATCHER   Defer the dispatcher import to first use (default: true)
+    AOS_WARMUP            Warm up from the warm-up trigger and the first health
+                          probe (default: true)
+    AOS_WARMUP_ON_LOAD    Start loop-independent warm-up steps on a background
+                          thread when ``function_app`` is imported (default: false)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import env_bool
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Proxy for module *name* that imports it on first attribute access.
+
+    The import runs once, under a lock, on whichever thread touches the
+    proxy first.  Call :meth:`load` to import it ahead of time.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        """Import the module (once) and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self.load_seconds = time.perf_counter() - started
+                    self._module = module
+                    logger.info(
+                        "Imported %s in %.0f ms", self._name, self.load_seconds * 1000
+                    )
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+@dataclass
+class _Step:
+    name: str
+    fn: Callable[[], Any]
+    loop_bound: bool
+    lock: threading.Lock
+    status: str = "pending"
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+class WarmUp:
+    """Named warm-up steps, each run at most once per worker."""
+
+    def __init__(self) -> None:
+        self.enabled = env_bool("AOS_WARMUP", True)
+        self.on_load = env_bool("AOS_WARMUP_ON_LOAD", False)
+        self._steps: List[_Step] = []
+        self._task: Optional[asyncio.Future] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, fn: Callable[[], Any], loop_bound: bool = False) -> None:
+        """Register step *name*.
+
+        Args:
+            fn: Zero-argument callable.  Loop-bound steps return an awaitable;
+                the others are plain blocking functions.
+            loop_bound: The step creates objects tied to the event loop.
+        """
+        self._steps.append(_Step(name, fn, loop_bound, threading.Lock()))
+
+    def start_background(self) -> None:
+        """Run the loop-independent steps on a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def run() -> None:
+            for step in self._steps:
+                if not step.loop_bound:
+                    self._run_blocking(step)
+
+        self._thread = threading.Thread(target=run, name="aos-warmup", daemon=True)
+        self._thread.start()
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every step that has not run yet; concurrent callers share one pass."""
+        if not self.enabled:
+            return self.snapshot()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run_all())
+        await asyncio.shield(self._task)
+        return self.snapshot()
+
+    def schedule(self) -> None:
+        """Start :meth:`run` in the background if it has not been started."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run_all())
+
+    async def _run_all(self) -> None:
+        started = time.perf_counter()
+        for step in self._steps:
+            if step.loop_bound:
+                await self._run_async(step)
+            else:
+                await asyncio.to_thread(self._run_blocking, step)
+        logger.info(
+            "Warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000
+        )
+
+    def _run_blocking(self, step: _Step) -> None:
+        with step.lock:
+            if step.status != "pending":
+                return
+            started = self._begin(step)
+            try:
+                step.fn()
+            except Exception as exc:  # noqa: BLE001 — warm-up is best effort
+                self._end(step, started, exc)
+            else:
+                self._end(step, started)
+
+    async def _run_async(self, step: _Step) -> None:
+        if step.status != "pending":
+            return
+        started = self._begin(step)
+        try:
+            await step.fn()
+        except Exception as exc:  # noqa: BLE001 — warm-up is best effort
+            self._end(step, started, exc)
+        else:
+            self._end(step, started)
+
+    @staticmethod
+    def _begin(step: _Step) -> float:
+        step.status = "running"
+        return time.perf_counter()
+
+    @staticmethod
+    def _end(step: _Step, started: float, exc: Optional[BaseException] = None) -> None:
+        step.duration = time.perf_counter() - started
+        if exc is None:
+            step.status = "done"
+            return
+        step.status, step.error = "failed", str(exc)
+        logger.error("Warm-up step '%s' failed", step.name, exc_info=exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and per-step outcome as a JSON-ready dict."""
+        steps: Dict[str, Any] = {}
+        for step in self._steps:
+            steps[step.name] = {
+                "status": step.status,
+                "ms": round(step.duration * 1000, 3),
+            }
+            if step.error:
+                steps[step.name]["error"] = step.error
+        return {"enabled": self.enabled, "on_load": self.on_load, "steps": steps}
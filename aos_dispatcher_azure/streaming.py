@@ -0,0 +1,31 @@
+"""Encoders for streamed response formats (Server-Sent Events).
+
+The Azure Functions Python HTTP binding buffers the response body, so an SSE
+response carries the events available when it is sent and ends; the client's
+``EventSource`` reconnects (after the ``retry`` delay) with ``Last-Event-ID``
+and picks up from there.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+
+def sse_event(
+    data: Any, event: Optional[str] = None, event_id: Optional[str] = None
+) -> str:
+    """Encode one SSE event; *data* is JSON-serialised."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, separators=(",", ":"))
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_retry(milliseconds: int) -> str:
+    """Encode the reconnection delay the client should use."""
+    return f"retry: {int(milliseconds)}\n\n"
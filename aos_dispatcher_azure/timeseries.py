@@ -0,0 +1,555 @@
+"""Columnar in-memory metric store with precomputed rollups.
+
+``GET /api/metrics`` with ``start``/``end``/``step``/``agg`` is answered from
+this store instead of returning the library's entire series.
+
+Each series keeps:
+
+    raw      two ``array('d')`` columns (epoch seconds, value), sorted by
+             time, trimmed to the last ``AOS_METRICS_RAW_RETENTION_HOURS``
+    rollups  per resolution (1 minute, 5 minutes, 1 hour, 1 day): columns of
+             bucket start, count, sum, min and max, updated on every write and
+             trimmed to the last ``AOS_METRICS_ROLLUP_BUCKETS`` buckets of
+             their resolution (about 7 days of 1-minute buckets by default)
+
+A query whose ``step`` is a multiple of a rollup resolution reads the coarsest
+such rollup, so a dashboard over months of data touches a few thousand
+buckets instead of millions of points.  ``p95`` and steps that are not a
+multiple of one minute are computed from raw points.
+
+Buckets are aligned to multiples of ``step`` since the epoch; ``start`` is
+aligned down to its bucket and empty buckets are omitted.
+
+The store is per worker.  It is fed by the metric writes the worker handles
+and, for series it has not seen yet, backfilled from the dispatcher on first
+query (re-synced every ``AOS_METRICS_RESYNC_INTERVAL`` seconds).  A re-sync
+reads the library's whole series; parsing it and rebuilding the columns run on
+the thread pool.
+
+Configuration:
+    AOS_METRICS_RAW_RETENTION_HOURS   Raw points kept per series (default: 168)
+    AOS_METRICS_ROLLUP_BUCKETS        Buckets kept per rollup, counted back
+                                      from the newest (default: 10000)
+    AOS_METRICS_RESYNC_INTERVAL       Seconds before a series is re-read from
+                                      the dispatcher (default: 300)
+    AOS_METRICS_MAX_BUCKETS           Max buckets one query may return
+                                      (default: 10000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from .config import env_float, env_int
+
+RESOLUTIONS = (60, 300, 3600, 86400)
+AGGREGATIONS = ("avg", "min", "max", "sum", "count", "p95")
+DEFAULT_WINDOW = 86400.0
+DEFAULT_TARGET_BUCKETS = 500
+DEFAULT_RAW_RETENTION_HOURS = 168.0
+DEFAULT_ROLLUP_BUCKETS = 10_000
+DEFAULT_RESYNC_INTERVAL = 300.0
+DEFAULT_MAX_BUCKETS = 10_000
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhdw]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+#: ``fetch(name)`` → library ``get_metrics`` response ``(body, status_code)``.
+SeriesFetcher = Callable[[str], Awaitable[tuple]]
+
+#: ``DispatcherExecutor.run``: ``run(endpoint, fn, *args)`` on the thread pool.
+Runner = Callable[..., Awaitable[Any]]
+
+
+class MetricQueryError(ValueError):
+    """Invalid ``start``, ``end``, ``step`` or ``agg`` parameter."""
+
+
+def parse_timestamp(value: Any) -> float:
+    """Epoch seconds from an ISO 8601 string or a number of seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_timestamp(epoch: float) -> str:
+    return (
+        datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace("+00:00", "Z")
+    )
+
+
+def parse_duration(value: str) -> float:
+    """Seconds from ``"300"``, ``"5m"``, ``"1h"``, ``"1d"`` or ``"1w"``."""
+    match = _DURATION.match(value.strip().lower())
+    if not match:
+        raise MetricQueryError(f"Invalid duration '{value}'")
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    if not math.isfinite(seconds):
+        raise MetricQueryError(f"Invalid duration '{value}'")
+    return seconds
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of *values* (unsorted)."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class MetricQuery:
+    """A windowed, downsampled series query."""
+
+    start: float
+    end: float
+    step: float
+    agg: str = "avg"
+
+    @classmethod
+    def from_params(
+        cls, params: Mapping[str, str], now: Optional[float] = None
+    ) -> "MetricQuery":
+        """Build a query from ``start``/``end``/``step``/``agg`` query parameters.
+
+        ``end`` defaults to now and ``start`` to 24 hours before ``end``.
+        Without ``step`` the smallest rollup resolution giving at most 500
+        buckets is used.
+        """
+        try:
+            end = (
+                parse_timestamp(params["end"])
+                if params.get("end")
+                else (now or time.time())
+            )
+            start = end - DEFAULT_WINDOW
+            if params.get("start"):
+                start = parse_timestamp(params["start"])
+            # Also rejects infinities, NaN and epochs outside datetime's range.
+            format_timestamp(start)
+            format_timestamp(end)
+        except (ValueError, OverflowError, OSError):
+            raise MetricQueryError(
+                "'start' and 'end' must be ISO 8601 or epoch seconds"
+            ) from None
+        if end <= start:
+            raise MetricQueryError("'end' must be after 'start'")
+        agg = (params.get("agg") or "avg").lower()
+        if agg not in AGGREGATIONS:
+            raise MetricQueryError(f"'agg' must be one of: {', '.join(AGGREGATIONS)}")
+        if params.get("step"):
+            step = parse_duration(params["step"])
+            if step <= 0:
+                raise MetricQueryError("'step' must be positive")
+        else:
+            step = default_step(end - start)
+        max_buckets = env_int("AOS_METRICS_MAX_BUCKETS", DEFAULT_MAX_BUCKETS)
+        if (end - start) / step > max_buckets:
+            raise MetricQueryError(
+                f"Query would return more than {max_buckets} buckets"
+            )
+        return cls(start=start, end=end, step=step, agg=agg)
+
+
+def default_step(window: float) -> float:
+    for resolution in RESOLUTIONS:
+        if window / resolution <= DEFAULT_TARGET_BUCKETS:
+            return float(resolution)
+    days = math.ceil(window / DEFAULT_TARGET_BUCKETS / 86400)
+    return float(days * 86400)
+
+
+class Rollup:
+    """Per-bucket count/sum/min/max at one resolution, as parallel arrays."""
+
+    __slots__ = (
+        "resolution",
+        "retention",
+        "trimmed_before",
+        "starts",
+        "counts",
+        "sums",
+        "mins",
+        "maxs",
+    )
+
+    def __init__(self, resolution: int, buckets: int = DEFAULT_ROLLUP_BUCKETS) -> None:
+        self.resolution = resolution
+        self.retention = resolution * buckets
+        # Start of the oldest bucket kept once older ones have been trimmed.
+        self.trimmed_before: Optional[float] = None
+        self.starts = array("d")
+        self.counts = array("q")
+        self.sums = array("d")
+        self.mins = array("d")
+        self.maxs = array("d")
+
+    def add(self, timestamp: float, value: float) -> None:
+        bucket = timestamp - timestamp % self.resolution
+        starts = self.starts
+        if starts and starts[-1] == bucket:
+            index = len(starts) - 1
+        elif not starts or bucket > starts[-1]:
+            starts.append(bucket)
+            self.counts.append(1)
+            self.sums.append(value)
+            self.mins.append(value)
+            self.maxs.append(value)
+            self._trim()
+            return
+        elif bucket < starts[-1] - self.retention:
+            return  # older than the retention window
+        else:
+            index = bisect_left(starts, bucket)
+            if index == len(starts) or starts[index] != bucket:
+                starts.insert(index, bucket)
+                self.counts.insert(index, 1)
+                self.sums.insert(index, value)
+                self.mins.insert(index, value)
+                self.maxs.insert(index, value)
+                return
+        self.counts[index] += 1
+        self.sums[index] += value
+        if value < self.mins[index]:
+            self.mins[index] = value
+        if value > self.maxs[index]:
+            self.maxs[index] = value
+
+    def _trim(self) -> None:
+        # Trim in chunks (10% of retention) so appends stay amortised O(1).
+        starts = self.starts
+        cutoff = starts[-1] - self.retention
+        if starts[0] < cutoff - self.retention * 0.1:
+            drop = bisect_left(starts, cutoff)
+            for column in (starts, self.counts, self.sums, self.mins, self.maxs):
+                del column[:drop]
+            self.trimmed_before = starts[0]
+
+    def query(self, query: MetricQuery) -> List[Tuple[float, float]]:
+        step = query.step
+        lo = bisect_left(self.starts, query.start - query.start % step)
+        hi = bisect_left(self.starts, query.end)
+        out: List[Tuple[float, float]] = []
+        current: Optional[float] = None
+        count = 0
+        total = 0.0
+        low = math.inf
+        high = -math.inf
+        for index in range(lo, hi):
+            bucket = self.starts[index] - self.starts[index] % step
+            if bucket != current:
+                if current is not None:
+                    out.append((current, _combine(query.agg, count, total, low, high)))
+                current, count, total, low, high = bucket, 0, 0.0, math.inf, -math.inf
+            count += self.counts[index]
+            total += self.sums[index]
+            low = min(low, self.mins[index])
+            high = max(high, self.maxs[index])
+        if current is not None:
+            out.append((current, _combine(query.agg, count, total, low, high)))
+        return out
+
+
+def _combine(agg: str, count: int, total: float, low: float, high: float) -> float:
+    if agg == "avg":
+        return total / count
+    if agg == "sum":
+        return total
+    if agg == "min":
+        return low
+    if agg == "max":
+        return high
+    return float(count)
+
+
+class Series:
+    """Raw points and rollups of one metric."""
+
+    def __init__(
+        self,
+        name: str,
+        raw_retention: float,
+        rollup_buckets: int = DEFAULT_ROLLUP_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.raw_retention = raw_retention
+        self.rollup_buckets = rollup_buckets
+        self.timestamps = array("d")
+        self.values = array("d")
+        self.rollups = self._new_rollups()
+        self.count = 0
+        self.total = 0.0
+        self.synced_at: Optional[float] = None
+        self._buffer: Optional[List[Tuple[float, float]]] = None
+        self._lock = threading.Lock()
+
+    def _new_rollups(self) -> List[Rollup]:
+        return [Rollup(resolution, self.rollup_buckets) for resolution in RESOLUTIONS]
+
+    def add(self, timestamp: float, value: float) -> None:
+        with self._lock:
+            self._add(timestamp, value)
+            if self._buffer is not None:
+                self._buffer.append((timestamp, value))
+
+    def _add(self, timestamp: float, value: float) -> None:
+        timestamps = self.timestamps
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            self.values.append(value)
+        else:
+            index = bisect_right(timestamps, timestamp)
+            timestamps.insert(index, timestamp)
+            self.values.insert(index, value)
+        for rollup in self.rollups:
+            rollup.add(timestamp, value)
+        self.count += 1
+        self.total += value
+        self._trim()
+
+    def _trim(self) -> None:
+        timestamps = self.timestamps
+        # Trim in chunks (10% of retention) so appends stay amortised O(1).
+        cutoff = timestamps[-1] - self.raw_retention
+        if timestamps[0] < cutoff - self.raw_retention * 0.1:
+            drop = bisect_left(timestamps, cutoff)
+            del timestamps[:drop]
+            del self.values[:drop]
+
+    @property
+    def raw_start(self) -> Optional[float]:
+        return self.timestamps[0] if self.timestamps else None
+
+    @property
+    def last(self) -> Optional[Tuple[float, float]]:
+        return (self.timestamps[-1], self.values[-1]) if self.timestamps else None
+
+    def begin_sync(self) -> None:
+        """Start buffering writes that race a re-sync from the dispatcher."""
+        with self._lock:
+            self._buffer = []
+
+    def end_sync(self, points: Optional[Iterable[Tuple[float, float]]]) -> None:
+        """Rebuild from the dispatcher's *points* plus writes made meanwhile.
+
+        With ``points=None`` (the fetch failed) the local data is kept.
+        Blocking; run it through ``DispatcherExecutor.run``.
+        """
+        ordered = sorted(points) if points is not None else None
+        with self._lock:
+            buffered = self._buffer or []
+            self._buffer = None
+            if ordered is None:
+                return
+            # Writes buffered during the fetch may or may not be in its result.
+            seen = set()
+            if buffered:
+                since = min(buffered)[0]
+                seen = set(ordered[bisect_left(ordered, (since, -math.inf)) :])
+            self.timestamps = array("d")
+            self.values = array("d")
+            self.rollups = self._new_rollups()
+            self.count = 0
+            self.total = 0.0
+            for timestamp, value in ordered:
+                self._add(timestamp, value)
+            for point in buffered:
+                if point not in seen:
+                    self._add(*point)
+            self.synced_at = time.monotonic()
+
+    def query(self, query: MetricQuery) -> Tuple[List[Tuple[float, float]], int, bool]:
+        """Return ``(buckets, resolution, partial)``.
+
+        Resolution ``0`` means raw points; *partial* is true when the window
+        reaches back past the data kept at that resolution.
+        """
+        start = query.start - query.start % query.step
+        with self._lock:
+            rollup = self._rollup_for(query)
+            if rollup is not None:
+                trimmed = rollup.trimmed_before
+                partial = trimmed is not None and start < trimmed
+                return rollup.query(query), rollup.resolution, partial
+            raw_start = self.raw_start
+            return (
+                self._query_raw(query),
+                0,
+                raw_start is not None and start < raw_start,
+            )
+
+    def _rollup_for(self, query: MetricQuery) -> Optional[Rollup]:
+        if query.agg == "p95":
+            return None
+        for rollup in reversed(self.rollups):
+            if query.step >= rollup.resolution and query.step % rollup.resolution == 0:
+                return rollup
+        return None
+
+    def _query_raw(self, query: MetricQuery) -> List[Tuple[float, float]]:
+        step = query.step
+        lo = bisect_left(self.timestamps, query.start - query.start % step)
+        hi = bisect_left(self.timestamps, query.end)
+        groups: Dict[float, List[float]] = defaultdict(list)
+        for index in range(lo, hi):
+            timestamp = self.timestamps[index]
+            groups[timestamp - timestamp % step].append(self.values[index])
+        out = []
+        for bucket, values in groups.items():
+            if query.agg == "p95":
+                value = percentile(values, 95)
+            else:
+                value = _combine(
+                    query.agg, len(values), sum(values), min(values), max(values)
+                )
+            out.append((bucket, value))
+        return out
+
+
+class TimeSeriesStore:
+    """Metric series of one worker, keyed by metric name."""
+
+    def __init__(
+        self,
+        raw_retention: Optional[float] = None,
+        resync_interval: Optional[float] = None,
+        rollup_buckets: Optional[int] = None,
+    ) -> None:
+        hours = env_float(
+            "AOS_METRICS_RAW_RETENTION_HOURS", DEFAULT_RAW_RETENTION_HOURS
+        )
+        self.raw_retention = raw_retention or hours * 3600
+        self.rollup_buckets = rollup_buckets or env_int(
+            "AOS_METRICS_ROLLUP_BUCKETS", DEFAULT_ROLLUP_BUCKETS
+        )
+        self.resync_interval = resync_interval or env_float(
+            "AOS_METRICS_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL
+        )
+        self._series: Dict[str, Series] = {}
+        self._sync_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._lock = threading.Lock()
+
+    def series(self, name: str) -> Series:
+        series = self._series.get(name)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(
+                    name, Series(name, self.raw_retention, self.rollup_buckets)
+                )
+        return series
+
+    def get(self, name: str) -> Optional[Series]:
+        return self._series.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._series)
+
+    def add(self, name: str, timestamp: Any, value: Any) -> bool:
+        """Record one point; returns ``False`` if it is not a numeric sample."""
+        if not name or isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        try:
+            epoch = parse_timestamp(timestamp) if timestamp is not None else time.time()
+        except ValueError:
+            return False
+        if not (math.isfinite(epoch) and math.isfinite(value)):
+            return False
+        self.series(name).add(epoch, float(value))
+        return True
+
+    def needs_sync(self, name: str) -> bool:
+        series = self._series.get(name)
+        if series is None or series.synced_at is None:
+            return True
+        return time.monotonic() - series.synced_at > self.resync_interval
+
+    async def ensure_synced(
+        self, name: str, fetch: SeriesFetcher, run: Runner
+    ) -> Optional[tuple]:
+        """Backfill *name* from the dispatcher if it is missing or stale.
+
+        Concurrent callers share one fetch; parsing the response and
+        rebuilding the series go through *run* (``DispatcherExecutor.run``).
+        Returns the library error response if the fetch failed, else ``None``.
+        """
+        if not self.needs_sync(name):
+            return None
+        async with self._sync_locks[name]:
+            if not self.needs_sync(name):
+                return None
+            series = self.series(name)
+            await run("metrics_backfill", series.begin_sync)
+            try:
+                body, status_code = await fetch(name)
+            except Exception:
+                await run("metrics_backfill", series.end_sync, None)
+                raise
+            if status_code >= 400:
+                await run("metrics_backfill", series.end_sync, None)
+                return body, status_code
+            await run("metrics_backfill", self._rebuild, series, body)
+            return None
+
+    @staticmethod
+    def _rebuild(series: Series, body: Any) -> None:
+        points: List[Tuple[float, float]] = []
+        for point in (body or {}).get("series") or []:
+            value = point.get("value")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            try:
+                timestamp = parse_timestamp(point.get("timestamp"))
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(timestamp) and math.isfinite(value):
+                points.append((timestamp, float(value)))
+        series.end_sync(points)
+
+    def query(self, name: str, query: MetricQuery) -> Dict[str, Any]:
+        """Run *query* against *name*; returns the response body."""
+        series = self._series.get(name)
+        buckets, resolution, partial = (
+            series.query(query) if series is not None else ([], 0, False)
+        )
+        start = query.start - query.start % query.step
+        return {
+            "name": name,
+            "start": format_timestamp(start),
+            "end": format_timestamp(query.end),
+            "step": query.step,
+            "agg": query.agg,
+            "resolution": resolution,
+            # Points or buckets older than the retention window are gone.
+            "partial": partial,
+            "series": [
+                {"timestamp": format_timestamp(bucket), "value": value}
+                for bucket, value in buckets
+            ],
+        }
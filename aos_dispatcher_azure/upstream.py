@@ -0,0 +1,409 @@
+"""Pooled HTTP client for the function apps the dispatcher proxies to.
+
+The MCP endpoints proxy to aos-mcp-servers (``MCP_SERVERS_BASE_URL``) and the
+agent catalog endpoints to aos-realm-of-agents (``REALM_OF_AGENTS_BASE_URL``).
+:class:`UpstreamPool` gives each upstream one shared ``aiohttp`` session:
+
+- Keep-alive connections, at most ``MAX_CONNECTIONS`` per upstream.
+- At most ``MAX_CONCURRENCY`` requests in flight per upstream; a request
+  that cannot start within ``QUEUE_TIMEOUT`` seconds gets ``503`` instead of
+  holding one of the worker's request slots while a slow upstream drains.
+- A total ``TIMEOUT`` per request (``504`` when exceeded).
+- Up to ``RETRIES`` retries with exponential backoff and full jitter, for
+  connection errors and ``502``/``503``/``504``.  Non-idempotent requests are
+  only retried when the connection failed before the request was sent.
+- A circuit breaker: after ``BREAKER_THRESHOLD`` consecutive failures the
+  upstream is short-circuited with ``503`` for ``BREAKER_RESET`` seconds,
+  then a single probe request decides whether to close it again.
+
+Responses are returned as library-style ``(body, status_code)`` tuples with
+the raw response bytes as *body*, so handlers pass them through unchanged.
+:meth:`UpstreamPool.forward` (used for MCP tool calls) also streams the
+request body upstream in slices and keeps the upstream's content type and
+encoding without decompressing it.  The Functions HTTP binding itself holds
+one copy of the request and response body; the proxy adds no further copy,
+parsing or re-encoding.
+
+``aiohttp`` is imported when the first session is created, not when this
+module is imported.
+
+Configuration (``<KEY>`` settings; ``AOS_UPSTREAM_<NAME>_<KEY>`` overrides
+``AOS_UPSTREAM_<KEY>`` for one upstream, e.g. ``AOS_UPSTREAM_MCP_SERVERS_TIMEOUT``):
+    MAX_CONNECTIONS     Pooled connections per upstream (default: 64)
+    MAX_CONCURRENCY     Requests in flight per upstream (default: 64)
+    QUEUE_TIMEOUT       Seconds to wait for a free slot (default: 1)
+    TIMEOUT             Seconds per request attempt (default: 10)
+    RETRIES             Retries after the first attempt (default: 2)
+    BACKOFF             Base backoff in seconds (default: 0.05)
+    BREAKER_THRESHOLD   Consecutive failures that open the breaker (default: 5)
+    BREAKER_RESET       Seconds the breaker stays open (default: 30)
+    CHUNK_SIZE          Bytes per request-body write for :meth:`UpstreamPool.forward`
+                        (default: 65536)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Mapping, Optional
+
+from .config import env_float, env_int
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+#: Upstream response headers kept by :meth:`UpstreamPool.forward`.
+PASSTHROUGH_HEADERS = (
+    "Content-Type",
+    "Content-Encoding",
+    "Content-Disposition",
+    "Cache-Control",
+    "ETag",
+    "Last-Modified",
+)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+DEFAULTS: Dict[str, float] = {
+    "MAX_CONNECTIONS": 64,
+    "MAX_CONCURRENCY": 64,
+    "QUEUE_TIMEOUT": 1.0,
+    "TIMEOUT": 10.0,
+    "RETRIES": 2,
+    "BACKOFF": 0.05,
+    "BREAKER_THRESHOLD": 5,
+    "BREAKER_RESET": 30.0,
+    "CHUNK_SIZE": 65536,
+}
+
+
+def _setting(name: str, key: str) -> float:
+    """``AOS_UPSTREAM_<NAME>_<KEY>``, else ``AOS_UPSTREAM_<KEY>``, else the default."""
+    default = DEFAULTS[key]
+    if key == "RETRIES":
+        fallback = env_int(f"AOS_UPSTREAM_{key}", int(default), minimum=0)
+        return env_int(f"AOS_UPSTREAM_{name.upper()}_{key}", fallback, minimum=0)
+    read = env_int if isinstance(default, int) else env_float
+    fallback = read(f"AOS_UPSTREAM_{key}", default)
+    return read(f"AOS_UPSTREAM_{name.upper()}_{key}", fallback)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed → open → half-open).
+
+    Args:
+        threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds the circuit stays open before one probe.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe when half-open)."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or (
+            self.opened_at is None and self.failures >= self.threshold
+        ):
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give back a claimed probe without a result (the request was not sent)."""
+        self._probing = False
+
+
+async def _chunks(body: bytes, size: int) -> AsyncIterator[memoryview]:
+    """Zero-copy slices of *body*; each is written and drained before the next."""
+    view = memoryview(body)
+    for start in range(0, len(view), size):
+        yield view[start : start + size]
+
+
+@dataclass
+class ProxiedResponse:
+    """An upstream response: raw *body* bytes (or an error dict) and headers to keep."""
+
+    status_code: int
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class UpstreamStats:
+    """Counters for one upstream."""
+
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    timeouts: int = 0
+    rejected_open: int = 0
+    rejected_saturated: int = 0
+    in_flight: int = 0
+    in_flight_max: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+
+class UpstreamPool:
+    """Shared keep-alive session, concurrency limit and breaker for one upstream.
+
+    Args:
+        name: Upstream name (``mcp_servers``, ``realm_of_agents``); also the
+            ``<NAME>`` in per-upstream settings.
+        base_url: Upstream base URL; request paths are joined to it.
+    """
+
+    def __init__(self, name: str, base_url: str) -> None:
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = int(_setting(name, "MAX_CONNECTIONS"))
+        self.max_concurrency = int(_setting(name, "MAX_CONCURRENCY"))
+        self.queue_timeout = _setting(name, "QUEUE_TIMEOUT")
+        self.timeout = _setting(name, "TIMEOUT")
+        self.retries = int(_setting(name, "RETRIES"))
+        self.backoff = _setting(name, "BACKOFF")
+        self.chunk_size = int(_setting(name, "CHUNK_SIZE"))
+        self.breaker = CircuitBreaker(
+            int(_setting(name, "BREAKER_THRESHOLD")), _setting(name, "BREAKER_RESET")
+        )
+        self.stats = UpstreamStats()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_environment(cls, name: str, url_variable: str) -> Optional["UpstreamPool"]:
+        """A pool for the URL in *url_variable*, or ``None`` when it is unset."""
+        base_url = os.environ.get(url_variable, "").strip()
+        return cls(name, base_url) if base_url else None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use (inside the event loop)."""
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def warm_up(self) -> None:
+        """Open the session and one keep-alive connection before the first request.
+
+        Sends ``HEAD`` to the base URL and ignores the outcome; the request is
+        not counted in :attr:`stats`.
+        """
+        import aiohttp
+
+        try:
+            async with self.session.head(f"{self.base_url}/", allow_redirects=False):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.debug("Warming up %s failed: %s", self.name, exc)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> tuple:
+        """Send one request; returns ``(body_bytes_or_None, status_code)``."""
+        response = await self._call(method, path, params, body, headers, stream=False)
+        return response.body, response.status_code
+
+    async def forward(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> "ProxiedResponse":
+        """Stream *body* to the upstream and pass its response through untouched.
+
+        The request body is sent in ``CHUNK_SIZE`` slices of *body* (no copy,
+        with backpressure) and the response keeps the upstream's status,
+        ``Content-Type`` and ``Content-Encoding``; compressed bodies are not
+        decompressed.
+        """
+        return await self._call(method, path, None, body, headers, stream=True)
+
+    async def _call(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Mapping[str, Any]],
+        body: Optional[bytes],
+        headers: Optional[Mapping[str, str]],
+        stream: bool,
+    ) -> "ProxiedResponse":
+        self.stats.requests += 1
+        if not self.breaker.allow():
+            self.stats.rejected_open += 1
+            return self._error(503, "unavailable (circuit open)")
+        session = self.session
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats.rejected_saturated += 1
+            self.breaker.release()
+            return self._error(503, "saturated")
+        self.stats.in_flight += 1
+        self.stats.in_flight_max = max(self.stats.in_flight_max, self.stats.in_flight)
+        started = time.perf_counter()
+        try:
+            response = await self._send(
+                session, method.upper(), path, params, body, headers, stream
+            )
+        finally:
+            self.stats.in_flight -= 1
+            self._slots.release()
+            elapsed = time.perf_counter() - started
+            self.stats.latency_total += elapsed
+            self.stats.latency_max = max(self.stats.latency_max, elapsed)
+        if response.status_code in RETRY_STATUSES:
+            self.stats.failed += 1
+            was_open = self.breaker.opened_at is not None
+            self.breaker.record_failure()
+            if not was_open and self.breaker.opened_at is not None:
+                logger.warning(
+                    "Circuit for upstream %s opened after %d consecutive failures",
+                    self.name,
+                    self.breaker.failures,
+                )
+        else:
+            self.stats.succeeded += 1
+            self.breaker.record_success()
+        return response
+
+    def _error(self, status_code: int, reason: str) -> "ProxiedResponse":
+        return ProxiedResponse(status_code, {"error": f"Upstream {self.name} {reason}"})
+
+    async def _send(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        path: str,
+        params: Optional[Mapping[str, Any]],
+        body: Optional[bytes],
+        headers: Optional[Mapping[str, str]],
+        stream: bool,
+    ) -> "ProxiedResponse":
+        import aiohttp
+
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        query = {k: str(v) for k, v in (params or {}).items() if v is not None}
+        idempotent = method in IDEMPOTENT_METHODS
+        if stream and body:
+            # A sized, non-chunked request whose body is written slice by slice.
+            headers = dict(headers or {}, **{"Content-Length": str(len(body))})
+        result = self._error(502, "unavailable")
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats.retries += 1
+                await asyncio.sleep(
+                    random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                )
+            self.stats.attempts += 1
+            data = _chunks(body, self.chunk_size) if stream and body else body
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    params=query,
+                    data=data,
+                    headers=headers,
+                    auto_decompress=not stream,
+                ) as response:
+                    payload = await response.read()
+                    passthrough = {}
+                    if stream:
+                        passthrough = {
+                            name: response.headers[name]
+                            for name in PASSTHROUGH_HEADERS
+                            if name in response.headers
+                        }
+                    result = ProxiedResponse(
+                        response.status, payload or None, passthrough
+                    )
+                if response.status not in RETRY_STATUSES or not idempotent:
+                    return result
+            except aiohttp.ClientConnectorError as exc:
+                # Nothing was sent, so even non-idempotent requests may retry.
+                logger.debug("Connecting to %s failed: %s", self.name, exc)
+                result = self._error(502, "unreachable")
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                result = self._error(504, "timed out")
+                if not idempotent:
+                    return result
+            except aiohttp.ClientError as exc:
+                logger.debug("Request to %s failed: %s", self.name, exc)
+                result = self._error(502, "request failed")
+                if not idempotent:
+                    return result
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings, breaker state and counters as a JSON-ready dict."""
+        stats = asdict(self.stats)
+        total, peak = stats.pop("latency_total"), stats.pop("latency_max")
+        done = self.stats.succeeded + self.stats.failed
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.max_connections,
+            "max_concurrency": self.max_concurrency,
+            "timeout_s": self.timeout,
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+            },
+            "latency_ms_avg": round(total / done * 1000, 3) if done else 0.0,
+            "latency_ms_max": round(peak * 1000, 3),
+            **stats,
+        }
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,301 @@
+"""Write-behind buffering for fire-and-forget ingest endpoints.
+
+``record_metric`` and ``log_decision`` wait for the dispatcher's storage write
+before they respond, although callers treat the data as telemetry.  With
+``AOS_WRITE_BEHIND`` on, those endpoints hand the item to a
+:class:`WriteBehindBuffer` and return ``202 Accepted`` straight away:
+
+- The buffer is a bounded FIFO of ``AOS_WRITE_BEHIND_CAPACITY`` items.  When
+  it is full, :meth:`WriteBehindBuffer.offer` refuses the item and the
+  endpoint answers ``429`` with ``Retry-After``, so a client outpacing
+  storage is slowed down instead of growing memory.
+- A background task writes the buffered items in batches of up to
+  ``AOS_WRITE_BEHIND_BATCH``, through the same path as the ``/batch``
+  endpoints (:func:`~aos_dispatcher_azure.bulk.write_items`): as soon as a
+  full batch is waiting, else every ``AOS_WRITE_BEHIND_INTERVAL`` seconds.
+  Items leave the buffer only once the write has returned.
+- Items the dispatcher rejects (``4xx``) are dropped and logged.  Items that
+  fail with ``5xx`` are retried ahead of newer items, up to
+  ``AOS_WRITE_BEHIND_MAX_ATTEMPTS`` writes, then dropped and logged.
+- On shutdown (interpreter exit or ``SIGTERM``, see :func:`drain_on_exit`)
+  the buffers are drained synchronously: the in-flight batch is awaited for
+  up to ``AOS_WRITE_BEHIND_DRAIN_TIMEOUT`` seconds and everything left is
+  written before the process ends.
+
+Accepted items are not visible to reads until they are written, and a
+``202`` carries no library-assigned id.  Items are still lost if the process
+is killed without ``SIGTERM``.
+
+Configuration:
+    AOS_WRITE_BEHIND                Buffer record_metric / log_decision writes
+                                    and return 202 (default: false)
+    AOS_WRITE_BEHIND_CAPACITY       Items buffered per endpoint (default: 10000)
+    AOS_WRITE_BEHIND_BATCH          Items per storage write (default: 500)
+    AOS_WRITE_BEHIND_INTERVAL       Seconds between time-triggered flushes
+                                    (default: 1)
+    AOS_WRITE_BEHIND_MAX_ATTEMPTS   Writes of an item failing with 5xx before
+                                    it is dropped (default: 3)
+    AOS_WRITE_BEHIND_DRAIN_TIMEOUT  Seconds to wait for an in-flight batch on
+                                    shutdown (default: 10)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Sequence, Tuple
+
+from .config import env_bool, env_float, env_int
+from .shutdown import on_shutdown
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 10_000
+DEFAULT_BATCH = 500
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_DRAIN_TIMEOUT = 10.0
+
+#: ``write(items)`` → :func:`~aos_dispatcher_azure.bulk.write_items` result.
+#: Blocking.
+BatchWriter = Callable[[List[Any]], tuple]
+#: ``on_written([(item, response_body), ...])`` for the items storage accepted.
+WrittenCallback = Callable[[List[Tuple[Any, Any]]], None]
+
+
+@dataclass
+class WriteBehindStats:
+    """Counters for one write-behind buffer."""
+
+    accepted: int = 0
+    rejected_full: int = 0
+    written: int = 0
+    failed: int = 0
+    retried: int = 0
+    dropped: int = 0
+    flushes: int = 0
+    flush_errors: int = 0
+    drained: int = 0
+
+
+class WriteBehindBuffer:
+    """Bounded buffer of items for one endpoint, written in the background.
+
+    :meth:`offer` is called on the event loop; :meth:`flush` runs on a
+    dispatcher thread (or the main thread when draining), one at a time.
+
+    Args:
+        endpoint: Endpoint name, for logs and executor stats.
+        write: Writes a batch of items (blocking).
+        run: ``DispatcherExecutor.run``, used to run :meth:`flush`.
+        on_written: Called on the writing thread with the items storage
+            accepted and their response bodies.
+        after_flush: Called on the event loop after each background flush
+            that wrote something.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        write: BatchWriter,
+        run: Callable[..., Awaitable[Any]],
+        on_written: Optional[WrittenCallback] = None,
+        after_flush: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.endpoint = endpoint
+        self.enabled = env_bool("AOS_WRITE_BEHIND", False)
+        self.capacity = env_int(
+            "AOS_WRITE_BEHIND_CAPACITY", DEFAULT_CAPACITY, minimum=1
+        )
+        self.batch_size = env_int("AOS_WRITE_BEHIND_BATCH", DEFAULT_BATCH, minimum=1)
+        self.interval = env_float("AOS_WRITE_BEHIND_INTERVAL", DEFAULT_INTERVAL)
+        self.max_attempts = env_int(
+            "AOS_WRITE_BEHIND_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS, minimum=1
+        )
+        self.stats = WriteBehindStats()
+        self._write = write
+        self._run = run
+        self._on_written = on_written
+        self._after_flush = after_flush
+        self._items: Deque[Tuple[Any, int]] = deque()  # (item, attempts so far)
+        # Re-entrant: a SIGTERM drain may interrupt offer() on the main thread.
+        self._lock = threading.RLock()
+        self._flushing = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds a refused client should wait: about one flush interval."""
+        return max(1, math.ceil(self.interval))
+
+    def offer(self, item: Any) -> bool:
+        """Buffer *item*; ``False`` if the buffer is full."""
+        with self._lock:
+            if len(self._items) >= self.capacity:
+                self.stats.rejected_full += 1
+                return False
+            self._items.append((item, 0))
+            self.stats.accepted += 1
+            depth = len(self._items)
+        self._ensure_flusher()
+        if depth >= self.batch_size:
+            self._wake.set()
+        return True
+
+    # ── background flushing ──
+
+    def _ensure_flusher(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._flusher())
+
+    async def _flusher(self) -> None:
+        while True:
+            if len(self._items) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            if not self._items:
+                continue
+            try:
+                written = await self._run(f"{self.endpoint}_flush", self.flush)
+            except Exception:  # noqa: BLE001 — the items stay buffered
+                self.stats.flush_errors += 1
+                logger.exception("Write-behind flush for %s failed", self.endpoint)
+                await asyncio.sleep(self.interval)
+                continue
+            if written and self._after_flush is not None:
+                self._after_flush()
+
+    def flush(self) -> int:
+        """Write up to one batch from the head of the buffer.  Blocking.
+
+        Returns the number of items taken from the buffer for this write.
+        """
+        with self._flushing:
+            return self._flush_batch()
+
+    def _flush_batch(self) -> int:
+        with self._lock:
+            batch = list(islice(self._items, self.batch_size))
+        if not batch:
+            return 0
+        body, _ = self._write([item for item, _ in batch])
+        self.stats.flushes += 1
+        accepted: List[Tuple[Any, Any]] = []
+        retry: List[Tuple[Any, int]] = []
+        for (item, attempts), entry in zip(batch, body["results"]):
+            status = entry["status"]
+            if status < 400:
+                accepted.append((item, entry["body"]))
+            elif status >= 500 and attempts + 1 < self.max_attempts:
+                retry.append((item, attempts + 1))
+            else:
+                logger.warning(
+                    "Write-behind %s dropped an item after %d attempt(s): %s %s",
+                    self.endpoint,
+                    attempts + 1,
+                    status,
+                    entry["body"],
+                )
+                if status >= 500:
+                    self.stats.dropped += 1
+                else:
+                    self.stats.failed += 1
+        with self._lock:
+            for _ in batch:
+                self._items.popleft()
+            # Retried items go ahead of anything accepted since.
+            self._items.extendleft(reversed(retry))
+        self.stats.written += len(accepted)
+        self.stats.retried += len(retry)
+        if accepted and self._on_written is not None:
+            try:
+                self._on_written(accepted)
+            except Exception:  # noqa: BLE001 — the items are already stored
+                logger.exception(
+                    "Write-behind %s post-write hook failed", self.endpoint
+                )
+        return len(batch)
+
+    # ── shutdown ──
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """Write everything buffered before returning.  Blocking.
+
+        Waits up to *timeout* seconds (default ``AOS_WRITE_BEHIND_DRAIN_TIMEOUT``)
+        for a flush already in flight.  Returns the number of items written or
+        given up on; items are only left behind when the wait times out.
+        """
+        if timeout is None:
+            timeout = env_float("AOS_WRITE_BEHIND_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT)
+        if not self._flushing.acquire(timeout=timeout):
+            logger.error(
+                "Write-behind %s: in-flight flush did not finish; "
+                "%d item(s) not drained",
+                self.endpoint,
+                len(self._items),
+            )
+            return 0
+        drained = 0
+        try:
+            started = time.perf_counter()
+            while self._items:
+                drained += self._flush_batch()
+        except Exception:  # noqa: BLE001 — shutting down; report what is lost
+            logger.exception(
+                "Write-behind %s drain failed; %d item(s) lost",
+                self.endpoint,
+                len(self._items),
+            )
+        finally:
+            self._flushing.release()
+        self.stats.drained += drained
+        if drained:
+            logger.info(
+                "Write-behind %s drained %d item(s) in %.0f ms",
+                self.endpoint,
+                drained,
+                (time.perf_counter() - started) * 1000,
+            )
+        return drained
+
+    def snapshot(self) -> dict:
+        """Settings, depth and counters as a JSON-ready dict."""
+        return {
+            "enabled": self.enabled,
+            "depth": len(self._items),
+            "capacity": self.capacity,
+            "batch_size": self.batch_size,
+            "interval_s": self.interval,
+            **asdict(self.stats),
+        }
+
+
+def drain_on_exit(buffers: Sequence[WriteBehindBuffer]) -> None:
+    """Drain *buffers* at interpreter exit and on ``SIGTERM`` (scale-in).
+
+    Registered with :func:`~aos_dispatcher_azure.shutdown.on_shutdown`, which
+    hands the signal on once every hook has run.
+    """
+
+    def drain_all() -> None:
+        for buffer in buffers:
+            if len(buffer):
+                buffer.drain()
+
+    on_shutdown(drain_all)
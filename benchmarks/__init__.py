@@ -0,0 +1 @@
+"""Local benchmarks for the AOS Dispatcher Azure Functions wrapper."""
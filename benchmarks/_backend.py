@@ -0,0 +1,615 @@
+"""In-memory ``aos_dispatcher.dispatcher`` backend for benchmarks.
+
+:func:`install` registers this module as ``aos_dispatcher.dispatcher`` so
+``function_app`` can be imported and its handlers driven in-process without
+Foundry, Service Bus or the proxied function apps.  Responses follow the
+shapes documented in ``docs/API-REFERENCE.md``.
+
+``LATENCY`` adds a per-call delay (seconds) to every synchronous function to
+model storage/Foundry round trips.  ``PROXY_LATENCY`` does the same for the
+async calls proxied to aos-mcp-servers / aos-realm-of-agents, and
+``PROXY_CALLS`` counts them per function.  ``AGENT_LATENCY`` sets the delay
+of ``ask_agent`` per agent id, in place of ``LATENCY``.
+
+With ``project_client`` set to an object with the ``AIProjectClient``
+agents surface, ``register_agent`` and ``message_agent`` go through it the
+way the library does: create the agent, then per message resolve the agent,
+create a thread, post the message, run and delete the thread.
+
+:func:`use_bulk_writes` adds the library's optional bulk functions
+(``record_metrics``, ``log_decisions``), which pay ``LATENCY`` once per call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+LATENCY: float = 0.0
+PROXY_LATENCY: float = 0.0
+PROXY_CALLS: Dict[str, int] = {}
+AGENT_LATENCY: Dict[str, float] = {}
+project_client: Any = None
+_lock = threading.Lock()
+
+_orchestrations: Dict[str, Dict[str, Any]] = {}
+_apps: Dict[str, Dict[str, Any]] = {}
+_documents: Dict[str, Dict[str, Any]] = {}
+_risks: Dict[str, Dict[str, Any]] = {}
+_decisions: List[Dict[str, Any]] = []
+_covenants: Dict[str, Dict[str, Any]] = {}
+_metrics: Dict[str, List[Dict[str, Any]]] = {}
+_kpis: Dict[str, Dict[str, Any]] = {}
+_agents: Dict[str, Dict[str, Any]] = {}
+_networks: Dict[str, Dict[str, Any]] = {}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+def _delay() -> None:
+    if LATENCY:
+        time.sleep(LATENCY)
+
+
+async def _proxy(name: str) -> None:
+    PROXY_CALLS[name] = PROXY_CALLS.get(name, 0) + 1
+    if PROXY_LATENCY:
+        await asyncio.sleep(PROXY_LATENCY)
+
+
+def reset() -> None:
+    """Drop all stored state."""
+    with _lock:
+        for store in (
+            _orchestrations,
+            _apps,
+            _documents,
+            _risks,
+            _covenants,
+            _metrics,
+            _kpis,
+        ):
+            store.clear()
+        _agents.clear()
+        _decisions.clear()
+        PROXY_CALLS.clear()
+        _networks.clear()
+        _networks["aos-primary"] = {"network_id": "aos-primary", "members": []}
+
+
+reset()
+
+
+# ── Orchestrations ───────────────────────────────────────────────────────────
+
+
+def process_orchestration_request(
+    body: Dict[str, Any], source_app: Optional[str] = None
+) -> tuple:
+    _delay()
+    if not isinstance(body, dict) or not body.get("agent_ids"):
+        return {"error": "agent_ids is required"}, 400
+    orch_id = body.get("orchestration_id") or _id("orch")
+    with _lock:
+        _orchestrations[orch_id] = {
+            "orchestration_id": orch_id,
+            "status": "running",
+            "source_app": source_app,
+            "created_at": _now(),
+            "updated_at": _now(),
+        }
+    return {"orchestration_id": orch_id, "status": "submitted"}, 202
+
+
+def complete_orchestration(
+    orch_id: str, result: Optional[Dict[str, Any]] = None
+) -> None:
+    """Benchmark hook: mark an orchestration completed."""
+    with _lock:
+        state = _orchestrations[orch_id]
+        state.update(status="completed", result=result or {}, updated_at=_now())
+
+
+def get_orchestration_status(orch_id: str) -> tuple:
+    _delay()
+    state = _orchestrations.get(orch_id)
+    if state is None:
+        return {"error": "Orchestration not found"}, 404
+    return {k: v for k, v in state.items() if k != "result"}, 200
+
+
+def get_orchestration_result(orch_id: str) -> tuple:
+    _delay()
+    state = _orchestrations.get(orch_id)
+    if state is None:
+        return {"error": "Orchestration not found"}, 404
+    if state["status"] != "completed":
+        return {
+            "error": "Orchestration not yet complete",
+            "status": state["status"],
+        }, 409
+    return {
+        "orchestration_id": orch_id,
+        "status": "completed",
+        "result": state.get("result", {}),
+        "completed_at": state["updated_at"],
+    }, 200
+
+
+def cancel_orchestration(orch_id: str) -> tuple:
+    _delay()
+    state = _orchestrations.get(orch_id)
+    if state is None:
+        return {"error": "Orchestration not found"}, 404
+    state.update(status="cancelled", updated_at=_now())
+    return {"orchestration_id": orch_id, "status": "cancelled"}, 200
+
+
+# ── Apps ─────────────────────────────────────────────────────────────────────
+
+
+def register_app(body: Dict[str, Any]) -> tuple:
+    _delay()
+    app_name = body.get("app_name")
+    if not app_name:
+        return {"error": "app_name is required"}, 400
+    _apps[app_name] = {
+        "app_name": app_name,
+        "status": "registered",
+        "registered_at": _now(),
+        "workflows": body.get("workflows", []),
+    }
+    return {
+        "app_name": app_name,
+        "status": "registered",
+        "service_bus": {
+            "queue": f"aos-{app_name}-requests",
+            "topic": "aos-orchestration-results",
+            "subscription": app_name,
+        },
+    }, 201
+
+
+def get_app_registration(app_name: str) -> tuple:
+    _delay()
+    app = _apps.get(app_name)
+    return (app, 200) if app else ({"error": "App not registered"}, 404)
+
+
+def deregister_app(app_name: str) -> tuple:
+    _delay()
+    if _apps.pop(app_name, None) is None:
+        return {"error": "App not registered"}, 404
+    return {"app_name": app_name, "status": "deregistered"}, 200
+
+
+def health() -> tuple:
+    return {
+        "status": "healthy",
+        "version": "4.0.0",
+        "timestamp": _now(),
+        "components": {"dispatcher": "healthy", "service_bus": "healthy"},
+    }, 200
+
+
+# ── Knowledge ────────────────────────────────────────────────────────────────
+
+
+def create_document(body: Dict[str, Any]) -> tuple:
+    _delay()
+    if not body.get("title"):
+        return {"error": "title is required"}, 400
+    doc = dict(body, id=_id("doc"), created_at=_now(), updated_at=_now())
+    _documents[doc["id"]] = doc
+    return {
+        k: doc[k] for k in ("id", "title", "doc_type", "created_at") if k in doc
+    }, 201
+
+
+def get_document(doc_id: str) -> tuple:
+    _delay()
+    doc = _documents.get(doc_id)
+    return (doc, 200) if doc else ({"error": "Document not found"}, 404)
+
+
+def search_documents(
+    query: str = "", doc_type: Optional[str] = None, limit: int = 10
+) -> tuple:
+    _delay()
+    terms = query.lower().split()
+    hits = []
+    for doc in _documents.values():
+        if doc_type and doc.get("doc_type") != doc_type:
+            continue
+        text = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
+        score = sum(text.count(term) for term in terms) if terms else 1
+        if score:
+            hits.append(dict(doc, score=float(score)))
+    hits.sort(key=lambda d: d["score"], reverse=True)
+    return {"documents": hits[:limit]}, 200
+
+
+def update_document(doc_id: str, body: Dict[str, Any]) -> tuple:
+    _delay()
+    doc = _documents.get(doc_id)
+    if doc is None:
+        return {"error": "Document not found"}, 404
+    doc.update(body, updated_at=_now())
+    return doc, 200
+
+
+def delete_document(doc_id: str) -> tuple:
+    _delay()
+    if _documents.pop(doc_id, None) is None:
+        return {"error": "Document not found"}, 404
+    return None, 204
+
+
+# ── Risks ────────────────────────────────────────────────────────────────────
+
+
+def register_risk(body: Dict[str, Any]) -> tuple:
+    _delay()
+    risk = dict(body, id=_id("risk"), status="open", created_at=_now())
+    _risks[risk["id"]] = risk
+    return risk, 201
+
+
+def list_risks(status: Optional[str] = None, category: Optional[str] = None) -> tuple:
+    _delay()
+    risks = [
+        r
+        for r in _risks.values()
+        if (status is None or r.get("status") == status)
+        and (category is None or r.get("category") == category)
+    ]
+    return {"risks": risks}, 200
+
+
+def _update_risk(risk_id: str, **changes: Any) -> tuple:
+    _delay()
+    risk = _risks.get(risk_id)
+    if risk is None:
+        return {"error": "Risk not found"}, 404
+    risk.update(changes)
+    return risk, 200
+
+
+def assess_risk(risk_id: str, body: Dict[str, Any]) -> tuple:
+    likelihood = float(body.get("likelihood", 0))
+    impact = float(body.get("impact", 0))
+    return _update_risk(
+        risk_id,
+        likelihood=likelihood,
+        impact=impact,
+        score=round(likelihood * impact, 4),
+    )
+
+
+def update_risk_status(risk_id: str, body: Dict[str, Any]) -> tuple:
+    return _update_risk(risk_id, status=body.get("status", "open"))
+
+
+def add_mitigation_plan(risk_id: str, body: Dict[str, Any]) -> tuple:
+    risk = _risks.get(risk_id)
+    plans = list(risk.get("mitigation_plans", [])) if risk else []
+    return _update_risk(risk_id, mitigation_plans=plans + [body])
+
+
+# ── Audit ────────────────────────────────────────────────────────────────────
+
+
+def log_decision(body: Dict[str, Any]) -> tuple:
+    _delay()
+    return _log_decision(body)
+
+
+def _log_decision(body: Dict[str, Any]) -> tuple:
+    if not body.get("title"):
+        return {"error": "title is required"}, 400
+    decision = dict(body, id=_id("decision"), timestamp=_now())
+    with _lock:
+        _decisions.append(decision)
+    return {k: decision.get(k) for k in ("id", "title", "agent_id", "timestamp")}, 201
+
+
+def get_decision_history(
+    orch_id: Optional[str] = None, agent_id: Optional[str] = None
+) -> tuple:
+    _delay()
+    decisions = [
+        d
+        for d in _decisions
+        if (orch_id is None or d.get("orchestration_id") == orch_id)
+        and (agent_id is None or d.get("agent_id") == agent_id)
+    ]
+    return {"decisions": decisions}, 200
+
+
+def get_audit_trail() -> tuple:
+    _delay()
+    return {"trail": list(_decisions)}, 200
+
+
+# ── Covenants ────────────────────────────────────────────────────────────────
+
+
+def create_covenant(body: Dict[str, Any]) -> tuple:
+    _delay()
+    covenant = dict(
+        body, id=_id("cov"), status="unsigned", signatures=[], created_at=_now()
+    )
+    _covenants[covenant["id"]] = covenant
+    return {
+        k: covenant[k] for k in ("id", "title", "status", "created_at") if k in covenant
+    }, 201
+
+
+def list_covenants(status: Optional[str] = None) -> tuple:
+    _delay()
+    return {
+        "covenants": [
+            c for c in _covenants.values() if status is None or c["status"] == status
+        ]
+    }, 200
+
+
+def validate_covenant(cov_id: str) -> tuple:
+    _delay()
+    covenant = _covenants.get(cov_id)
+    if covenant is None:
+        return {"error": "Covenant not found"}, 404
+    signed = {s.get("signatory") for s in covenant["signatures"]}
+    violations = [
+        f"unsigned:{p}" for p in covenant.get("parties", []) if p not in signed
+    ]
+    return {"id": cov_id, "valid": not violations, "violations": violations}, 200
+
+
+def sign_covenant(cov_id: str, body: Dict[str, Any]) -> tuple:
+    _delay()
+    covenant = _covenants.get(cov_id)
+    if covenant is None:
+        return {"error": "Covenant not found"}, 404
+    covenant["signatures"].append(body)
+    covenant["status"] = "signed"
+    return covenant, 200
+
+
+# ── Metrics & KPIs ───────────────────────────────────────────────────────────
+
+
+def record_metric(body: Dict[str, Any]) -> tuple:
+    _delay()
+    return _record_metric(body)
+
+
+def _record_metric(body: Dict[str, Any]) -> tuple:
+    name = body.get("name")
+    if not name or not isinstance(body.get("value"), (int, float)):
+        return {"error": "name and numeric value are required"}, 400
+    point = {"timestamp": body.get("timestamp") or _now(), "value": body["value"]}
+    with _lock:
+        _metrics.setdefault(name, []).append(point)
+    return dict(body, timestamp=point["timestamp"]), 201
+
+
+def get_metrics(name: str = "") -> tuple:
+    _delay()
+    return {"name": name, "series": list(_metrics.get(name, []))}, 200
+
+
+def create_kpi(body: Dict[str, Any]) -> tuple:
+    _delay()
+    if not body.get("name"):
+        return {"error": "name is required"}, 400
+    _kpis[body["name"]] = dict(body)
+    return dict(body), 201
+
+
+def get_kpi_dashboard() -> tuple:
+    _delay()
+    kpis = []
+    for name, kpi in _kpis.items():
+        series = _metrics.get(name, [])
+        current = series[-1]["value"] if series else None
+        target = kpi.get("target")
+        on_track = current is not None and target is not None and current >= target
+        kpis.append(
+            {
+                "name": name,
+                "target": target,
+                "current": current,
+                "status": "on_track" if on_track else "at_risk",
+            }
+        )
+    return {"kpis": kpis}, 200
+
+
+# ── MCP / agent catalog proxies (async, stubbed) ─────────────────────────────
+
+
+async def list_mcp_servers(server_type: Optional[str] = None) -> tuple:
+    await _proxy("list_mcp_servers")
+    servers = [
+        {"name": "erpnext", "type": "erp", "status": "online"},
+        {"name": "salesforce", "type": "crm", "status": "online"},
+    ]
+    return {"servers": [s for s in servers if server_type in (None, s["type"])]}, 200
+
+
+async def call_mcp_tool(server: str, tool: str, body: bytes) -> tuple:
+    await _proxy("call_mcp_tool")
+    return body or b"{}", 200
+
+
+async def get_mcp_server_status(server: str) -> tuple:
+    await _proxy("get_mcp_server_status")
+    return {
+        "server": server,
+        "status": "online",
+        "tools": ["search"],
+        "last_health_check": _now(),
+    }, 200
+
+
+_CATALOG = [
+    {
+        "agent_id": aid,
+        "name": f"{aid.upper()} Agent",
+        "agent_type": f"{aid.upper()}Agent",
+        "capabilities": [],
+    }
+    for aid in ("ceo", "cfo", "cto", "cso", "cmo")
+]
+
+
+async def list_agents(agent_type: Optional[str] = None) -> tuple:
+    await _proxy("list_agents")
+    return {
+        "agents": [a for a in _CATALOG if agent_type in (None, a["agent_type"])]
+    }, 200
+
+
+async def get_agent_descriptor(agent_id: str) -> tuple:
+    await _proxy("get_agent_descriptor")
+    for agent in _CATALOG:
+        if agent["agent_id"] == agent_id:
+            return dict(agent, model="gpt-4o", status="online"), 200
+    return {"error": "Agent not found"}, 404
+
+
+# ── Agents ───────────────────────────────────────────────────────────────────
+
+
+def register_agent(body: Dict[str, Any]) -> tuple:
+    _delay()
+    agent_id = body.get("agent_id")
+    if not agent_id:
+        return {"error": "agent_id is required"}, 400
+    if project_client is not None:
+        foundry_id = project_client.agents.create_agent(
+            model=body.get("model", "gpt-4o"),
+            name=agent_id,
+            instructions=body.get("purpose"),
+        ).id
+    else:
+        foundry_id = _id("foundry")
+    _agents[agent_id] = dict(body, foundry_agent_id=foundry_id)
+    return {
+        "agent_id": agent_id,
+        "foundry_agent_id": foundry_id,
+        "status": "registered",
+    }, 201
+
+
+def ask_agent(agent_id: str, body: Dict[str, Any]) -> tuple:
+    if agent_id in AGENT_LATENCY:
+        time.sleep(AGENT_LATENCY[agent_id])
+    else:
+        _delay()
+    reply = f"{agent_id}: {body.get('message', '')}"
+    return {"agent_id": agent_id, "response": reply, "confidence": 0.9}, 200
+
+
+def send_to_agent(agent_id: str) -> tuple:
+    _delay()
+    return None, 202
+
+
+def message_agent(agent_id: str, body: Dict[str, Any]) -> tuple:
+    registered = _agents.get(agent_id)
+    if project_client is None or registered is None:
+        _delay()
+        return {"message_id": _id("msg"), "status": "delivered"}, 200
+    agents = project_client.agents
+    agent = agents.get_agent(registered["foundry_agent_id"])
+    thread = agents.threads.create()
+    try:
+        message = agents.messages.create(
+            thread_id=thread.id, role="user", content=body.get("message", "")
+        )
+        agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
+    finally:
+        agents.threads.delete(thread.id)
+    return {
+        "message_id": message.id,
+        "status": "delivered",
+        "thread_id": thread.id,
+    }, 200
+
+
+# ── Network ──────────────────────────────────────────────────────────────────
+
+
+def discover_peers() -> tuple:
+    _delay()
+    return {"peers": [{"app_name": name, "status": "online"} for name in _apps]}, 200
+
+
+def join_network(network_id: str) -> tuple:
+    _delay()
+    network = _networks.setdefault(
+        network_id, {"network_id": network_id, "members": []}
+    )
+    network["members"].append("aos-dispatcher")
+    return {"network_id": network_id, "status": "joined"}, 200
+
+
+def list_networks() -> tuple:
+    _delay()
+    return {
+        "networks": [
+            {"network_id": n["network_id"], "members": len(n["members"])}
+            for n in _networks.values()
+        ]
+    }, 200
+
+
+def _bulk_record_metrics(bodies: List[Dict[str, Any]]) -> List[tuple]:
+    _delay()
+    return [_record_metric(body) for body in bodies]
+
+
+def _bulk_log_decisions(bodies: List[Dict[str, Any]]) -> List[tuple]:
+    _delay()
+    return [_log_decision(body) for body in bodies]
+
+
+def use_bulk_writes(enabled: bool = True) -> None:
+    """Export (or withdraw) ``record_metrics`` and ``log_decisions``."""
+    module = sys.modules[__name__]
+    bulk = {
+        "record_metrics": _bulk_record_metrics,
+        "log_decisions": _bulk_log_decisions,
+    }
+    for name, fn in bulk.items():
+        if enabled:
+            setattr(module, name, fn)
+        elif hasattr(module, name):
+            delattr(module, name)
+
+
+def install() -> types.ModuleType:
+    """Register this module as ``aos_dispatcher.dispatcher`` and return it."""
+    module = sys.modules[__name__]
+    package = sys.modules.get("aos_dispatcher")
+    if package is None:
+        package = types.ModuleType("aos_dispatcher")
+        package.__path__ = []  # type: ignore[attr-defined]
+        sys.modules["aos_dispatcher"] = package
+    package.dispatcher = module  # type: ignore[attr-defined]
+    sys.modules["aos_dispatcher.dispatcher"] = module
+    return module
@@ -0,0 +1,34 @@
+"""Shared helpers for the benchmark scripts: timing summaries and JSON output."""
+
+from __future__ import annotations
+
+import json
+import math
+import sys
+from typing import Any, Dict, Iterable, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the *pct* percentile (0–100) of *samples* (nearest-rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(pct * len(ordered) / 100)
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def latency_summary(samples: Iterable[float]) -> Dict[str, float]:
+    """Summarise latencies given in seconds as milliseconds."""
+    values = list(samples)
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(max(values, default=0.0) * 1000, 3),
+    }
+
+
+def emit(report: Dict[str, Any]) -> None:
+    """Write a benchmark report to stdout as indented JSON."""
+    json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
@@ -0,0 +1,189 @@
+"""Multi-tenant orchestration load with and without admission control.
+
+Simulates ``--seconds`` of submissions from several apps against a Foundry
+stand-in that can run ``--capacity`` orchestrations at once: a run started
+beyond that is rate-limited (fails at once), otherwise it takes
+``--run-ms`` (±50%).  Arrivals are Poisson per app:
+
+    flood     ``--flood-rate`` submissions/s (one misbehaving client app)
+    quiet-N   ``--quiet-rate`` submissions/s each (``--quiet-apps`` apps);
+              ``--high-share`` of their submissions are ``priority=high``
+
+Modes:
+
+    direct      every submission starts a run immediately (no admission)
+    admission   :class:`~aos_dispatcher_azure.admission.AdmissionController`
+                with ``max_running = --capacity`` and ``--app-quota`` per app;
+                submissions wait at most ``--max-wait-ms`` or get ``429``
+
+Reported per app: submitted, completed, rate_limited (failed in Foundry),
+rejected (``429`` at admission), admission wait and submit-to-finish
+latency for completed runs.
+
+Usage::
+
+    python -m benchmarks.bench_admission --seconds 5 --flood-rate 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aos_dispatcher_azure.admission import AdmissionController, AdmissionRejected
+
+from ._common import emit, latency_summary
+
+
+class Foundry:
+    """Runs orchestrations with a hard concurrency limit."""
+
+    def __init__(self, capacity: int, run_s: float, rng: random.Random) -> None:
+        self.capacity = capacity
+        self.run_s = run_s
+        self.rng = rng
+        self.running = 0
+        self.peak = 0
+        self._ids = itertools.count()
+        self.finished: Dict[str, asyncio.Future] = {}
+
+    def start(self, on_finish) -> tuple:
+        orch_id = f"orch-{next(self._ids)}"
+        done = asyncio.get_running_loop().create_future()
+        self.finished[orch_id] = done
+        if self.running >= self.capacity:
+            done.set_result("rate_limited")
+            asyncio.get_running_loop().call_soon(on_finish, orch_id)
+            return {"orchestration_id": orch_id, "status": "submitted"}, 202
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        duration = self.run_s * self.rng.uniform(0.5, 1.5)
+
+        def complete() -> None:
+            self.running -= 1
+            done.set_result("completed")
+            on_finish(orch_id)
+
+        asyncio.get_running_loop().call_later(duration, complete)
+        return {"orchestration_id": orch_id, "status": "submitted"}, 202
+
+
+async def _simulate(args: argparse.Namespace, admission: Optional[AdmissionController]):
+    rng = random.Random(args.seed)
+    foundry = Foundry(args.capacity, args.run_ms / 1000, rng)
+    on_finish = admission.finish if admission is not None else (lambda _: None)
+    stats: Dict[str, Dict[str, Any]] = {}
+    tasks: List[asyncio.Task] = []
+
+    async def one(app: str, priority: str) -> None:
+        record = stats[app]
+        record["submitted"] += 1
+        submitted = time.perf_counter()
+
+        async def call() -> tuple:
+            record["waits"].append(time.perf_counter() - submitted)
+            return foundry.start(on_finish)
+
+        try:
+            if admission is None:
+                body, _ = await call()
+            else:
+                body, _ = await admission.submit(
+                    app, call, priority=priority, max_wait=args.max_wait_ms / 1000
+                )
+        except AdmissionRejected:
+            record["rejected"] += 1
+            return
+        outcome = await foundry.finished[body["orchestration_id"]]
+        record[outcome] += 1
+        if outcome == "completed":
+            record["latencies"].append(time.perf_counter() - submitted)
+
+    async def arrivals(app: str, rate: float, high_share: float) -> None:
+        stats[app] = {
+            "submitted": 0,
+            "completed": 0,
+            "rate_limited": 0,
+            "rejected": 0,
+            "waits": [],
+            "latencies": [],
+        }
+        deadline = time.perf_counter() + args.seconds
+        while True:
+            await asyncio.sleep(rng.expovariate(rate))
+            if time.perf_counter() >= deadline:
+                return
+            priority = "high" if rng.random() < high_share else "normal"
+            tasks.append(asyncio.ensure_future(one(app, priority)))
+
+    apps = [("flood", args.flood_rate, 0.0)]
+    apps += [
+        (f"quiet-{i}", args.quiet_rate, args.high_share) for i in range(args.quiet_apps)
+    ]
+    if admission is not None:
+        # Unregistered apps share one bucket; register each so fairness applies.
+        for app, _, _ in apps:
+            admission.configure_app(app)
+    await asyncio.gather(*(arrivals(*app) for app in apps))
+    await asyncio.gather(*tasks)
+    report: Dict[str, Any] = {"foundry_peak_running": foundry.peak, "apps": {}}
+    for app, record in stats.items():
+        report["apps"][app] = {
+            "submitted": record["submitted"],
+            "completed": record["completed"],
+            "rate_limited": record["rate_limited"],
+            "rejected": record["rejected"],
+            "admission_wait": latency_summary(record["waits"]),
+            "completed_latency": latency_summary(record["latencies"]),
+        }
+    if admission is not None:
+        report["controller_waits"] = {
+            app: {k: v for k, v in snapshot.items() if k.startswith("wait_ms")}
+            for app, snapshot in admission.snapshot()["apps"].items()
+        }
+    return report
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "seconds": args.seconds,
+        "capacity": args.capacity,
+        "run_ms": args.run_ms,
+        "flood_rate": args.flood_rate,
+        "quiet_rate": args.quiet_rate,
+        "quiet_apps": args.quiet_apps,
+        "app_quota": args.app_quota,
+    }
+    report["direct"] = asyncio.run(_simulate(args, None))
+    controller = AdmissionController(
+        max_running=args.capacity,
+        app_max_running=args.app_quota,
+        max_queue=args.max_queue,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    report["admission"] = asyncio.run(_simulate(args, controller))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--run-ms", type=float, default=200.0)
+    parser.add_argument("--flood-rate", type=float, default=300.0)
+    parser.add_argument("--quiet-rate", type=float, default=10.0)
+    parser.add_argument("--quiet-apps", type=int, default=3)
+    parser.add_argument("--high-share", type=float, default=0.2)
+    parser.add_argument("--app-quota", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=100)
+    parser.add_argument("--max-wait-ms", type=float, default=500.0)
+    parser.add_argument("--seed", type=int, default=7)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
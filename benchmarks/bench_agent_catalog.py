@@ -0,0 +1,117 @@
+"""Latency and upstream calls of the agent catalog proxy, with and without caching.
+
+Models the start of a BusinessInfinity workflow: ``GET /api/agents`` followed
+by ``GET /api/agents/{id}`` for two agents.  ``--workflows`` of them run with
+``--concurrency`` in flight against the in-memory dispatcher backend
+(``benchmarks._backend``), whose proxied catalog calls take ``--upstream-ms``.
+Every ``--register-every`` workflows an agent is registered, invalidating the
+cache.
+
+Reported per mode (``uncached`` / ``cached``): workflows/s, per-workflow
+latency, upstream catalog calls, and the cache counters.
+
+Usage::
+
+    python -m benchmarks.bench_agent_catalog --workflows 2000 --upstream-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import azure.functions as func
+
+from . import _backend
+from ._common import emit, latency_summary
+
+AGENTS = ("ceo", "cfo", "cto", "cso", "cmo")
+
+
+def _get(route: str, **route_params: str) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="GET",
+        url=f"http://localhost/api/{route}",
+        route_params=route_params,
+        body=b"",
+    )
+
+
+async def _workflow(function_app: Any, index: int, args: argparse.Namespace) -> None:
+    if args.register_every and index % args.register_every == 0:
+        body = json.dumps({"agent_id": AGENTS[index % len(AGENTS)], "purpose": "bench"})
+        await function_app.register_agent(
+            func.HttpRequest(
+                method="POST",
+                url="http://localhost/api/agents/register",
+                body=body.encode(),
+            )
+        )
+    listed = await function_app.list_agents(_get("agents"))
+    assert listed.status_code == 200
+    for offset in (0, 1):
+        agent_id = AGENTS[(index + offset) % len(AGENTS)]
+        response = await function_app.get_agent_descriptor(
+            _get(f"agents/{agent_id}", agent_id=agent_id)
+        )
+        assert response.status_code == 200
+
+
+async def _drive(function_app: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await _workflow(function_app, index, args)
+            latencies.append(time.perf_counter() - start)
+
+    _backend.PROXY_CALLS.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.workflows)))
+    elapsed = time.perf_counter() - start
+    return {
+        "workflows_per_s": round(args.workflows / elapsed),
+        "latency": latency_summary(latencies),
+        "upstream_calls": dict(_backend.PROXY_CALLS),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    _backend.PROXY_LATENCY = args.upstream_ms / 1000
+    import function_app
+
+    caches = (function_app._agent_catalog, function_app._agent_descriptors)
+    report: Dict[str, Any] = {
+        "workflows": args.workflows,
+        "concurrency": args.concurrency,
+        "upstream_ms": args.upstream_ms,
+        "register_every": args.register_every,
+    }
+    for cache in caches:
+        cache.enabled = False
+    report["uncached"] = await _drive(function_app, args)
+    for cache in caches:
+        cache.enabled = True
+        cache.clear()
+    report["cached"] = await _drive(function_app, args)
+    report["cached"]["caches"] = {cache.name: cache.snapshot() for cache in caches}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--workflows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--upstream-ms", type=float, default=20.0)
+    parser.add_argument("--register-every", type=int, default=500)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
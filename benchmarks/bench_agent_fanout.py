@@ -0,0 +1,125 @@
+"""Wall time of a boardroom review: sequential ``ask_agent`` calls vs. one fan-out.
+
+Five stub agents (CEO, CFO, CTO, CSO, CMO) answer ``ask_agent`` after a fixed
+delay each (``--agent-ms``, one value per agent) in the in-memory dispatcher
+backend (``benchmarks._backend``).  A review asks all of them the same
+question, ``--reviews`` times per mode:
+
+    sequential   one ``POST /api/agents/{id}/ask`` after the other, as a
+                 client does today
+    fanout       one ``POST /api/agents/ask`` for all agents
+
+Reported per mode: review latency, and for ``fanout`` the per-agent latency
+it attributes.  ``expected_ms`` gives the sum and the maximum of the agent
+delays.  A last review sets ``timeout`` below the slowest agent (``--deadline-ms``)
+to show the partial result.
+
+Usage::
+
+    python -m benchmarks.bench_agent_fanout --agent-ms 120 300 180 90 240
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import azure.functions as func
+
+from . import _backend
+from ._common import emit, latency_summary
+
+AGENTS = ("ceo", "cfo", "cto", "cso", "cmo")
+PROMPT = {"message": "Should we expand into the EU market next quarter?"}
+
+
+def _post(route: str, body: Dict[str, Any], **route_params: str) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url=f"http://localhost/api/{route}",
+        route_params=route_params,
+        body=json.dumps(body).encode(),
+    )
+
+
+async def _sequential(function_app: Any) -> None:
+    for agent_id in AGENTS:
+        response = await function_app.ask_agent(
+            _post(f"agents/{agent_id}/ask", PROMPT, agent_id=agent_id)
+        )
+        assert response.status_code == 200
+
+
+async def _fanout(function_app: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+    body = dict(PROMPT, agent_ids=list(AGENTS))
+    if timeout is not None:
+        body["timeout"] = timeout
+    response = await function_app.ask_agents(_post("agents/ask", body))
+    return json.loads(response.get_body())
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    _backend.AGENT_LATENCY.update(
+        {agent_id: ms / 1000 for agent_id, ms in zip(AGENTS, args.agent_ms)}
+    )
+    import function_app
+
+    report: Dict[str, Any] = {
+        "agents": dict(zip(AGENTS, args.agent_ms)),
+        "reviews": args.reviews,
+        "expected_ms": {"sum": sum(args.agent_ms), "max": max(args.agent_ms)},
+    }
+    sequential: List[float] = []
+    for _ in range(args.reviews):
+        started = time.perf_counter()
+        await _sequential(function_app)
+        sequential.append(time.perf_counter() - started)
+    report["sequential"] = {"latency": latency_summary(sequential)}
+
+    fanout: List[float] = []
+    per_agent: Dict[str, List[float]] = {agent_id: [] for agent_id in AGENTS}
+    for _ in range(args.reviews):
+        started = time.perf_counter()
+        body = await _fanout(function_app)
+        fanout.append(time.perf_counter() - started)
+        assert not body["timed_out"]
+        for result in body["results"]:
+            per_agent[result["agent_id"]].append(result["latency_ms"] / 1000)
+    report["fanout"] = {
+        "latency": latency_summary(fanout),
+        "per_agent": {
+            agent_id: latency_summary(v) for agent_id, v in per_agent.items()
+        },
+    }
+
+    body = await _fanout(function_app, timeout=args.deadline_ms / 1000)
+    report["partial"] = {
+        "timeout_ms": args.deadline_ms,
+        "answered": [result["agent_id"] for result in body["results"]],
+        "timed_out": body["timed_out"],
+        "elapsed_ms": body["elapsed_ms"],
+    }
+    # Let abandoned calls finish before the pool shuts down.
+    await asyncio.sleep(max(args.agent_ms) / 1000)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--agent-ms",
+        type=float,
+        nargs=len(AGENTS),
+        default=[120.0, 300.0, 180.0, 90.0, 240.0],
+    )
+    parser.add_argument("--reviews", type=int, default=20)
+    parser.add_argument("--deadline-ms", type=float, default=200.0)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Append throughput and query latency of the audit log at scale.
+
+Appends ``--entries`` decisions (default 10M) to a fresh
+:class:`~aos_dispatcher_azure.auditlog.AuditLog` in a temporary directory
+under ``--dir``, ``--batch`` per call as the batch endpoint does.  Decisions
+belong to ``entries / 10`` orchestrations and ``--agents`` agents and are one
+second apart.
+
+Reported:
+
+    append          records/s for batched appends, and the latency of
+                    ``--single`` one-decision appends at the end of the log
+    open            re-opening the log (another worker's cold start)
+    queries         latency of history by orchestration, by agent (first
+                    page of ``--page``), by both, a one-hour window, and a
+                    trail page at a random cursor — before and after
+                    compaction
+    scan_baseline   the orchestration query as a linear scan of an in-memory
+                    list of ``--scan-entries`` decisions (what
+                    ``get_decision_history`` does in the library)
+    compaction      merges, time and segment count
+    verify          walking the whole hash chain (``--verify``)
+
+Usage::
+
+    python -m benchmarks.bench_audit_log --entries 10000000 --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from aos_dispatcher_azure.auditlog import AuditLog
+from aos_dispatcher_azure.pagination import encode_cursor
+
+from ._common import emit, latency_summary
+
+BASE = 1_767_225_600.0  # 2026-01-01T00:00:00Z
+TITLES = (
+    "Approve budget",
+    "Expand to new market",
+    "Hire CFO",
+    "Renegotiate supplier terms",
+)
+
+
+def _decision(n: int, agents: int) -> Dict[str, Any]:
+    return {
+        "id": f"decision-{n:012x}",
+        "title": TITLES[n % len(TITLES)],
+        "agent_id": f"agent-{n % agents}",
+        "orchestration_id": f"orch-{n // 10:08d}",
+        "rationale": "Projected ROI exceeds the hurdle rate under all three scenarios.",
+        "confidence": 0.5 + (n % 50) / 100,
+        "timestamp": BASE + n,
+    }
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _queries(
+    log: AuditLog, args: argparse.Namespace, rng: random.Random
+) -> Dict[str, Any]:
+    n = args.entries
+    orchestrations = max(1, n // 10)
+
+    def by_orchestration() -> None:
+        body, _ = log.decision_history(
+            orch_id=f"orch-{rng.randrange(orchestrations):08d}"
+        )
+        assert body["decisions"]
+
+    def by_agent() -> None:
+        agent = f"agent-{rng.randrange(args.agents)}"
+        body, _ = log.decision_history(agent_id=agent, limit=args.page)
+        assert len(body["decisions"]) == min(args.page, n // args.agents)
+
+    def by_both() -> None:
+        orch = rng.randrange(orchestrations)
+        log.decision_history(
+            orch_id=f"orch-{orch:08d}", agent_id=f"agent-{orch % args.agents}"
+        )
+
+    def one_hour() -> None:
+        start = BASE + rng.randrange(max(1, n - 3600))
+        body, _ = log.decision_history(start=start, end=start + 3600, limit=args.page)
+        assert body["decisions"]
+
+    def trail_page() -> None:
+        cursor = encode_cursor("get_audit_trail", rng.randrange(n))
+        log.audit_trail(limit=args.page, cursor=cursor)
+
+    return {
+        name: latency_summary(_timed(fn, args.queries))
+        for name, fn in (
+            ("by_orchestration", by_orchestration),
+            (f"by_agent_first_{args.page}", by_agent),
+            ("by_orchestration_and_agent", by_both),
+            (f"one_hour_window_first_{args.page}", one_hour),
+            (f"trail_page_{args.page}", trail_page),
+        )
+    }
+
+
+def _scan_baseline(args: argparse.Namespace, rng: random.Random) -> Dict[str, Any]:
+    n = args.scan_entries
+    decisions = [_decision(i, args.agents) for i in range(n)]
+
+    def scan() -> None:
+        orch_id = f"orch-{rng.randrange(max(1, n // 10)):08d}"
+        [d for d in decisions if d.get("orchestration_id") == orch_id]
+
+    return {"entries": n, "by_orchestration": latency_summary(_timed(scan, 20))}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="aos-audit-", dir=args.dir)
+    report: Dict[str, Any] = {
+        "entries": args.entries,
+        "batch": args.batch,
+        "agents": args.agents,
+    }
+    try:
+        log = AuditLog(directory, shared=args.shared)
+        log.open()
+        started = time.perf_counter()
+        for first in range(0, args.entries, args.batch):
+            last = min(first + args.batch, args.entries)
+            log.append([_decision(n, args.agents) for n in range(first, last)])
+        elapsed = time.perf_counter() - started
+        single = []
+        for n in range(args.entries, args.entries + args.single):
+            decision = _decision(n, args.agents)
+            started = time.perf_counter()
+            log.append([decision])
+            single.append(time.perf_counter() - started)
+        args.entries += args.single
+        report["append"] = {
+            "records_per_s": round(args.entries / elapsed),
+            "us_per_record": round(elapsed / args.entries * 1e6, 2),
+            "single": latency_summary(single),
+        }
+        log.close()
+
+        started = time.perf_counter()
+        log = AuditLog(directory, shared=args.shared)
+        log.open()
+        report["open_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        report["log"] = log.snapshot()
+        report["queries"] = _queries(log, args, rng)
+
+        started = time.perf_counter()
+        merges = log.compact()
+        report["compaction"] = {
+            "merges": merges,
+            "seconds": round(time.perf_counter() - started, 3),
+            "segments_after": log.snapshot()["segments"],
+        }
+        report["queries_compacted"] = _queries(log, args, rng)
+        if args.verify:
+            started = time.perf_counter()
+            result = log.verify()
+            report["verify"] = {
+                "valid": result["valid"],
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+        log.close()
+        report["scan_baseline"] = _scan_baseline(args, rng)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--single", type=int, default=2000, help="one-decision appends")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-entries", type=int, default=1_000_000)
+    parser.add_argument(
+        "--shared", action="store_true", help="take the append lock file"
+    )
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument(
+        "--dir", default=os.environ.get("TMPDIR"), help="parent directory"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
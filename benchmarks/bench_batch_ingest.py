@@ -0,0 +1,145 @@
+"""Items/sec for single-item vs. batched ingest of metric points.
+
+Drives the real ``function_app`` handlers in-process against the in-memory
+dispatcher backend (``benchmarks._backend``):
+
+    single    one ``POST /api/metrics`` per point, ``--concurrency`` in flight
+    batch_N   ``POST /api/metrics/batch`` with N points per request (JSON
+              array), ``--concurrency`` requests in flight
+
+Each request pays ``--invoke-ms`` of simulated Functions host overhead (the
+host → worker hop that an in-process benchmark otherwise skips) and each
+dispatcher write takes ``--write-us``.
+
+Usage::
+
+    python -m benchmarks.bench_batch_ingest --points 20000 --batch-sizes 100,1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import azure.functions as func
+
+from . import _backend
+from ._common import emit, latency_summary
+
+
+def _point(i: int) -> Dict[str, Any]:
+    return {
+        "name": f"bench.metric.{i % 50}",
+        "value": float(i),
+        "tags": {"agent": "cfo"},
+    }
+
+
+def _request(route: str, body: bytes) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url=f"http://localhost/api/{route}",
+        headers={"Content-Type": "application/json"},
+        body=body,
+    )
+
+
+async def _drive(
+    handler: Any, bodies: List[bytes], route: str, concurrency: int, invoke_s: float
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(body: bytes) -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            if invoke_s:
+                await asyncio.sleep(invoke_s)
+            response = await handler(_request(route, body))
+            if response.status_code >= 300:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    return {
+        "elapsed_s": time.perf_counter() - start,
+        "latencies": latencies,
+        "failures": failures,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    _backend.LATENCY = args.write_us / 1_000_000
+    import function_app
+
+    points = [_point(i) for i in range(args.points)]
+    invoke_s = args.invoke_ms / 1000
+    report: Dict[str, Any] = {
+        "points": args.points,
+        "concurrency": args.concurrency,
+        "invoke_ms": args.invoke_ms,
+        "write_us": args.write_us,
+        "results": {},
+    }
+
+    singles = [json.dumps(point).encode() for point in points]
+    runs = [("single", function_app.record_metric, "metrics", singles)]
+    for size in args.batch_sizes:
+        bodies = [
+            json.dumps(points[i : i + size]).encode()
+            for i in range(0, len(points), size)
+        ]
+        runs.append(
+            (
+                f"batch_{size}",
+                function_app.record_metrics_batch,
+                "metrics/batch",
+                bodies,
+            )
+        )
+
+    for label, handler, route, bodies in runs:
+        _backend.reset()
+        function_app._executor.reset()
+        outcome = await _drive(handler, bodies, route, args.concurrency, invoke_s)
+        stored = sum(len(series) for series in _backend._metrics.values())
+        report["results"][label] = {
+            "requests": len(bodies),
+            "failed_requests": outcome["failures"],
+            "points_stored": stored,
+            "elapsed_s": round(outcome["elapsed_s"], 3),
+            "items_per_s": round(stored / outcome["elapsed_s"], 1),
+            "request_latency": latency_summary(outcome["latencies"]),
+        }
+    single = report["results"]["single"]["items_per_s"]
+    for label, result in report["results"].items():
+        result["speedup_vs_single"] = (
+            round(result["items_per_s"] / single, 2) if single else None
+        )
+    function_app._executor.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument(
+        "--batch-sizes",
+        type=lambda raw: [int(size) for size in raw.split(",")],
+        default=[100, 1000],
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--invoke-ms", type=float, default=1.0)
+    parser.add_argument("--write-us", type=float, default=20.0)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Encode/decode cost and size of response bodies per codec, across payload sizes.
+
+Payloads are shaped like the high-volume endpoints: a metric series
+(``GET /api/metrics``), a decision history (``GET /api/audit/decisions``) and
+an orchestration status poll, with ``--sizes`` rows each (the status poll is
+always one object).  For each payload and codec:
+
+    encode_us / decode_us   Mean per call over ``--repeat`` calls
+    bytes                   Encoded size
+
+Codecs: ``stdlib`` (``json.dumps`` / ``json.loads``, the previous path),
+``orjson`` and ``msgpack`` when installed.  ``response`` rows time the whole
+``Codec.encode_response`` path (serialize + compress) with ``gzip`` and ``br``
+for the ``orjson`` codec, reporting the bytes actually sent.
+
+Usage::
+
+    python -m benchmarks.bench_codec --sizes 1,100,1000,10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict
+
+from aos_dispatcher_azure.codec import Codec, brotli, msgpack, orjson
+
+from ._common import emit
+
+
+def _metric_series(rows: int) -> Dict[str, Any]:
+    return {
+        "name": "orchestration.latency_ms",
+        "points": [
+            {
+                "timestamp": f"2026-10-16T12:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                "value": i * 1.25,
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+def _decisions(rows: int) -> Dict[str, Any]:
+    return {
+        "decisions": [
+            {
+                "id": f"decision-{i:08d}",
+                "agent_id": ("ceo", "cfo", "cto")[i % 3],
+                "decision": "approve" if i % 4 else "escalate",
+                "rationale": "Within delegated budget; risk score below threshold.",
+                "confidence": 0.87,
+                "context": {"orchestration_id": f"orch-{i // 10:06d}", "round": i % 5},
+                "timestamp": "2026-10-16T12:00:00Z",
+            }
+            for i in range(rows)
+        ]
+    }
+
+
+def _status(_: int) -> Dict[str, Any]:
+    return {
+        "orchestration_id": "orch-000042",
+        "status": "running",
+        "progress": 0.42,
+        "agents": ["ceo", "cfo", "cto"],
+        "updated_at": "2026-10-16T12:00:00Z",
+    }
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1e6, 2)
+
+
+def _measure(payload: Any, repeat: int) -> Dict[str, Any]:
+    codecs: Dict[str, Any] = {
+        "stdlib": (lambda: json.dumps(payload).encode("utf-8"), json.loads),
+    }
+    if orjson is not None:
+        codecs["orjson"] = (lambda: orjson.dumps(payload), orjson.loads)
+    if msgpack is not None:
+        codecs["msgpack"] = (
+            lambda: msgpack.packb(payload, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    report: Dict[str, Any] = {}
+    for name, (encode, decode) in codecs.items():
+        encoded = encode()
+        report[name] = {
+            "encode_us": _time(encode, repeat),
+            "decode_us": _time(lambda: decode(encoded), repeat),
+            "bytes": len(encoded),
+        }
+    codec = Codec(min_compress_bytes=1024)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        sent = codec.encode_response(payload, accept_encoding=encoding)[0]
+        report[f"response_{codec.json_codec}_{encoding}"] = {
+            "encode_us": _time(
+                lambda: codec.encode_response(payload, accept_encoding=encoding), repeat
+            ),
+            "bytes": len(sent),
+        }
+    return report
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "codecs": {
+            "orjson": orjson is not None,
+            "msgpack": msgpack is not None,
+            "brotli": brotli is not None,
+        }
+    }
+    for label, build in (("metric_series", _metric_series), ("decisions", _decisions)):
+        report[label] = {}
+        for rows in (int(size) for size in args.sizes.split(",")):
+            repeat = max(3, args.repeat // rows)
+            report[label][str(rows)] = _measure(build(rows), repeat)
+    report["status_poll"] = _measure(_status(1), args.repeat)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sizes", default="1,100,1000,10000")
+    parser.add_argument(
+        "--repeat", type=int, default=20000, help="calls for a 1-row payload"
+    )
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
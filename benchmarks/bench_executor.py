@@ -0,0 +1,97 @@
+"""Concurrent throughput of async handlers with and without the executor layer.
+
+Simulates ``maxConcurrentRequests`` handlers that each make one blocking
+dispatcher call.  ``inline`` calls the function directly on the event loop
+(the behaviour before ``DispatcherExecutor``); ``executor`` sends it to the
+bounded pool.
+
+Usage::
+
+    python -m benchmarks.bench_executor --requests 400 --concurrency 100 \\
+        --call-ms 20 --workers 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, Dict, List
+
+from aos_dispatcher_azure.execution import DispatcherExecutor
+
+from ._common import emit, latency_summary
+
+
+def make_blocking_call(call_ms: float) -> Callable[..., Any]:
+    def process_orchestration_request(body: Dict[str, Any]) -> tuple:
+        time.sleep(call_ms / 1000)
+        return {
+            "orchestration_id": body["orchestration_id"],
+            "status": "submitted",
+        }, 202
+
+    return process_orchestration_request
+
+
+async def drive(
+    handler: Callable[[int], Any], requests: int, concurrency: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        arrived = time.perf_counter()
+        async with gate:
+            await handler(i)
+        latencies.append(time.perf_counter() - arrived)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        **latency_summary(latencies),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    call = make_blocking_call(args.call_ms)
+
+    async def inline(i: int) -> Any:
+        return call({"orchestration_id": f"orch-{i}"})
+
+    executor = DispatcherExecutor(max_workers=args.workers)
+
+    async def pooled(i: int) -> Any:
+        return await executor.run(
+            "submit_orchestration", call, {"orchestration_id": f"orch-{i}"}
+        )
+
+    before = await drive(inline, args.requests, args.concurrency)
+    after = await drive(pooled, args.requests, args.concurrency)
+    stats = executor.snapshot()
+    executor.shutdown()
+    return {
+        "benchmark": "executor",
+        "params": vars(args),
+        "inline": before,
+        "executor": after,
+        "speedup": round(after["throughput_rps"] / before["throughput_rps"], 2),
+        "executor_stats": stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--call-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=32)
+    emit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
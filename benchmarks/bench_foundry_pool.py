@@ -0,0 +1,174 @@
+"""Foundry round trips and message latency with and without the handle/thread pool.
+
+A local fake ``AIProjectClient`` (:class:`FakeProjectClient`) counts calls
+per operation and sleeps ``--rtt-ms`` per call, plus ``--model-ms`` in
+``runs.create_and_process``.  The in-memory dispatcher backend
+(``benchmarks._backend``) uses it as the library does: per message it resolves
+the agent, creates a thread, posts the message, runs and deletes the thread.
+
+``--agents`` agents are registered, then ``--orchestrations`` orchestrations
+each send ``--messages`` messages to every agent through
+``POST /api/agents/{id}/message`` (``--concurrency`` orchestrations at a
+time, one message per agent at a time), plus the same number of messages
+without an ``orchestration_id``.
+
+Reported per mode (``unpooled`` / ``pooled``): round trips per operation and
+per message, and per-message latency with and without an orchestration; for
+``pooled`` also the pool counters.
+
+Usage::
+
+    python -m benchmarks.bench_foundry_pool --rtt-ms 40 --model-ms 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import azure.functions as func
+
+from . import _backend
+from ._common import emit, latency_summary
+
+
+class FakeProjectClient:
+    """The ``agents`` surface of ``AIProjectClient`` the backend uses, with latency."""
+
+    def __init__(self, rtt: float, model: float) -> None:
+        self.rtt = rtt
+        self.model = model
+        self.calls: Counter = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.agents = SimpleNamespace(
+            create_agent=self._op("agents.create_agent", "asst"),
+            get_agent=self._op("agents.get_agent", None),
+            threads=SimpleNamespace(
+                create=self._op("threads.create", "thread"),
+                delete=self._op("threads.delete", None),
+            ),
+            messages=SimpleNamespace(create=self._op("messages.create", "msg")),
+            runs=SimpleNamespace(
+                create_and_process=self._op("runs.create_and_process", "run")
+            ),
+        )
+
+    def _op(self, name: str, prefix: Optional[str]):
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                self.calls[name] += 1
+                serial = next(self._ids)
+            time.sleep(
+                self.rtt + (self.model if name == "runs.create_and_process" else 0.0)
+            )
+            object_id = f"{prefix}_{serial}" if prefix else (args[0] if args else None)
+            return SimpleNamespace(id=object_id)
+
+        return call
+
+
+def _post(agent_id: str, body: Dict[str, Any]) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url=f"http://localhost/api/agents/{agent_id}/message",
+        route_params={"agent_id": agent_id},
+        body=json.dumps(body).encode(),
+    )
+
+
+async def _drive(
+    function_app: Any, agents: List[str], args: argparse.Namespace
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {"orchestration": [], "standalone": []}
+
+    async def send(agent_id: str, body: Dict[str, Any], kind: str) -> None:
+        started = time.perf_counter()
+        response = await function_app.message_agent(_post(agent_id, body))
+        latencies[kind].append(time.perf_counter() - started)
+        assert response.status_code == 200
+
+    async def conversation(agent_id: str, orch_id: Optional[str]) -> None:
+        for n in range(args.messages):
+            body = {"message": f"Update {n}", "direction": "foundry_to_agent"}
+            if orch_id:
+                body["orchestration_id"] = orch_id
+            await send(agent_id, body, "orchestration" if orch_id else "standalone")
+
+    async def orchestration(index: int) -> None:
+        async with semaphore:
+            orch_id = f"orch-{index:05d}"
+            await asyncio.gather(
+                *(conversation(agent_id, orch_id) for agent_id in agents)
+            )
+            await asyncio.gather(*(conversation(agent_id, None) for agent_id in agents))
+
+    client = _backend.project_client
+    client.calls.clear()
+    await asyncio.gather(*(orchestration(i) for i in range(args.orchestrations)))
+    messages = sum(len(samples) for samples in latencies.values())
+    return {
+        "messages": messages,
+        "round_trips": dict(client.calls),
+        "round_trips_per_message": round(sum(client.calls.values()) / messages, 3),
+        "latency": {
+            kind: latency_summary(samples) for kind, samples in latencies.items()
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    _backend.project_client = FakeProjectClient(
+        args.rtt_ms / 1000, args.model_ms / 1000
+    )
+    import function_app
+
+    function_app._executor.max_workers = max(
+        function_app._executor.max_workers, args.concurrency * args.agents
+    )
+    agents = [f"agent-{n}" for n in range(args.agents)]
+    for agent_id in agents:
+        body = json.dumps({"agent_id": agent_id, "purpose": "bench"}).encode()
+        await function_app.register_agent(
+            func.HttpRequest(
+                method="POST", url="http://localhost/api/agents/register", body=body
+            )
+        )
+    report: Dict[str, Any] = {
+        "rtt_ms": args.rtt_ms,
+        "model_ms": args.model_ms,
+        "agents": args.agents,
+        "orchestrations": args.orchestrations,
+        "messages_per_conversation": args.messages,
+    }
+    pool = function_app._foundry_pool
+    pool.enabled = False
+    report["unpooled"] = await _drive(function_app, agents, args)
+    pool.enabled = True
+    report["pooled"] = await _drive(function_app, agents, args)
+    report["pooled"]["pool"] = pool.snapshot()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    parser.add_argument("--model-ms", type=float, default=300.0)
+    parser.add_argument("--agents", type=int, default=5)
+    parser.add_argument("--orchestrations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Cold-start cost of loading the function app: import profile and first requests.
+
+Every measurement runs in a fresh interpreter (``--repeat`` times; the median
+is reported):
+
+    import_ms          ``import function_app`` — what the host waits for
+                       before it can index the functions
+    first_health_ms    the first ``GET /api/health``
+    first_request_ms   the first dispatcher-backed request
+                       (``GET /api/health?deep=true``)
+    warmup_ms          the ``warmup`` trigger (``lazy_warmup`` only)
+
+Modes:
+
+    eager          ``AOS_LAZY_DISPATCHER=false``: the dispatcher library is
+                   imported with ``function_app`` (the previous behaviour)
+    lazy           the dispatcher library is imported on first use
+    lazy_warmup    as ``lazy``, with the warm-up trigger fired before the
+                   first request
+
+When the ``aos_dispatcher`` library is not installed, a stand-in package that
+re-exports ``benchmarks/_backend.py`` after sleeping ``--dispatcher-import-ms``
+(the library's SDK imports and Foundry client construction) is generated.
+
+``importtime`` summarises ``python -X importtime`` for one ``lazy`` import:
+the cumulative time of ``function_app`` and the ``--top`` modules it imports
+directly, slowest first.  ``--history FILE`` appends the medians and that
+total as one JSON line (with the git commit and date), so import time can be
+tracked across changes.
+
+Usage::
+
+    python -m benchmarks.bench_import_time --repeat 5 --history import_time.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ._common import emit
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("eager", "lazy", "lazy_warmup")
+
+# Runs in the child; json/time are imported before function_app so they do not
+# count towards its import.
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import function_app
+report = {"import_ms": (time.perf_counter() - started) * 1000}
+report["dispatcher_loaded_at_import"] = function_app.dispatcher.loaded
+report["aiohttp_loaded_at_import"] = "aiohttp" in sys.modules
+import asyncio
+import azure.functions as func
+
+def get(url, **params):
+    return func.HttpRequest("GET", url, body=b"", params=params)
+
+async def main():
+    if sys.argv[1] == "lazy_warmup":
+        started = time.perf_counter()
+        await function_app.warmup(None)
+        report["warmup_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    await function_app.health(get("/api/health"))
+    report["first_health_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    await function_app.health(get("/api/health", deep="true"))
+    report["first_request_ms"] = (time.perf_counter() - started) * 1000
+
+asyncio.run(main())
+print(json.dumps(report))
+"""
+
+_STAND_IN = """import time as _time
+
+_time.sleep({seconds})
+
+from benchmarks._backend import *  # noqa: E402,F401,F403
+"""
+
+
+def _stand_in(directory: Path, import_ms: float) -> None:
+    package = directory / "aos_dispatcher"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "dispatcher.py").write_text(_STAND_IN.format(seconds=import_ms / 1000))
+
+
+def _child(
+    mode: str, path: List[str], importtime: bool = False
+) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(path)
+    env["AOS_LAZY_DISPATCHER"] = "false" if mode == "eager" else "true"
+    env.pop("AOS_WARMUP_ON_LOAD", None)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    return subprocess.run(
+        command + ["-c", _CHILD, mode],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _profile(stderr: str, top: int) -> Dict[str, Any]:
+    """``function_app``'s cumulative import time and its slowest direct imports."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        entries.append((int(cumulative), len(name) - len(name.lstrip()), name.strip()))
+    index = next(i for i, entry in enumerate(entries) if entry[2] == "function_app")
+    total, level, _ = entries[index]
+    children = []
+    for cumulative, depth, name in reversed(entries[:index]):
+        if depth <= level:
+            break
+        if depth == level + 2:
+            children.append((cumulative, name))
+    children.sort(reverse=True)
+    return {
+        "function_app_ms": round(total / 1000, 3),
+        "top": {
+            name: round(cumulative / 1000, 3) for cumulative, name in children[:top]
+        },
+    }
+
+
+def _median(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for key, value in runs[0].items():
+        if isinstance(value, bool):
+            summary[key] = value
+        else:
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+
+def _commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = [str(ROOT)]
+        stand_in = importlib.util.find_spec("aos_dispatcher") is None
+        if stand_in:
+            _stand_in(Path(directory), args.dispatcher_import_ms)
+            path.insert(0, directory)
+        report: Dict[str, Any] = {
+            "dispatcher": (
+                f"stand-in ({args.dispatcher_import_ms:g} ms import)"
+                if stand_in
+                else "library"
+            ),
+            "repeat": args.repeat,
+        }
+        for mode in MODES:
+            runs = [
+                json.loads(_child(mode, path).stdout.strip().splitlines()[-1])
+                for _ in range(args.repeat)
+            ]
+            report[mode] = _median(runs)
+        report["importtime"] = _profile(
+            _child("lazy", path, importtime=True).stderr, args.top
+        )
+    if args.history:
+        record = {
+            "recorded_at": datetime.now(timezone.utc)
+            .isoformat()
+            .replace("+00:00", "Z"),
+            "commit": _commit(),
+            "function_app_ms": report["importtime"]["function_app_ms"],
+            **{
+                f"{mode}_{key}": value
+                for mode in MODES
+                for key, value in report[mode].items()
+            },
+        }
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(record, sort_keys=True) + "\n")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dispatcher-import-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10, help="direct imports listed")
+    parser.add_argument("--history", help="append a summary line to this JSONL file")
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
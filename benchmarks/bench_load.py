@@ -0,0 +1,679 @@
+"""End-to-end load test of the function app: workload mixes against in-memory stand-ins.
+
+Drives the registered functions in-process, through ``func.HttpRequest`` and
+fake Service Bus messages, against the in-memory dispatcher backend
+(``benchmarks._backend``, every call taking ``--dispatcher-ms``) and a local
+``aiohttp`` stub of aos-mcp-servers and aos-realm-of-agents (every request
+taking ``--upstream-ms``).  Each request also pays ``--invoke-ms`` of
+simulated Functions host overhead.  Orchestrations complete ``--run-ms``
+after they are submitted.
+
+Workloads (``--workloads``, default all):
+
+    orchestrations   ``--clients`` clients each submit orchestrations
+                     (``POST /api/orchestrations``, spread over ``--apps``
+                     apps), poll ``GET .../{id}`` every ``--poll-ms`` until
+                     it completes, then fetch ``GET .../{id}/result``
+    servicebus       ``--messages`` orchestration requests through the Service
+                     Bus trigger in batches of ``--batch-size``
+    metrics          a burst of ``--points`` metric points: single
+                     ``POST /api/metrics`` and ``POST /api/metrics/batch``
+    search           ``--queries`` knowledge searches over ``--documents``
+                     seeded documents
+    audit_export     ``--exports`` NDJSON exports of the audit trail
+                     (``GET /api/audit/trail?format=ndjson``) and paged
+                     history reads over ``--decisions`` seeded decisions
+    proxies          agent catalog and MCP status reads through the stub
+                     upstreams
+    mixed            all of the above at once, at a quarter of their sizes
+
+Each workload runs in a fresh interpreter so its state and peak memory are
+its own.  Reported per workload: requests, throughput, p50/p95/p99 latency
+and status counts per route, and peak RSS (``peak_rss_mb``, and
+``peak_rss_delta_mb`` above the level after seeding).  A Service Bus batch
+counts as one request; the messages settled and messages per second are
+reported under ``service_bus``.  Admission control and the orchestration
+watcher apply as deployed, so Service Bus throughput is bounded by
+``AOS_ADMISSION_APP_MAX_RUNNING`` slots freed every
+``AOS_ORCHESTRATION_WATCH_INTERVAL``.
+
+The report carries the git commit and settings; ``--baseline FILE`` (an
+earlier report) adds the change in throughput, p95 latency and peak RSS per
+workload, and ``--history FILE`` appends a summary line.  ``AOS_*`` settings
+in the environment apply to the function app as usual.
+
+Usage::
+
+    python -m benchmarks.bench_load --workloads orchestrations,metrics \
+        --baseline base.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import azure.functions as func
+from aiohttp import web
+
+from ._common import emit, latency_summary
+
+ROOT = Path(__file__).resolve().parents[1]
+WORKLOADS = (
+    "orchestrations",
+    "servicebus",
+    "metrics",
+    "search",
+    "audit_export",
+    "proxies",
+)
+TERMS = (
+    "market",
+    "expansion",
+    "risk",
+    "revenue",
+    "compliance",
+    "eu",
+    "pricing",
+    "hiring",
+)
+AGENTS = ("ceo", "cfo", "cto", "cso", "cmo")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+# ── stub upstreams ───────────────────────────────────────────────────────────
+
+
+class UpstreamStub:
+    """aos-mcp-servers and aos-realm-of-agents answering after a fixed delay."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.requests = 0
+
+    async def _reply(self, body: Any) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response(body)
+
+    async def agents(self, request: web.Request) -> web.Response:
+        return await self._reply(
+            {"agents": [{"agent_id": a, "agent_type": "executive"} for a in AGENTS]}
+        )
+
+    async def agent(self, request: web.Request) -> web.Response:
+        agent_id = request.match_info["agent_id"]
+        return await self._reply(
+            {"agent_id": agent_id, "model": "gpt-4o", "status": "online"}
+        )
+
+    async def servers(self, request: web.Request) -> web.Response:
+        return await self._reply({"servers": [{"name": "erpnext", "status": "online"}]})
+
+    async def status(self, request: web.Request) -> web.Response:
+        server = request.match_info["server"]
+        return await self._reply(
+            {"server": server, "status": "online", "tools": ["search"]}
+        )
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/agents", self.agents)
+        app.router.add_get("/api/agents/{agent_id}", self.agent)
+        app.router.add_get("/api/mcp/servers", self.servers)
+        app.router.add_get("/api/mcp/servers/{server}/status", self.status)
+        return app
+
+
+# ── in-process driver (child) ────────────────────────────────────────────────
+
+
+class Recorder:
+    """Latency and status counts per route."""
+
+    def __init__(self, invoke_s: float) -> None:
+        self.invoke_s = invoke_s
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, route: str, seconds: float, status: Any) -> None:
+        self.latencies[route].append(seconds)
+        self.statuses[route][str(status)] += 1
+
+    async def call(
+        self, route: str, handler: Callable[..., Awaitable[Any]], *args: Any
+    ) -> Any:
+        started = time.perf_counter()
+        if self.invoke_s:
+            await asyncio.sleep(self.invoke_s)
+        response = await handler(*args)
+        self.record(route, time.perf_counter() - started, response.status_code)
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        routes = {
+            route: {
+                "requests": len(samples),
+                "per_s": round(len(samples) / elapsed, 1),
+                "latency": latency_summary(samples),
+                "statuses": dict(self.statuses[route]),
+            }
+            for route, samples in sorted(self.latencies.items())
+        }
+        requests = sum(route["requests"] for route in routes.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": requests,
+            "throughput_per_s": round(requests / elapsed, 1),
+            "routes": routes,
+        }
+
+
+def _request(
+    method: str,
+    route: str,
+    body: Any = None,
+    params: Optional[Dict[str, str]] = None,
+    **route_params: str,
+) -> func.HttpRequest:
+    return func.HttpRequest(
+        method=method,
+        url=f"http://localhost/api/{route}",
+        headers={"Content-Type": "application/json"},
+        params=params or {},
+        route_params=route_params,
+        body=json.dumps(body).encode() if body is not None else b"",
+    )
+
+
+def _json(response: Any) -> Any:
+    try:
+        return json.loads(response.get_body())
+    except ValueError:
+        return None
+
+
+async def _gather_limited(
+    concurrency: int, jobs: List[Callable[[], Awaitable[Any]]]
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(job: Callable[[], Awaitable[Any]]) -> None:
+        async with semaphore:
+            await job()
+
+    await asyncio.gather(*(one(job) for job in jobs))
+
+
+class Load:
+    """Setup and drive coroutines for each workload, sized by *scale*."""
+
+    def __init__(
+        self, function_app: Any, rec: Recorder, args: argparse.Namespace, scale: float
+    ):
+        self.fa = function_app
+        self.rec = rec
+        self.args = args
+        self.scale = scale
+        self.rng = random.Random(args.seed)
+        self.run_s = args.run_ms / 1000
+        self.settler: Any = None
+
+    def _n(self, value: int) -> int:
+        return max(1, int(value * self.scale))
+
+    def complete_runs(self) -> None:
+        """Have the backend complete each orchestration ``--run-ms`` after submit."""
+        from . import _backend
+
+        loop = asyncio.get_running_loop()
+        submit = _backend.process_orchestration_request
+
+        def complete(orch_id: str) -> None:
+            _backend.complete_orchestration(orch_id, {"decision": "approved"})
+
+        def process_orchestration_request(
+            body: Any, source_app: Optional[str] = None
+        ) -> tuple:
+            result = submit(body, source_app)
+            if result[1] < 400:
+                orch_id = result[0]["orchestration_id"]
+                loop.call_soon_threadsafe(
+                    loop.call_later, self.run_s, complete, orch_id
+                )
+            return result
+
+        _backend.process_orchestration_request = process_orchestration_request
+
+    # orchestrations
+
+    async def orchestrations(self) -> None:
+        fa, rec, args = self.fa, self.rec, self.args
+        per_client = max(1, self._n(args.orchestrations) // args.clients)
+        for i in range(args.apps):
+            fa._admission.configure_app(f"app-{i}")
+
+        async def client(index: int) -> None:
+            for n in range(per_client):
+                body = {
+                    "agent_ids": list(AGENTS[: 1 + (n % len(AGENTS))]),
+                    "purpose": "load test",
+                    "app_name": f"app-{(index + n) % args.apps}",
+                }
+                response = await rec.call(
+                    "submit_orchestration",
+                    fa.submit_orchestration,
+                    _request("POST", "orchestrations", body),
+                )
+                orch_id = (_json(response) or {}).get("orchestration_id")
+                if response.status_code >= 400 or not orch_id:
+                    continue
+                for _ in range(args.max_polls):
+                    await asyncio.sleep(args.poll_ms / 1000)
+                    response = await rec.call(
+                        "get_orchestration_status",
+                        fa.get_orchestration_status,
+                        _request(
+                            "GET", f"orchestrations/{orch_id}", orchestration_id=orch_id
+                        ),
+                    )
+                    if (_json(response) or {}).get("status") not in (
+                        "submitted",
+                        "running",
+                    ):
+                        break
+                await rec.call(
+                    "get_orchestration_result",
+                    fa.get_orchestration_result,
+                    _request(
+                        "GET",
+                        f"orchestrations/{orch_id}/result",
+                        orchestration_id=orch_id,
+                    ),
+                )
+
+        await asyncio.gather(*(client(i) for i in range(args.clients)))
+
+    # Service Bus
+
+    async def servicebus(self) -> None:
+        from .bench_servicebus_batch import CountingSettler, FakeMessage
+
+        fa, args = self.fa, self.args
+        settler = self.settler = CountingSettler()
+        total = self._n(args.messages)
+        for start in range(0, total, args.batch_size):
+            orch_ids = [
+                f"sb-{start + i:07d}"
+                for i in range(min(args.batch_size, total - start))
+            ]
+            messages = [
+                FakeMessage(
+                    json.dumps(
+                        {
+                            "app_name": f"app-{i % args.apps}",
+                            "payload": {
+                                "orchestration_id": orch_id,
+                                "agent_ids": ["ceo", "cfo"],
+                            },
+                        }
+                    ).encode()
+                )
+                for i, orch_id in enumerate(orch_ids)
+            ]
+            started = time.perf_counter()
+            if args.invoke_ms:
+                await asyncio.sleep(args.invoke_ms / 1000)
+            await fa.service_bus_orchestration_request(messages, settler)
+            elapsed = time.perf_counter() - started
+            self.rec.record("service_bus_orchestration_request", elapsed, "ok")
+
+    # metrics
+
+    async def metrics(self) -> None:
+        fa, rec, args = self.fa, self.rec, self.args
+        points = self._n(args.points)
+
+        def point(i: int) -> Dict[str, Any]:
+            return {
+                "name": f"load.metric.{i % 50}",
+                "value": float(i),
+                "tags": {"agent": "cfo"},
+            }
+
+        singles = points // 2
+        jobs = [
+            partial(
+                rec.call,
+                "record_metric",
+                fa.record_metric,
+                _request("POST", "metrics", p),
+            )
+            for p in map(point, range(singles))
+        ]
+        batches = [
+            [point(j) for j in range(i, min(i + 100, points))]
+            for i in range(singles, points, 100)
+        ]
+        jobs += [
+            partial(
+                rec.call,
+                "record_metrics_batch",
+                fa.record_metrics_batch,
+                _request("POST", "metrics/batch", batch),
+            )
+            for batch in batches
+        ]
+        await _gather_limited(args.concurrency, jobs)
+
+    # knowledge search
+
+    async def setup_search(self) -> None:
+        documents = [
+            {
+                "title": f"{self.rng.choice(TERMS)} brief {i}",
+                "content": " ".join(self.rng.choice(TERMS) for _ in range(40)),
+                "doc_type": ("policy", "report", "memo")[i % 3],
+            }
+            for i in range(self._n(self.args.documents))
+        ]
+        for start in range(0, len(documents), 1000):
+            await self.fa.create_documents_batch(
+                _request("POST", "knowledge/batch", documents[start : start + 1000])
+            )
+
+    async def search(self) -> None:
+        fa, rec, args = self.fa, self.rec, self.args
+        queries = [
+            " ".join(self.rng.sample(TERMS, 2)) for _ in range(self._n(args.queries))
+        ]
+        jobs = [
+            partial(
+                rec.call,
+                "search_documents",
+                fa.search_documents,
+                _request(
+                    "GET", "knowledge/documents", params={"query": query, "limit": "10"}
+                ),
+            )
+            for query in queries
+        ]
+        await _gather_limited(args.concurrency, jobs)
+
+    # audit export
+
+    async def setup_audit_export(self) -> None:
+        decisions = [
+            {
+                "title": f"Decision {i}",
+                "rationale": "load test",
+                "agent_id": AGENTS[i % len(AGENTS)],
+                "orchestration_id": f"orch-{i // 10:06d}",
+            }
+            for i in range(self._n(self.args.decisions))
+        ]
+        for start in range(0, len(decisions), 1000):
+            await self.fa.log_decisions_batch(
+                _request(
+                    "POST", "audit/decisions/batch", decisions[start : start + 1000]
+                )
+            )
+
+    async def audit_export(self) -> None:
+        fa, rec, args = self.fa, self.rec, self.args
+        export = _request("GET", "audit/trail", params={"format": "ndjson"})
+        jobs = [
+            partial(rec.call, "get_audit_trail_export", fa.get_audit_trail, export)
+            for _ in range(self._n(args.exports))
+        ]
+        jobs += [
+            partial(
+                rec.call,
+                "get_decision_history",
+                fa.get_decision_history,
+                _request(
+                    "GET",
+                    "audit/decisions",
+                    params={"agent_id": agent_id, "limit": "100"},
+                ),
+            )
+            for agent_id in AGENTS * self._n(args.exports)
+        ]
+        await _gather_limited(args.concurrency, jobs)
+
+    # proxied upstreams
+
+    async def proxies(self) -> None:
+        fa, rec, args = self.fa, self.rec, self.args
+        agent_id = self.rng.choice(AGENTS)
+        calls = (
+            ("list_agents", fa.list_agents, _request("GET", "agents")),
+            (
+                "get_agent_descriptor",
+                fa.get_agent_descriptor,
+                _request("GET", f"agents/{agent_id}", agent_id=agent_id),
+            ),
+            ("list_mcp_servers", fa.list_mcp_servers, _request("GET", "mcp/servers")),
+            (
+                "get_mcp_server_status",
+                fa.get_mcp_server_status,
+                _request("GET", "mcp/servers/erpnext/status", server="erpnext"),
+            ),
+        )
+        jobs = [
+            partial(rec.call, *calls[i % len(calls)])
+            for i in range(self._n(args.proxy_requests))
+        ]
+        await _gather_limited(args.concurrency, jobs)
+
+
+async def _child(workload: str, args: argparse.Namespace) -> Dict[str, Any]:
+    if args.port:
+        base_url = f"http://127.0.0.1:{args.port}"
+        os.environ.setdefault("MCP_SERVERS_BASE_URL", base_url)
+        os.environ.setdefault("REALM_OF_AGENTS_BASE_URL", base_url)
+    from . import _backend
+
+    _backend.install()
+    _backend.LATENCY = args.dispatcher_ms / 1000
+    import function_app
+
+    rec = Recorder(args.invoke_ms / 1000)
+    names = WORKLOADS if workload == "mixed" else (workload,)
+    load = Load(function_app, rec, args, 0.25 if workload == "mixed" else 1.0)
+    load.complete_runs()
+    for name in names:
+        setup = getattr(load, f"setup_{name}", None)
+        if setup is not None:
+            await setup()
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(getattr(load, name)() for name in names))
+    report = rec.report(time.perf_counter() - started)
+    peak = _rss_mb()
+    if load.settler is not None:
+        settled = load.settler.counts
+        report["service_bus"] = {
+            "settled": settled,
+            "messages_per_s": round(sum(settled.values()) / report["elapsed_s"], 1),
+        }
+    report["memory"] = {
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+        "peak_rss_delta_mb": round(peak - baseline, 1),
+    }
+    for pool in function_app._upstreams:
+        await pool.close()
+    function_app._executor.shutdown()
+    return report
+
+
+# ── parent ───────────────────────────────────────────────────────────────────
+
+
+async def _measure(workload: str, port: int) -> Dict[str, Any]:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "benchmarks.bench_load",
+        *sys.argv[1:],
+        "--child",
+        workload,
+        "--port",
+        str(port),
+        cwd=str(ROOT),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode:
+        return {"error": f"workload exited with status {process.returncode}"}
+    return json.loads(stdout)
+
+
+def _change(new: float, old: float) -> Optional[float]:
+    return round((new - old) / old * 100, 1) if old else None
+
+
+def _compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    comparison: Dict[str, Any] = {"baseline_commit": baseline.get("commit")}
+    for workload, result in report["workloads"].items():
+        before = baseline.get("workloads", {}).get(workload)
+        if not before or "routes" not in before or "routes" not in result:
+            continue
+        comparison[workload] = {
+            "throughput_change_pct": _change(
+                result["throughput_per_s"], before["throughput_per_s"]
+            ),
+            "peak_rss_change_pct": _change(
+                result["memory"]["peak_rss_mb"], before["memory"]["peak_rss_mb"]
+            ),
+            "p95_change_pct": {
+                route: _change(
+                    stats["latency"]["p95_ms"],
+                    before["routes"][route]["latency"]["p95_ms"],
+                )
+                for route, stats in result["routes"].items()
+                if route in before["routes"]
+            },
+        }
+    return comparison
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub = UpstreamStub(args.upstream_ms / 1000)
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    report: Dict[str, Any] = {
+        "recorded_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "commit": _commit(),
+        "python": sys.version.split()[0],
+        "settings": {
+            key: value
+            for key, value in sorted(vars(args).items())
+            if key not in ("child", "port", "baseline", "history")
+        },
+        "workloads": {},
+    }
+    try:
+        for workload in args.workloads:
+            report["workloads"][workload] = await _measure(workload, port)
+    finally:
+        await runner.cleanup()
+    report["upstream_requests"] = stub.requests
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as source:
+            report["comparison"] = _compare(report, json.load(source))
+    if args.history:
+        record = {
+            "recorded_at": report["recorded_at"],
+            "commit": report["commit"],
+            **{
+                f"{workload}_{key}": value
+                for workload, result in report["workloads"].items()
+                if "routes" in result
+                for key, value in (
+                    ("throughput_per_s", result["throughput_per_s"]),
+                    ("peak_rss_mb", result["memory"]["peak_rss_mb"]),
+                )
+            },
+        }
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(record, sort_keys=True) + "\n")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--workloads",
+        type=lambda raw: raw.split(","),
+        default=[*WORKLOADS, "mixed"],
+        help="comma-separated: " + ", ".join((*WORKLOADS, "mixed")),
+    )
+    parser.add_argument("--dispatcher-ms", type=float, default=2.0)
+    parser.add_argument("--upstream-ms", type=float, default=10.0)
+    parser.add_argument("--invoke-ms", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--apps", type=int, default=4)
+    parser.add_argument("--orchestrations", type=int, default=640)
+    parser.add_argument("--run-ms", type=float, default=200.0)
+    parser.add_argument("--poll-ms", type=float, default=50.0)
+    parser.add_argument("--max-polls", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--documents", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--decisions", type=int, default=50_000)
+    parser.add_argument("--exports", type=int, default=20)
+    parser.add_argument("--proxy-requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--history", help="append a summary line to this JSONL file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    unknown = set(args.workloads) - {*WORKLOADS, "mixed"}
+    if unknown:
+        parser.error(f"unknown workload(s): {', '.join(sorted(unknown))}")
+    if args.child:
+        json.dump(asyncio.run(_child(args.child, args)), sys.stdout)
+        return
+    emit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Client request counts and time-to-result: plain polling vs. long-poll.
+
+Simulates ``--orchestrations`` orchestrations that move through
+``submitted → running → completed`` over a random duration.  Each has one
+client waiting for the result:
+
+    polling     the client calls GET /api/orchestrations/{id} every
+                ``--poll-ms`` (one dispatcher read per request)
+    long_poll   the client calls GET /api/orchestrations/{id}?wait=N with its
+                last ETag; one shared watcher per worker reads the dispatcher
+                every ``--watch-ms``
+
+Usage::
+
+    python -m benchmarks.bench_long_poll --orchestrations 200 --poll-ms 250
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List
+
+from aos_dispatcher_azure.orchestrations import OrchestrationTracker
+
+from ._common import emit, latency_summary
+
+
+class SimulatedDispatcher:
+    """Orchestrations whose status depends only on elapsed time."""
+
+    def __init__(self, count: int, min_s: float, max_s: float, seed: int) -> None:
+        rng = random.Random(seed)
+        self.started = time.perf_counter()
+        self.durations = {f"orch-{i}": rng.uniform(min_s, max_s) for i in range(count)}
+        self.reads = 0
+
+    def completed_at(self, orch_id: str) -> float:
+        return self.started + self.durations[orch_id]
+
+    async def get_orchestration_status(self, orch_id: str) -> tuple:
+        self.reads += 1
+        elapsed = time.perf_counter() - self.started
+        duration = self.durations[orch_id]
+        if elapsed >= duration:
+            status = "completed"
+        elif elapsed >= duration / 3:
+            status = "running"
+        else:
+            status = "submitted"
+        return {"orchestration_id": orch_id, "status": status}, 200
+
+
+async def run_polling(args: argparse.Namespace) -> Dict[str, Any]:
+    sim = SimulatedDispatcher(args.orchestrations, args.min_s, args.max_s, args.seed)
+    lags: List[float] = []
+    requests = 0
+
+    async def client(orch_id: str) -> None:
+        nonlocal requests
+        while True:
+            requests += 1
+            body, _ = await sim.get_orchestration_status(orch_id)
+            if body["status"] == "completed":
+                lags.append(time.perf_counter() - sim.completed_at(orch_id))
+                return
+            await asyncio.sleep(args.poll_ms / 1000)
+
+    await asyncio.gather(*(client(orch_id) for orch_id in sim.durations))
+    return {"client_requests": requests, "dispatcher_reads": sim.reads, **_lag(lags)}
+
+
+async def run_long_poll(args: argparse.Namespace) -> Dict[str, Any]:
+    sim = SimulatedDispatcher(args.orchestrations, args.min_s, args.max_s, args.seed)
+    tracker = OrchestrationTracker(
+        sim.get_orchestration_status, interval=args.watch_ms / 1000
+    )
+    lags: List[float] = []
+    requests = 0
+
+    async def client(orch_id: str) -> None:
+        nonlocal requests
+        etag = None
+        while True:
+            requests += 1
+            # Same steps as get_orchestration_status with ?wait=.
+            body, _ = await sim.get_orchestration_status(orch_id)
+            state = await tracker.observe(orch_id, body)
+            if not state.terminal:
+                state = await tracker.wait_for_change(
+                    orch_id, etag or state.etag, args.wait_s
+                )
+            etag = state.etag
+            if state.terminal:
+                lags.append(time.perf_counter() - sim.completed_at(orch_id))
+                return
+
+    await asyncio.gather(*(client(orch_id) for orch_id in sim.durations))
+    await tracker.close()
+    return {"client_requests": requests, "dispatcher_reads": sim.reads, **_lag(lags)}
+
+
+def _lag(lags: List[float]) -> Dict[str, Any]:
+    summary = latency_summary(lags)
+    return {f"time_to_result_{key}": value for key, value in summary.items()}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    polling = await run_polling(args)
+    long_poll = await run_long_poll(args)
+    return {
+        "benchmark": "long_poll",
+        "params": vars(args),
+        "polling": polling,
+        "long_poll": long_poll,
+        "client_request_reduction": round(
+            polling["client_requests"] / max(1, long_poll["client_requests"]), 2
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orchestrations", type=int, default=200)
+    parser.add_argument("--min-s", type=float, default=1.0)
+    parser.add_argument("--max-s", type=float, default=4.0)
+    parser.add_argument("--poll-ms", type=float, default=250.0)
+    parser.add_argument("--watch-ms", type=float, default=250.0)
+    parser.add_argument("--wait-s", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    emit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
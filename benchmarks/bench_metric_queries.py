@@ -0,0 +1,127 @@
+"""Ingest rate and windowed query latency of the metric rollup store.
+
+Ingests ``--points`` points (default 10M) for one series spread evenly over
+``--days`` days into :class:`~aos_dispatcher_azure.timeseries.TimeSeriesStore`,
+then runs dashboard-style queries at several resolutions.  Each query is
+compared with ``full_scan`` — aggregating the same window from every raw point,
+which is what a dashboard had to do with the full series from
+``GET /api/metrics``.
+
+Usage::
+
+    python -m benchmarks.bench_metric_queries --points 10000000 --days 90
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+from aos_dispatcher_azure.timeseries import MetricQuery, TimeSeriesStore
+
+from ._common import emit, latency_summary
+
+BASE = 1_767_225_600.0  # 2026-01-01T00:00:00Z
+
+# (label, window seconds, step, agg)
+QUERIES = [
+    ("1d_at_1m_avg", 86400, "1m", "avg"),
+    ("7d_at_5m_max", 7 * 86400, "5m", "max"),
+    ("30d_at_1h_avg", 30 * 86400, "1h", "avg"),
+    ("all_at_1d_sum", None, "1d", "sum"),
+    ("1d_at_1h_p95", 86400, "1h", "p95"),
+]
+
+
+def full_scan(
+    timestamps: array, values: array, query: MetricQuery
+) -> List[Tuple[float, float]]:
+    lo = bisect_left(timestamps, query.start - query.start % query.step)
+    hi = bisect_left(timestamps, query.end)
+    buckets: Dict[float, List[float]] = {}
+    for index in range(lo, hi):
+        timestamp = timestamps[index]
+        buckets.setdefault(timestamp - timestamp % query.step, []).append(values[index])
+    out = []
+    for bucket, points in buckets.items():
+        if query.agg == "p95":
+            points.sort()
+            out.append((bucket, points[max(0, math.ceil(0.95 * len(points)) - 1)]))
+        elif query.agg == "avg":
+            out.append((bucket, sum(points) / len(points)))
+        elif query.agg == "max":
+            out.append((bucket, max(points)))
+        else:
+            out.append((bucket, sum(points)))
+    return out
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    span = args.days * 86400
+    interval = span / args.points
+    store = TimeSeriesStore(raw_retention=args.raw_hours * 3600)
+    series = store.series("bench.metric")
+    raw_ts = array("d")
+    raw_values = array("d")
+
+    start = time.perf_counter()
+    for i in range(args.points):
+        timestamp = BASE + i * interval
+        value = 100.0 + 10.0 * math.sin(i / 5000) + rng.random()
+        series.add(timestamp, value)
+        raw_ts.append(timestamp)
+        raw_values.append(value)
+    ingest_s = time.perf_counter() - start
+    end = BASE + span
+
+    report: Dict[str, Any] = {
+        "points": args.points,
+        "days": args.days,
+        "ingest_s": round(ingest_s, 2),
+        "ingest_points_per_s": round(args.points / ingest_s),
+        "raw_points_retained": len(series.timestamps),
+        "rollup_buckets": {r.resolution: len(r.starts) for r in series.rollups},
+        "queries": {},
+    }
+    for label, window, step, agg in QUERIES:
+        window = window or span
+        query = MetricQuery.from_params(
+            {"start": str(end - window), "end": str(end), "step": step, "agg": agg}
+        )
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            body = store.query("bench.metric", query)
+            timings.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        baseline = full_scan(raw_ts, raw_values, query)
+        scan_s = time.perf_counter() - t0
+        report["queries"][label] = {
+            "buckets": len(body["series"]),
+            "resolution": body["resolution"],
+            "partial": body["partial"],
+            "store": latency_summary(timings),
+            "full_scan_ms": round(scan_s * 1000, 3),
+            "full_scan_buckets": len(baseline),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--days", type=float, default=90.0)
+    parser.add_argument("--raw-hours", type=float, default=168.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Peer discovery latency and size: library scan vs. membership snapshot vs. delta.
+
+``--apps`` apps are registered in the in-memory dispatcher backend
+(``benchmarks._backend``, every call taking ``--dispatcher-ms``), then
+``POST /api/network/discover`` is called ``--calls`` times per mode:
+
+    library    ``AOS_NETWORK_CACHE`` off: every call rebuilds the peer list
+               from all registered apps
+    snapshot   served from the membership table's cached full list
+    delta      before each call ``--churn`` apps register or deregister
+               through the app endpoints; the client passes the ``version``
+               it last saw as ``since`` and gets only the changes
+
+Reported per mode and app count: call latency and response bytes, plus the
+time to seed the table from the library.
+
+Usage::
+
+    python -m benchmarks.bench_network_membership --apps 1000,10000,50000 --churn 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import azure.functions as func
+
+from . import _backend
+from ._common import emit, latency_summary
+
+
+def _request(
+    method: str, route: str, body: Any = None, **route_params: str
+) -> func.HttpRequest:
+    return func.HttpRequest(
+        method=method,
+        url=f"http://localhost/api/{route}",
+        route_params=route_params,
+        body=json.dumps(body).encode() if body is not None else b"",
+    )
+
+
+def _discover(since: Optional[str] = None) -> func.HttpRequest:
+    return _request("POST", "network/discover", {"since": since} if since else None)
+
+
+async def _calls(
+    function_app: Any, args: argparse.Namespace, delta: bool
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    sizes: List[int] = []
+    version: Optional[str] = None
+    churned = 0
+    for _ in range(args.calls):
+        if delta:
+            for _ in range(args.churn):
+                name = f"churn-{churned}"
+                if churned % 2:
+                    await function_app.deregister_app(
+                        _request("DELETE", f"apps/{name}", app_name=name)
+                    )
+                else:
+                    await function_app.register_app(
+                        _request(
+                            "POST", "apps/register", {"app_name": name, "workflows": []}
+                        )
+                    )
+                churned += 1
+        started = time.perf_counter()
+        response = await function_app.discover_peers(_discover(version))
+        latencies.append(time.perf_counter() - started)
+        body = response.get_body()
+        sizes.append(len(body))
+        if delta:
+            version = json.loads(body).get("version")
+    return {
+        "latency": latency_summary(latencies),
+        "response_bytes": statistics.median(sizes),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    import function_app
+
+    report: Dict[str, Any] = {
+        "calls": args.calls,
+        "churn": args.churn,
+        "dispatcher_ms": args.dispatcher_ms,
+        "apps": {},
+    }
+    network = function_app._network
+    for count in args.apps:
+        _backend.reset()
+        _backend.LATENCY = 0.0
+        for i in range(count):
+            _backend.register_app({"app_name": f"app-{i:06d}", "workflows": []})
+        _backend.LATENCY = args.dispatcher_ms / 1000
+        result: Dict[str, Any] = {}
+
+        network.enabled = False
+        result["library"] = await _calls(function_app, args, delta=False)
+
+        network.enabled = True
+        network.invalidate()
+        started = time.perf_counter()
+        await network.ensure_synced(
+            function_app._fetch_peers, function_app._fetch_networks
+        )
+        result["seed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["snapshot"] = await _calls(function_app, args, delta=False)
+        result["delta"] = await _calls(function_app, args, delta=True)
+        report["apps"][str(count)] = result
+    function_app._executor.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--apps",
+        type=lambda raw: [int(n) for n in raw.split(",")],
+        default=[1000, 10_000, 50_000],
+    )
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--churn", type=int, default=5)
+    parser.add_argument("--dispatcher-ms", type=float, default=1.0)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Peak memory of ``POST /api/mcp/servers/{s}/tools/{t}`` by payload size.
+
+A stub aos-mcp-servers runs in this process; each measurement runs in a fresh
+child process that drives the proxy and reports how far its peak RSS rose
+above the level reached after building the request (``peak_rss_delta_mb``):
+
+    upload     ``size`` MB request body, small response
+    download   small request, ``size`` MB JSON response (gzip-compressible;
+               the client sends ``Accept-Encoding: gzip``)
+
+Modes:
+
+    buffered    the request/response path used before streaming: the body
+                handed to ``aiohttp`` in one write, the response decompressed
+                and returned as ``application/json``
+    streaming   ``call_mcp_tool`` (``UpstreamPool.forward``): request body
+                written in ``CHUNK_SIZE`` slices, response passed through with
+                its upstream encoding
+
+The Functions HTTP binding itself holds the request and response bodies, so
+neither mode can go below one copy of each; the report shows what the proxy
+adds on top.
+
+Usage::
+
+    python -m benchmarks.bench_proxy_memory --sizes 1,16,64,256
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import resource
+import sys
+from typing import Any, Dict
+
+from aiohttp import web
+
+from ._common import emit
+
+MB = 1024 * 1024
+
+
+def _payload(size: int) -> bytes:
+    row = (
+        b'{"account":"4000-SALES","period":"2026-09",'
+        b'"amount":1234.56,"currency":"EUR"},'
+    )
+    return b"[" + row * (size // len(row)) + b"{}]"
+
+
+class Stub:
+    def __init__(self) -> None:
+        self._responses: Dict[int, Dict[bool, bytes]] = {}
+
+    def response(self, size: int, gzipped: bool) -> bytes:
+        if size not in self._responses:
+            raw = _payload(size)
+            self._responses[size] = {False: raw, True: gzip.compress(raw, 1)}
+        return self._responses[size][gzipped]
+
+    async def tool(self, request: web.Request) -> web.StreamResponse:
+        received = 0
+        async for chunk in request.content.iter_chunked(MB):
+            received += len(chunk)
+        size = int(request.match_info["tool"].rpartition("-")[2])
+        if not size:
+            return web.json_response({"received": received})
+        gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+        headers = {"Content-Type": "application/json"}
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=self.response(size, gzipped), headers=headers)
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _child(mode: str, direction: str, size_mb: int, port: int) -> Dict[str, Any]:
+    os.environ["MCP_SERVERS_BASE_URL"] = f"http://127.0.0.1:{port}"
+    from . import _backend
+
+    _backend.install()
+    import azure.functions as func
+
+    import function_app
+
+    size = size_mb * MB
+    tool = f"export-{0 if direction == 'upload' else size}"
+    request = func.HttpRequest(
+        method="POST",
+        url=f"http://localhost/api/mcp/servers/erp/tools/{tool}",
+        headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"},
+        route_params={"server": "erp", "tool": tool},
+        body=os.urandom(size) if direction == "upload" else b"{}",
+    )
+    pool = function_app._mcp_upstream
+    # Warm the session so connection setup is not part of the measurement.
+    await pool.request("POST", "api/mcp/servers/erp/tools/export-0", body=b"{}")
+    baseline = _rss_mb()
+    if mode == "buffered":
+        result = await pool.request(
+            "POST",
+            f"api/mcp/servers/erp/tools/{tool}",
+            body=request.get_body(),
+            headers={"Content-Type": "application/json"},
+        )
+        response = function_app._make_response(result)
+    else:
+        response = await function_app.call_mcp_tool(request)
+    peak = _rss_mb()
+    await pool.close()
+    return {
+        "status": response.status_code,
+        "content_encoding": response.headers.get("Content-Encoding", ""),
+        "response_bytes": len(response.get_body()),
+        "peak_rss_delta_mb": round(peak - baseline, 1),
+    }
+
+
+async def _measure(mode: str, direction: str, size: int, port: int) -> Dict[str, Any]:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "benchmarks.bench_proxy_memory",
+        "--child",
+        f"{mode},{direction},{size},{port}",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await process.communicate()
+    return json.loads(stdout)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub = Stub()
+    app = web.Application(client_max_size=0)
+    app.router.add_post("/api/mcp/servers/{server}/tools/{tool}", stub.tool)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    report: Dict[str, Any] = {"sizes_mb": args.sizes, "upload": {}, "download": {}}
+    try:
+        for direction in ("upload", "download"):
+            for size in (int(s) for s in args.sizes.split(",")):
+                report[direction][str(size)] = {
+                    mode: await _measure(mode, direction, size, port)
+                    for mode in ("buffered", "streaming")
+                }
+    finally:
+        await runner.cleanup()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sizes", default="1,16,64,256")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        mode, direction, size, port = args.child.split(",")
+        json.dump(
+            asyncio.run(_child(mode, direction, int(size), int(port))), sys.stdout
+        )
+        return
+    emit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
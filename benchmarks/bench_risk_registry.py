@@ -0,0 +1,150 @@
+"""Write cost and read latency of the indexed risk registry.
+
+Seeds a :class:`~aos_dispatcher_azure.risks.RiskRegistry` with ``--risks``
+risks (default 100k) spread over the four categories and three statuses, most
+of them assessed, then applies ``--writes`` assess / status / mitigation
+updates as the write endpoints do.
+
+Reported:
+
+    seed            ``load`` time for the whole registry (a re-seed)
+    writes          updates/s and per-update latency
+    lists           latency of a ``--page`` page filtered by status, by
+                    category and status, and by score band — from the
+                    indexes vs. filtering the whole registry (what
+                    ``list_risks`` does in the library)
+    summary         latency of the maintained aggregates with the top
+                    ``--top`` risks vs. computing them from a full scan
+
+Usage::
+
+    python -m benchmarks.bench_risk_registry --risks 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from aos_dispatcher_azure.risks import RiskRegistry, summarise_risks
+
+from ._common import emit, latency_summary
+
+CATEGORIES = ("operational", "financial", "strategic", "compliance")
+STATUSES = ("open", "open", "open", "mitigated", "closed")
+
+
+def _risk(n: int, rng: random.Random) -> Dict[str, Any]:
+    risk = {
+        "id": f"risk-{n:08x}",
+        "title": f"Risk {n}",
+        "category": CATEGORIES[n % len(CATEGORIES)],
+        "owner": "coo",
+        "status": rng.choice(STATUSES),
+        "created_at": "2026-03-22T10:00:00Z",
+    }
+    if rng.random() < 0.8:
+        likelihood, impact = rng.random(), rng.random()
+        risk.update(
+            likelihood=likelihood, impact=impact, score=round(likelihood * impact, 4)
+        )
+    return risk
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    risks = [_risk(n, rng) for n in range(args.risks)]
+    registry = RiskRegistry(resync_interval=float("inf"))
+    started = time.perf_counter()
+    registry.load(risks)
+    report: Dict[str, Any] = {
+        "risks": args.risks,
+        "seed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+    latencies = []
+    for _ in range(args.writes):
+        risk_id = f"risk-{rng.randrange(args.risks):08x}"
+        kind = rng.random()
+        if kind < 0.6:
+            likelihood, impact = rng.random(), rng.random()
+            update = {"likelihood": likelihood, "impact": impact}
+            update["score"] = round(likelihood * impact, 4)
+        elif kind < 0.9:
+            update = {"status": rng.choice(STATUSES)}
+        else:
+            update = {"mitigation_plans": [{"plan": "Onboard a second supplier"}]}
+        started = time.perf_counter()
+        registry.apply(dict(update, id=risk_id))
+        latencies.append(time.perf_counter() - started)
+    report["writes"] = {
+        "updates_per_s": round(len(latencies) / sum(latencies)),
+        "latency": latency_summary(latencies),
+    }
+
+    current = registry.list_risks()[0]["risks"]
+    filters = {
+        "status": {"status": "mitigated"},
+        "category_and_status": {"category": "financial", "status": "closed"},
+        "score_band": {"score_band": "critical"},
+    }
+
+    def scan(wanted: Dict[str, str]) -> None:
+        band = wanted.get("score_band")
+        [
+            r
+            for r in current
+            if all(r.get(k) == v for k, v in wanted.items() if k != "score_band")
+            and (band is None or (r.get("score") or 0) >= 0.75)
+        ][: args.page]
+
+    report["lists"] = {
+        name: {
+            "indexed": latency_summary(
+                _timed(
+                    lambda: registry.list_risks(**wanted, limit=args.page), args.queries
+                )
+            ),
+            "scan": latency_summary(
+                _timed(lambda: scan(wanted), max(1, args.queries // 10))
+            ),
+        }
+        for name, wanted in filters.items()
+    }
+    report["summary"] = {
+        "maintained": latency_summary(
+            _timed(lambda: registry.summary(args.top), args.queries)
+        ),
+        "scan": latency_summary(
+            _timed(
+                lambda: summarise_risks(current, args.top), max(1, args.queries // 50)
+            )
+        ),
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--risks", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=100_000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Knowledge-base search: BM25 index vs. linear scan at 10k, 100k and 1M documents.
+
+For each corpus size (``--sizes``) a synthetic corpus with a Zipf-distributed
+vocabulary is indexed into :class:`~aos_dispatcher_azure.search.SearchIndex`,
+flushed to a segment file and re-opened, reporting:
+
+- ``build``: documents/s indexed incrementally (``upsert``)
+- ``flush``: segment write time and file size
+- ``cold_start``: time to open the segment and answer the first query, vs.
+  rebuilding the index from the documents
+- ``update_us``: incremental re-index of one document
+- ``queries``: latency of rare-term, common-term, filtered and faceted
+  queries, vs. ``linear_scan`` — the substring scan the in-memory dispatcher
+  backend (``benchmarks/_backend.py``) performs for ``search_documents``
+
+Usage::
+
+    python -m benchmarks.bench_search --sizes 10000,100000,1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from aos_dispatcher_azure.search import SearchIndex
+
+from ._common import emit, latency_summary
+
+DOC_TYPES = ["policy", "procedure", "guide", "faq", "report"]
+
+# (label, query, doc_type, facets)
+QUERIES = [
+    ("rare_term", "w4000", None, False),
+    ("common_terms", "w3 w7", None, False),
+    ("three_terms", "w25 w120 w900", None, False),
+    ("filtered", "w7 w40", "faq", False),
+    ("faceted", "w40", None, True),
+]
+
+
+def corpus(size: int, vocabulary: int, words: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    terms = [f"w{rank}" for rank in range(1, vocabulary + 1)]
+    cumulative = list(
+        itertools.accumulate(1.0 / rank for rank in range(1, vocabulary + 1))
+    )
+    docs = []
+    for index in range(size):
+        text = rng.choices(terms, cum_weights=cumulative, k=words + 5)
+        docs.append(
+            {
+                "id": f"doc-{index:08d}",
+                "title": " ".join(text[:5]),
+                "content": " ".join(text[5:]),
+                "doc_type": DOC_TYPES[index % len(DOC_TYPES)],
+            }
+        )
+    return docs
+
+
+def linear_scan(
+    docs: List[Dict[str, Any]], query: str, doc_type: Optional[str], limit: int
+) -> List[Dict[str, Any]]:
+    terms = query.lower().split()
+    hits = []
+    for doc in docs:
+        if doc_type and doc.get("doc_type") != doc_type:
+            continue
+        text = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
+        score = sum(text.count(term) for term in terms)
+        if score:
+            hits.append((score, doc))
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    return [doc for _, doc in hits[:limit]]
+
+
+def timed(fn, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def run_size(size: int, args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    docs = corpus(size, args.vocabulary, args.words, args.seed)
+    path = os.path.join(workdir, f"index-{size}.seg")
+    index = SearchIndex(path=path, flush_threshold=size + 1)
+
+    t0 = time.perf_counter()
+    for doc in docs:
+        index.upsert(doc["id"], doc)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index.flush()
+    flush_s = time.perf_counter() - t0
+    index.close()
+
+    t0 = time.perf_counter()
+    cold = SearchIndex(path=path)
+    cold.load()
+    cold.search("w7", limit=args.limit)
+    cold_s = time.perf_counter() - t0
+
+    rng = random.Random(args.seed + 1)
+    update_timings = timed(
+        lambda: cold.update(
+            docs[rng.randrange(size)]["id"], {"content": "w1 w2 w3 updated"}
+        ),
+        args.repeat,
+    )
+
+    report: Dict[str, Any] = {
+        "documents": size,
+        "build_s": round(build_s, 2),
+        "build_docs_per_s": round(size / build_s),
+        "flush_s": round(flush_s, 2),
+        "segment_mb": round(os.path.getsize(path) / 1e6, 1),
+        "cold_start_ms": round(cold_s * 1000, 1),
+        "rebuild_ms": round(build_s * 1000, 1),
+        "update": latency_summary(update_timings),
+        "queries": {},
+    }
+    scan_repeat = max(1, args.scan_repeat if size <= 100_000 else 1)
+    for label, query, doc_type, facets in QUERIES:
+        index_timings = timed(
+            lambda: cold.search(query, doc_type, args.limit, facets), args.repeat
+        )
+        scan_timings = timed(
+            lambda: linear_scan(docs, query, doc_type, args.limit), scan_repeat
+        )
+        report["queries"][label] = {
+            "index": latency_summary(index_timings),
+            "linear_scan": latency_summary(scan_timings),
+        }
+    cold.close()
+    os.unlink(path)
+    return report
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    with tempfile.TemporaryDirectory() as workdir:
+        return {
+            "vocabulary": args.vocabulary,
+            "words_per_doc": args.words,
+            "sizes": {str(size): run_size(size, args, workdir) for size in sizes},
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scan-repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=11)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Messages/sec through the batched Service Bus trigger at several batch sizes.
+
+A fake message source yields ``--messages`` orchestration envelopes (with a
+``--poison-rate`` share of invalid JSON) in batches of each requested size.
+Every batch costs one simulated Functions invocation (``--invocation-ms``)
+and each valid message one blocking dispatcher call (``--call-ms``) on the
+``DispatcherExecutor`` pool.
+
+Usage::
+
+    python -m benchmarks.bench_servicebus_batch --batch-sizes 1,16,64
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from aos_dispatcher_azure.execution import DispatcherExecutor
+from aos_dispatcher_azure.servicebus import OrchestrationBatchProcessor
+
+from ._common import emit
+
+
+class FakeMessage:
+    """Stand-in for ``ServiceBusReceivedMessage`` (``body`` is a list of sections)."""
+
+    def __init__(self, body: bytes) -> None:
+        self.body = [body]
+
+
+class CountingSettler:
+    """Records settlement outcomes instead of calling the Functions host."""
+
+    def __init__(self) -> None:
+        self.counts = {"complete": 0, "abandon": 0, "deadletter": 0}
+
+    def complete(self, message: Any) -> None:
+        self.counts["complete"] += 1
+
+    def abandon(self, message: Any) -> None:
+        self.counts["abandon"] += 1
+
+    def deadletter(
+        self,
+        message: Any,
+        deadletter_reason: Optional[str] = None,
+        deadletter_error_description: Optional[str] = None,
+    ) -> None:
+        self.counts["deadletter"] += 1
+
+
+def message_source(count: int, poison_every: int) -> Iterator[FakeMessage]:
+    for i in range(count):
+        if poison_every and i % poison_every == poison_every - 1:
+            yield FakeMessage(b"{not json")
+            continue
+        envelope = {
+            "app_name": f"app-{i % 4}",
+            "payload": {"orchestration_id": f"orch-{i}", "agent_ids": ["ceo", "cfo"]},
+        }
+        yield FakeMessage(json.dumps(envelope).encode("utf-8"))
+
+
+async def run_batch_size(args: argparse.Namespace, batch_size: int) -> Dict[str, Any]:
+    executor = DispatcherExecutor(max_workers=args.workers)
+
+    def process_orchestration_request(
+        payload: Dict[str, Any], source_app: str
+    ) -> tuple:
+        time.sleep(args.call_ms / 1000)
+        return {
+            "orchestration_id": payload["orchestration_id"],
+            "status": "submitted",
+        }, 202
+
+    async def handler(app_name: str, payload: Dict[str, Any]) -> tuple:
+        return await executor.run(
+            "service_bus_orchestration_request",
+            process_orchestration_request,
+            payload,
+            source_app=app_name,
+        )
+
+    processor = OrchestrationBatchProcessor(handler, concurrency=args.concurrency)
+    settler = CountingSettler()
+    poison_every = int(1 / args.poison_rate) if args.poison_rate else 0
+    messages = list(message_source(args.messages, poison_every))
+
+    started = time.perf_counter()
+    for offset in range(0, len(messages), batch_size):
+        await asyncio.sleep(args.invocation_ms / 1000)
+        await processor.process(messages[offset : offset + batch_size], settler)
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    return {
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(len(messages) / elapsed, 1),
+        "settled": settler.counts,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    sizes: List[int] = [int(s) for s in args.batch_sizes.split(",") if s.strip()]
+    results = [await run_batch_size(args, size) for size in sizes]
+    return {"benchmark": "servicebus_batch", "params": vars(args), "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,16,64")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--call-ms", type=float, default=10.0)
+    parser.add_argument("--invocation-ms", type=float, default=2.0)
+    parser.add_argument("--poison-rate", type=float, default=0.01)
+    logging.disable(logging.CRITICAL)
+    emit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Proxy client behaviour against a local stub upstream with latency and failures.
+
+Starts an ``aiohttp`` stub of aos-realm-of-agents / aos-mcp-servers on
+localhost and drives :class:`~aos_dispatcher_azure.upstream.UpstreamPool`
+through three scenarios:
+
+    keepalive   ``--requests`` GETs at ``--concurrency``: a new session per
+                request (no connection reuse) vs. the pooled client.  Reports
+                requests/s, latency and TCP connections the stub accepted.
+    failures    ``--failure-rate`` of responses are ``503``: success rate with
+                retries disabled vs. enabled (``RETRIES=2``).
+    slow        One MCP server stops answering (``--slow-ms``) while the
+                dispatcher keeps sending to it: with the breaker, requests
+                fail fast once it opens and in-flight requests stay bounded
+                by ``MAX_CONCURRENCY``; without it (threshold above the
+                request count), each one waits for the full timeout.
+
+Usage::
+
+    python -m benchmarks.bench_upstream --requests 2000 --latency-ms 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from aos_dispatcher_azure.upstream import UpstreamPool
+
+from ._common import emit, latency_summary
+
+
+class Stub:
+    """Stub upstream; counts the TCP connections it accepted."""
+
+    def __init__(
+        self, latency: float, failure_rate: float, slow: float, seed: int
+    ) -> None:
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow = slow
+        self.rng = random.Random(seed)
+        self.connections: set = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.connections.add(id(request.transport))
+        if request.match_info.get("server") == "slow":
+            await asyncio.sleep(self.slow)
+        else:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            return web.json_response({"error": "unavailable"}, status=503)
+        return web.json_response({"agents": [{"agent_id": "ceo"}], "status": "online"})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/agents", self.handle)
+        app.router.add_get("/api/mcp/servers/{server}/status", self.handle)
+        return app
+
+
+async def _drive(call, count: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            status = await call()
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_s": round(count / elapsed),
+        "elapsed_s": round(elapsed, 3),
+        "latency": latency_summary(latencies),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _pool(name: str, base_url: str, **settings: Any) -> UpstreamPool:
+    for key, value in settings.items():
+        os.environ[f"AOS_UPSTREAM_{name.upper()}_{key}"] = str(value)
+    return UpstreamPool(name, base_url)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub = Stub(args.latency_ms / 1000, 0.0, args.slow_ms / 1000, args.seed)
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    report: Dict[str, Any] = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+    }
+
+    try:
+        # keepalive
+        async def fresh_session() -> int:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base_url}/api/agents") as response:
+                    await response.read()
+                    return response.status
+
+        stub.connections.clear()
+        result = await _drive(fresh_session, args.requests, args.concurrency)
+        result["connections"] = len(stub.connections)
+        report["keepalive"] = {"session_per_request": result}
+        pool = _pool("bench_pooled", base_url)
+        stub.connections.clear()
+        result = await _drive(
+            lambda: _status(pool.request("GET", "api/agents")),
+            args.requests,
+            args.concurrency,
+        )
+        result["connections"] = len(stub.connections)
+        report["keepalive"]["pooled"] = result
+        await pool.close()
+
+        # failures
+        stub.failure_rate = args.failure_rate
+        report["failures"] = {"failure_rate": args.failure_rate}
+        for label, retries in (("no_retry", 0), ("retry", 2)):
+            pool = _pool(
+                f"bench_{label}", base_url, RETRIES=retries, BREAKER_THRESHOLD=10**6
+            )
+            result = await _drive(
+                lambda: _status(pool.request("GET", "api/agents")),
+                args.requests,
+                args.concurrency,
+            )
+            result["stats"] = pool.snapshot()
+            report["failures"][label] = result
+            await pool.close()
+        stub.failure_rate = 0.0
+
+        # slow upstream
+        report["slow"] = {"slow_ms": args.slow_ms, "timeout_s": args.timeout}
+        count = args.slow_requests
+        for label, threshold in (("no_breaker", 10**6), ("breaker", 5)):
+            pool = _pool(
+                f"bench_slow_{label}",
+                base_url,
+                TIMEOUT=args.timeout,
+                RETRIES=0,
+                MAX_CONCURRENCY=16,
+                QUEUE_TIMEOUT=args.timeout / 5,
+                BREAKER_THRESHOLD=threshold,
+            )
+            result = await _drive(
+                lambda: _status(pool.request("GET", "api/mcp/servers/slow/status")),
+                count,
+                args.concurrency,
+            )
+            result["stats"] = pool.snapshot()
+            report["slow"][label] = result
+            await pool.close()
+    finally:
+        await runner.cleanup()
+    return report
+
+
+async def _status(call) -> int:
+    _, status = await call
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--slow-requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=3)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
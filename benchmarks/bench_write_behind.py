@@ -0,0 +1,176 @@
+"""Ingest latency and throughput of record_metric / log_decision, sync vs. write-behind.
+
+Drives the real ``function_app`` handlers in-process against the in-memory
+dispatcher backend (``benchmarks._backend``), where every storage write takes
+``--write-ms``.  Per endpoint (``POST /api/metrics``, ``POST /api/audit/decisions``)
+``--items`` requests are sent, ``--concurrency`` in flight, in three modes:
+
+    sync                the handler waits for the write (``AOS_WRITE_BEHIND`` off)
+    write_behind        the handler buffers the item and answers 202; the
+                        background flusher writes batches of ``--batch``, one
+                        item per storage call (no bulk function)
+    write_behind_bulk   the same, with the library's bulk function: one
+                        storage call per batch
+
+Reported per mode: request latency, requests accepted per second, items
+stored per second (until the last item is in storage) and requests refused
+with 429, plus the buffer counters.  A buffer of ``--capacity`` items smaller
+than ``--items`` shows the backpressure; refused requests are not retried.
+``drain`` gives the time :meth:`WriteBehindBuffer.drain` (the shutdown path)
+takes to write a full buffer, with bulk writes.
+
+Usage::
+
+    python -m benchmarks.bench_write_behind --items 5000 --write-ms 2 --capacity 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import azure.functions as func
+
+from aos_dispatcher_azure.writebehind import WriteBehindStats
+
+from . import _backend
+from ._common import emit, latency_summary
+
+MODES = (
+    ("sync", False, False),
+    ("write_behind", True, False),
+    ("write_behind_bulk", True, True),
+)
+
+
+def _metric(i: int) -> Dict[str, Any]:
+    return {
+        "name": f"bench.metric.{i % 50}",
+        "value": float(i),
+        "tags": {"agent": "cfo"},
+    }
+
+
+def _decision(i: int) -> Dict[str, Any]:
+    return {"title": f"Decision {i}", "agent_id": "cfo", "rationale": "benchmark"}
+
+
+def _request(route: str, body: bytes) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url=f"http://localhost/api/{route}",
+        headers={"Content-Type": "application/json"},
+        body=body,
+    )
+
+
+def _stored(endpoint: str) -> int:
+    if endpoint == "record_metric":
+        return sum(len(series) for series in _backend._metrics.values())
+    return len(_backend._decisions)
+
+
+async def _drive(
+    function_app: Any,
+    endpoint: str,
+    route: str,
+    make: Callable[[int], Dict[str, Any]],
+    args,
+) -> Dict[str, Any]:
+    handler = getattr(function_app, endpoint)
+    bodies = [json.dumps(make(i)).encode() for i in range(args.items)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(body: bytes) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await handler(_request(route, body))
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    _backend.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    accepted_in = time.perf_counter() - started
+    accepted = args.items - statuses.get(429, 0)
+    while _stored(endpoint) < accepted:
+        await asyncio.sleep(0.005)
+    stored_in = time.perf_counter() - started
+    return {
+        "statuses": statuses,
+        "request_latency": latency_summary(latencies),
+        "accepted_per_s": round(accepted / accepted_in, 1),
+        "stored_per_s": round(_stored(endpoint) / stored_in, 1),
+        "stored_after_s": round(stored_in, 3),
+    }
+
+
+def _drain(
+    buffer: Any, make: Callable[[int], Dict[str, Any]], items: int
+) -> Dict[str, Any]:
+    _backend.reset()
+    with buffer._lock:
+        buffer._items.extend((make(i), 0) for i in range(items))
+    started = time.perf_counter()
+    drained = buffer.drain()
+    elapsed = time.perf_counter() - started
+    return {"items": drained, "elapsed_s": round(elapsed, 3)}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    _backend.install()
+    _backend.LATENCY = args.write_ms / 1000
+    import function_app
+
+    report: Dict[str, Any] = {
+        "items": args.items,
+        "concurrency": args.concurrency,
+        "write_ms": args.write_ms,
+        "capacity": args.capacity,
+        "batch": args.batch,
+    }
+    targets = (
+        ("record_metric", "metrics", _metric, function_app._metric_writes),
+        ("log_decision", "audit/decisions", _decision, function_app._decision_writes),
+    )
+    for endpoint, route, make, buffer in targets:
+        buffer.capacity = args.capacity
+        buffer.batch_size = args.batch
+        buffer.interval = args.interval_ms / 1000
+        results: Dict[str, Any] = {}
+        for mode, enabled, bulk in MODES:
+            buffer.enabled = enabled
+            buffer.stats = WriteBehindStats()
+            _backend.use_bulk_writes(bulk)
+            function_app._executor.reset()
+            results[mode] = await _drive(function_app, endpoint, route, make, args)
+            if enabled:
+                results[mode]["buffer"] = buffer.snapshot()
+        results["drain"] = await asyncio.to_thread(
+            _drain, buffer, make, min(args.capacity, args.items)
+        )
+        buffer.enabled = False
+        _backend.use_bulk_writes(False)
+        report[endpoint] = results
+    function_app._executor.shutdown()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-ms", type=float, default=2.0)
+    parser.add_argument("--capacity", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--interval-ms", type=float, default=100.0)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ Azure Functions-specific concerns:
     - Binding to HTTP routes and Service Bus triggers via ``azure.functions``
     - Parsing ``func.HttpRequest`` (body, route params, query params)
     - Converting ``(body, status_code)`` library responses to ``func.HttpResponse``
+    - Running blocking dispatcher calls off the event loop
+      (``aos_dispatcher_azure.execution``)
 
 Receives all inbound requests and dispatches them to the AOS kernel, analogous
 to the dispatcher in a traditional operating system.
@@ -26,42 +28,78 @@ AOS Function Apps (3 total — each is a separate Azure Functions deployment):
     REALM_OF_AGENTS_BASE_URL.  When those variables are not set (e.g. in
     local development) the dispatcher falls back to in-memory stubs.
 
+List endpoints (risks, covenants, decisions, audit trail, networks, agents)
+accept ``limit``/``cursor`` paging and ``format=ndjson`` exports
+(``aos_dispatcher_azure.pagination``).
+
+Every HTTP handler is instrumented per phase (parse / dispatcher / serialize),
+with OpenTelemetry spans and on-demand sampling profiles
+(``aos_dispatcher_azure.instrumentation``).
+
+Decisions are also kept in an append-only, hash-chained segment log that
+answers history and trail queries from its indexes when ``AOS_AUDIT_LOG_PATH``
+is set (``aos_dispatcher_azure.auditlog``).
+
+With ``AOS_WRITE_BEHIND`` set, metric points and decisions are buffered and
+written in background batches, and drained on shutdown
+(``aos_dispatcher_azure.writebehind``).
+
+The dispatcher library is imported on first use, not while the host indexes
+this module, and warm-up pays that cost ahead of traffic
+(``aos_dispatcher_azure.startup``).
+
+Bodies are JSON or, on request, MessagePack; large responses are compressed
+per ``Accept-Encoding`` (``aos_dispatcher_azure.codec``).
+
 Endpoints — Orchestrations (all managed by Foundry Agent Service):
-    POST /api/orchestrations              Submit an orchestration request
-    GET  /api/orchestrations/{id}         Poll orchestration status
+    POST /api/orchestrations              Submit an orchestration request (idempotent,
+                                          admission-controlled: 429 + Retry-After)
+    GET  /api/orchestrations/{id}         Poll orchestration status (?wait= long-poll)
+    GET  /api/orchestrations/{id}/events  Server-Sent Events status stream
     GET  /api/orchestrations/{id}/result  Retrieve completed result
     POST /api/orchestrations/{id}/cancel  Cancel a running orchestration
 
 Endpoints — Knowledge Base:
     POST /api/knowledge/documents         Create a document
-    GET  /api/knowledge/documents         Search documents
+    GET  /api/knowledge/documents         Search documents (BM25 index,
+                                          ?facets=doc_type)
     GET  /api/knowledge/documents/{id}    Get document by ID
     POST /api/knowledge/documents/{id}    Update document
     DELETE /api/knowledge/documents/{id}  Delete document
+    POST /api/knowledge/batch             Create documents in bulk (JSON array or
+                                          NDJSON)
 
 Endpoints — Risk Registry:
     POST /api/risks                       Register a risk
     GET  /api/risks                       List risks
+    GET  /api/risks/summary               Risk counts, exposure and top risks
     POST /api/risks/{id}/assess           Assess a risk
     POST /api/risks/{id}/status           Update risk status
     POST /api/risks/{id}/mitigate         Add mitigation plan
 
 Endpoints — Audit Trail:
-    POST /api/audit/decisions             Log a decision
-    GET  /api/audit/decisions             Get decision history
-    GET  /api/audit/trail                 Get audit trail
+    POST /api/audit/decisions             Log a decision (write-behind: 202 / 429)
+    POST /api/audit/decisions/batch       Log decisions in bulk (JSON array or NDJSON)
+    GET  /api/audit/decisions             Get decision history (?start/end with the
+                                          audit log)
+    GET  /api/audit/trail                 Get audit trail (?limit/cursor,
+                                          ?format=ndjson)
+    GET  /api/audit/verify                Verify the audit log's hash chain
 
 Endpoints — Covenants:
     POST /api/covenants                   Create a covenant
     GET  /api/covenants                   List covenants
-    GET  /api/covenants/{id}/validate     Validate a covenant
+    GET  /api/covenants/{id}/validate     Validate a covenant (memoized until signed)
+    POST /api/covenants/validate          Validate many covenants
     POST /api/covenants/{id}/sign         Sign a covenant
 
 Endpoints — Analytics:
-    POST /api/metrics                     Record a metric
-    GET  /api/metrics                     Get metric series
+    POST /api/metrics                     Record a metric (write-behind: 202 / 429)
+    POST /api/metrics/batch               Record metrics in bulk (JSON array or NDJSON)
+    GET  /api/metrics                     Get metric series (?start/end/step/agg
+                                          downsampled)
     POST /api/kpis                        Create a KPI
-    GET  /api/kpis/dashboard              Get KPI dashboard
+    GET  /api/kpis/dashboard              Get KPI dashboard (materialised, ETag/304)
 
 Endpoints — MCP (proxied to aos-mcp-servers via MCP_SERVERS_BASE_URL):
     GET  /api/mcp/servers                 List MCP servers
@@ -69,17 +107,20 @@ Endpoints — MCP (proxied to aos-mcp-servers via MCP_SERVERS_BASE_URL):
     GET  /api/mcp/servers/{s}/status      Get MCP server status
 
 Endpoints — Agents:
-    GET  /api/agents                      List agents (proxied to aos-realm-of-agents)
-    GET  /api/agents/{id}                 Get agent descriptor (proxied to aos-realm-of-agents)
+    GET  /api/agents                      List agents (proxied to aos-realm-of-agents,
+                                          cached)
+    GET  /api/agents/{id}                 Get agent descriptor (proxied to
+                                          aos-realm-of-agents, cached)
     POST /api/agents/register             Register a PurposeDrivenAgent with Foundry
+    POST /api/agents/ask                  Ask several agents concurrently (fan-out)
     POST /api/agents/{id}/ask             Ask an agent
     POST /api/agents/{id}/send            Send to an agent
     POST /api/agents/{id}/message         Send message via Foundry bridge
 
 Endpoints — Network:
-    POST /api/network/discover            Discover peers
+    POST /api/network/discover            Discover peers (?since= for changes only)
     POST /api/network/{id}/join           Join a network
-    GET  /api/network                     List networks
+    GET  /api/network                     List networks (?since= for changes only)
 
 Endpoints — App Registration:
     POST /api/apps/register               Register a client application
@@ -87,58 +128,735 @@ Endpoints — App Registration:
     DELETE /api/apps/{app_name}           Deregister a client application
 
 Endpoints — Health:
-    GET  /api/health                      Health check
+    GET  /api/health                      Health check (?deep=true; shallow until the
+                                          dispatcher library is loaded)
+    GET  /api/health/startup              Dispatcher import time and warm-up steps
+    GET  /api/health/executor             Dispatcher call queueing/execution stats
+    GET  /api/health/cache                Agent catalog cache, covenant validation memo,
+                                          Foundry handle/thread pool and network table
+                                          counters
+    GET  /api/health/idempotency          Orchestration submission dedup counters
+    GET  /api/health/audit                Audit log size, head hash and compactions
+    GET  /api/health/admission            Running/queued orchestrations and wait per app
+    GET  /api/health/upstreams            Proxy connection pool / circuit breaker stats
+    GET  /api/health/ingest               Write-behind buffer depth and flush counters
+    GET  /api/health/results              Result events published, pending and dropped
+
+Endpoints — Instrumentation:
+    GET  /api/metrics/internal            Per-endpoint latency / size / status metrics
+                                          (Prometheus text format)
+    GET  /api/metrics/internal/profiles/{id}
+                                          Sampling profile of a request sent with
+                                          X-AOS-Profile: true (AOS_PROFILING)
+
+Warm-up Trigger:
+    warmup                                Import the dispatcher and open clients before
+                                          traffic (Premium / Flex Consumption plans)
 
 Service Bus Triggers:
     aos-orchestration-requests            Process incoming orchestration requests
+                                          (batched, settled per message)
+
+Service Bus Topics (published):
+    aos-orchestration-results             Completion/failure events, per-app
+                                          subscription filtered by app_name
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, List, Optional
+from urllib.parse import quote
 
 import azure.functions as func
+import azurefunctions.extensions.bindings.servicebus as servicebus
 
-import aos_dispatcher.dispatcher as dispatcher
+from aos_dispatcher_azure.admission import (
+    DEFAULT_SERVICE_BUS_MAX_WAIT,
+    AdmissionController,
+    AdmissionRejected,
+)
+from aos_dispatcher_azure.auditlog import AuditLog
+from aos_dispatcher_azure.bulk import (
+    DEFAULT_MAX_ITEMS,
+    BulkRequestError,
+    parse_items,
+    summarise,
+    write_items,
+)
+from aos_dispatcher_azure.cache import ResponseCache
+from aos_dispatcher_azure.codec import Codec, CodecError
+from aos_dispatcher_azure.config import env_bool, env_float, env_int
+from aos_dispatcher_azure.covenants import CovenantValidator, validate_all
+from aos_dispatcher_azure.execution import DispatcherExecutor
+from aos_dispatcher_azure.fanout import (
+    DEFAULT_FANOUT_TIMEOUT,
+    DEFAULT_MAX_AGENTS,
+    fan_out,
+)
+from aos_dispatcher_azure.foundry import FoundryPool
+from aos_dispatcher_azure.idempotency import (
+    IdempotencyConflict,
+    IdempotencyGuard,
+    submission_key,
+)
+from aos_dispatcher_azure.instrumentation import (
+    PROMETHEUS_MIMETYPE,
+    Instrumentation,
+    phase,
+)
+from aos_dispatcher_azure.kpis import KpiBoard
+from aos_dispatcher_azure.network import NetworkMembership, VersionError
+from aos_dispatcher_azure.orchestrations import (
+    NOT_FOUND,
+    OrchestrationTracker,
+    etag_matches,
+)
+from aos_dispatcher_azure.pagination import (
+    NDJSON_MIMETYPE,
+    ListSnapshots,
+    PaginationError,
+    ndjson_lines,
+    next_link,
+    paginate,
+    parse_page_request,
+    supports_pagination,
+)
+from aos_dispatcher_azure.results import (
+    EVENT_TYPES,
+    ResultEvent,
+    ResultPublisher,
+    ServiceBusResultBroker,
+    close_on_exit,
+)
+from aos_dispatcher_azure.risks import (
+    BAND_NAMES,
+    MAX_TOP,
+    RiskRegistry,
+    summarise_risks,
+)
+from aos_dispatcher_azure.search import SearchIndex
+from aos_dispatcher_azure.servicebus import OrchestrationBatchProcessor
+from aos_dispatcher_azure.startup import LazyModule, WarmUp
+from aos_dispatcher_azure.streaming import sse_event, sse_retry
+from aos_dispatcher_azure.timeseries import (
+    MetricQuery,
+    MetricQueryError,
+    TimeSeriesStore,
+    parse_timestamp,
+)
+from aos_dispatcher_azure.upstream import UpstreamPool
+from aos_dispatcher_azure.writebehind import WriteBehindBuffer, drain_on_exit
 
 logger = logging.getLogger(__name__)
-app = func.FunctionApp()
+
+# Every HTTP handler is timed per phase (parse / dispatcher / serialize), counted
+# by status and size, and optionally traced and profiled; exposed on
+# GET /api/metrics/internal (see aos_dispatcher_azure.instrumentation).
+_instrumentation = Instrumentation()
+
+
+class _InstrumentedFunctionApp(func.FunctionApp):
+    """``FunctionApp`` that wraps each HTTP route handler in ``_instrumentation``."""
+
+    def route(self, route: Optional[str] = None, *args: Any, **kwargs: Any):
+        register = super().route(route, *args, **kwargs)
+        return lambda fn: register(_instrumentation.wrap(fn.__name__, fn, route))
+
+
+app = _InstrumentedFunctionApp()
+
+# The dispatcher library (and the Foundry / Azure SDK clients it builds) is
+# imported on first use rather than while the host indexes this module.
+dispatcher = LazyModule("aos_dispatcher.dispatcher")
+if not env_bool("AOS_LAZY_DISPATCHER", True):
+    dispatcher.load()
+
+# Blocking dispatcher calls run on a bounded thread pool so a slow call never
+# stalls the worker's event loop (see AOS_DISPATCHER_MAX_WORKERS).
+_executor = DispatcherExecutor()
+
+
+async def _watch_orchestration_status(orch_id: str) -> tuple:
+    return await _executor.run(
+        "orchestration_watcher", dispatcher.get_orchestration_status, orch_id
+    )
+
+
+async def _fetch_orchestration_result(orch_id: str) -> tuple:
+    return await _executor.run(
+        "publish_orchestration_result", dispatcher.get_orchestration_result, orch_id
+    )
+
+
+# Status changes seen by any handler (or by the background watcher) are fanned
+# out to listeners; the result publisher pushes terminal ones to the
+# aos-orchestration-results topic for the submitting app.
+_orchestrations = OrchestrationTracker(_watch_orchestration_status)
+_results = ResultPublisher(
+    ServiceBusResultBroker.from_environment(), result_fn=_fetch_orchestration_result
+)
+_orchestrations.add_listener(_results.on_status_change)
+if _results.enabled:
+    close_on_exit(_results)
+
+# Submissions are deduplicated by Idempotency-Key / orchestration_id across the
+# HTTP endpoint and the Service Bus trigger; a duplicate never starts a second
+# Foundry run.
+_submissions = IdempotencyGuard()
+
+# Running orchestrations are capped per worker and per app; queued submissions
+# are admitted by priority class, then weighted fair share across apps.  Slots
+# are freed when the tracker sees the orchestration finish.  Orchestrations are
+# only polled for their slot while submissions are queued for one.
+_admission = AdmissionController()
+_admission.on_queue = _orchestrations.watch
+_orchestrations.add_listener(_admission.on_status_change)
+_SERVICE_BUS_ADMISSION_WAIT = env_float(
+    "AOS_ADMISSION_SERVICE_BUS_MAX_WAIT", DEFAULT_SERVICE_BUS_MAX_WAIT
+)
+
+
+# Admission key of HTTP submissions that name no app; it has no results subscription.
+_ANONYMOUS_APP = "anonymous"
+
+
+async def _submit_admitted(
+    endpoint: str, app_name: str, body: Any, max_wait: Optional[float] = None, **kwargs
+) -> tuple:
+    """Submit an orchestration through admission control.
+
+    Accepted orchestrations of an app that receives result events are
+    watched until terminal.  Others are observed when a client reads their
+    status, and polled for their admission slot only while submissions queue.
+
+    Raises:
+        AdmissionRejected: No slot became free within *max_wait* seconds.
+    """
+    priority = body.get("priority") if isinstance(body, dict) else None
+    result = await _admission.submit(
+        app_name,
+        lambda: _executor.run(
+            endpoint, dispatcher.process_orchestration_request, body, **kwargs
+        ),
+        priority=priority,
+        max_wait=max_wait,
+    )
+    response_body, status_code = result
+    consumed = _results.enabled and app_name != _ANONYMOUS_APP
+    if consumed and status_code < 400 and isinstance(response_body, dict):
+        orch_id = response_body.get("orchestration_id")
+        if orch_id:
+            _orchestrations.track(orch_id, app_name)
+    return result
+
+
+# Metric points written through this worker, with rollups for windowed queries;
+# series this worker has not seen are backfilled from the dispatcher on demand.
+_metrics = TimeSeriesStore()
+
+
+async def _backfill_metric_series(name: str) -> tuple:
+    return await _executor.run("metrics_backfill", dispatcher.get_metrics, name=name)
+
+
+# KPI dashboard kept materialised as metric points arrive.
+_kpis = KpiBoard()
+
+
+async def _fetch_kpi_dashboard() -> tuple:
+    return await _executor.run("kpi_dashboard_sync", dispatcher.get_kpi_dashboard)
+
+
+def _ingest_metric_points(points: list) -> None:
+    """Apply successfully recorded metric points to the series store and KPIs."""
+    for point in points:
+        if isinstance(point, dict):
+            name, timestamp, value = (
+                point.get("name"),
+                point.get("timestamp"),
+                point.get("value"),
+            )
+            _metrics.add(name, timestamp, value)
+            _kpis.record(name, value, timestamp)
+
+
+# Inverted index answering document searches; loaded from its segment file
+# (AOS_SEARCH_INDEX_PATH) or bootstrapped from the dispatcher on first search,
+# and then rebuilt from it every AOS_SEARCH_RESYNC_INTERVAL seconds.
+_search = SearchIndex()
+
+
+async def _bootstrap_search_index(limit: int) -> tuple:
+    return await _executor.run(
+        "search_index_bootstrap",
+        dispatcher.search_documents,
+        query="",
+        doc_type=None,
+        limit=limit,
+    )
+
+
+# Covenant validation results, reused until the covenant is signed (or a newer
+# version is seen) and at most AOS_COVENANT_CACHE_TTL seconds.
+_covenant_validations = CovenantValidator()
+
+
+async def _validate_covenants(cov_ids: list) -> list:
+    return await _executor.run(
+        "validate_covenants",
+        validate_all,
+        cov_ids,
+        dispatcher.validate_covenant,
+        getattr(dispatcher, "validate_covenants", None),
+    )
+
+
+# Risks indexed by status, category and score band, with counts, exposure and a
+# score ranking kept current by the risk write endpoints.
+_risk_registry = RiskRegistry()
+
+
+async def _fetch_risks() -> tuple:
+    return await _executor.run("risk_registry_sync", dispatcher.list_risks)
+
+
+def _record_risk(result: tuple, body: Optional[dict] = None) -> None:
+    """Apply a successful risk write (the risk it returned) to the registry."""
+    risk, status_code = result
+    if not _risk_registry.enabled or status_code >= 400:
+        return
+    if body is not None and isinstance(risk, dict):
+        risk = dict(body, **risk)
+    if not _risk_registry.apply(risk):
+        _risk_registry.invalidate()
+
+
+# Peers and networks kept per worker with a version and change log, updated by
+# app registration and network joins; discovery is served from it, as full
+# snapshots or as deltas since a client's last version.
+_network = NetworkMembership()
+
+
+async def _fetch_peers() -> tuple:
+    return await _executor.run("network_sync_peers", dispatcher.discover_peers)
+
+
+async def _fetch_networks() -> tuple:
+    return await _executor.run("network_sync_networks", dispatcher.list_networks)
+
+
+def _since(req: func.HttpRequest) -> Optional[str]:
+    """The ``since`` version from the query string, else from a JSON body."""
+    since = req.params.get("since")
+    if since is None and req.get_body():
+        try:
+            body = req.get_json()
+        except ValueError:
+            return None
+        if isinstance(body, dict) and body.get("since") is not None:
+            since = str(body["since"])
+    return since
+
+
+# Decisions logged through this app, in an append-only, hash-chained segment log
+# (AOS_AUDIT_LOG_PATH) that answers history and trail queries from its indexes.
+_audit_log = AuditLog()
+
+
+async def _fetch_audit_trail() -> tuple:
+    return await _executor.run("audit_log_bootstrap", dispatcher.get_audit_trail)
+
+
+def _logged_decision(body: dict, response: Any) -> dict:
+    """The decision as the library stored it: the request plus its id and timestamp."""
+    decision = dict(body)
+    if isinstance(response, dict):
+        for key in ("id", "timestamp"):
+            if response.get(key) is not None:
+                decision[key] = response[key]
+    return decision
+
+
+def _audit_log_following() -> bool:
+    """Whether accepted decisions go to the audit log (it is serving or catching up)."""
+    return _audit_log.complete or bool(_audit_log.behind)
+
+
+async def _append_decisions(decisions: list) -> None:
+    """Append decisions the library accepted to the audit log."""
+    if not decisions:
+        return
+    try:
+        await _executor.run("audit_log_append", _audit_log.append, decisions)
+    except Exception:  # noqa: BLE001 — the library already holds the decisions
+        logger.exception(
+            "Appending %d decision(s) to the audit log failed", len(decisions)
+        )
+        _audit_log.append_failed(decisions)
+        return
+    _audit_log.schedule_compaction(_executor.run)
+
+
+def _write_metric_points(points: list) -> tuple:
+    return write_items(
+        points, dispatcher.record_metric, getattr(dispatcher, "record_metrics", None)
+    )
+
+
+def _metric_points_written(written: list) -> None:
+    _ingest_metric_points(
+        [body if isinstance(body, dict) else point for point, body in written]
+    )
+
+
+def _write_decisions(decisions: list) -> tuple:
+    return write_items(
+        decisions, dispatcher.log_decision, getattr(dispatcher, "log_decisions", None)
+    )
+
+
+def _decisions_written(written: list) -> None:
+    if not _audit_log_following():
+        return
+    decisions = [_logged_decision(body, response) for body, response in written]
+    try:
+        _audit_log.append(decisions)
+    except Exception:  # noqa: BLE001 — the library already holds the decisions
+        logger.exception(
+            "Appending %d decision(s) to the audit log failed", len(decisions)
+        )
+        _audit_log.append_failed(decisions)
+
+
+def _decisions_flushed() -> None:
+    if _audit_log.complete:
+        _audit_log.schedule_compaction(_executor.run)
+
+
+# With AOS_WRITE_BEHIND, record_metric and log_decision answer 202 once the item
+# is buffered; a background task writes the buffers in batches, and they are
+# drained on exit / SIGTERM (aos_dispatcher_azure.writebehind).
+_metric_writes = WriteBehindBuffer(
+    "record_metric",
+    _write_metric_points,
+    _executor.run,
+    on_written=_metric_points_written,
+)
+_decision_writes = WriteBehindBuffer(
+    "log_decision",
+    _write_decisions,
+    _executor.run,
+    on_written=_decisions_written,
+    after_flush=_decisions_flushed,
+)
+if _metric_writes.enabled:
+    drain_on_exit([_metric_writes, _decision_writes])
+
+
+def _buffered(
+    buffer: WriteBehindBuffer, item: Any, req: func.HttpRequest
+) -> func.HttpResponse:
+    """``202`` once *item* is buffered, or ``429`` + ``Retry-After`` if it is full."""
+    if not buffer.offer(item):
+        response = _make_response(
+            ({"error": f"{buffer.endpoint} buffer is full"}, 429), req
+        )
+        response.headers["Retry-After"] = str(buffer.retry_after)
+        return response
+    return _make_response(({"status": "accepted", "buffered": len(buffer)}, 202), req)
+
+
+def _index_document(doc_id: object, *changes: object) -> None:
+    """Queue a successful document write for the search index.
+
+    Only appends to the index's queue; it is applied on the thread pool.
+    """
+    if _search.enabled and isinstance(doc_id, str) and doc_id:
+        _search.queue_update(doc_id, *changes)
+        _search.schedule_apply(_executor.run)
+
+
+def _unindex_document(doc_id: str) -> None:
+    """Queue the removal of a deleted document from the search index."""
+    if _search.enabled:
+        _search.queue_delete(doc_id)
+        _search.schedule_apply(_executor.run)
+
+
+# Pooled, circuit-broken clients for the proxied function apps; None when the
+# base URL is unset, in which case the library's stubs answer.
+_mcp_upstream = UpstreamPool.from_environment("mcp_servers", "MCP_SERVERS_BASE_URL")
+_catalog_upstream = UpstreamPool.from_environment(
+    "realm_of_agents", "REALM_OF_AGENTS_BASE_URL"
+)
+_upstreams = [pool for pool in (_mcp_upstream, _catalog_upstream) if pool is not None]
+
+
+async def _upstream_list_mcp_servers(server_type: Optional[str] = None) -> tuple:
+    return await _mcp_upstream.request(
+        "GET", "api/mcp/servers", {"server_type": server_type}
+    )
+
+
+async def _upstream_get_mcp_server_status(server: str) -> tuple:
+    return await _mcp_upstream.request(
+        "GET", f"api/mcp/servers/{quote(server, safe='')}/status"
+    )
+
+
+async def _upstream_list_agents(agent_type: Optional[str] = None) -> tuple:
+    return await _catalog_upstream.request(
+        "GET", "api/agents", {"agent_type": agent_type}
+    )
+
+
+async def _upstream_get_agent_descriptor(agent_id: str) -> tuple:
+    return await _catalog_upstream.request(
+        "GET", f"api/agents/{quote(agent_id, safe='')}"
+    )
+
+
+_UPSTREAM_CALLS = {
+    "list_mcp_servers": (_mcp_upstream, _upstream_list_mcp_servers),
+    "get_mcp_server_status": (_mcp_upstream, _upstream_get_mcp_server_status),
+    "list_agents": (_catalog_upstream, _upstream_list_agents),
+    "get_agent_descriptor": (_catalog_upstream, _upstream_get_agent_descriptor),
+}
+
+
+def _proxied(name: str):
+    """The pooled upstream call for proxy function *name*, else the library's stub."""
+    pool, call = _UPSTREAM_CALLS[name]
+    return call if pool is not None else getattr(dispatcher, name)
+
+
+# Realm-of-agents catalog responses, cached per worker with stale-while-revalidate;
+# register_agent invalidates them.
+_agent_catalog = ResponseCache("agents")
+_agent_descriptors = ResponseCache("agent_descriptors")
+
+# Full collections kept between the pages sliced from them (see _list_response).
+_list_snapshots = ListSnapshots()
+
+
+async def _cached_call(
+    cache: Optional[ResponseCache], endpoint: str, fn, *args, **kwargs
+) -> tuple:
+    """Run a dispatcher call, through *cache* (keyed by its arguments) if given."""
+
+    def call() -> Awaitable[tuple]:
+        return _executor.run(endpoint, fn, *args, **kwargs)
+
+    if cache is None:
+        return await call()
+    return await cache.get(args + tuple(sorted(kwargs.items())), call)
+
+
+def _warm_up_dispatcher() -> None:
+    """Run the library's own ``warmup()`` (client construction), if it has one."""
+    hook = getattr(dispatcher, "warmup", None)
+    if callable(hook):
+        hook()
+    _foundry_pool.install(dispatcher.load())
+
+
+# Foundry agent handles and per-(agent, orchestration) threads reused across
+# calls, once installed over the library's project client.
+_foundry_pool = FoundryPool()
+
+
+def _foundry_call(
+    fn: Callable[..., Any], agent_id: str, body: Any
+) -> Callable[..., Any]:
+    """*fn* run in the pooling scope of a Foundry-backed agent call.
+
+    See ``aos_dispatcher_azure.foundry``: the scope ends on the pool thread,
+    when the library call returns.
+    """
+    if _foundry_pool.enabled and not _foundry_pool.installed:
+        _foundry_pool.install(dispatcher.load())
+    orch_id = body.get("orchestration_id") if isinstance(body, dict) else None
+    return _foundry_pool.bind(fn, agent_id, orch_id)
+
+
+async def _warm_up_upstreams() -> None:
+    await asyncio.gather(*(pool.warm_up() for pool in _upstreams))
+
+
+# Deferred start-up work, run ahead of traffic by the warm-up trigger, the first
+# health probe or (AOS_WARMUP_ON_LOAD) a background thread started right here.
+_warm_up = WarmUp()
+_warm_up.add("dispatcher_import", dispatcher.load)
+_warm_up.add("dispatcher_warmup", _warm_up_dispatcher)
+_warm_up.add("upstreams", _warm_up_upstreams, loop_bound=True)
+_warm_up.add("results_publisher", _results.warm_up, loop_bound=True)
+if _warm_up.enabled and _warm_up.on_load:
+    _warm_up.start_background()
+
+# Serializer for request and response bodies (orjson / MessagePack / gzip / br
+# when available; see aos_dispatcher_azure.codec).
+_codec = Codec()
+
+# Upper bound for long-poll / SSE holds; keep well below functionTimeout.
+_LONG_POLL_MAX_WAIT = env_float("AOS_LONG_POLL_MAX_WAIT", 55.0)
+_SSE_RETRY_MS = 250
+
+# Deadline cap and width of POST /api/agents/ask fan-outs.
+_FANOUT_TIMEOUT = env_float("AOS_FANOUT_TIMEOUT", DEFAULT_FANOUT_TIMEOUT)
+_FANOUT_MAX_AGENTS = env_int("AOS_FANOUT_MAX_AGENTS", DEFAULT_MAX_AGENTS)
 
 
 # ── Response helpers ──────────────────────────────────────────────────────────
 
 
-def _make_response(result: tuple) -> func.HttpResponse:
+def _make_response(
+    result: tuple, req: Optional[func.HttpRequest] = None
+) -> func.HttpResponse:
     """Convert a library ``(body, status_code)`` tuple to ``func.HttpResponse``.
 
     - ``body is None``   → 204 No Content (no body, no Content-Type)
     - ``body`` is bytes  → raw bytes passed through (proxy responses)
-    - ``body`` is dict   → JSON-serialised with ``application/json``
+    - ``body`` is dict   → JSON-serialised with ``application/json``, or
+      MessagePack when *req* prefers it in ``Accept``
+
+    With *req*, bodies above ``AOS_COMPRESSION_MIN_BYTES`` are compressed per
+    its ``Accept-Encoding`` (``aos_dispatcher_azure.codec``).
     """
     body, status_code = result
     if body is None:
         return func.HttpResponse(status_code=status_code)
-    if isinstance(body, bytes):
-        return func.HttpResponse(body, status_code=status_code, mimetype="application/json")
+    headers = req.headers if req is not None else {}
+    with phase("serialize"):
+        payload, mimetype, extra = _codec.encode_response(
+            body, headers.get("Accept", ""), headers.get("Accept-Encoding", "")
+        )
     return func.HttpResponse(
-        json.dumps(body),
-        status_code=status_code,
-        mimetype="application/json",
+        payload, status_code=status_code, mimetype=mimetype, headers=extra
     )
 
 
+def _parse_wait(req: func.HttpRequest, default: float = 0.0) -> tuple:
+    """Parse the long-poll ``wait`` query parameter (seconds).
+
+    Returns:
+        ``(seconds, None)`` capped at ``AOS_LONG_POLL_MAX_WAIT``.
+        ``(None, error_response)`` when the value is not a number.
+    """
+    raw = req.params.get("wait")
+    if raw is None:
+        return default, None
+    try:
+        wait = float(raw)
+    except ValueError:
+        return None, _make_response(
+            ({"error": "'wait' must be a number of seconds"}, 400), req
+        )
+    return max(0.0, min(wait, _LONG_POLL_MAX_WAIT)), None
+
+
 def _require_json(req: func.HttpRequest) -> tuple:
-    """Parse JSON body from request.
+    """Parse the JSON (or MessagePack) request body.
 
     Returns:
         ``(body_dict, None)`` on success.
-        ``(None, error_response)`` when the body is not valid JSON.
+        ``(None, error_response)`` when the body cannot be decoded.
     """
     try:
-        return req.get_json(), None
-    except ValueError:
-        return None, _make_response(({"error": "Invalid JSON body"}, 400))
+        with phase("parse"):
+            body = _codec.decode_body(
+                req.get_body(), req.headers.get("Content-Type", "")
+            )
+        return body, None
+    except CodecError as exc:
+        return None, _make_response(({"error": str(exc)}, 400), req)
+
+
+def _require_items(req: func.HttpRequest) -> tuple:
+    """Parse a batch request body (JSON array, ``{"items": [...]}`` or NDJSON).
+
+    Returns:
+        ``(items, None)`` on success.
+        ``(None, error_response)`` when the body cannot be split into items.
+    """
+    try:
+        with phase("parse"):
+            items = parse_items(
+                req.get_body(), req.headers.get("Content-Type", ""), codec=_codec
+            )
+        return items, None
+    except BulkRequestError as exc:
+        return None, _make_response(({"error": str(exc)}, exc.status_code), req)
+
+
+async def _list_response(
+    req: func.HttpRequest,
+    endpoint: str,
+    fn,
+    list_key: str,
+    key: str = "id",
+    cache: Optional[ResponseCache] = None,
+    **kwargs,
+) -> func.HttpResponse:
+    """Call a list function and apply ``limit`` / ``cursor`` / ``format`` paging.
+
+    The full collection is returned unchanged when no paging parameter is
+    given.  See ``aos_dispatcher_azure.pagination``.  With *cache* the library
+    response is served through it.  Pages after the first are cut from the
+    snapshot kept for their cursor, when it is still held, without calling
+    *fn* again.
+    """
+    try:
+        page = parse_page_request(req.params, req.headers.get("Accept", ""))
+    except PaginationError as exc:
+        return _make_response(({"error": str(exc)}, 400), req)
+    native = page.active and supports_pagination(fn)
+    snapshot = None
+    scope = tuple(sorted(kwargs.items()))
+    if native:
+        kwargs.update(limit=page.size, cursor=page.cursor)
+    elif page.active:
+        try:
+            snapshot = _list_snapshots.lookup(page.cursor, endpoint, scope)
+        except PaginationError as exc:
+            return _make_response(({"error": str(exc)}, 400), req)
+    if snapshot is not None:
+        result = (snapshot, 200)
+    else:
+        result = await _cached_call(cache, endpoint, fn, **kwargs)
+    body, status_code = result
+    if not page.active or status_code >= 400:
+        return _make_response(result, req)
+    if isinstance(body, bytes):
+        try:
+            body = _codec.loads(body)
+        except ValueError:
+            return _make_response(result, req)
+    if not isinstance(body, dict):
+        return _make_response(result, req)
+    if native:
+        next_cursor = body.get("next_cursor")
+    else:
+        try:
+            body, next_cursor = paginate(
+                body, list_key, page, endpoint, key, _list_snapshots, scope
+            )
+        except PaginationError as exc:
+            return _make_response(({"error": str(exc)}, 400), req)
+    if not page.export:
+        return _make_response((body, status_code), req)
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_link(req.url, next_cursor)}>; rel="next"'
+    with phase("serialize"):
+        lines = ndjson_lines(body.get(list_key) or [])
+    return func.HttpResponse(
+        lines, status_code=status_code, mimetype=NDJSON_MIMETYPE, headers=headers
+    )
 
 
 # ── HTTP Endpoints — Orchestrations ──────────────────────────────────────────
@@ -159,19 +877,120 @@ async def submit_orchestration(req: func.HttpRequest) -> func.HttpResponse:
             "config": {},
             "callback_url": null
         }
+
+    Resubmitting with the same ``Idempotency-Key`` header (or, without one,
+    the same ``orchestration_id``) from the same app returns the first
+    submission's response with ``Idempotent-Replayed: true`` instead of
+    starting another run.  Reusing either with a different body returns
+    ``422`` (``Idempotency-Key``) or ``409`` (``orchestration_id``).
+
+    The submitting app (``X-App-Name`` header, else ``app_name`` in the body)
+    and the optional ``priority`` field (``high``/``normal``/``low``) decide
+    admission; apps that are not registered share one quota.  When the quota
+    is used up and no slot frees up within ``AOS_ADMISSION_MAX_WAIT``, ``429``
+    is returned with ``Retry-After``.
     """
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.process_orchestration_request(body))
+    app_name = (
+        req.headers.get("X-App-Name")
+        or (body.get("app_name") if isinstance(body, dict) else None)
+        or _ANONYMOUS_APP
+    )
+    try:
+        result, replayed = await _submissions.run(
+            submission_key(app_name, body, req.headers.get("Idempotency-Key")),
+            body,
+            lambda: _submit_admitted("submit_orchestration", app_name, body),
+        )
+    except IdempotencyConflict as exc:
+        return _make_response(({"error": str(exc)}, exc.status_code), req)
+    except AdmissionRejected as exc:
+        response = _make_response(({"error": str(exc)}, 429), req)
+        response.headers["Retry-After"] = str(exc.retry_after)
+        return response
+    response = _make_response(result, req)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
 
 
 @app.function_name("get_orchestration_status")
 @app.route(route="orchestrations/{orchestration_id}", methods=["GET"])
 async def get_orchestration_status(req: func.HttpRequest) -> func.HttpResponse:
-    """Poll the status of a submitted orchestration."""
+    """Poll the status of a submitted orchestration.
+
+    Responses carry an ``ETag``.  With ``?wait=<seconds>`` the request is held
+    until the status body differs from the client's ``If-None-Match`` tag (or
+    from the state at request time); if nothing changes before the timeout,
+    ``304 Not Modified`` is returned.  Without ``wait``, a matching
+    ``If-None-Match`` also returns ``304``.
+    """
     orch_id = req.route_params.get("orchestration_id", "")
-    return _make_response(dispatcher.get_orchestration_status(orch_id))
+    wait, err = _parse_wait(req)
+    if err:
+        return err
+    result = await _executor.run(
+        "get_orchestration_status", dispatcher.get_orchestration_status, orch_id
+    )
+    state = await _orchestrations.observe(orch_id, result[0])
+    if state is None or result[1] >= 400:
+        return _make_response(result, req)
+    if_none_match = req.headers.get("If-None-Match")
+    matched = etag_matches(if_none_match, state.etag)
+    if wait and not state.terminal and (matched or not if_none_match):
+        state = await _orchestrations.wait_for_change(orch_id, state.etag, wait)
+        matched = etag_matches(if_none_match, state.etag)
+    if matched:
+        response = func.HttpResponse(status_code=304)
+    else:
+        status_code = 404 if state.status == NOT_FOUND else 200
+        response = _make_response((state.body, status_code), req)
+    response.headers["ETag"] = f'"{state.etag}"'
+    return response
+
+
+@app.function_name("stream_orchestration_events")
+@app.route(route="orchestrations/{orchestration_id}/events", methods=["GET"])
+async def stream_orchestration_events(req: func.HttpRequest) -> func.HttpResponse:
+    """Server-Sent Events stream of status transitions and partial outputs.
+
+    Each response carries the events after ``Last-Event-ID`` (held for up to
+    ``wait`` seconds until there is at least one) and ends; ``EventSource``
+    reconnects with the last event ID to continue.  The stream ends with an
+    ``end`` event, with an ID of its own, once the orchestration reaches a
+    terminal status; reconnecting after it returns ``204 No Content``.
+    """
+    orch_id = req.route_params.get("orchestration_id", "")
+    wait, err = _parse_wait(req, default=_LONG_POLL_MAX_WAIT)
+    if err:
+        return err
+    last_event_id = req.headers.get("Last-Event-ID") or req.params.get("last_event_id")
+    result = await _executor.run(
+        "stream_orchestration_events", dispatcher.get_orchestration_status, orch_id
+    )
+    state = await _orchestrations.observe(orch_id, result[0])
+    if state is None or result[1] >= 400:
+        return _make_response(result, req)
+    changes = state.changes_since(last_event_id)
+    if not changes and wait and not state.terminal:
+        await _orchestrations.wait_for_change(orch_id, last_event_id, wait)
+        changes = state.changes_since(last_event_id)
+    end_id = f"{state.etag}-end"
+    if state.terminal and last_event_id == end_id:
+        # The client already has the end event; 204 stops EventSource reconnecting.
+        return func.HttpResponse(status_code=204, headers={"Cache-Control": "no-cache"})
+    parts = [sse_retry(_SSE_RETRY_MS)]
+    parts.extend(sse_event(c.body, event=c.kind, event_id=c.etag) for c in changes)
+    if state.terminal:
+        parts.append(sse_event({"status": state.status}, event="end", event_id=end_id))
+    return func.HttpResponse(
+        "".join(parts),
+        status_code=200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 @app.function_name("get_orchestration_result")
@@ -179,7 +998,13 @@ async def get_orchestration_status(req: func.HttpRequest) -> func.HttpResponse:
 async def get_orchestration_result(req: func.HttpRequest) -> func.HttpResponse:
     """Retrieve the final result of a completed orchestration."""
     orch_id = req.route_params.get("orchestration_id", "")
-    return _make_response(dispatcher.get_orchestration_result(orch_id))
+    result = await _executor.run(
+        "get_orchestration_result", dispatcher.get_orchestration_result, orch_id
+    )
+    if result[1] < 400:
+        # A result means the orchestration finished; catch the tracker up.
+        await _orchestrations.refresh(orch_id)
+    return _make_response(result, req)
 
 
 @app.function_name("cancel_orchestration")
@@ -187,47 +1012,84 @@ async def get_orchestration_result(req: func.HttpRequest) -> func.HttpResponse:
 async def cancel_orchestration(req: func.HttpRequest) -> func.HttpResponse:
     """Cancel a running orchestration."""
     orch_id = req.route_params.get("orchestration_id", "")
-    return _make_response(dispatcher.cancel_orchestration(orch_id))
+    result = await _executor.run(
+        "cancel_orchestration", dispatcher.cancel_orchestration, orch_id
+    )
+    if result[1] < 400:
+        await _orchestrations.refresh(orch_id)
+    return _make_response(result, req)
 
 
 # ── Service Bus Trigger — Orchestration Requests ─────────────────────────────
 
 
+async def _process_service_bus_request(app_name: str, payload: dict) -> tuple:
+    """Process one Service Bus orchestration request using the HTTP code path.
+
+    Accepted orchestrations are watched until they finish so the result can be
+    published to the app's ``aos-orchestration-results`` subscription; requests
+    the dispatcher rejects are published as failures straight away.  A
+    redelivered or duplicate request (same app and ``orchestration_id``) gets
+    the first submission's response; the same id with a different payload is
+    published as a failure.  Requests that are not admitted within
+    ``AOS_ADMISSION_SERVICE_BUS_MAX_WAIT`` raise, so the message is abandoned
+    and redelivered later.
+    """
+    try:
+        result, _ = await _submissions.run(
+            submission_key(app_name, payload),
+            payload,
+            lambda: _submit_admitted(
+                "service_bus_orchestration_request",
+                app_name,
+                payload,
+                _SERVICE_BUS_ADMISSION_WAIT,
+                source_app=app_name,
+            ),
+        )
+    except IdempotencyConflict as exc:
+        # Redelivering cannot fix a reused id; report it like a rejection.
+        result = ({"error": str(exc)}, exc.status_code)
+    body, status_code = result
+    body = body if isinstance(body, dict) else {}
+    orch_id = body.get("orchestration_id") or payload.get("orchestration_id") or ""
+    if status_code < 400 and orch_id:
+        await _orchestrations.observe(orch_id, body)
+    elif 400 <= status_code < 500:
+        await _results.publish(
+            ResultEvent(orch_id, app_name, EVENT_TYPES["failed"], body)
+        )
+    return result
+
+
+_service_bus_batches = OrchestrationBatchProcessor(_process_service_bus_request)
+
+
 @app.function_name("service_bus_orchestration_request")
 @app.service_bus_queue_trigger(
-    arg_name="msg",
+    arg_name="messages",
     queue_name="aos-orchestration-requests",
     connection="SERVICE_BUS_CONNECTION",
+    cardinality=func.Cardinality.MANY,
+    auto_complete_messages=False,
 )
-async def service_bus_orchestration_request(msg: func.ServiceBusMessage) -> None:
-    """Process an orchestration request received via Service Bus.
+async def service_bus_orchestration_request(
+    messages: List[servicebus.ServiceBusReceivedMessage],
+    message_actions: servicebus.ServiceBusMessageActions,
+) -> None:
+    """Process a batch of orchestration requests received via Service Bus.
 
     This trigger enables scale-to-zero: AOS sleeps until a message arrives
     on the orchestration requests queue, then wakes up to process it.
-    """
-    body_bytes = msg.get_body()
-    body_str = body_bytes.decode("utf-8")
-
-    try:
-        envelope = json.loads(body_str)
-    except json.JSONDecodeError:
-        logger.error("Invalid JSON in Service Bus message: %s", body_str[:200])
-        return
-
-    app_name = envelope.get("app_name", "unknown")
-    payload = envelope.get("payload", {})
-
-    logger.info(
-        "Received orchestration request via Service Bus from app '%s'",
-        app_name,
-    )
+    Messages in a batch are processed concurrently (capped by
+    ``AOS_SERVICE_BUS_BATCH_CONCURRENCY``) and settled individually, so one
+    poison message is dead-lettered without failing the rest of the batch.
 
-    # Process the request using the same logic as HTTP
-    dispatcher.process_orchestration_request(payload, source_app=app_name)
-
-    # TODO: Send result back via Service Bus topic to the client app
-    # This would use the aos-orchestration-results topic with a subscription
-    # filtered by app_name.
+    Results are pushed to the ``aos-orchestration-results`` topic (filtered by
+    ``app_name``) as soon as each orchestration completes, fails or is
+    cancelled.
+    """
+    await _service_bus_batches.process(messages, message_actions)
 
 
 # ── HTTP Endpoints — App Registration ────────────────────────────────────────
@@ -246,13 +1108,26 @@ async def register_app(req: func.HttpRequest) -> func.HttpResponse:
         {
             "app_name": "business-infinity",
             "workflows": ["strategic-review", "market-analysis"],
-            "app_id": "optional-azure-ad-app-id"
+            "app_id": "optional-azure-ad-app-id",
+            "weight": 1,
+            "max_running": 16
         }
+
+    The optional ``weight`` and ``max_running`` set the app's fair-queueing
+    weight and running-orchestration quota for admission control.
     """
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.register_app(body))
+    result = await _executor.run("register_app", dispatcher.register_app, body)
+    if result[1] < 400 and isinstance(body, dict) and body.get("app_name"):
+        _admission.configure_app(
+            body["app_name"],
+            weight=body.get("weight"),
+            max_running=body.get("max_running"),
+        )
+        _network.peer_registered(str(body["app_name"]))
+    return _make_response(result, req)
 
 
 @app.function_name("get_app_registration")
@@ -260,7 +1135,12 @@ async def register_app(req: func.HttpRequest) -> func.HttpResponse:
 async def get_app_registration(req: func.HttpRequest) -> func.HttpResponse:
     """Get the registration status of a client application."""
     app_name = req.route_params.get("app_name", "")
-    return _make_response(dispatcher.get_app_registration(app_name))
+    return _make_response(
+        await _executor.run(
+            "get_app_registration", dispatcher.get_app_registration, app_name
+        ),
+        req,
+    )
 
 
 @app.function_name("deregister_app")
@@ -268,7 +1148,11 @@ async def get_app_registration(req: func.HttpRequest) -> func.HttpResponse:
 async def deregister_app(req: func.HttpRequest) -> func.HttpResponse:
     """Remove a client application registration."""
     app_name = req.route_params.get("app_name", "")
-    return _make_response(dispatcher.deregister_app(app_name))
+    result = await _executor.run("deregister_app", dispatcher.deregister_app, app_name)
+    if result[1] < 400:
+        _admission.forget_app(app_name)
+        _network.peer_deregistered(app_name)
+    return _make_response(result, req)
 
 
 # ── Health ────────────────────────────────────────────────────────────────────
@@ -276,9 +1160,140 @@ async def deregister_app(req: func.HttpRequest) -> func.HttpResponse:
 
 @app.function_name("health")
 @app.route(route="health", methods=["GET"])
-async def health(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
-    """Health check endpoint."""
-    return _make_response(dispatcher.health())
+async def health(req: func.HttpRequest) -> func.HttpResponse:
+    """Health check endpoint.
+
+    Until the dispatcher library has been imported, answers from the wrapper
+    alone and starts warm-up, so the first probe of a cold worker does not
+    pay for the Foundry clients.  ``?deep=true`` always asks the library.
+    """
+    deep = req.params.get("deep", "").lower() in ("1", "true")
+    if not dispatcher.loaded and not deep:
+        _warm_up.schedule()
+        body = {
+            "status": "healthy",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "components": {"dispatcher": "not_loaded"},
+        }
+        return _make_response((body, 200), req)
+    return _make_response(await _executor.run("health", dispatcher.health), req)
+
+
+@app.function_name("get_startup_stats")
+@app.route(route="health/startup", methods=["GET"])
+async def get_startup_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Dispatcher import time and warm-up step outcomes for this worker."""
+    import_ms = dispatcher.load_seconds
+    body = {
+        "dispatcher": {
+            "loaded": dispatcher.loaded,
+            "import_ms": round(import_ms * 1000, 3) if import_ms is not None else None,
+        },
+        "warmup": _warm_up.snapshot(),
+    }
+    return _make_response((body, 200), req)
+
+
+@app.function_name("warmup")
+@app.warm_up_trigger("context")
+async def warmup(context: func.warmup.WarmUpContext) -> None:
+    """Warm-up trigger: fired when the platform adds an instance, before traffic."""
+    snapshot = await _warm_up.run()
+    logger.info("Warm-up completed: %s", snapshot["steps"])
+
+
+@app.function_name("get_executor_stats")
+@app.route(route="health/executor", methods=["GET"])
+async def get_executor_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Per-endpoint queueing and execution time for dispatcher calls.
+
+    Used to size ``AOS_DISPATCHER_MAX_WORKERS``: sustained queue time with flat
+    execution time means the pool is saturated.
+    """
+    return _make_response((_executor.snapshot(), 200), req)
+
+
+@app.function_name("get_cache_stats")
+@app.route(route="health/cache", methods=["GET"])
+async def get_cache_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Counters of the agent catalog caches, covenant memo, Foundry pool and network."""
+    caches = {c.name: c.snapshot() for c in (_agent_catalog, _agent_descriptors)}
+    caches["covenant_validations"] = _covenant_validations.snapshot()
+    caches["foundry_pool"] = _foundry_pool.snapshot()
+    caches["network"] = _network.snapshot()
+    return _make_response(({"caches": caches}, 200), req)
+
+
+@app.function_name("get_admission_stats")
+@app.route(route="health/admission", methods=["GET"])
+async def get_admission_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Running orchestrations, queue depth and admission wait per app."""
+    return _make_response(({"admission": _admission.snapshot()}, 200), req)
+
+
+@app.function_name("get_idempotency_stats")
+@app.route(route="health/idempotency", methods=["GET"])
+async def get_idempotency_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Replayed/coalesced counters of orchestration submission deduplication."""
+    return _make_response(({"idempotency": _submissions.snapshot()}, 200), req)
+
+
+@app.function_name("get_audit_log_stats")
+@app.route(route="health/audit", methods=["GET"])
+async def get_audit_log_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Audit log size, head hash and compaction counters."""
+    return _make_response(({"audit_log": _audit_log.snapshot()}, 200), req)
+
+
+@app.function_name("get_write_behind_stats")
+@app.route(route="health/ingest", methods=["GET"])
+async def get_write_behind_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Write-behind buffer depth and flush counters (record_metric, log_decision)."""
+    buffers = {b.endpoint: b.snapshot() for b in (_metric_writes, _decision_writes)}
+    return _make_response(({"write_behind": buffers}, 200), req)
+
+
+@app.function_name("get_result_publisher_stats")
+@app.route(route="health/results", methods=["GET"])
+async def get_result_publisher_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Result events published, pending and dropped for aos-orchestration-results."""
+    return _make_response(({"results": _results.stats()}, 200), req)
+
+
+@app.function_name("get_upstream_stats")
+@app.route(route="health/upstreams", methods=["GET"])
+async def get_upstream_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Connection pool, circuit breaker and latency stats per proxied upstream."""
+    return _make_response(
+        ({"upstreams": {u.name: u.snapshot() for u in _upstreams}}, 200), req
+    )
+
+
+@app.function_name("get_internal_metrics")
+@app.route(route="metrics/internal", methods=["GET"])
+async def get_internal_metrics(req: func.HttpRequest) -> func.HttpResponse:
+    """Per-endpoint latency, size and status metrics in Prometheus text format."""
+    return func.HttpResponse(
+        _instrumentation.render_prometheus(),
+        status_code=200,
+        mimetype=PROMETHEUS_MIMETYPE,
+    )
+
+
+@app.function_name("get_profile")
+@app.route(route="metrics/internal/profiles/{profile_id}", methods=["GET"])
+async def get_profile(req: func.HttpRequest) -> func.HttpResponse:
+    """A sampling profile taken for a request sent with ``X-AOS-Profile: true``.
+
+    Returns folded stacks (``text/plain``, for flame graph tools), or a JSON
+    summary of the hottest frames with ``?format=json``.
+    """
+    profile = _instrumentation.profiles.get(req.route_params.get("profile_id", ""))
+    if profile is None:
+        return _make_response(({"error": "Profile not found"}, 404), req)
+    if req.params.get("format") == "json":
+        return _make_response((profile.summary(), 200), req)
+    return func.HttpResponse(profile.folded(), status_code=200, mimetype="text/plain")
 
 
 # ── Knowledge Base Endpoints ─────────────────────────────────────────────────
@@ -291,7 +1306,36 @@ async def create_document(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.create_document(body))
+    result = await _executor.run("create_document", dispatcher.create_document, body)
+    if result[1] < 400 and isinstance(result[0], dict):
+        _index_document(result[0].get("id"), body, result[0])
+    return _make_response(result, req)
+
+
+@app.function_name("create_documents_batch")
+@app.route(route="knowledge/batch", methods=["POST"])
+async def create_documents_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """Create many knowledge documents; returns a result per document.
+
+    Not under ``knowledge/documents/`` so that it cannot capture a document
+    whose id is ``batch``.
+    """
+    items, err = _require_items(req)
+    if err:
+        return err
+    result = await _executor.run(
+        "create_documents_batch",
+        write_items,
+        items,
+        dispatcher.create_document,
+        getattr(dispatcher, "create_documents", None),
+    )
+    for entry in result[0]["results"]:
+        if entry["status"] < 400 and isinstance(entry["body"], dict):
+            _index_document(
+                entry["body"].get("id"), items[entry["index"]], entry["body"]
+            )
+    return _make_response(result, req)
 
 
 @app.function_name("get_document")
@@ -299,17 +1343,48 @@ async def create_document(req: func.HttpRequest) -> func.HttpResponse:
 async def get_document(req: func.HttpRequest) -> func.HttpResponse:
     """Get a knowledge document by ID."""
     doc_id = req.route_params.get("document_id", "")
-    return _make_response(dispatcher.get_document(doc_id))
+    return _make_response(
+        await _executor.run("get_document", dispatcher.get_document, doc_id), req
+    )
 
 
 @app.function_name("search_documents")
 @app.route(route="knowledge/documents", methods=["GET"])
 async def search_documents(req: func.HttpRequest) -> func.HttpResponse:
-    """Search knowledge documents."""
+    """Search knowledge documents.
+
+    Answered from the BM25 index (``aos_dispatcher_azure.search``) once it
+    holds the corpus; ``facets=doc_type`` adds per-type match counts.  Until
+    then the library search is used.
+    """
     query = req.params.get("query") or ""
     doc_type = req.params.get("doc_type")
-    limit = int(req.params.get("limit", "10"))
-    return _make_response(dispatcher.search_documents(query=query, doc_type=doc_type, limit=limit))
+    try:
+        # Same rules (and cap) as list page sizes.
+        limit = parse_page_request({"limit": req.params.get("limit") or "10"}).limit
+    except PaginationError as exc:
+        return _make_response(({"error": str(exc)}, 400), req)
+    if await _search.ensure_ready(_bootstrap_search_index, _executor.run):
+        facets = req.params.get("facets") == "doc_type"
+        return _make_response(
+            (
+                await _executor.run(
+                    "search_documents", _search.search, query, doc_type, limit, facets
+                ),
+                200,
+            ),
+            req,
+        )
+    return _make_response(
+        await _executor.run(
+            "search_documents",
+            dispatcher.search_documents,
+            query=query,
+            doc_type=doc_type,
+            limit=limit,
+        ),
+        req,
+    )
 
 
 @app.function_name("update_document")
@@ -320,7 +1395,14 @@ async def update_document(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.update_document(doc_id, body))
+    result = await _executor.run(
+        "update_document", dispatcher.update_document, doc_id, body
+    )
+    if result[1] < 400:
+        _index_document(
+            doc_id, body, result[0] if isinstance(result[0], dict) else None
+        )
+    return _make_response(result, req)
 
 
 @app.function_name("delete_document")
@@ -328,7 +1410,10 @@ async def update_document(req: func.HttpRequest) -> func.HttpResponse:
 async def delete_document(req: func.HttpRequest) -> func.HttpResponse:
     """Delete a knowledge document."""
     doc_id = req.route_params.get("document_id", "")
-    return _make_response(dispatcher.delete_document(doc_id))
+    result = await _executor.run("delete_document", dispatcher.delete_document, doc_id)
+    if result[1] < 400:
+        _unindex_document(doc_id)
+    return _make_response(result, req)
 
 
 # ── Risk Registry Endpoints ──────────────────────────────────────────────────
@@ -341,16 +1426,99 @@ async def register_risk(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.register_risk(body))
+    result = await _executor.run("register_risk", dispatcher.register_risk, body)
+    _record_risk(result, body)
+    return _make_response(result, req)
 
 
 @app.function_name("list_risks")
 @app.route(route="risks", methods=["GET"])
 async def list_risks(req: func.HttpRequest) -> func.HttpResponse:
-    """List risks with optional filters."""
+    """List risks with optional filters.
+
+    Served from the registry's indexes (``aos_dispatcher_azure.risks``) when
+    it is enabled, which also accepts a ``score_band`` filter; otherwise from
+    the library.
+    """
     status = req.params.get("status")
     category = req.params.get("category")
-    return _make_response(dispatcher.list_risks(status=status, category=category))
+    band = req.params.get("score_band")
+    if band is not None and band not in BAND_NAMES:
+        return _make_response(
+            ({"error": f"'score_band' must be one of: {', '.join(BAND_NAMES)}"}, 400),
+            req,
+        )
+    if not _risk_registry.enabled:
+        if band is not None:
+            return _make_response(
+                (
+                    {"error": "'score_band' requires the risk index (AOS_RISK_INDEX)"},
+                    400,
+                ),
+                req,
+            )
+        return await _list_response(
+            req,
+            "list_risks",
+            dispatcher.list_risks,
+            "risks",
+            status=status,
+            category=category,
+        )
+    failed = await _risk_registry.ensure_synced(_fetch_risks)
+    if failed is not None:
+        return _make_response(failed, req)
+    return await _list_response(
+        req,
+        "list_risks",
+        _risk_registry.list_risks,
+        "risks",
+        status=status,
+        category=category,
+        score_band=band,
+    )
+
+
+@app.function_name("get_risk_summary")
+@app.route(route="risks/summary", methods=["GET"])
+async def get_risk_summary(req: func.HttpRequest) -> func.HttpResponse:
+    """Counts and exposure per category and status, and the highest-scored risks.
+
+    ``top`` (default 10) sets how many risks ``top_risks`` holds; ``status``
+    and ``category`` narrow that list.  Served from the registry's maintained
+    aggregates; with ``AOS_RISK_INDEX`` off it is computed from a library
+    ``list_risks`` call.
+    """
+    try:
+        top = int(req.params.get("top", "10"))
+        if not 0 <= top <= MAX_TOP:
+            raise ValueError
+    except ValueError:
+        return _make_response(
+            ({"error": f"'top' must be an integer between 0 and {MAX_TOP}"}, 400), req
+        )
+    filters = {
+        "status": req.params.get("status"),
+        "category": req.params.get("category"),
+    }
+    if not _risk_registry.enabled:
+        body, status_code = await _executor.run("list_risks", dispatcher.list_risks)
+        if status_code >= 400:
+            return _make_response((body, status_code), req)
+        risks = (body or {}).get("risks") or []
+        return _make_response(
+            (
+                await _executor.run(
+                    "get_risk_summary", summarise_risks, risks, top, **filters
+                ),
+                200,
+            ),
+            req,
+        )
+    failed = await _risk_registry.ensure_synced(_fetch_risks)
+    if failed is not None:
+        return _make_response(failed, req)
+    return _make_response((_risk_registry.summary(top, **filters), 200), req)
 
 
 @app.function_name("assess_risk")
@@ -361,7 +1529,9 @@ async def assess_risk(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.assess_risk(risk_id, body))
+    result = await _executor.run("assess_risk", dispatcher.assess_risk, risk_id, body)
+    _record_risk(result)
+    return _make_response(result, req)
 
 
 @app.function_name("update_risk_status")
@@ -372,7 +1542,11 @@ async def update_risk_status(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.update_risk_status(risk_id, body))
+    result = await _executor.run(
+        "update_risk_status", dispatcher.update_risk_status, risk_id, body
+    )
+    _record_risk(result)
+    return _make_response(result, req)
 
 
 @app.function_name("add_mitigation_plan")
@@ -383,7 +1557,11 @@ async def add_mitigation_plan(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.add_mitigation_plan(risk_id, body))
+    result = await _executor.run(
+        "add_mitigation_plan", dispatcher.add_mitigation_plan, risk_id, body
+    )
+    _record_risk(result)
+    return _make_response(result, req)
 
 
 # ── Audit Trail / Decision Ledger Endpoints ──────────────────────────────────
@@ -392,27 +1570,117 @@ async def add_mitigation_plan(req: func.HttpRequest) -> func.HttpResponse:
 @app.function_name("log_decision")
 @app.route(route="audit/decisions", methods=["POST"])
 async def log_decision(req: func.HttpRequest) -> func.HttpResponse:
-    """Log a decision."""
+    """Log a decision (appended to the audit log once the library accepts it).
+
+    With ``AOS_WRITE_BEHIND`` the decision is buffered and written in the
+    background: ``202`` when accepted, ``429`` with ``Retry-After`` when the
+    buffer is full.
+    """
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.log_decision(body))
+    await _audit_log.ensure_ready(_fetch_audit_trail)
+    if _decision_writes.enabled and isinstance(body, dict):
+        return _buffered(_decision_writes, body, req)
+    result = await _executor.run("log_decision", dispatcher.log_decision, body)
+    if _audit_log_following() and result[1] < 400 and isinstance(body, dict):
+        await _append_decisions([_logged_decision(body, result[0])])
+    return _make_response(result, req)
+
+
+@app.function_name("log_decisions_batch")
+@app.route(route="audit/decisions/batch", methods=["POST"])
+async def log_decisions_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """Log many decisions; returns a result per decision."""
+    items, err = _require_items(req)
+    if err:
+        return err
+    await _audit_log.ensure_ready(_fetch_audit_trail)
+    result = await _executor.run(
+        "log_decisions_batch",
+        write_items,
+        items,
+        dispatcher.log_decision,
+        getattr(dispatcher, "log_decisions", None),
+    )
+    if _audit_log_following():
+        await _append_decisions(
+            [
+                _logged_decision(items[entry["index"]], entry["body"])
+                for entry in result[0]["results"]
+                if entry["status"] < 400 and isinstance(items[entry["index"]], dict)
+            ]
+        )
+    return _make_response(result, req)
 
 
 @app.function_name("get_decision_history")
 @app.route(route="audit/decisions", methods=["GET"])
 async def get_decision_history(req: func.HttpRequest) -> func.HttpResponse:
-    """Get decision history."""
+    """Get decision history.
+
+    Served from the audit log's indexes (``aos_dispatcher_azure.auditlog``)
+    when it is enabled, which also accepts a ``start``/``end`` time window
+    (ISO 8601 or epoch seconds); otherwise from the library.
+    """
     orch_id = req.params.get("orchestration_id")
     agent_id = req.params.get("agent_id")
-    return _make_response(dispatcher.get_decision_history(orch_id=orch_id, agent_id=agent_id))
+    if not await _audit_log.ensure_ready(_fetch_audit_trail):
+        if req.params.get("start") or req.params.get("end"):
+            error = "'start'/'end' require the audit log (AOS_AUDIT_LOG_PATH)"
+            return _make_response(({"error": error}, 400), req)
+        return await _list_response(
+            req,
+            "get_decision_history",
+            dispatcher.get_decision_history,
+            "decisions",
+            orch_id=orch_id,
+            agent_id=agent_id,
+        )
+    window = {}
+    for key in ("start", "end"):
+        if req.params.get(key):
+            try:
+                window[key] = parse_timestamp(req.params[key])
+            except ValueError:
+                return _make_response(
+                    ({"error": f"Invalid '{key}' timestamp"}, 400), req
+                )
+    return await _list_response(
+        req,
+        "get_decision_history",
+        _audit_log.decision_history,
+        "decisions",
+        orch_id=orch_id,
+        agent_id=agent_id,
+        **window,
+    )
 
 
 @app.function_name("get_audit_trail")
 @app.route(route="audit/trail", methods=["GET"])
-async def get_audit_trail(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
-    """Get the audit trail."""
-    return _make_response(dispatcher.get_audit_trail())
+async def get_audit_trail(req: func.HttpRequest) -> func.HttpResponse:
+    """Get the audit trail (paged by ``limit``/``cursor``, ``format=ndjson`` export)."""
+    if await _audit_log.ensure_ready(_fetch_audit_trail):
+        return await _list_response(
+            req, "get_audit_trail", _audit_log.audit_trail, "trail"
+        )
+    return await _list_response(
+        req, "get_audit_trail", dispatcher.get_audit_trail, "trail"
+    )
+
+
+@app.function_name("verify_audit_log")
+@app.route(route="audit/verify", methods=["GET"])
+async def verify_audit_log(req: func.HttpRequest) -> func.HttpResponse:
+    """Walk the audit log's hash chain; ``409`` if a record was altered or removed.
+
+    Reads every record — meant for periodic integrity checks, not hot paths.
+    """
+    if not await _audit_log.ensure_ready(_fetch_audit_trail):
+        return _make_response(({"error": "Audit log is not enabled"}, 404), req)
+    report = await _executor.run("verify_audit_log", _audit_log.verify)
+    return _make_response((report, 200 if report["valid"] else 409), req)
 
 
 # ── Covenant Management Endpoints ────────────────────────────────────────────
@@ -425,23 +1693,77 @@ async def create_covenant(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.create_covenant(body))
+    result = await _executor.run("create_covenant", dispatcher.create_covenant, body)
+    if (
+        result[1] < 400
+        and isinstance(result[0], dict)
+        and isinstance(result[0].get("id"), str)
+    ):
+        _covenant_validations.invalidate(result[0]["id"])
+    return _make_response(result, req)
 
 
 @app.function_name("list_covenants")
 @app.route(route="covenants", methods=["GET"])
 async def list_covenants(req: func.HttpRequest) -> func.HttpResponse:
-    """List covenants."""
+    """List covenants (each one seen updates the validation memo's versions)."""
     status = req.params.get("status")
-    return _make_response(dispatcher.list_covenants(status=status))
+    library_fn = dispatcher.list_covenants
+
+    # wraps() keeps the signature, so native limit/cursor paging is detected.
+    @functools.wraps(library_fn)
+    def list_and_observe(*args: Any, **kwargs: Any) -> tuple:
+        result = library_fn(*args, **kwargs)
+        _covenant_validations.observe_list(result)
+        return result
+
+    return await _list_response(
+        req, "list_covenants", list_and_observe, "covenants", status=status
+    )
 
 
 @app.function_name("validate_covenant")
 @app.route(route="covenants/{covenant_id}/validate", methods=["GET"])
 async def validate_covenant(req: func.HttpRequest) -> func.HttpResponse:
-    """Validate a covenant."""
+    """Validate a covenant; results are memoized per covenant version."""
     cov_id = req.route_params.get("covenant_id", "")
-    return _make_response(dispatcher.validate_covenant(cov_id))
+    return _make_response(
+        await _covenant_validations.validate(
+            cov_id,
+            lambda: _executor.run(
+                "validate_covenant", dispatcher.validate_covenant, cov_id
+            ),
+        ),
+        req,
+    )
+
+
+@app.function_name("validate_covenants")
+@app.route(route="covenants/validate", methods=["POST"])
+async def validate_covenants(req: func.HttpRequest) -> func.HttpResponse:
+    """Validate many covenants: ``{"covenant_ids": [...]}``; one result per covenant."""
+    body, err = _require_json(req)
+    if err:
+        return err
+    cov_ids = body.get("covenant_ids") if isinstance(body, dict) else body
+    if not isinstance(cov_ids, list) or not cov_ids:
+        return _make_response(
+            ({"error": "'covenant_ids' must be a non-empty list"}, 400), req
+        )
+    if not all(isinstance(cov_id, str) and cov_id for cov_id in cov_ids):
+        return _make_response(
+            ({"error": "Each covenant id must be a non-empty string"}, 400), req
+        )
+    max_items = env_int("AOS_BULK_MAX_ITEMS", DEFAULT_MAX_ITEMS)
+    if len(cov_ids) > max_items:
+        return _make_response(({"error": f"Batch exceeds {max_items} items"}, 413), req)
+    results = await _covenant_validations.validate_many(cov_ids, _validate_covenants)
+    response_body, status_code = summarise(results)
+    response_body["all_valid"] = all(
+        status < 400 and isinstance(result, dict) and result.get("valid") is True
+        for result, status in results
+    )
+    return _make_response((response_body, status_code), req)
 
 
 @app.function_name("sign_covenant")
@@ -452,7 +1774,13 @@ async def sign_covenant(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.sign_covenant(cov_id, body))
+    result = await _executor.run(
+        "sign_covenant", dispatcher.sign_covenant, cov_id, body
+    )
+    if result[1] < 400:
+        _covenant_validations.invalidate(cov_id)
+        _covenant_validations.observe(result[0])
+    return _make_response(result, req)
 
 
 # ── Analytics & Metrics Endpoints ────────────────────────────────────────────
@@ -461,19 +1789,72 @@ async def sign_covenant(req: func.HttpRequest) -> func.HttpResponse:
 @app.function_name("record_metric")
 @app.route(route="metrics", methods=["POST"])
 async def record_metric(req: func.HttpRequest) -> func.HttpResponse:
-    """Record a metric data point."""
+    """Record a metric data point.
+
+    With ``AOS_WRITE_BEHIND`` the point is buffered and written in the
+    background: ``202`` when accepted, ``429`` with ``Retry-After`` when the
+    buffer is full.
+    """
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.record_metric(body))
+    if _metric_writes.enabled and isinstance(body, dict):
+        return _buffered(_metric_writes, body, req)
+    result = await _executor.run("record_metric", dispatcher.record_metric, body)
+    if result[1] < 400:
+        _ingest_metric_points([result[0] if isinstance(result[0], dict) else body])
+    return _make_response(result, req)
+
+
+@app.function_name("record_metrics_batch")
+@app.route(route="metrics/batch", methods=["POST"])
+async def record_metrics_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """Record many metric data points; returns a result per point."""
+    items, err = _require_items(req)
+    if err:
+        return err
+    result = await _executor.run(
+        "record_metrics_batch",
+        write_items,
+        items,
+        dispatcher.record_metric,
+        getattr(dispatcher, "record_metrics", None),
+    )
+    _ingest_metric_points(
+        [
+            entry["body"] if isinstance(entry["body"], dict) else items[entry["index"]]
+            for entry in result[0]["results"]
+            if entry["status"] < 400
+        ]
+    )
+    return _make_response(result, req)
 
 
 @app.function_name("get_metrics")
 @app.route(route="metrics", methods=["GET"])
 async def get_metrics(req: func.HttpRequest) -> func.HttpResponse:
-    """Retrieve metric time series."""
+    """Retrieve metric time series.
+
+    With any of ``start``, ``end``, ``step`` or ``agg`` the series is
+    downsampled from the worker's rollup store
+    (``aos_dispatcher_azure.timeseries``); otherwise the library's full series
+    is returned.
+    """
     name = req.params.get("name", "")
-    return _make_response(dispatcher.get_metrics(name=name))
+    if not any(req.params.get(key) for key in ("start", "end", "step", "agg")):
+        return _make_response(
+            await _executor.run("get_metrics", dispatcher.get_metrics, name=name), req
+        )
+    try:
+        query = MetricQuery.from_params(req.params)
+    except MetricQueryError as exc:
+        return _make_response(({"error": str(exc)}, 400), req)
+    failed = await _metrics.ensure_synced(name, _backfill_metric_series, _executor.run)
+    if failed is not None:
+        return _make_response(failed, req)
+    return _make_response(
+        (await _executor.run("get_metrics", _metrics.query, name, query), 200), req
+    )
 
 
 @app.function_name("create_kpi")
@@ -483,21 +1864,43 @@ async def create_kpi(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.create_kpi(body))
+    result = await _executor.run("create_kpi", dispatcher.create_kpi, body)
+    if result[1] < 400:
+        _kpis.define(result[0] if isinstance(result[0], dict) else body)
+    return _make_response(result, req)
 
 
 @app.function_name("get_kpi_dashboard")
 @app.route(route="kpis/dashboard", methods=["GET"])
-async def get_kpi_dashboard(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
-    """Get the KPI dashboard."""
-    return _make_response(dispatcher.get_kpi_dashboard())
+async def get_kpi_dashboard(req: func.HttpRequest) -> func.HttpResponse:
+    """Get the KPI dashboard.
+
+    Served from the materialised snapshot (``aos_dispatcher_azure.kpis``);
+    a matching ``If-None-Match`` returns ``304 Not Modified``.
+    """
+    failed = await _kpis.ensure_synced(_fetch_kpi_dashboard)
+    if failed is not None:
+        return _make_response(failed, req)
+    body, etag = _kpis.snapshot()
+    headers = {"ETag": f'"{etag}"'}
+    if etag_matches(req.headers.get("If-None-Match"), etag):
+        return func.HttpResponse(status_code=304, headers=headers)
+    with phase("serialize"):
+        payload, mimetype, extra = _codec.encode_response(
+            body, accept_encoding=req.headers.get("Accept-Encoding", "")
+        )
+    headers.update(extra)
+    return func.HttpResponse(
+        payload, status_code=200, mimetype=mimetype, headers=headers
+    )
 
 
 # ── MCP Server Integration Endpoints ─────────────────────────────────────────
 # These endpoints proxy to the *aos-mcp-servers* function app (ASISaga/mcp).
 # Configure MCP_SERVERS_BASE_URL in App Settings to point at the deployed
-# aos-mcp-servers instance.  When the variable is unset a minimal stub response
-# is returned so local development stays functional.
+# aos-mcp-servers instance; requests then go through a pooled, circuit-broken
+# client (aos_dispatcher_azure.upstream).  When the variable is unset a minimal
+# stub response is returned so local development stays functional.
 
 
 @app.function_name("list_mcp_servers")
@@ -505,16 +1908,54 @@ async def get_kpi_dashboard(req: func.HttpRequest) -> func.HttpResponse:  # noqa
 async def list_mcp_servers(req: func.HttpRequest) -> func.HttpResponse:
     """List available MCP servers (proxied to aos-mcp-servers)."""
     server_type = req.params.get("server_type")
-    return _make_response(await dispatcher.list_mcp_servers(server_type=server_type))
+    return _make_response(
+        await _executor.run(
+            "list_mcp_servers",
+            _proxied("list_mcp_servers"),
+            server_type=server_type,
+        ),
+        req,
+    )
 
 
 @app.function_name("call_mcp_tool")
 @app.route(route="mcp/servers/{server}/tools/{tool}", methods=["POST"])
 async def call_mcp_tool(req: func.HttpRequest) -> func.HttpResponse:
-    """Invoke a tool on an MCP server (proxied to aos-mcp-servers)."""
+    """Invoke a tool on an MCP server (proxied to aos-mcp-servers).
+
+    With ``MCP_SERVERS_BASE_URL`` set the request body is streamed upstream
+    and the response is passed through with its own status, content type and
+    encoding (``UpstreamPool.forward``).
+    """
     server = req.route_params.get("server", "")
     tool = req.route_params.get("tool", "")
-    return _make_response(await dispatcher.call_mcp_tool(server, tool, req.get_body()))
+    if _mcp_upstream is None:
+        return _make_response(
+            await _executor.run(
+                "call_mcp_tool",
+                dispatcher.call_mcp_tool,
+                server,
+                tool,
+                req.get_body(),
+            ),
+            req,
+        )
+    response = await _executor.run(
+        "call_mcp_tool",
+        _mcp_upstream.forward,
+        "POST",
+        f"api/mcp/servers/{quote(server, safe='')}/tools/{quote(tool, safe='')}",
+        req.get_body(),
+        {
+            "Content-Type": req.headers.get("Content-Type") or "application/json",
+            "Accept-Encoding": req.headers.get("Accept-Encoding") or "identity",
+        },
+    )
+    if isinstance(response.body, dict):
+        return _make_response((response.body, response.status_code), req)
+    return func.HttpResponse(
+        response.body, status_code=response.status_code, headers=response.headers
+    )
 
 
 @app.function_name("get_mcp_server_status")
@@ -522,7 +1963,12 @@ async def call_mcp_tool(req: func.HttpRequest) -> func.HttpResponse:
 async def get_mcp_server_status(req: func.HttpRequest) -> func.HttpResponse:
     """Get MCP server status (proxied to aos-mcp-servers)."""
     server = req.route_params.get("server", "")
-    return _make_response(await dispatcher.get_mcp_server_status(server))
+    return _make_response(
+        await _executor.run(
+            "get_mcp_server_status", _proxied("get_mcp_server_status"), server
+        ),
+        req,
+    )
 
 
 # ── Agent Catalog Endpoints ───────────────────────────────────────────────────
@@ -535,7 +1981,15 @@ async def get_mcp_server_status(req: func.HttpRequest) -> func.HttpResponse:
 async def list_agents(req: func.HttpRequest) -> func.HttpResponse:
     """List agents from the realm-of-agents catalog (proxied to aos-realm-of-agents)."""
     agent_type = req.params.get("agent_type")
-    return _make_response(await dispatcher.list_agents(agent_type=agent_type))
+    return await _list_response(
+        req,
+        "list_agents",
+        _proxied("list_agents"),
+        "agents",
+        "agent_id",
+        cache=_agent_catalog,
+        agent_type=agent_type,
+    )
 
 
 @app.function_name("get_agent_descriptor")
@@ -543,7 +1997,15 @@ async def list_agents(req: func.HttpRequest) -> func.HttpResponse:
 async def get_agent_descriptor(req: func.HttpRequest) -> func.HttpResponse:
     """Get an agent descriptor from the realm-of-agents catalog."""
     agent_id = req.route_params.get("agent_id", "")
-    return _make_response(await dispatcher.get_agent_descriptor(agent_id))
+    return _make_response(
+        await _cached_call(
+            _agent_descriptors,
+            "get_agent_descriptor",
+            _proxied("get_agent_descriptor"),
+            agent_id,
+        ),
+        req,
+    )
 
 
 # ── Agent Interaction Endpoints ──────────────────────────────────────────────
@@ -557,7 +2019,68 @@ async def ask_agent(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.ask_agent(agent_id, body))
+    ask = _foundry_call(dispatcher.ask_agent, agent_id, body)
+    result = await _executor.run("ask_agent", ask, agent_id, body)
+    return _make_response(result, req)
+
+
+@app.function_name("ask_agents")
+@app.route(route="agents/ask", methods=["POST"])
+async def ask_agents(req: func.HttpRequest) -> func.HttpResponse:
+    """Send one prompt to several agents concurrently.
+
+    Request body: the ``ask_agent`` body plus ``agent_ids`` (the agents to
+    ask) and an optional ``timeout`` (seconds, at most
+    ``AOS_FANOUT_TIMEOUT``).  Replies are returned in the order they arrived,
+    each with its latency; agents that did not answer before the deadline are
+    listed in ``timed_out``.  ``Accept: text/event-stream`` returns one
+    ``reply`` event per agent and a closing ``end`` event instead.  See
+    ``aos_dispatcher_azure.fanout``.
+    """
+    body, err = _require_json(req)
+    if err:
+        return err
+    agent_ids = body.get("agent_ids") if isinstance(body, dict) else None
+    if not isinstance(agent_ids, list) or not agent_ids:
+        return _make_response(
+            ({"error": "'agent_ids' must be a non-empty list"}, 400), req
+        )
+    if not all(isinstance(agent_id, str) and agent_id for agent_id in agent_ids):
+        return _make_response(
+            ({"error": "Each agent id must be a non-empty string"}, 400), req
+        )
+    agent_ids = list(dict.fromkeys(agent_ids))
+    if len(agent_ids) > _FANOUT_MAX_AGENTS:
+        return _make_response(
+            ({"error": f"Fan-out exceeds {_FANOUT_MAX_AGENTS} agents"}, 413), req
+        )
+    timeout = body.get("timeout", _FANOUT_TIMEOUT)
+    if (
+        isinstance(timeout, bool)
+        or not isinstance(timeout, (int, float))
+        or timeout <= 0
+    ):
+        return _make_response(
+            ({"error": "'timeout' must be a positive number"}, 400), req
+        )
+    prompt = {k: v for k, v in body.items() if k not in ("agent_ids", "timeout")}
+
+    async def ask(agent_id: str) -> tuple:
+        call = _foundry_call(dispatcher.ask_agent, agent_id, prompt)
+        return await _executor.run("ask_agents", call, agent_id, dict(prompt))
+
+    result = await fan_out(agent_ids, ask, min(float(timeout), _FANOUT_TIMEOUT))
+    if "text/event-stream" not in req.headers.get("Accept", ""):
+        return _make_response((result.to_dict(), result.status_code), req)
+    with phase("serialize"):
+        parts = [sse_event(reply.to_dict(), event="reply") for reply in result.replies]
+        parts.append(sse_event(result.summary(), event="end"))
+    return func.HttpResponse(
+        "".join(parts),
+        status_code=result.status_code,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 @app.function_name("send_to_agent")
@@ -565,7 +2088,9 @@ async def ask_agent(req: func.HttpRequest) -> func.HttpResponse:
 async def send_to_agent(req: func.HttpRequest) -> func.HttpResponse:
     """Fire-and-forget message to an agent."""
     agent_id = req.route_params.get("agent_id", "")
-    return _make_response(dispatcher.send_to_agent(agent_id))
+    return _make_response(
+        await _executor.run("send_to_agent", dispatcher.send_to_agent, agent_id), req
+    )
 
 
 @app.function_name("register_agent")
@@ -587,7 +2112,14 @@ async def register_agent(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.register_agent(body))
+    result = await _executor.run("register_agent", dispatcher.register_agent, body)
+    if result[1] < 400:
+        _agent_catalog.clear()
+        if isinstance(body, dict):
+            _agent_descriptors.invalidate((body.get("agent_id"),))
+        else:
+            _agent_descriptors.clear()
+    return _make_response(result, req)
 
 
 @app.function_name("message_agent")
@@ -607,7 +2139,9 @@ async def message_agent(req: func.HttpRequest) -> func.HttpResponse:
     body, err = _require_json(req)
     if err:
         return err
-    return _make_response(dispatcher.message_agent(agent_id, body))
+    message = _foundry_call(dispatcher.message_agent, agent_id, body)
+    result = await _executor.run("message_agent", message, agent_id, body)
+    return _make_response(result, req)
 
 
 # ── Network Discovery Endpoints ──────────────────────────────────────────────
@@ -615,21 +2149,59 @@ async def message_agent(req: func.HttpRequest) -> func.HttpResponse:
 
 @app.function_name("discover_peers")
 @app.route(route="network/discover", methods=["POST"])
-async def discover_peers(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
-    """Discover peer applications."""
-    return _make_response(dispatcher.discover_peers())
+async def discover_peers(req: func.HttpRequest) -> func.HttpResponse:
+    """Discover peer applications.
+
+    Served from the membership table (``aos_dispatcher_azure.network``) when
+    it is enabled.  The response carries a ``version``; passing it back as
+    ``since`` (query parameter or JSON body) returns only the peers added or
+    changed since then and the ``removed`` app names.
+    """
+    if not _network.enabled:
+        return _make_response(
+            await _executor.run("discover_peers", dispatcher.discover_peers), req
+        )
+    failed = await _network.ensure_synced(_fetch_peers, _fetch_networks)
+    if failed is not None:
+        return _make_response(failed, req)
+    try:
+        return _make_response((_network.listing("peers", _since(req)), 200), req)
+    except VersionError as exc:
+        return _make_response(({"error": str(exc)}, 400), req)
 
 
 @app.function_name("join_network")
 @app.route(route="network/{network_id}/join", methods=["POST"])
-async def join_network(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
+async def join_network(req: func.HttpRequest) -> func.HttpResponse:
     """Join a network."""
     network_id = req.route_params.get("network_id", "")
-    return _make_response(dispatcher.join_network(network_id))
+    result = await _executor.run("join_network", dispatcher.join_network, network_id)
+    if _network.enabled and result[1] < 400:
+        _network.network_joined(network_id, result[0])
+    return _make_response(result, req)
 
 
 @app.function_name("list_networks")
 @app.route(route="network", methods=["GET"])
-async def list_networks(req: func.HttpRequest) -> func.HttpResponse:  # noqa: ARG001
-    """List available networks."""
-    return _make_response(dispatcher.list_networks())
+async def list_networks(req: func.HttpRequest) -> func.HttpResponse:
+    """List available networks.
+
+    Served from the membership table when it is enabled; ``since`` returns
+    the networks changed after that ``version`` instead of a page.
+    """
+    if not _network.enabled:
+        return await _list_response(
+            req, "list_networks", dispatcher.list_networks, "networks", "network_id"
+        )
+    failed = await _network.ensure_synced(_fetch_peers, _fetch_networks)
+    if failed is not None:
+        return _make_response(failed, req)
+    since = req.params.get("since")
+    if since is not None:
+        try:
+            return _make_response((_network.listing("networks", since), 200), req)
+        except VersionError as exc:
+            return _make_response(({"error": str(exc)}, 400), req)
+    return await _list_response(
+        req, "list_networks", _network.list_networks, "networks", "network_id"
+    )
@@ -0,0 +1,177 @@
+"""AdmissionController buckets, quotas and queueing."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from aos_dispatcher_azure.admission import (
+    SHARED_APP,
+    AdmissionController,
+    AdmissionRejected,
+    parse_app_map,
+)
+
+
+def _controller(**kwargs) -> AdmissionController:
+    settings = dict(max_running=64, app_max_running=2, max_queue=10, max_wait=0.05)
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+class TestAdmissionBuckets:
+    def test_unknown_apps_share_one_quota(self) -> None:
+        admission = _controller()
+
+        async def scenario() -> None:
+            await admission.acquire("rotating-1")
+            await admission.acquire("rotating-2")
+            with pytest.raises(AdmissionRejected):
+                await admission.acquire("rotating-3")
+
+        asyncio.run(scenario())
+        assert list(admission.snapshot()["apps"]) == [SHARED_APP]
+
+    def test_registered_app_gets_its_own_quota(self) -> None:
+        admission = _controller()
+        admission.configure_app("business-infinity", max_running=3)
+
+        async def scenario() -> List[str]:
+            leases = [await admission.acquire("business-infinity") for _ in range(3)]
+            leases.append(await admission.acquire("unregistered"))
+            return [lease.app for lease in leases]
+
+        assert asyncio.run(scenario()) == ["business-infinity"] * 3 + [SHARED_APP]
+
+    def test_configured_quota_names_a_known_app(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_ADMISSION_APP_QUOTAS", "reports=4")
+
+        assert _controller().bucket_of("reports") == "reports"
+
+    def test_registrations_beyond_max_apps_are_forgotten(self) -> None:
+        admission = _controller(max_apps=2)
+        for app in ("a", "b", "c"):
+            admission.configure_app(app)
+
+        assert [admission.bucket_of(app) for app in ("a", "b", "c")] == [
+            SHARED_APP,
+            "b",
+            "c",
+        ]
+
+    def test_forgotten_app_state_is_dropped_once_idle(self) -> None:
+        admission = _controller()
+        admission.configure_app("a")
+
+        async def scenario() -> None:
+            lease = await admission.acquire("a")
+            admission.forget_app("a")
+            assert "a" in admission.snapshot()["apps"]  # still holds a slot
+            admission.release(lease)
+
+        asyncio.run(scenario())
+        assert "a" not in admission.snapshot()["apps"]
+        assert admission.snapshot()["running"] == 0
+
+    def test_many_unknown_names_do_not_grow_the_app_table(self) -> None:
+        admission = _controller(app_max_running=1000)
+
+        async def scenario() -> None:
+            for n in range(500):
+                admission.release(await admission.acquire(f"app-{n}"))
+
+        asyncio.run(scenario())
+        assert len(admission._apps) == 1
+
+
+class TestAdmissionSettings:
+    @pytest.mark.parametrize("max_running", ["inf", float("inf"), "many", [1]])
+    def test_configure_app_ignores_unusable_quota(self, max_running) -> None:
+        admission = _controller()
+
+        admission.configure_app("a", max_running=max_running)
+
+        assert admission.snapshot()["apps"] == {}
+        assert admission._app(admission.bucket_of("a")).max_running == 2
+
+    def test_configure_app_ignores_infinite_weight(self) -> None:
+        admission = _controller()
+        admission.configure_app("a", weight=float("inf"), max_running=5)
+
+        state = admission._app("a")
+        assert (state.weight, state.max_running) == (1.0, 5)
+
+    def test_parse_app_map_skips_malformed_and_infinite_values(self) -> None:
+        parsed = parse_app_map("a=2, b=inf,c=x,=3,d=-1,e=1.5")
+
+        assert parsed == {"a": 2.0, "e": 1.5}
+
+
+class TestAdmissionQueueing:
+    def test_high_priority_is_admitted_before_low(self) -> None:
+        admission = _controller(max_running=1, max_wait=1.0)
+        admission.configure_app("a", max_running=5)
+        order: List[str] = []
+
+        async def waiter(priority: str) -> None:
+            lease = await admission.acquire("a", priority)
+            order.append(priority)
+            admission.release(lease)
+
+        async def scenario() -> None:
+            first = await admission.acquire("a")
+            tasks = [asyncio.create_task(waiter(p)) for p in ("low", "high", "normal")]
+            await asyncio.sleep(0)
+            admission.release(first)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        assert order == ["high", "normal", "low"]
+
+    def test_failed_submission_returns_its_slot(self) -> None:
+        admission = _controller()
+
+        async def failing() -> tuple:
+            return {"error": "bad request"}, 400
+
+        result = asyncio.run(admission.submit("a", failing))
+
+        assert result[1] == 400
+        assert admission.snapshot()["running"] == 0
+
+    def test_full_queue_is_rejected_with_retry_after(self) -> None:
+        admission = _controller(max_running=1, max_queue=1, max_wait=1.0)
+
+        async def scenario() -> AdmissionRejected:
+            await admission.acquire("a")
+            queued = asyncio.create_task(admission.acquire("a"))
+            await asyncio.sleep(0)
+            try:
+                with pytest.raises(AdmissionRejected) as rejected:
+                    await admission.acquire("a")
+            finally:
+                queued.cancel()
+            return rejected.value
+
+        assert asyncio.run(scenario()).retry_after >= 1
+
+    def test_queued_request_asks_to_watch_the_slot_holders(self) -> None:
+        admission = _controller(max_running=1)
+        watched: List[List[str]] = []
+        admission.on_queue = watched.append
+
+        async def started() -> tuple:
+            return {"orchestration_id": "o-1"}, 202
+
+        async def scenario() -> None:
+            await admission.submit("a", started)
+            assert watched == []
+            queued = asyncio.create_task(admission.acquire("a"))
+            await asyncio.sleep(0)
+            admission.finish("o-1")
+            admission.release(await queued)
+
+        asyncio.run(scenario())
+        assert watched == [["o-1"]]
@@ -0,0 +1,193 @@
+"""AuditLog appends, indexed queries, hash chain, compaction and file locks."""
+
+from __future__ import annotations
+
+import glob
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.auditlog import AuditLog
+from aos_dispatcher_azure.filelock import LOCK_STALE_AFTER, file_lock
+
+
+def _decision(n: int) -> Dict[str, Any]:
+    return {
+        "id": f"d{n}",
+        "orchestration_id": f"o{n % 3}",
+        "agent_id": f"a{n % 2}",
+        "timestamp": 1_700_000_000 + n,
+        "decision": "x" * 200,
+    }
+
+
+def _ids(body: Dict[str, Any], key: str = "decisions") -> List[str]:
+    return [decision["id"] for decision in body[key]]
+
+
+@pytest.fixture
+def log(tmp_path) -> AuditLog:
+    log = AuditLog(path=str(tmp_path), segment_bytes=4096, shared=True)
+    log.open()
+    yield log
+    log.close()
+
+
+class TestAuditLogQueries:
+    def test_history_is_filtered_across_sealed_segments(self, log) -> None:
+        log.append([_decision(n) for n in range(60)])
+
+        body, status = log.decision_history(orch_id="o1", agent_id="a0")
+
+        assert status == 200 and log.snapshot()["segments"] > 1
+        assert _ids(body) == [f"d{n}" for n in range(60) if n % 6 == 4]
+
+    def test_time_window_is_half_open(self, log) -> None:
+        log.append([_decision(n) for n in range(30)])
+
+        body, _ = log.decision_history(start=1_700_000_010, end=1_700_000_013)
+
+        assert _ids(body) == ["d10", "d11", "d12"]
+
+    def test_cursor_pages_through_the_trail(self, log) -> None:
+        log.append([_decision(n) for n in range(25)])
+        seen, cursor = [], None
+
+        while True:
+            body, _ = log.audit_trail(limit=10, cursor=cursor)
+            seen += _ids(body, "trail")
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == [f"d{n}" for n in range(25)]
+
+    def test_cursor_of_another_collection_is_a_400(self, log) -> None:
+        log.append([_decision(1), _decision(2)])
+        body, _ = log.decision_history(limit=1)
+
+        _, status = log.audit_trail(limit=1, cursor=body["next_cursor"])
+
+        assert status == 400
+
+    def test_reopened_log_reads_what_was_written(self, tmp_path, log) -> None:
+        log.append([_decision(n) for n in range(40)])
+        log.close()
+
+        reopened = AuditLog(path=str(tmp_path), segment_bytes=4096, shared=True)
+        reopened.open()
+        try:
+            assert reopened.count == 40
+            assert _ids(reopened.audit_trail()[0], "trail")[-1] == "d39"
+        finally:
+            reopened.close()
+
+
+class TestAuditLogChain:
+    def test_untouched_log_verifies(self, log) -> None:
+        log.append([_decision(n) for n in range(40)])
+
+        report = log.verify()
+
+        assert report["valid"] and report["records"] == 40
+
+    def test_altered_record_breaks_the_chain(self, tmp_path, log) -> None:
+        log.append([_decision(n) for n in range(40)])
+        sealed = sorted(glob.glob(os.path.join(str(tmp_path), "*.log")))[0]
+        with open(sealed, "r+b") as handle:
+            data = handle.read()
+            offset = data.index(b'"id":"d1"')
+            handle.seek(offset + 6)
+            handle.write(b"9")
+
+        reopened = AuditLog(path=str(tmp_path), segment_bytes=4096, shared=True)
+        reopened.open()
+        try:
+            report = reopened.verify()
+        finally:
+            reopened.close()
+
+        assert not report["valid"]
+        assert report["first_invalid_seq"] == 2
+        assert report["reason"] == "hash mismatch"
+
+    def test_compaction_keeps_records_and_hashes(self, log) -> None:
+        log.append([_decision(n) for n in range(120)])
+        before = log.verify()["head"]
+        segments = log.snapshot()["segments"]
+
+        assert log.compact() >= 1
+
+        report = log.verify()
+        assert log.snapshot()["segments"] < segments
+        assert report["valid"] and report["records"] == 120
+        assert report["head"] == before
+        assert _ids(log.decision_history(orch_id="o2")[0]) == [
+            f"d{n}" for n in range(120) if n % 3 == 2
+        ]
+
+
+class TestAuditLogCatchUp:
+    def test_failed_append_is_written_ahead_of_the_next(self, log) -> None:
+        log.bootstrap([])
+        log.append_failed([_decision(1)])
+
+        assert not log.complete and log.behind == 1
+        log.append([_decision(2)])
+
+        assert log.complete and log.behind == 0
+        assert _ids(log.audit_trail()[0], "trail") == ["d1", "d2"]
+
+    def test_bootstrap_does_not_duplicate_a_non_empty_log(self, log) -> None:
+        log.append([_decision(1)])
+
+        log.bootstrap([_decision(1), _decision(2)])
+
+        assert log.count == 1 and log.complete
+
+
+class TestFileLock:
+    def test_held_lock_times_out(self, tmp_path) -> None:
+        path = str(tmp_path / "append")
+        with file_lock(path):
+            with pytest.raises(TimeoutError):
+                with file_lock(path, timeout=0.1):
+                    pass
+
+    def test_lock_is_released_after_the_block(self, tmp_path) -> None:
+        path = str(tmp_path / "append")
+        with file_lock(path):
+            pass
+
+        assert not os.path.exists(path + ".lock")
+
+    def test_stale_lock_is_broken(self, tmp_path) -> None:
+        path = str(tmp_path / "append")
+        with open(path + ".lock", "w") as handle:
+            handle.write("12345")
+        stale = time.time() - LOCK_STALE_AFTER - 1
+        os.utime(path + ".lock", (stale, stale))
+
+        with file_lock(path, timeout=0.1):
+            pass
+
+    def test_lock_serialises_threads(self, tmp_path) -> None:
+        path, inside, overlaps = str(tmp_path / "append"), [0], []
+
+        def worker() -> None:
+            with file_lock(path):
+                inside[0] += 1
+                overlaps.append(inside[0])
+                time.sleep(0.01)
+                inside[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert overlaps == [1, 1, 1, 1]
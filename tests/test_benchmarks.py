@@ -0,0 +1,75 @@
+"""Load-test report helpers: percentiles, per-route summaries and baselines."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from benchmarks._common import latency_summary, percentile
+from benchmarks.bench_load import Recorder, _change, _compare
+
+
+def _workload(per_s: float, p95_ms: float, rss: float) -> Dict[str, Any]:
+    return {
+        "throughput_per_s": per_s,
+        "memory": {"peak_rss_mb": rss},
+        "routes": {"submit": {"latency": {"p95_ms": p95_ms}}},
+    }
+
+
+class TestPercentile:
+    def test_nearest_rank(self) -> None:
+        samples = [float(n) for n in range(1, 101)]
+
+        assert percentile(samples, 50) == 50.0
+        assert percentile(samples, 99) == 99.0
+        assert percentile(samples, 100) == 100.0
+
+    def test_no_samples_is_zero(self) -> None:
+        assert percentile([], 95) == 0.0
+        assert latency_summary([])["max_ms"] == 0.0
+
+    def test_summary_is_in_milliseconds(self) -> None:
+        assert latency_summary([0.002])["p99_ms"] == 2.0
+
+
+class TestRecorder:
+    def test_report_counts_requests_and_statuses_per_route(self) -> None:
+        recorder = Recorder(invoke_s=0)
+        recorder.record("submit", 0.01, 202)
+        recorder.record("submit", 0.03, 429)
+        recorder.record("poll", 0.01, 200)
+
+        report = recorder.report(elapsed=2.0)
+
+        assert report["requests"] == 3 and report["throughput_per_s"] == 1.5
+        assert report["routes"]["submit"]["statuses"] == {"202": 1, "429": 1}
+        assert list(report["routes"]) == ["poll", "submit"]
+
+
+class TestBaselineComparison:
+    def test_changes_are_percentages_of_the_baseline(self) -> None:
+        report = {"workloads": {"metrics": _workload(150, 5, 110)}}
+        baseline = {"commit": "abc", "workloads": {"metrics": _workload(100, 10, 100)}}
+
+        comparison = _compare(report, baseline)
+
+        assert comparison["baseline_commit"] == "abc"
+        assert comparison["metrics"] == {
+            "throughput_change_pct": 50.0,
+            "peak_rss_change_pct": 10.0,
+            "p95_change_pct": {"submit": -50.0},
+        }
+
+    def test_workloads_missing_or_failed_in_either_report_are_skipped(self) -> None:
+        report = {
+            "workloads": {
+                "metrics": _workload(1, 1, 1),
+                "search": {"error": "workload exited with status 1"},
+            }
+        }
+        baseline = {"workloads": {"search": _workload(1, 1, 1)}}
+
+        assert _compare(report, baseline) == {"baseline_commit": None}
+
+    def test_zero_baseline_has_no_change(self) -> None:
+        assert _change(5, 0) is None
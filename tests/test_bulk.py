@@ -0,0 +1,92 @@
+"""Batch request parsing and per-item write results."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.bulk import BulkRequestError, parse_items, write_items
+
+
+def _ok(item: Dict[str, Any]) -> tuple:
+    return {"id": item["id"]}, 201
+
+
+class TestParseItems:
+    def test_json_array_and_items_object_are_accepted(self) -> None:
+        assert parse_items(b'[{"id": 1}]') == [{"id": 1}]
+        assert parse_items(b'{"items": [{"id": 1}]}') == [{"id": 1}]
+
+    def test_bad_ndjson_line_fails_on_its_own(self) -> None:
+        body = b'{"id": 1}\nnot json\n\n{"id": 3}\n'
+
+        items = parse_items(body, "application/x-ndjson; charset=utf-8")
+
+        assert items[0] == {"id": 1} and items[2] == {"id": 3}
+        assert items[1].error == "Invalid JSON on line 2"
+
+    def test_ndjson_without_its_content_type_is_detected(self) -> None:
+        assert parse_items(b'{"id": 1}\n{"id": 2}\n') == [{"id": 1}, {"id": 2}]
+
+    @pytest.mark.parametrize(
+        "body", [b"not json", b'{"id": 1}', b"[]", b"\xff\xfe", b'"text"']
+    )
+    def test_unusable_body_is_a_400(self, body: bytes) -> None:
+        with pytest.raises(BulkRequestError) as raised:
+            parse_items(body)
+        assert raised.value.status_code == 400
+
+    def test_too_many_items_is_a_413(self) -> None:
+        with pytest.raises(BulkRequestError) as raised:
+            parse_items(b"[{}, {}, {}]", max_items=2)
+        assert raised.value.status_code == 413
+
+
+class TestWriteItems:
+    def test_invalid_items_fail_without_reaching_the_dispatcher(self) -> None:
+        written: List[Dict[str, Any]] = []
+
+        def single(item: Dict[str, Any]) -> tuple:
+            written.append(item)
+            return _ok(item)
+
+        items = parse_items(b'{"id": 1}\nnot json\n[2]\n', "application/x-ndjson")
+        body, status = write_items(items, single)
+
+        assert written == [{"id": 1}]
+        assert [r["status"] for r in body["results"]] == [201, 400, 400]
+        assert (body["succeeded"], body["failed"], status) == (1, 2, 207)
+
+    def test_failing_item_does_not_fail_the_batch(self) -> None:
+        def single(item: Dict[str, Any]) -> tuple:
+            if item["id"] == 2:
+                raise RuntimeError("library error")
+            return _ok(item)
+
+        body, status = write_items([{"id": 1}, {"id": 2}], single)
+
+        assert [r["status"] for r in body["results"]] == [201, 500]
+        assert status == 207
+
+    def test_bulk_function_gets_only_the_valid_items(self) -> None:
+        calls: List[List[Dict[str, Any]]] = []
+
+        def bulk(items: List[Dict[str, Any]]) -> List[tuple]:
+            calls.append(items)
+            return [_ok(item) for item in items]
+
+        body, status = write_items([{"id": 1}, "x", {"id": 3}], _ok, bulk)
+
+        assert calls == [[{"id": 1}, {"id": 3}]]
+        assert [r["body"] for r in body["results"]][::2] == [{"id": 1}, {"id": 3}]
+        assert status == 207
+
+    def test_bulk_result_count_mismatch_fails_every_pending_item(self) -> None:
+        body, status = write_items([{"id": 1}, {"id": 2}], _ok, lambda items: [])
+
+        assert [r["status"] for r in body["results"]] == [500, 500]
+        assert status == 207
+
+    def test_all_written_is_a_200(self) -> None:
+        assert write_items([{"id": 1}], _ok)[1] == 200
@@ -0,0 +1,124 @@
+"""JSON and MessagePack codecs, content negotiation and compression."""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from aos_dispatcher_azure import codec as codec_module
+from aos_dispatcher_azure.codec import (
+    JSON_MIMETYPE,
+    MSGPACK_MIMETYPE,
+    Codec,
+    CodecError,
+)
+
+
+class TestJson:
+    @pytest.mark.parametrize("json_codec", ["orjson", "stdlib"])
+    def test_output_is_compact_utf8(self, json_codec: str) -> None:
+        codec = Codec(json_codec=json_codec)
+
+        assert codec.dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode("utf-8")
+
+    def test_integer_beyond_64_bits_falls_back_to_stdlib(self) -> None:
+        big = 2**70
+
+        assert json.loads(Codec(json_codec="orjson").dumps({"n": big})) == {"n": big}
+
+    def test_invalid_body_is_a_codec_error(self) -> None:
+        with pytest.raises(CodecError):
+            Codec().decode_body(b"{not json")
+
+    def test_empty_body_is_a_codec_error(self) -> None:
+        with pytest.raises(CodecError):
+            Codec().decode_body(b"")
+
+
+class TestMessagePack:
+    @pytest.fixture(autouse=True)
+    def needs_msgpack(self) -> None:
+        pytest.importorskip("msgpack")
+
+    def test_msgpack_body_is_decoded_by_content_type(self) -> None:
+        packed = codec_module.msgpack.packb({"a": 1})
+
+        body = Codec().decode_body(packed, "application/x-msgpack; charset=binary")
+
+        assert body == {"a": 1}
+
+    def test_invalid_msgpack_body_is_a_codec_error(self) -> None:
+        with pytest.raises(CodecError):
+            Codec().decode_body(b"\xc1", MSGPACK_MIMETYPE)
+
+    def test_disabled_msgpack_body_is_parsed_as_json(self) -> None:
+        codec = Codec(msgpack_enabled=False)
+
+        assert codec.decode_body(b"{}", MSGPACK_MIMETYPE) == {}
+
+    @pytest.mark.parametrize(
+        "accept, expected",
+        [
+            ("", JSON_MIMETYPE),
+            ("application/msgpack", MSGPACK_MIMETYPE),
+            ("application/json, application/msgpack", JSON_MIMETYPE),
+            ("application/json;q=0.5, application/msgpack", MSGPACK_MIMETYPE),
+            ("*/*, application/msgpack;q=0.9", JSON_MIMETYPE),
+            ("application/msgpack;q=bogus", JSON_MIMETYPE),
+        ],
+    )
+    def test_msgpack_only_when_preferred_over_json(self, accept, expected) -> None:
+        assert Codec().negotiate_mimetype(accept) == expected
+
+    def test_unpackable_response_falls_back_to_json(self) -> None:
+        payload, mimetype, headers = Codec(compression=False).encode_response(
+            {"n": 2**70}, accept=MSGPACK_MIMETYPE
+        )
+
+        assert mimetype == JSON_MIMETYPE
+        assert json.loads(payload) == {"n": 2**70}
+        assert headers == {"Vary": "Accept"}
+
+
+class TestCompression:
+    def test_small_response_is_not_compressed(self) -> None:
+        codec = Codec(msgpack_enabled=False, min_compress_bytes=1024)
+
+        _, _, headers = codec.encode_response({"a": 1}, accept_encoding="gzip")
+
+        assert "Content-Encoding" not in headers
+
+    def test_large_response_is_gzipped_when_accepted(self, monkeypatch) -> None:
+        monkeypatch.setattr(codec_module, "brotli", None)
+        codec = Codec(msgpack_enabled=False, min_compress_bytes=10)
+        body = {"items": ["x" * 100]}
+
+        payload, _, headers = codec.encode_response(body, accept_encoding="gzip")
+
+        assert headers == {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        assert json.loads(gzip.decompress(payload)) == body
+
+    @pytest.mark.parametrize(
+        "accept_encoding", ["", "identity", "gzip;q=0", "*;q=0", "deflate"]
+    )
+    def test_no_acceptable_encoding_sends_identity(self, accept_encoding) -> None:
+        assert Codec.negotiate_encoding(accept_encoding) is None
+
+    def test_wildcard_accepts_gzip(self, monkeypatch) -> None:
+        monkeypatch.setattr(codec_module, "brotli", None)
+
+        assert Codec.negotiate_encoding("*") == "gzip"
+
+    def test_proxied_bytes_are_only_compressed(self, monkeypatch) -> None:
+        monkeypatch.setattr(codec_module, "brotli", None)
+        codec = Codec(min_compress_bytes=10)
+        raw = b'{"already": "' + b"x" * 50 + b'"}'
+
+        payload, mimetype, headers = codec.encode_response(
+            raw, accept=MSGPACK_MIMETYPE, accept_encoding="gzip"
+        )
+
+        assert gzip.decompress(payload) == raw and mimetype == JSON_MIMETYPE
+        assert headers["Vary"] == "Accept-Encoding"
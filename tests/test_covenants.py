@@ -0,0 +1,176 @@
+"""Covenant validation memo, version tracking and batch validation."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.covenants import (
+    CompiledCovenant,
+    CovenantValidator,
+    validate_all,
+)
+
+
+class _Library:
+    """``validate_covenant`` stand-in counting calls per covenant."""
+
+    def __init__(self, status: int = 200) -> None:
+        self.status = status
+        self.calls: List[str] = []
+
+    def loader(self, cov_id: str):
+        async def load() -> tuple:
+            self.calls.append(cov_id)
+            await asyncio.sleep(0)
+            return {"id": cov_id, "valid": True, "call": len(self.calls)}, self.status
+
+        return load
+
+    async def fetch(self, cov_ids: List[str]) -> List[tuple]:
+        return [await self.loader(cov_id)() for cov_id in cov_ids]
+
+
+def _covenant(version: int, **extra: Any) -> Dict[str, Any]:
+    return {"id": "c1", "terms": f"v{version}", **extra}
+
+
+class TestCompiledCovenant:
+    def test_digest_ignores_key_order(self) -> None:
+        first = CompiledCovenant.compile({"id": "c1", "a": 1, "b": 2})
+        second = CompiledCovenant.compile({"b": 2, "a": 1, "id": "c1"})
+
+        assert first.digest == second.digest
+
+    def test_signature_changes_the_digest(self) -> None:
+        signed = _covenant(1, signatures=["ceo"])
+
+        assert (
+            CompiledCovenant.compile(signed).digest
+            != CompiledCovenant.compile(_covenant(1)).digest
+        )
+
+    def test_unparseable_expiry_never_expires(self) -> None:
+        compiled = CompiledCovenant.compile(_covenant(1, expires_at="someday"))
+
+        assert compiled.expires_at == math.inf
+
+    @pytest.mark.parametrize("covenant", [None, [], {"terms": "x"}, {"id": 7}])
+    def test_covenant_without_string_id_is_not_compiled(self, covenant) -> None:
+        assert CompiledCovenant.compile(covenant) is None
+
+
+class TestCovenantValidator:
+    def test_repeat_validation_is_served_from_the_memo(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+
+        async def scenario() -> list:
+            return [await validator.validate("c1", library.loader("c1")) for _ in "ab"]
+
+        first, second = asyncio.run(scenario())
+
+        assert first is second and library.calls == ["c1"]
+
+    def test_new_covenant_version_is_revalidated(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+        validator.observe(_covenant(1))
+
+        async def scenario() -> None:
+            await validator.validate("c1", library.loader("c1"))
+            validator.observe_list(({"covenants": [_covenant(2)]}, 200))
+            await validator.validate("c1", library.loader("c1"))
+
+        asyncio.run(scenario())
+
+        assert library.calls == ["c1", "c1"]
+        assert validator.stats.stale_versions == 1
+
+    def test_expired_covenant_is_revalidated(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+        validator.observe(_covenant(1, expires_at="2000-01-01T00:00:00Z"))
+
+        async def scenario() -> None:
+            for _ in range(2):
+                await validator.validate("c1", library.loader("c1"))
+
+        asyncio.run(scenario())
+
+        assert len(library.calls) == 2
+
+    def test_error_response_is_not_memoized(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library(status=404)
+
+        async def scenario() -> None:
+            for _ in range(2):
+                await validator.validate("c1", library.loader("c1"))
+
+        asyncio.run(scenario())
+
+        assert len(library.calls) == 2
+
+    def test_validation_in_flight_at_invalidation_is_not_stored(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+
+        async def signing_loader() -> tuple:
+            validator.invalidate("c1")  # signed meanwhile
+            return await library.loader("c1")()
+
+        async def scenario() -> None:
+            await validator.validate("c1", signing_loader)
+            await validator.validate("c1", library.loader("c1"))
+
+        asyncio.run(scenario())
+
+        assert len(library.calls) == 2
+
+    def test_concurrent_validations_share_one_call(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+
+        async def scenario() -> list:
+            return await asyncio.gather(
+                *(validator.validate("c1", library.loader("c1")) for _ in range(3))
+            )
+
+        asyncio.run(scenario())
+
+        assert library.calls == ["c1"] and validator.stats.coalesced == 2
+
+    def test_validate_many_fetches_only_what_is_missing(self) -> None:
+        validator, library = CovenantValidator(ttl=60), _Library()
+
+        async def scenario() -> list:
+            await validator.validate("c1", library.loader("c1"))
+            return await validator.validate_many(["c1", "c2", "c2"], library.fetch)
+
+        results = asyncio.run(scenario())
+
+        assert library.calls == ["c1", "c2"]
+        assert [body["id"] for body, _ in results] == ["c1", "c2", "c2"]
+
+    def test_oldest_results_are_evicted(self) -> None:
+        validator, library = CovenantValidator(ttl=60, max_entries=2), _Library()
+
+        asyncio.run(validator.validate_many(["c1", "c2", "c3"], library.fetch))
+
+        assert validator.snapshot()["entries"] == 2
+        assert validator.stats.evictions == 1
+
+
+class TestValidateAll:
+    def test_failing_covenant_does_not_fail_the_batch(self) -> None:
+        def single(cov_id: str) -> tuple:
+            if cov_id == "bad":
+                raise RuntimeError("library error")
+            return {"id": cov_id}, 200
+
+        results = validate_all(["ok", "bad"], single)
+
+        assert [status for _, status in results] == [200, 500]
+
+    def test_bulk_result_count_mismatch_fails_every_covenant(self) -> None:
+        results = validate_all(["a", "b"], lambda c: ({}, 200), lambda ids: [])
+
+        assert [status for _, status in results] == [500, 500]
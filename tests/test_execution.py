@@ -0,0 +1,90 @@
+"""DispatcherExecutor pool dispatch, registered coroutine variants and timings."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+
+import pytest
+
+from aos_dispatcher_azure import execution
+from aos_dispatcher_azure.execution import (
+    DispatcherExecutor,
+    native_async,
+    register_async,
+)
+
+
+@pytest.fixture(autouse=True)
+def variants(monkeypatch) -> None:
+    monkeypatch.setattr(execution, "_async_variants", {})
+
+
+def list_items() -> tuple:
+    return {"thread": threading.current_thread().name}, 200
+
+
+async def list_items_async() -> tuple:
+    return {"thread": "event-loop"}, 200
+
+
+class TestNativeAsync:
+    def test_coroutine_function_is_its_own_variant(self) -> None:
+        assert native_async(list_items_async) is list_items_async
+
+    def test_variant_is_not_found_by_name(self) -> None:
+        assert native_async(list_items) is None
+
+    def test_registered_variant_replaces_the_function(self) -> None:
+        register_async(list_items, list_items_async)
+
+        assert native_async(list_items) is list_items_async
+
+    def test_wrapper_keeps_running_on_the_pool(self) -> None:
+        register_async(list_items, list_items_async)
+
+        @functools.wraps(list_items)
+        def wrapper() -> tuple:
+            return list_items()
+
+        assert native_async(wrapper) is None
+
+    def test_blocking_variant_is_rejected(self) -> None:
+        with pytest.raises(TypeError):
+            register_async(list_items, list_items)
+
+
+class TestDispatcherExecutor:
+    def test_blocking_call_runs_on_the_pool(self) -> None:
+        executor = DispatcherExecutor(max_workers=2)
+        try:
+            body, _ = asyncio.run(executor.run("list_items", list_items))
+        finally:
+            executor.shutdown()
+
+        assert body["thread"].startswith("aos-dispatcher")
+
+    def test_registered_variant_is_awaited(self) -> None:
+        register_async(list_items, list_items_async)
+        executor = DispatcherExecutor(max_workers=2)
+
+        body, _ = asyncio.run(executor.run("list_items", list_items))
+
+        assert body == {"thread": "event-loop"}
+        assert executor._pool is None
+
+    def test_failed_call_is_counted_and_raised(self) -> None:
+        executor = DispatcherExecutor(max_workers=2)
+
+        def broken() -> tuple:
+            raise RuntimeError("library error")
+
+        try:
+            with pytest.raises(RuntimeError):
+                asyncio.run(executor.run("broken", broken))
+        finally:
+            executor.shutdown()
+
+        stats = executor.snapshot()["endpoints"]["broken"]
+        assert (stats["calls"], stats["errors"], stats["in_flight"]) == (1, 1, 0)
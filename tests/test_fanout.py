@@ -0,0 +1,107 @@
+"""fan_out concurrency, deadlines, failures and duplicate agents."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List
+
+from aos_dispatcher_azure.fanout import fan_out
+
+
+def _agents(delays: Dict[str, float], calls: List[str]):
+    async def call(agent_id: str) -> tuple:
+        calls.append(agent_id)
+        await asyncio.sleep(delays[agent_id])
+        if delays[agent_id] < 0:
+            raise RuntimeError("agent down")
+        return {"agent": agent_id}, 200
+
+    return call
+
+
+class TestFanOut:
+    def test_replies_arrive_in_completion_order(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.03, "cfo": 0.01, "cto": 0.02}, calls)
+
+        result = asyncio.run(fan_out(["ceo", "cfo", "cto"], call, timeout=1))
+
+        assert [reply.agent_id for reply in result.replies] == ["cfo", "cto", "ceo"]
+        assert result.timed_out == [] and result.status_code == 200
+        assert result.elapsed < 0.06  # the slowest agent, not the sum
+
+    def test_agents_past_the_deadline_are_timed_out(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.0, "cfo": 5, "cto": 5}, calls)
+
+        result = asyncio.run(fan_out(["cto", "ceo", "cfo"], call, timeout=0.05))
+
+        assert [reply.agent_id for reply in result.replies] == ["ceo"]
+        assert result.timed_out == ["cto", "cfo"]
+        assert result.status_code == 207
+
+    def test_failing_agent_is_a_500_reply(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.0, "cfo": -1}, calls)
+
+        result = asyncio.run(fan_out(["ceo", "cfo"], call, timeout=1))
+
+        statuses = {reply.agent_id: reply.status_code for reply in result.replies}
+        assert statuses == {"ceo": 200, "cfo": 500}
+        assert result.summary()["failed"] == 1 and result.status_code == 207
+
+
+class TestFanOutDuplicates:
+    def test_duplicate_agent_is_asked_once(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.0, "cfo": 0.0}, calls)
+
+        result = asyncio.run(fan_out(["ceo", "cfo", "ceo"], call, timeout=1))
+
+        assert calls == ["ceo", "cfo"]
+        assert len(result.replies) == 2 and result.timed_out == []
+
+    def test_duplicate_agent_past_the_deadline_is_timed_out_once(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 5, "cfo": 0.0}, calls)
+
+        result = asyncio.run(fan_out(["ceo", "cfo", "ceo"], call, timeout=0.05))
+
+        assert result.timed_out == ["ceo"]
+        assert result.summary()["succeeded"] == 1
+
+
+class TestFanOutResult:
+    def test_reply_latency_is_measured_from_the_start(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.0, "cfo": 0.03}, calls)
+
+        result = asyncio.run(fan_out(["ceo", "cfo"], call, timeout=1))
+
+        latencies = {reply.agent_id: reply.latency for reply in result.replies}
+        assert latencies["ceo"] < 0.03 <= latencies["cfo"] <= result.elapsed
+
+    def test_body_lists_replies_and_the_summary(self) -> None:
+        calls: List[str] = []
+        call = _agents({"ceo": 0.0, "cfo": 5}, calls)
+
+        body = asyncio.run(fan_out(["ceo", "cfo"], call, timeout=0.02)).to_dict()
+
+        assert body["results"] == [
+            {
+                "agent_id": "ceo",
+                "status": 200,
+                "latency_ms": body["results"][0]["latency_ms"],
+                "body": {"agent": "ceo"},
+            }
+        ]
+        assert (body["succeeded"], body["failed"], body["timed_out"]) == (1, 0, ["cfo"])
+        assert body["timeout_s"] == 0.02
+
+    def test_error_status_from_an_agent_makes_it_partial(self) -> None:
+        async def call(agent_id: str) -> tuple:
+            return {"error": "Agent not found"}, 404
+
+        result = asyncio.run(fan_out(["ghost"], call, timeout=1))
+
+        assert result.status_code == 207 and result.summary()["failed"] == 1
@@ -0,0 +1,210 @@
+"""FoundryPool thread leases against a fake project client."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from aos_dispatcher_azure.execution import DispatcherExecutor
+from aos_dispatcher_azure.foundry import FoundryPool, PooledProjectClient
+
+
+class FakeProjectClient:
+    """``AIProjectClient.agents`` stand-in that flags overlapping runs on a thread."""
+
+    def __init__(self, run_seconds: float) -> None:
+        self.run_seconds = run_seconds
+        self.deleted: List[str] = []
+        self.overlapping: List[str] = []
+        self._active: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.lookups: List[str] = []
+        self.agents = SimpleNamespace(
+            get_agent=self._get_agent,
+            delete_agent=lambda agent_id: None,
+            threads=SimpleNamespace(
+                create=self._create_thread, delete=self.deleted.append
+            ),
+            runs=SimpleNamespace(create_and_process=self._run),
+        )
+
+    def _get_agent(self, agent_id: str) -> Any:
+        self.lookups.append(agent_id)
+        return SimpleNamespace(id=agent_id)
+
+    def _create_thread(self) -> Any:
+        return SimpleNamespace(id=f"t{next(self._ids)}")
+
+    def _run(self, thread_id: str, agent_id: str) -> None:
+        with self._lock:
+            if self._active.get(thread_id):
+                self.overlapping.append(thread_id)
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+        time.sleep(self.run_seconds)
+        with self._lock:
+            self._active[thread_id] -= 1
+
+
+def _library(pool_module: Any):
+    """``message_agent`` as the library does it: a thread per message, then deleted."""
+
+    def message_agent(agent_id: str) -> str:
+        agents = pool_module.project_client.agents
+        agent = agents.get_agent(agent_id)
+        thread = agents.threads.create()
+        try:
+            agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
+        finally:
+            agents.threads.delete(thread.id)
+        return thread.id
+
+    return message_agent
+
+
+def _pooled(run_seconds: float = 0.0, **settings: Any):
+    client = FakeProjectClient(run_seconds=run_seconds)
+    module = SimpleNamespace(project_client=client)
+    pool = FoundryPool(**settings)
+    pool.enabled = True
+    assert pool.install(module)
+    return client, module, pool
+
+
+class TestFoundryPoolThreads:
+    def test_cancelled_call_keeps_its_thread_until_the_run_ends(self) -> None:
+        client, module, pool = _pooled(run_seconds=0.2)
+        message_agent = _library(module)
+        executor = DispatcherExecutor(max_workers=4)
+
+        async def scenario() -> str:
+            first = executor.run("m", pool.bind(message_agent, "cfo", "orch-1"), "cfo")
+            try:
+                await asyncio.wait_for(first, timeout=0.05)
+            except asyncio.TimeoutError:
+                pass
+            # The first run is still going; the conversation must not hand out
+            # its thread.
+            return await executor.run(
+                "m", pool.bind(message_agent, "cfo", "orch-1"), "cfo"
+            )
+
+        try:
+            second_thread = asyncio.run(scenario())
+            time.sleep(0.3)  # Let the cancelled call's run finish.
+        finally:
+            executor.shutdown()
+
+        assert client.overlapping == []
+        assert second_thread != "t1"
+        assert pool.snapshot()["leased_threads"] == 0
+        idle = [entry.thread.id for entry in pool._idle.values()]
+        assert len(idle) == 1
+        assert not set(idle) & set(client.deleted)
+
+    def test_sequential_calls_reuse_the_conversation_thread(self) -> None:
+        client, module, pool = _pooled()
+        message_agent = _library(module)
+
+        threads = [pool.bind(message_agent, "cfo", "orch-1")("cfo") for _ in range(3)]
+
+        assert threads == ["t1", "t1", "t1"]
+        assert client.deleted == []
+        assert pool.stats.threads_reused == 2
+
+    def test_call_without_an_orchestration_gets_a_fresh_thread(self) -> None:
+        client, module, pool = _pooled()
+        message_agent = _library(module)
+
+        threads = [pool.bind(message_agent, "cfo", None)("cfo") for _ in range(2)]
+
+        assert threads == ["t1", "t2"]
+        assert client.deleted == ["t1", "t2"]
+
+    def test_idle_threads_beyond_the_limit_are_deleted(self) -> None:
+        client, module, pool = _pooled(max_threads=1)
+        message_agent = _library(module)
+
+        pool.bind(message_agent, "cfo", "orch-1")("cfo")
+        pool.bind(message_agent, "cfo", "orch-2")("cfo")
+        pool.bind(message_agent, "cfo", "orch-3")("cfo")  # deletes the evicted t1
+
+        assert client.deleted == ["t1"]
+        assert pool.stats.threads_evicted == 2
+
+    def test_expired_idle_thread_is_replaced(self) -> None:
+        client, module, pool = _pooled(thread_idle=0.05)
+        message_agent = _library(module)
+
+        first = pool.bind(message_agent, "cfo", "orch-1")("cfo")
+        time.sleep(0.1)
+        second = pool.bind(message_agent, "cfo", "orch-1")("cfo")
+
+        pool.bind(message_agent, "cfo", "orch-1")("cfo")  # deletes the expired t1
+
+        assert (first, second) == ("t1", "t2")
+        assert client.deleted == ["t1"] and pool.stats.threads_expired == 1
+
+    def test_failed_delete_is_counted_not_raised(self) -> None:
+        client, module, pool = _pooled(max_threads=1)
+        message_agent = _library(module)
+
+        def broken_delete(thread_id: str) -> None:
+            raise ConnectionError("Foundry unavailable")
+
+        client.agents.threads.delete = broken_delete
+        module.project_client = PooledProjectClient(client, pool)
+        for orchestration_id in ("orch-1", "orch-2", "orch-3"):
+            pool.bind(message_agent, "cfo", orchestration_id)("cfo")
+
+        assert pool.stats.delete_errors == 1
+
+
+class TestFoundryPoolAgents:
+    def test_agent_handle_is_looked_up_once(self) -> None:
+        client, module, pool = _pooled()
+        message_agent = _library(module)
+
+        for _ in range(3):
+            message_agent("cfo")
+
+        assert client.lookups == ["cfo"]
+        assert pool.snapshot()["agent_hit_ratio"] == round(2 / 3, 4)
+
+    def test_deleted_agent_is_looked_up_again(self) -> None:
+        client, module, pool = _pooled()
+        agents = module.project_client.agents
+
+        agents.get_agent("cfo")
+        agents.delete_agent("cfo")
+        agents.get_agent("cfo")
+
+        assert client.lookups == ["cfo", "cfo"]
+
+
+class TestFoundryPoolInstall:
+    def test_module_without_a_client_is_not_pooled(self) -> None:
+        pool = FoundryPool()
+        pool.enabled = True
+
+        assert not pool.install(SimpleNamespace(project_client=None))
+
+    def test_client_is_wrapped_once(self) -> None:
+        _, module, pool = _pooled()
+        wrapped = module.project_client
+
+        assert pool.install(module)
+        assert module.project_client is wrapped
+
+    def test_disabled_pool_leaves_calls_unwrapped(self) -> None:
+        pool = FoundryPool()
+        pool.enabled = False
+
+        def fn() -> None:
+            return None
+
+        assert pool.bind(fn, "cfo", "orch-1") is fn
@@ -0,0 +1,163 @@
+"""IdempotencyGuard keys, replays and conflicts."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Optional
+
+import pytest
+
+from aos_dispatcher_azure.idempotency import (
+    IdempotencyConflict,
+    IdempotencyGuard,
+    MemoryIdempotencyStore,
+    StoredResponse,
+    submission_key,
+)
+
+
+class _Dispatcher:
+    """Counts calls and answers with a fixed status."""
+
+    def __init__(self, status: int = 202) -> None:
+        self.status = status
+        self.calls = 0
+
+    async def __call__(self) -> tuple:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return {"call": self.calls}, self.status
+
+
+class TestSubmissionKey:
+    def test_key_is_scoped_to_the_app(self) -> None:
+        body = {"orchestration_id": "o-1"}
+
+        assert submission_key("a", body) != submission_key("b", body)
+        assert submission_key("a", {}, "k") != submission_key("b", {}, "k")
+
+    def test_app_name_cannot_forge_another_scope(self) -> None:
+        assert submission_key("a:key", {}, "k") != submission_key("a", {}, "key:k")
+
+    def test_header_takes_precedence_over_orchestration_id(self) -> None:
+        key = submission_key("a", {"orchestration_id": "o-1"}, " k ")
+
+        assert key == "key:a:k"
+
+    def test_request_without_key_or_id_has_no_key(self) -> None:
+        assert submission_key("a", {"orchestration_id": ""}, "  ") is None
+        assert submission_key("a", ["not", "a", "dict"]) is None
+
+
+class TestIdempotencyGuard:
+    def test_repeat_replays_stored_response(self) -> None:
+        guard, call = IdempotencyGuard(), _Dispatcher()
+        key = submission_key("a", {"orchestration_id": "o-1"})
+
+        async def scenario() -> List[tuple]:
+            first = await guard.run(key, {"orchestration_id": "o-1"}, call)
+            second = await guard.run(key, {"orchestration_id": "o-1"}, call)
+            return [first, second]
+
+        first, second = asyncio.run(scenario())
+        assert call.calls == 1
+        assert first == (({"call": 1}, 202), False)
+        assert second == (({"call": 1}, 202), True)
+
+    def test_concurrent_duplicates_are_coalesced(self) -> None:
+        guard, call = IdempotencyGuard(), _Dispatcher()
+
+        async def scenario() -> list:
+            return await asyncio.gather(
+                *(guard.run("key:a:k", {"x": 1}, call) for _ in range(3))
+            )
+
+        results = asyncio.run(scenario())
+        assert call.calls == 1
+        assert [replayed for _, replayed in results] == [False, True, True]
+        assert guard.stats.coalesced == 2
+
+    def test_failed_response_is_not_stored(self) -> None:
+        guard, call = IdempotencyGuard(), _Dispatcher(status=503)
+
+        async def scenario() -> None:
+            await guard.run("key:a:k", {}, call)
+            await guard.run("key:a:k", {}, call)
+
+        asyncio.run(scenario())
+        assert call.calls == 2
+
+    def test_reused_idempotency_key_with_other_body_is_422(self) -> None:
+        guard = IdempotencyGuard()
+
+        async def scenario() -> None:
+            await guard.run("key:a:k", {"x": 1}, _Dispatcher())
+            await guard.run("key:a:k", {"x": 2}, _Dispatcher())
+
+        with pytest.raises(IdempotencyConflict) as raised:
+            asyncio.run(scenario())
+        assert raised.value.status_code == 422
+        assert guard.stats.conflicts == 1
+
+    def test_reused_orchestration_id_with_other_body_is_409(self) -> None:
+        guard = IdempotencyGuard()
+        first = {"orchestration_id": "o-1", "agent_ids": ["ceo"]}
+        second = {"orchestration_id": "o-1", "agent_ids": ["cfo"]}
+
+        async def scenario() -> None:
+            await guard.run(submission_key("a", first), first, _Dispatcher())
+            await guard.run(submission_key("a", second), second, _Dispatcher())
+
+        with pytest.raises(IdempotencyConflict) as raised:
+            asyncio.run(scenario())
+        assert raised.value.status_code == 409
+
+    def test_same_id_from_another_app_runs_again(self) -> None:
+        guard, call = IdempotencyGuard(), _Dispatcher()
+        body = {"orchestration_id": "o-1"}
+
+        async def scenario() -> None:
+            await guard.run(submission_key("a", body), body, call)
+            await guard.run(submission_key("b", body), body, call)
+
+        asyncio.run(scenario())
+        assert call.calls == 2
+
+    def test_store_failure_does_not_block_submission(self) -> None:
+        class BrokenStore:
+            async def get(self, key: str) -> None:
+                raise ConnectionError("down")
+
+            async def put(self, key: str, response: StoredResponse) -> None:
+                raise ConnectionError("down")
+
+        guard, call = IdempotencyGuard(store=BrokenStore()), _Dispatcher()
+
+        result, replayed = asyncio.run(guard.run("key:a:k", {}, call))
+        assert (result[1], replayed) == (202, False)
+        assert guard.stats.store_errors == 2
+
+
+class TestMemoryIdempotencyStore:
+    def test_oldest_entries_are_evicted_beyond_max_entries(self) -> None:
+        store = MemoryIdempotencyStore(max_entries=2)
+        expires = time.time() + 60
+
+        async def scenario() -> list:
+            for key in ("a", "b", "c"):
+                await store.put(key, StoredResponse("f", ({}, 202), expires))
+            return [await store.get(key) is not None for key in ("a", "b", "c")]
+
+        assert asyncio.run(scenario()) == [False, True, True]
+        assert store.evictions == 1
+
+    def test_expired_entry_is_not_returned(self) -> None:
+        store = MemoryIdempotencyStore(max_entries=2)
+
+        async def scenario() -> Optional[StoredResponse]:
+            await store.put("a", StoredResponse("f", ({}, 202), time.time() - 1))
+            return await store.get("a")
+
+        assert asyncio.run(scenario()) is None
+        assert len(store) == 0
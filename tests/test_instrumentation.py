@@ -0,0 +1,146 @@
+"""Per-endpoint metrics, phase timing, Prometheus output and profiles."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import pytest
+
+from aos_dispatcher_azure.instrumentation import (
+    PROFILE_ID_HEADER,
+    Histogram,
+    Instrumentation,
+    phase,
+)
+
+
+class _Message:
+    def __init__(
+        self,
+        body: bytes = b"",
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.body = body
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+
+    def get_body(self) -> bytes:
+        return self.body
+
+
+@pytest.fixture
+def instrumentation(monkeypatch) -> Instrumentation:
+    monkeypatch.setenv("AOS_OTEL_SPANS", "false")
+    return Instrumentation()
+
+
+class TestHistogram:
+    def test_bounds_are_inclusive_and_cumulative(self) -> None:
+        hist = Histogram([1, 2])
+        for value in (0.5, 1, 1.5, 3):
+            hist.observe(value)
+
+        assert list(hist.cumulative()) == [("1", 2), ("2", 3), ("+Inf", 4)]
+        assert hist.sum == 6.0
+
+
+class TestInstrumentation:
+    def test_phases_sizes_and_status_are_recorded(self, instrumentation) -> None:
+        async def handler(req: _Message) -> _Message:
+            with phase("dispatcher"):
+                await asyncio.sleep(0.01)
+            return _Message(b"x" * 100, status_code=202)
+
+        wrapped = instrumentation.wrap("submit", handler)
+        asyncio.run(wrapped(_Message(b"{}")))
+
+        metrics = instrumentation.endpoints["submit"]
+        assert metrics.phases["dispatcher"].sum >= 0.01
+        assert metrics.phases["total"].count == 1
+        assert metrics.request_bytes.sum == 2 and metrics.response_bytes.sum == 100
+        assert metrics.statuses == {"202": 1} and metrics.in_flight == 0
+
+    def test_raising_handler_counts_as_a_500(self, instrumentation) -> None:
+        async def handler(req: _Message) -> _Message:
+            raise RuntimeError("library error")
+
+        wrapped = instrumentation.wrap("broken", handler)
+        with pytest.raises(RuntimeError):
+            asyncio.run(wrapped(_Message()))
+
+        metrics = instrumentation.endpoints["broken"]
+        assert metrics.statuses == {"500": 1} and metrics.in_flight == 0
+
+    def test_phase_outside_a_request_is_ignored(self, instrumentation) -> None:
+        with phase("dispatcher"):
+            pass
+
+        assert not instrumentation.endpoints
+
+    def test_disabled_instrumentation_returns_the_handler(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_INSTRUMENTATION", "false")
+
+        async def handler(req: Any) -> Any:
+            return None
+
+        assert Instrumentation().wrap("x", handler) is handler
+
+    def test_prometheus_labels_are_escaped(self, instrumentation) -> None:
+        async def handler(req: _Message) -> _Message:
+            return _Message()
+
+        asyncio.run(instrumentation.wrap('odd"name', handler)(_Message()))
+        text = instrumentation.render_prometheus()
+
+        assert 'aos_http_responses_total{endpoint="odd\\"name",status="200"} 1' in text
+        assert "# TYPE aos_http_requests_in_flight gauge" in text
+        assert text.endswith("\n")
+
+
+class TestProfiling:
+    def test_profile_header_attaches_a_kept_profile(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_PROFILING", "true")
+        monkeypatch.setenv("AOS_PROFILER_INTERVAL_MS", "1")
+        instrumentation = Instrumentation()
+
+        async def handler(req: _Message) -> _Message:
+            time.sleep(0.05)  # busy on the event loop
+            return _Message()
+
+        wrapped = instrumentation.wrap("slow", handler)
+        response = asyncio.run(wrapped(_Message(headers={"X-AOS-Profile": "true"})))
+
+        profile = instrumentation.profiles[response.headers[PROFILE_ID_HEADER]]
+        assert profile.samples > 0
+        assert all(stack.startswith("event-loop;") for stack in profile.stacks)
+
+    def test_profiling_off_ignores_the_header(self, instrumentation) -> None:
+        async def handler(req: _Message) -> _Message:
+            return _Message()
+
+        wrapped = instrumentation.wrap("x", handler)
+        response = asyncio.run(wrapped(_Message(headers={"X-AOS-Profile": "true"})))
+
+        assert PROFILE_ID_HEADER not in response.headers
+        assert not instrumentation.profiles
+
+    def test_only_the_newest_profiles_are_kept(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_PROFILING", "true")
+        monkeypatch.setenv("AOS_PROFILES_KEPT", "2")
+        instrumentation = Instrumentation()
+
+        async def handler(req: _Message) -> _Message:
+            return _Message()
+
+        wrapped = instrumentation.wrap("x", handler)
+        ids = [
+            asyncio.run(wrapped(_Message(headers={"X-AOS-Profile": "1"}))).headers[
+                PROFILE_ID_HEADER
+            ]
+            for _ in range(3)
+        ]
+
+        assert list(instrumentation.profiles) == ids[1:]
@@ -0,0 +1,139 @@
+"""KpiBoard aggregation, seeding and snapshots; If-None-Match matching."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict
+
+import pytest
+
+from aos_dispatcher_azure.kpis import KpiBoard, fold
+from aos_dispatcher_azure.orchestrations import etag_matches
+
+
+def _board(*kpis: Dict[str, Any]) -> KpiBoard:
+    board = KpiBoard(resync_interval=60)
+
+    async def fetch() -> tuple:
+        return {"kpis": list(kpis)}, 200
+
+    asyncio.run(board.ensure_synced(fetch))
+    return board
+
+
+def _dashboard(board: KpiBoard) -> Dict[str, Dict[str, Any]]:
+    body, _ = board.snapshot()
+    return {kpi["name"]: kpi for kpi in json.loads(body)["kpis"]}
+
+
+class TestKpiAggregation:
+    def test_last_keeps_the_newest_point_by_timestamp(self) -> None:
+        board = _board({"name": "nps", "target": 50, "current": None})
+
+        board.record("nps", 60, "2026-01-02T00:00:00Z")
+        board.record("nps", 10, "2026-01-01T00:00:00Z")  # older, ignored
+
+        assert _dashboard(board)["nps"]["current"] == 60
+        assert _dashboard(board)["nps"]["status"] == "on_track"
+
+    @pytest.mark.parametrize(
+        "aggregation, expected",
+        [("sum", 106), ("count", 5), ("min", 1), ("max", 100)],
+    )
+    def test_points_fold_into_the_seeded_value(self, aggregation, expected) -> None:
+        seeded = {"name": "sales", "current": 100, "aggregation": aggregation}
+        if aggregation == "count":
+            seeded["current"] = 3
+        board = _board(seeded)
+
+        board.record("sales", 1, "2026-01-02T00:00:00Z")
+        board.record("sales", 5, "2026-01-01T00:00:00Z")  # older still counts
+
+        assert _dashboard(board)["sales"]["current"] == expected
+
+    def test_avg_is_updated_with_the_seeded_count(self) -> None:
+        board = _board(
+            {"name": "csat", "current": 4.0, "count": 3, "aggregation": "avg"}
+        )
+
+        board.record("csat", 2.0)
+
+        assert _dashboard(board)["csat"]["current"] == pytest.approx(3.5)
+        assert _dashboard(board)["csat"]["count"] == 4
+
+    def test_avg_without_count_reseeds_on_next_read(self) -> None:
+        board = _board({"name": "csat", "current": 4.0, "aggregation": "avg"})
+
+        board.record("csat", 2.0)
+
+        assert _dashboard(board)["csat"]["current"] == 4.0
+        assert board.needs_sync()
+
+    def test_unknown_aggregation_falls_back_to_last(self) -> None:
+        assert fold({"current": 3, "aggregation": "median"}, 7) == 7
+
+    def test_first_point_of_an_empty_count_kpi_counts_one(self) -> None:
+        assert fold({"current": None, "aggregation": "count"}, 42) == 1
+
+
+class TestKpiBoard:
+    def test_points_for_unknown_kpis_are_ignored(self) -> None:
+        board = _board({"name": "nps", "current": 1})
+
+        assert not board.record("other", 5)
+        assert not board.record("nps", True)
+        assert not board.record("nps", 5, "not a timestamp")
+
+    def test_snapshot_is_cached_until_a_change(self) -> None:
+        board = _board({"name": "nps", "current": 1})
+        first = board.snapshot()
+
+        assert board.snapshot()[0] is first[0]
+        board.record("nps", 2)
+        assert board.snapshot()[1] != first[1]
+
+    def test_failed_seed_returns_the_error_and_keeps_the_board(self) -> None:
+        board = _board({"name": "nps", "current": 1})
+        board.synced_at = None
+
+        async def fetch() -> tuple:
+            return {"error": "down"}, 503
+
+        assert asyncio.run(board.ensure_synced(fetch)) == ({"error": "down"}, 503)
+        assert _dashboard(board)["nps"]["current"] == 1
+
+    def test_sum_does_not_replay_points_recorded_during_the_seed(self) -> None:
+        board = KpiBoard(resync_interval=60)
+
+        async def fetch() -> tuple:
+            # The library already counts the point recorded meanwhile.
+            board.record("sales", 5)
+            return {
+                "kpis": [{"name": "sales", "current": 15, "aggregation": "sum"}]
+            }, 200
+
+        asyncio.run(board.ensure_synced(fetch))
+
+        assert _dashboard(board)["sales"]["current"] == 15
+
+
+class TestEtagMatches:
+    def test_missing_header_never_matches(self) -> None:
+        assert not etag_matches(None, "abc")
+        assert not etag_matches("", "abc")
+
+    def test_quoted_tag_matches(self) -> None:
+        assert etag_matches('"abc"', "abc")
+
+    def test_tag_in_a_list_matches(self) -> None:
+        assert etag_matches('"x", "abc" , "y"', "abc")
+
+    def test_weak_tag_matches(self) -> None:
+        assert etag_matches('W/"abc"', "abc")
+
+    def test_star_matches_any_tag(self) -> None:
+        assert etag_matches("*", "abc")
+
+    def test_other_tags_do_not_match(self) -> None:
+        assert not etag_matches('"abcd", W/"ab"', "abc")
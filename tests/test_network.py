@@ -0,0 +1,149 @@
+"""NetworkMembership versions, deltas and re-seeding."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.network import NetworkMembership, VersionError
+
+
+def _table(*peers: str, changelog: int = 100) -> NetworkMembership:
+    table = NetworkMembership(resync_interval=60, changelog=changelog)
+    table.load([{"app_name": peer, "status": "online"} for peer in peers], [])
+    return table
+
+
+def _names(body: Dict[str, Any]) -> List[str]:
+    return [peer["app_name"] for peer in body["peers"]]
+
+
+class TestNetworkDeltas:
+    def test_since_returns_only_the_changes(self) -> None:
+        table = _table("a", "b")
+        since = table.token
+
+        table.peer_registered("c")
+        table.peer_deregistered("a")
+        body = table.listing("peers", since)
+
+        assert body["delta"] and _names(body) == ["c"] and body["removed"] == ["a"]
+        assert body["version"] == table.token
+
+    def test_current_version_gives_an_empty_delta(self) -> None:
+        table = _table("a")
+
+        body = table.listing("peers", table.token)
+
+        assert body["delta"] and body["peers"] == [] and body["removed"] == []
+
+    def test_re_registering_unchanged_peer_is_not_a_change(self) -> None:
+        table = _table("a")
+        version = table.version
+
+        table.peer_registered("a")
+
+        assert table.version == version
+
+    @pytest.mark.parametrize("since", ["other:1", "{epoch}:99"])
+    def test_version_from_another_worker_gives_the_full_list(self, since) -> None:
+        table = _table("a", "b")
+
+        body = table.listing("peers", since.format(epoch=table.epoch))
+
+        assert not body["delta"] and _names(body) == ["a", "b"]
+
+    def test_version_older_than_the_change_log_gives_the_full_list(self) -> None:
+        table = _table(changelog=2)
+        first = table.token
+        for name in "abcde":
+            table.peer_registered(name)
+        recent = f"{table.epoch}:{table.version - 2}"
+
+        assert not table.listing("peers", first)["delta"]
+        assert _names(table.listing("peers", recent)) == ["d", "e"]
+
+    @pytest.mark.parametrize("since", ["garbage", "abc:x"])
+    def test_malformed_since_is_rejected(self, since) -> None:
+        table = _table("a")
+
+        with pytest.raises(VersionError):
+            table.listing("peers", since)
+
+    def test_full_list_is_built_once_per_version(self) -> None:
+        table = _table("a")
+
+        first = table.listing("peers")
+        assert table.listing("peers") is first
+        table.peer_registered("b")
+        assert table.listing("peers") is not first
+
+
+class TestNetworkWrites:
+    def test_join_counts_one_more_member_without_a_count(self) -> None:
+        table = NetworkMembership(resync_interval=60)
+        table.load([], [{"network_id": "n1", "members": 2, "name": "Board"}])
+
+        table.network_joined("n1")
+        table.network_joined("n1", {"members": 7})
+
+        assert table.list_networks()[0]["networks"] == [
+            {"network_id": "n1", "members": 7, "name": "Board"}
+        ]
+
+    def test_write_before_the_first_seed_is_left_to_the_seed(self) -> None:
+        table = NetworkMembership(resync_interval=60)
+
+        table.peer_registered("a")
+
+        assert table.version == 0 and table.needs_sync()
+
+
+class TestNetworkSync:
+    def test_reseed_is_recorded_as_changes(self) -> None:
+        table = _table("a", "b")
+        since = table.token
+
+        table.load([{"app_name": "b", "status": "offline"}], [])
+        body = table.listing("peers", since)
+
+        assert body["removed"] == ["a"]
+        assert body["peers"] == [{"app_name": "b", "status": "offline"}]
+
+    def test_reseed_replaces_entries_instead_of_merging(self) -> None:
+        table = NetworkMembership(resync_interval=60)
+        table.load([{"app_name": "a", "status": "online", "region": "eu"}], [])
+
+        table.load([{"app_name": "a", "status": "online"}], [])
+
+        assert table.discover_peers()[0]["peers"] == [
+            {"app_name": "a", "status": "online"}
+        ]
+
+    def test_write_during_the_seed_is_kept(self) -> None:
+        table = NetworkMembership(resync_interval=60)
+
+        async def peers() -> tuple:
+            table.peer_registered("late")
+            return {"peers": [{"app_name": "a"}]}, 200
+
+        async def networks() -> tuple:
+            return {"networks": []}, 200
+
+        assert asyncio.run(table.ensure_synced(peers, networks)) is None
+        assert _names(table.listing("peers")) == ["a", "late"]
+
+    def test_failed_seed_returns_the_error(self) -> None:
+        table = NetworkMembership(resync_interval=60)
+
+        async def peers() -> tuple:
+            return {"peers": []}, 200
+
+        async def networks() -> tuple:
+            return {"error": "down"}, 503
+
+        result = asyncio.run(table.ensure_synced(peers, networks))
+
+        assert result == ({"error": "down"}, 503) and table.needs_sync()
@@ -0,0 +1,111 @@
+"""OrchestrationTracker observation, watching and waiting."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from aos_dispatcher_azure.orchestrations import NOT_FOUND, OrchestrationTracker
+
+
+class _Statuses:
+    """Status reads served from a dict; missing ids are ``404``."""
+
+    def __init__(self) -> None:
+        self.bodies: Dict[str, dict] = {}
+        self.reads: List[str] = []
+
+    async def __call__(self, orchestration_id: str) -> tuple:
+        self.reads.append(orchestration_id)
+        body = self.bodies.get(orchestration_id)
+        return (body, 200) if body is not None else ({"error": "gone"}, 404)
+
+    def set(self, orchestration_id: str, status: str) -> None:
+        self.bodies[orchestration_id] = {
+            "orchestration_id": orchestration_id,
+            "status": status,
+        }
+
+
+class TestOrchestrationTracker:
+    def test_observed_orchestration_is_not_watched(self) -> None:
+        statuses = _Statuses()
+        tracker = OrchestrationTracker(statuses, interval=0.01)
+
+        async def scenario() -> None:
+            await tracker.observe(
+                "o-1", {"orchestration_id": "o-1", "status": "running"}
+            )
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+        assert tracker.watched == 0
+        assert statuses.reads == []
+
+    def test_watched_orchestration_is_polled_until_terminal(self) -> None:
+        statuses = _Statuses()
+        statuses.set("o-1", "running")
+        tracker = OrchestrationTracker(statuses, interval=0.01)
+        seen: List[Tuple[str, str]] = []
+
+        async def listener(state, previous) -> None:
+            seen.append((previous, state.status))
+
+        tracker.add_listener(listener)
+
+        async def scenario() -> None:
+            tracker.watch(["o-1"])
+            await asyncio.sleep(0.03)
+            statuses.set("o-1", "completed")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+        assert seen == [(None, "running"), ("running", "completed")]
+        assert tracker.watched == 0
+
+    def test_vanished_orchestration_ends_as_not_found(self) -> None:
+        statuses = _Statuses()
+        tracker = OrchestrationTracker(statuses, interval=0.01)
+
+        async def scenario() -> str:
+            tracker.watch(["o-1"])
+            await asyncio.sleep(0.05)
+            return tracker.get("o-1").status
+
+        assert asyncio.run(scenario()) == NOT_FOUND
+
+    def test_stale_read_does_not_undo_a_terminal_status(self) -> None:
+        tracker = OrchestrationTracker(_Statuses())
+
+        async def scenario() -> str:
+            await tracker.observe("o-1", {"status": "completed"})
+            await tracker.observe("o-1", {"status": "running"})
+            return tracker.get("o-1").status
+
+        assert asyncio.run(scenario()) == "completed"
+
+    def test_waiter_stops_watching_once_it_times_out(self) -> None:
+        statuses = _Statuses()
+        statuses.set("o-1", "running")
+        tracker = OrchestrationTracker(statuses, interval=0.01)
+
+        async def scenario() -> None:
+            state = await tracker.observe("o-1", statuses.bodies["o-1"])
+            await tracker.wait_for_change("o-1", state.etag, 0.03)
+
+        asyncio.run(scenario())
+        assert tracker.watched == 0
+
+    def test_changes_since_unknown_etag_is_the_current_state(self) -> None:
+        tracker = OrchestrationTracker(_Statuses())
+
+        async def scenario():
+            await tracker.observe("o-1", {"status": "running"})
+            await tracker.observe("o-1", {"status": "running", "agent_outputs": {}})
+            return tracker.get("o-1")
+
+        state = asyncio.run(scenario())
+        assert [c.kind for c in state.changes_since(None)] == ["progress"]
+        assert [c.kind for c in state.changes_since("elsewhere")] == ["progress"]
+        first = state.history[0].etag
+        assert [c.kind for c in state.changes_since(first)] == ["progress"]
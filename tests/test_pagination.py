@@ -0,0 +1,195 @@
+"""Paging parameters, cursors and slicing list responses from kept snapshots."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from aos_dispatcher_azure.pagination import (
+    ListSnapshots,
+    PageRequest,
+    PaginationError,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    parse_page_request,
+)
+
+
+def _risks(count: int) -> Dict[str, Any]:
+    return {"risks": [{"id": f"r{n}"} for n in range(count)]}
+
+
+def _export(
+    fetch, snapshots: ListSnapshots, size: int, scope: Any = None
+) -> List[Dict[str, Any]]:
+    """Follow ``next_cursor`` as an NDJSON export client would."""
+    items: List[Dict[str, Any]] = []
+    cursor: Optional[str] = None
+    while True:
+        page = PageRequest(limit=size, cursor=cursor, export=True)
+        body = snapshots.lookup(cursor, "list_risks", scope) or fetch()
+        paged, cursor = paginate(
+            body, "risks", page, "list_risks", "id", snapshots, scope
+        )
+        items.extend(paged["risks"])
+        if cursor is None:
+            return items
+
+
+class TestPageRequest:
+    def test_non_integer_limit_is_rejected(self) -> None:
+        with pytest.raises(PaginationError):
+            parse_page_request({"limit": "abc"})
+
+    def test_limit_below_one_is_rejected(self) -> None:
+        with pytest.raises(PaginationError):
+            parse_page_request({"limit": "0"})
+
+    def test_json_limit_is_capped(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_LIST_MAX_LIMIT", "50")
+
+        assert parse_page_request({"limit": "500"}).limit == 50
+
+    def test_accept_header_requests_an_export(self) -> None:
+        assert parse_page_request({}, "application/x-ndjson").export
+
+    def test_unknown_format_is_rejected(self) -> None:
+        with pytest.raises(PaginationError):
+            parse_page_request({"format": "csv"})
+
+
+class TestCursor:
+    def test_cursor_round_trips(self) -> None:
+        cursor = encode_cursor("list_risks", 20, "r19")
+
+        assert decode_cursor(cursor, "list_risks") == (20, "r19")
+
+    def test_cursor_of_another_collection_is_rejected(self) -> None:
+        with pytest.raises(PaginationError):
+            decode_cursor(encode_cursor("list_risks", 1), "list_covenants")
+
+    def test_garbage_cursor_is_rejected(self) -> None:
+        with pytest.raises(PaginationError):
+            decode_cursor("not-a-cursor!", "list_risks")
+
+
+class TestPaginate:
+    def test_expired_snapshot_falls_back_to_the_anchor(self) -> None:
+        risks = _risks(6)["risks"]
+        snapshots = ListSnapshots(ttl=60, max_entries=4)
+        first, cursor = paginate(
+            {"risks": list(risks)},
+            "risks",
+            PageRequest(limit=3),
+            "list_risks",
+            "id",
+            snapshots,
+        )
+        snapshots.discard(next(iter(snapshots._entries)))
+        refetched = {"risks": [{"id": "new"}] + risks}
+
+        assert snapshots.lookup(cursor, "list_risks") is None
+        second, _ = paginate(
+            refetched,
+            "risks",
+            PageRequest(limit=3, cursor=cursor),
+            "list_risks",
+            "id",
+            snapshots,
+        )
+        assert [r["id"] for r in first["risks"] + second["risks"]] == [
+            r["id"] for r in risks
+        ]
+
+    def test_snapshot_is_not_shared_across_filters(self) -> None:
+        snapshots = ListSnapshots(ttl=60, max_entries=4)
+        body = _risks(4)
+        scope = (("status", "open"),)
+        _, cursor = paginate(
+            body, "risks", PageRequest(limit=2), "list_risks", "id", snapshots, scope
+        )
+
+        assert snapshots.lookup(cursor, "list_risks", scope) is body
+        assert snapshots.lookup(cursor, "list_risks", (("status", "closed"),)) is None
+
+    def test_last_page_has_no_cursor_and_drops_the_snapshot(self) -> None:
+        snapshots = ListSnapshots(ttl=60, max_entries=4)
+        body = _risks(3)
+        _, cursor = paginate(
+            body, "risks", PageRequest(limit=2), "list_risks", "id", snapshots
+        )
+        held = snapshots.lookup(cursor, "list_risks")
+
+        last, next_cursor = paginate(
+            held,
+            "risks",
+            PageRequest(limit=2, cursor=cursor),
+            "list_risks",
+            "id",
+            snapshots,
+        )
+
+        assert [r["id"] for r in last["risks"]] == ["r2"]
+        assert next_cursor is None and last["next_cursor"] is None
+        assert len(snapshots) == 0
+
+
+class TestExport:
+    def test_export_pages_are_not_kept(self) -> None:
+        calls = []
+
+        def fetch() -> Dict[str, Any]:
+            calls.append(1)
+            return _risks(25)
+
+        snapshots = ListSnapshots(ttl=60, max_entries=4)
+        items = _export(fetch, snapshots, size=10)
+
+        assert [item["id"] for item in items] == [f"r{n}" for n in range(25)]
+        assert len(calls) == 3  # one fetch per page, nothing held in between
+        assert snapshots.stats()["snapshots"] == 0
+
+
+class TestListSnapshots:
+    def test_collection_over_the_item_budget_is_not_kept(self) -> None:
+        snapshots = ListSnapshots(ttl=60, max_entries=4, max_items=10)
+
+        _, cursor = paginate(
+            _risks(11), "risks", PageRequest(limit=5), "list_risks", "id", snapshots
+        )
+
+        assert len(snapshots) == 0
+        assert snapshots.stats()["too_large"] == 1
+        assert decode_cursor(cursor, "list_risks") == (5, "r4")
+
+    def test_oldest_snapshots_are_evicted_to_stay_within_the_item_budget(self) -> None:
+        snapshots = ListSnapshots(ttl=60, max_entries=4, max_items=10)
+        first = snapshots.store("list_risks", _risks(6), size=6)
+        second = snapshots.store("list_risks", _risks(6), size=6)
+
+        assert list(snapshots._entries) == [second]
+        assert snapshots.items == 6
+        assert first is not None
+
+    def test_discard_releases_the_items(self) -> None:
+        snapshots = ListSnapshots(ttl=60, max_entries=4, max_items=10)
+        snapshot_id = snapshots.store("list_risks", _risks(4), size=4)
+
+        snapshots.discard(snapshot_id)
+
+        assert (len(snapshots), snapshots.items) == (0, 0)
+
+    def test_expired_snapshots_release_their_items(self, monkeypatch) -> None:
+        clock = [100.0]
+        monkeypatch.setattr(
+            "aos_dispatcher_azure.pagination.time.monotonic", lambda: clock[0]
+        )
+        snapshots = ListSnapshots(ttl=1, max_entries=4, max_items=10)
+        snapshots.store("list_risks", _risks(4), size=4)
+        clock[0] += 2
+
+        snapshots.store("list_risks", _risks(3), size=3)
+
+        assert (len(snapshots), snapshots.items) == (1, 3)
@@ -0,0 +1,145 @@
+"""ResultPublisher buffering, retries and shutdown against the in-memory broker."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import List
+from unittest.mock import patch
+
+from aos_dispatcher_azure import results, shutdown
+from aos_dispatcher_azure.orchestrations import OrchestrationState
+from aos_dispatcher_azure.results import (
+    InMemoryResultBroker,
+    ResultEvent,
+    ResultPublisher,
+)
+
+
+def _event(n: int, app_name: str = "business-infinity") -> ResultEvent:
+    return ResultEvent(f"orch-{n}", app_name, "orchestration.completed", {"n": n})
+
+
+class TestResultPublisher:
+    def test_events_beyond_max_pending_are_dropped(self) -> None:
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=100, linger=60, max_pending=3)
+
+        async def scenario() -> None:
+            for n in range(5):
+                await publisher.publish(_event(n))
+            assert publisher.pending == 3
+            await publisher.close()
+
+        asyncio.run(scenario())
+
+        assert [
+            e["orchestration_id"] for e in broker.subscriptions["business-infinity"]
+        ] == [
+            "orch-0",
+            "orch-1",
+            "orch-2",
+        ]
+        assert publisher.stats()["dropped"] == 2
+
+    def test_batch_is_dropped_after_max_attempts(self) -> None:
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=10, linger=60, max_attempts=2)
+
+        async def scenario() -> None:
+            await publisher.publish(_event(1, "unreachable"))
+            broker.fail_next = 2
+            await publisher.flush()
+            assert publisher.pending == 1  # kept for a retry
+            await publisher.flush()
+            assert publisher.pending == 0
+            await publisher.publish(_event(2, "unreachable"))
+            await publisher.flush()
+
+        asyncio.run(scenario())
+
+        stats = publisher.stats()
+        assert (stats["failed_sends"], stats["dropped"], stats["published"]) == (
+            2,
+            1,
+            1,
+        )
+        assert [e["orchestration_id"] for e in broker.subscriptions["unreachable"]] == [
+            "orch-2"
+        ]
+
+    def test_failed_full_batch_is_retried_in_the_background(self) -> None:
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=2, linger=0.001)
+
+        async def scenario() -> int:
+            broker.fail_next = 1
+            await publisher.publish(_event(1))
+            await publisher.publish(_event(2))  # full batch, sent inline, fails
+            pending = publisher.pending
+            with patch("aos_dispatcher_azure.results.RETRY_DELAY", 0.001):
+                for _ in range(100):
+                    await asyncio.sleep(0.005)
+                    if not publisher.pending:
+                        break
+            return pending
+
+        assert asyncio.run(scenario()) == 2
+        assert publisher.pending == 0
+        assert len(broker.subscriptions["business-infinity"]) == 2
+
+
+class TestResultPublisherShutdown:
+    def test_drain_sends_pending_events_from_another_thread(self) -> None:
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=100, linger=60)
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            for n in range(3):
+                asyncio.run_coroutine_threadsafe(
+                    publisher.publish(_event(n)), loop
+                ).result(1)
+            assert publisher.pending == 3
+
+            assert publisher.drain(timeout=5) == 3
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(1)
+            loop.close()
+
+        assert len(broker.subscriptions["business-infinity"]) == 3
+        assert broker.senders_closed == 1
+
+    def test_sigterm_on_the_loop_closes_before_handing_on(self, monkeypatch) -> None:
+        monkeypatch.setattr(shutdown, "_hooks", [])
+        monkeypatch.setattr(shutdown, "_installed", True)
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=100, linger=60)
+        handed_on: List[int] = []
+
+        async def scenario() -> None:
+            await publisher.publish(_event(1))
+            results.close_on_exit(publisher, timeout=5)
+            shutdown._run_on_sigterm(lambda: handed_on.append(publisher.pending))
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+
+        assert handed_on == [0]
+        assert len(broker.subscriptions["business-infinity"]) == 1
+
+
+class TestResultEvents:
+    def test_terminal_status_publishes_for_the_tracked_app(self) -> None:
+        broker = InMemoryResultBroker()
+        publisher = ResultPublisher(broker, max_batch=1)
+        state = OrchestrationState(
+            "orch-9", status="cancelled", app_name="business-infinity"
+        )
+
+        asyncio.run(publisher.on_status_change(state, "running"))
+
+        (event,) = broker.subscriptions["business-infinity"]
+        assert event["event_type"] == "orchestration.cancelled"
@@ -0,0 +1,149 @@
+"""RiskRegistry indexes, paging, aggregates and seeding."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.risks import RiskRegistry, band_for, risk_score
+
+
+def _risk(n: int, score: Any = None, **fields: Any) -> Dict[str, Any]:
+    risk = {"id": f"r{n}", "status": "open", "category": "ops", **fields}
+    if score is not None:
+        risk["score"] = score
+    return risk
+
+
+def _ids(body: Dict[str, Any]) -> List[str]:
+    return [risk["id"] for risk in body["risks"]]
+
+
+def _registry(*risks: Dict[str, Any]) -> RiskRegistry:
+    registry = RiskRegistry(resync_interval=60)
+    registry.load(risks)
+    return registry
+
+
+class TestScoreBands:
+    @pytest.mark.parametrize(
+        "score, band",
+        [(None, "unassessed"), (0.0, "low"), (0.25, "medium"), (0.74, "high")],
+    )
+    def test_band_lower_bounds_are_inclusive(self, score, band) -> None:
+        assert band_for(score) == band
+
+    def test_score_above_one_is_critical(self) -> None:
+        assert band_for(3.0) == "critical"
+
+    @pytest.mark.parametrize("score", [True, "0.5", math.nan, None])
+    def test_non_numeric_score_is_unassessed(self, score) -> None:
+        assert risk_score({"score": score}) is None
+
+
+class TestRiskRegistryList:
+    def test_filters_combine_across_indexes(self) -> None:
+        registry = _registry(
+            _risk(1, 0.8),
+            _risk(2, 0.8, status="closed"),
+            _risk(3, 0.1),
+            _risk(4, 0.9, category="finance"),
+        )
+
+        body, _ = registry.list_risks(
+            status="open", category="ops", score_band="critical"
+        )
+
+        assert _ids(body) == ["r1"]
+
+    def test_unknown_filter_value_matches_nothing(self) -> None:
+        assert _ids(_registry(_risk(1)).list_risks(status="archived")[0]) == []
+
+    def test_cursor_pages_through_a_filtered_list(self) -> None:
+        registry = _registry(
+            *(_risk(n, status="open" if n % 2 else "closed") for n in range(10))
+        )
+        seen, cursor = [], None
+
+        while True:
+            body, _ = registry.list_risks(status="open", limit=2, cursor=cursor)
+            seen += _ids(body)
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == ["r1", "r3", "r5", "r7", "r9"]
+
+    def test_garbage_cursor_is_a_400(self) -> None:
+        _, status = _registry(_risk(1)).list_risks(limit=1, cursor="garbage!")
+
+        assert status == 400
+
+    def test_status_change_moves_the_risk_between_indexes(self) -> None:
+        registry = _registry(_risk(1, 0.5), _risk(2, 0.5))
+
+        registry.apply({"id": "r1", "status": "mitigated"})
+
+        assert _ids(registry.list_risks(status="open")[0]) == ["r2"]
+        assert _ids(registry.list_risks(status="mitigated")[0]) == ["r1"]
+        assert registry.list_risks(status="mitigated")[0]["risks"][0]["score"] == 0.5
+
+
+class TestRiskRegistrySummary:
+    def test_aggregates_follow_reassessment(self) -> None:
+        registry = _registry(_risk(1, 0.2), _risk(2, 0.6, category="finance"))
+
+        registry.apply({"id": "r1", "score": 0.9})
+        summary = registry.summary()
+
+        assert summary["total"] == 2 and summary["exposure"] == 1.5
+        assert summary["by_category"]["ops"]["exposure"] == 0.9
+        assert summary["by_score_band"]["low"] == 0
+        assert summary["by_score_band"]["critical"] == 1
+        assert [risk["id"] for risk in summary["top_risks"]] == ["r1", "r2"]
+
+    def test_top_risks_can_be_narrowed_but_aggregates_cannot(self) -> None:
+        registry = _registry(_risk(1, 0.9), _risk(2, 0.5, status="closed"))
+
+        summary = registry.summary(top=5, status="closed")
+
+        assert [risk["id"] for risk in summary["top_risks"]] == ["r2"]
+        assert summary["total"] == 2
+
+    def test_unassessed_risks_are_counted_but_not_ranked(self) -> None:
+        summary = _registry(_risk(1), _risk(2, 0.3)).summary()
+
+        assert summary["by_score_band"]["unassessed"] == 1
+        assert [risk["id"] for risk in summary["top_risks"]] == ["r2"]
+
+
+class TestRiskRegistrySync:
+    def test_write_during_the_seed_is_kept(self) -> None:
+        registry = RiskRegistry(resync_interval=60)
+
+        async def fetch() -> tuple:
+            registry.apply(_risk(2, 0.4))  # registered while the list was fetched
+            return {"risks": [_risk(1, 0.1)]}, 200
+
+        assert asyncio.run(registry.ensure_synced(fetch)) is None
+
+        assert _ids(registry.list_risks()[0]) == ["r1", "r2"]
+
+    def test_failed_seed_returns_the_error_and_stays_unsynced(self) -> None:
+        registry = RiskRegistry(resync_interval=60)
+
+        async def fetch() -> tuple:
+            return {"error": "down"}, 503
+
+        assert asyncio.run(registry.ensure_synced(fetch)) == ({"error": "down"}, 503)
+        assert registry.needs_sync()
+
+    def test_write_before_the_first_seed_is_left_to_the_seed(self) -> None:
+        registry = RiskRegistry(resync_interval=60)
+
+        assert registry.apply(_risk(1))
+        assert not registry.apply({"status": "open"})
+        assert len(registry) == 0
@@ -0,0 +1,303 @@
+"""SearchIndex write queue, segment persistence and library bootstrap."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from aos_dispatcher_azure.search import SearchIndex, Segment, read_generation
+
+
+def _doc(n: int, doc_type: str = "policy", content: str = "") -> Dict[str, Any]:
+    return {
+        "id": f"doc-{n}",
+        "title": f"title {n}",
+        "content": content or f"alpha beta word{n}",
+        "doc_type": doc_type,
+    }
+
+
+def _ids(body: Dict[str, Any]) -> List[str]:
+    return sorted(doc["id"] for doc in body["documents"])
+
+
+async def _run(endpoint: str, fn, *args, **kwargs) -> Any:
+    """``DispatcherExecutor.run`` stand-in: the call on a worker thread."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _listing(documents: List[Dict[str, Any]], calls: List[int]):
+    async def fetch(limit: int) -> tuple:
+        calls.append(limit)
+        return {"documents": [dict(doc, score=1.0) for doc in documents[:limit]]}, 200
+
+    return fetch
+
+
+@pytest.fixture
+def segment_path(tmp_path) -> str:
+    return str(tmp_path / "index.seg")
+
+
+class TestSearchIndexQuery:
+    def test_matching_documents_are_ranked_by_relevance(self) -> None:
+        index = SearchIndex(path="")
+        index.upsert("doc-1", _doc(1, content="covenant breach covenant"))
+        index.upsert("doc-2", _doc(2, content="covenant"))
+        index.upsert("doc-3", _doc(3, content="unrelated"))
+
+        body = index.search("covenant")
+
+        assert [doc["id"] for doc in body["documents"]] == ["doc-1", "doc-2"]
+
+    def test_limit_keeps_the_best_matches(self) -> None:
+        index = SearchIndex(path="")
+        for n in range(5):
+            index.upsert(f"doc-{n}", _doc(n))
+
+        assert len(index.search("alpha", limit=2)["documents"]) == 2
+
+    def test_unknown_doc_type_matches_nothing(self) -> None:
+        index = SearchIndex(path="")
+        index.upsert("doc-1", _doc(1))
+
+        body = index.search("alpha", doc_type="memo", facets=True)
+
+        assert body == {"documents": [], "facets": {"doc_type": {}}}
+
+    def test_facets_count_every_match_not_just_the_page(self) -> None:
+        index = SearchIndex(path="")
+        index.upsert("doc-1", _doc(1))
+        index.upsert("doc-2", _doc(2, doc_type="memo"))
+        index.upsert("doc-3", _doc(3, doc_type="memo"))
+
+        body = index.search("alpha", limit=1, facets=True)
+
+        assert body["facets"] == {"doc_type": {"memo": 2, "policy": 1}}
+
+    def test_deleted_document_is_not_returned(self) -> None:
+        index = SearchIndex(path="")
+        index.upsert("doc-1", _doc(1))
+        index.upsert("doc-2", _doc(2))
+
+        index.delete("doc-1")
+
+        assert _ids(index.search("alpha")) == ["doc-2"]
+        assert _ids(index.search("")) == ["doc-2"]
+
+    def test_file_that_is_not_a_segment_is_rejected(self, segment_path) -> None:
+        with open(segment_path, "wb") as handle:
+            handle.write(b"\0" * 4096)
+
+        with pytest.raises(ValueError):
+            Segment(segment_path)
+
+
+class TestSearchIndexQueue:
+    def test_queue_update_does_not_wait_for_the_lock(self) -> None:
+        index = SearchIndex(path="")
+        held, release = threading.Event(), threading.Event()
+
+        def hold() -> None:
+            with index._lock:
+                held.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait(5)
+        try:
+            index.queue_update("doc-1", _doc(1))
+            index.queue_delete("doc-2")
+            assert index.pending == 2
+        finally:
+            release.set()
+            holder.join(5)
+
+    def test_search_applies_queued_writes_first(self) -> None:
+        index = SearchIndex(path="")
+        index.queue_update("doc-1", _doc(1))
+        index.queue_update("doc-2", _doc(2))
+        index.queue_delete("doc-1")
+
+        assert _ids(index.search("alpha")) == ["doc-2"]
+        assert index.pending == 0
+
+    def test_queued_update_merges_into_the_stored_document(self) -> None:
+        index = SearchIndex(path="")
+        index.upsert("doc-1", _doc(1))
+        index.queue_update("doc-1", {"content": "gamma"})
+
+        (doc,) = index.search("gamma")["documents"]
+        assert doc["title"] == "title 1"
+        assert index.search("alpha")["documents"] == []
+
+    def test_schedule_apply_applies_an_in_memory_queue(self) -> None:
+        index = SearchIndex(path="")
+
+        async def scenario() -> None:
+            index.queue_update("doc-1", _doc(1))
+            index.schedule_apply(_run)
+            await index._flush_task
+
+        asyncio.run(scenario())
+        assert index.pending == 0
+        assert index.size == 1
+
+
+class TestSearchIndexSegment:
+    def test_flush_writes_a_segment_a_cold_index_loads(self, segment_path) -> None:
+        index = SearchIndex(path=segment_path)
+        for n in range(5):
+            index.upsert(f"doc-{n}", _doc(n, "report" if n % 2 else "policy"))
+        assert index.flush()
+
+        cold = SearchIndex(path=segment_path)
+        assert cold.load()
+        assert cold.size == 5
+        assert _ids(cold.search("", doc_type="report")) == ["doc-1", "doc-3"]
+        facets = cold.search("alpha", facets=True)["facets"]["doc_type"]
+        assert facets == {"policy": 3, "report": 2}
+        index.close()
+        cold.close()
+
+    def test_flush_merges_the_delta_into_the_previous_segment(
+        self, segment_path
+    ) -> None:
+        index = SearchIndex(path=segment_path)
+        index.upsert("doc-1", _doc(1, content="alpha shared"))
+        index.flush()
+        index.upsert("doc-2", _doc(2, content="beta shared"))
+        index.flush()
+
+        assert read_generation(segment_path) == 2
+        segment = Segment(segment_path)
+        try:
+            assert segment.n_docs == 2
+            assert segment.find_term("shared")[0] == 2
+            assert segment.find_term("alpha")[0] == 1
+        finally:
+            segment.close()
+        assert _ids(index.search("shared")) == ["doc-1", "doc-2"]
+        index.close()
+
+    def test_replaced_document_is_tombstoned_in_the_segment(self, segment_path) -> None:
+        index = SearchIndex(path=segment_path)
+        for n in range(4):
+            index.upsert(f"doc-{n}", _doc(n))
+        index.flush()
+        index.update("doc-0", {"content": "rewritten"})
+        index.flush()
+
+        segment = Segment(segment_path)
+        try:
+            assert (segment.n_docs, segment.n_live) == (5, 4)
+            assert list(segment.deleted) == [1, 0, 0, 0, 0]
+            assert segment.find_id("doc-0") == 4
+        finally:
+            segment.close()
+        assert _ids(index.search("rewritten")) == ["doc-0"]
+        index.close()
+
+    def test_flush_compacts_once_most_documents_are_deleted(self, segment_path) -> None:
+        index = SearchIndex(path=segment_path)
+        for n in range(10):
+            index.upsert(f"doc-{n}", _doc(n))
+        index.flush()
+        for n in range(4):
+            index.delete(f"doc-{n}")
+        index.flush()
+
+        segment = Segment(segment_path)
+        try:
+            assert (segment.n_docs, segment.n_live) == (6, 6)
+            assert not any(segment.deleted)
+            assert segment.find_id("doc-0") is None
+        finally:
+            segment.close()
+        assert index.size == 6
+        index.close()
+
+    def test_newer_segment_keeps_unflushed_changes(self, segment_path) -> None:
+        first = SearchIndex(path=segment_path, reload_interval=0.001)
+        second = SearchIndex(path=segment_path, reload_interval=0.001)
+        first.upsert("doc-1", _doc(1))
+        first.flush()
+        second.load()
+        second.upsert("doc-2", _doc(2))
+        first.upsert("doc-3", _doc(3))
+        first.flush()
+
+        assert second.flush()
+        assert read_generation(segment_path) == 3
+        time.sleep(0.01)  # past first's reload interval
+        assert _ids(first.search("alpha")) == ["doc-1", "doc-2", "doc-3"]
+        first.close()
+        second.close()
+
+    def test_flush_without_changes_writes_nothing(self, segment_path) -> None:
+        index = SearchIndex(path=segment_path)
+
+        assert not index.flush()
+        assert not os.path.exists(segment_path)
+
+
+class TestSearchIndexBootstrap:
+    def test_bootstrap_requests_one_more_than_the_limit(self) -> None:
+        index = SearchIndex(path="", bootstrap_limit=10)
+        calls: List[int] = []
+
+        ready = asyncio.run(index.ensure_ready(_listing([_doc(1)], calls), _run))
+
+        assert ready and calls == [11]
+        assert index.size == 1
+
+    def test_bootstrap_rejects_a_truncated_listing(self) -> None:
+        index = SearchIndex(path="", bootstrap_limit=3)
+        calls: List[int] = []
+        fetch = _listing([_doc(n) for n in range(5)], calls)
+
+        async def scenario() -> List[bool]:
+            return [await index.ensure_ready(fetch, _run) for _ in range(2)]
+
+        assert asyncio.run(scenario()) == [False, False]
+        assert calls == [4]  # not retried before the resync interval
+        assert not index.complete
+
+    def test_rebuild_keeps_writes_made_during_the_fetch(self) -> None:
+        index = SearchIndex(path="", resync_interval=0.001)
+        index.bootstrap([_doc(1), _doc(2)])
+        calls: List[int] = []
+
+        async def fetch(limit: int) -> tuple:
+            calls.append(limit)
+            # Written while the listing is being read; not part of it.
+            index.queue_update("doc-3", _doc(3))
+            index.apply_queued()
+            return {"documents": [_doc(1)]}, 200
+
+        async def scenario() -> None:
+            await asyncio.sleep(0.01)
+            assert await index.ensure_ready(fetch, _run)
+            await index._resync_task
+
+        asyncio.run(scenario())
+        assert calls
+        assert _ids(index.search("alpha")) == ["doc-1", "doc-3"]
+
+    def test_bootstrap_is_flushed_to_the_segment(self, segment_path) -> None:
+        index = SearchIndex(path=segment_path, flush_interval=0.001)
+
+        async def scenario() -> None:
+            assert await index.ensure_ready(_listing([_doc(1), _doc(2)], []), _run)
+            await index._flush_task
+
+        asyncio.run(scenario())
+        assert read_generation(segment_path) == 1
+        assert index.pending == 0
+        index.close()
@@ -0,0 +1,137 @@
+"""Service Bus envelope parsing and per-message batch settlement."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from aos_dispatcher_azure.servicebus import (
+    OrchestrationBatchProcessor,
+    message_body,
+    parse_envelope,
+)
+
+
+class _Message:
+    def __init__(self, body: Any) -> None:
+        self.body = body
+
+
+class _Settler:
+    """Records how each message was settled."""
+
+    def __init__(self) -> None:
+        self.settled: List[Tuple[str, Any, Optional[str]]] = []
+
+    def complete(self, message: Any) -> None:
+        self.settled.append(("complete", message, None))
+
+    def abandon(self, message: Any) -> None:
+        self.settled.append(("abandon", message, None))
+
+    def deadletter(
+        self,
+        message: Any,
+        deadletter_reason: Optional[str] = None,
+        deadletter_error_description: Optional[str] = None,
+    ) -> None:
+        self.settled.append(("deadletter", message, deadletter_reason))
+
+    def outcome(self, message: Any) -> Tuple[str, Optional[str]]:
+        return next((a, r) for a, m, r in self.settled if m is message)
+
+
+def _envelope(payload: Dict[str, Any], app_name: str = "app") -> bytes:
+    return json.dumps({"app_name": app_name, "payload": payload}).encode()
+
+
+class TestMessageBody:
+    def test_raw_bytes_are_returned_as_is(self) -> None:
+        assert message_body(bytearray(b"{}")) == b"{}"
+
+    def test_sectioned_body_is_joined(self) -> None:
+        assert message_body(_Message([b'{"a"', b":1}"])) == b'{"a":1}'
+
+    def test_string_body_is_encoded(self) -> None:
+        assert message_body(_Message("{}")) == b"{}"
+
+
+class TestParseEnvelope:
+    def test_missing_app_name_is_unknown(self) -> None:
+        envelope = parse_envelope(b'{"payload": {"x": 1}}')
+
+        assert (envelope.app_name, envelope.payload) == ("unknown", {"x": 1})
+
+    @pytest.mark.parametrize(
+        "raw", [b"not json", b"\xff\xfe", b"[1, 2]", b'{"payload": []}']
+    )
+    def test_invalid_envelope_is_rejected(self, raw: bytes) -> None:
+        with pytest.raises(ValueError):
+            parse_envelope(raw)
+
+
+class TestOrchestrationBatchProcessor:
+    def test_each_message_is_settled_by_its_own_outcome(self) -> None:
+        async def handler(app_name: str, payload: Dict[str, Any]) -> tuple:
+            if payload["kind"] == "boom":
+                raise RuntimeError("library error")
+            return {"error": payload["kind"]}, payload["status"]
+
+        messages = {
+            "ok": _Message(_envelope({"kind": "ok", "status": 202})),
+            "bad": _Message(_envelope({"kind": "bad", "status": 400})),
+            "busy": _Message(_envelope({"kind": "busy", "status": 503})),
+            "boom": _Message(_envelope({"kind": "boom"})),
+            "garbage": _Message(b"not json"),
+        }
+        settler = _Settler()
+
+        result = asyncio.run(
+            OrchestrationBatchProcessor(handler, concurrency=2).process(
+                list(messages.values()), settler
+            )
+        )
+
+        assert settler.outcome(messages["ok"]) == ("complete", None)
+        assert settler.outcome(messages["bad"]) == ("deadletter", "Rejected400")
+        assert settler.outcome(messages["busy"]) == ("abandon", None)
+        assert settler.outcome(messages["boom"]) == ("abandon", None)
+        assert settler.outcome(messages["garbage"]) == ("deadletter", "InvalidEnvelope")
+        assert (result.completed, result.abandoned, result.dead_lettered) == (1, 2, 2)
+        assert result.responses[0] == ({"error": "ok"}, 202)
+        assert result.responses[4] is None
+
+    def test_concurrency_is_capped_per_batch(self) -> None:
+        running = [0, 0]  # current, peak
+
+        async def handler(app_name: str, payload: Dict[str, Any]) -> tuple:
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return {}, 202
+
+        messages = [_Message(_envelope({"n": n})) for n in range(6)]
+        processor = OrchestrationBatchProcessor(handler, concurrency=2)
+
+        result = asyncio.run(processor.process(messages, _Settler()))
+
+        assert running[1] == 2 and result.completed == 6
+
+    def test_failed_settlement_does_not_fail_the_batch(self) -> None:
+        class BrokenSettler(_Settler):
+            def complete(self, message: Any) -> None:
+                raise ConnectionError("host gone")
+
+        async def handler(app_name: str, payload: Dict[str, Any]) -> tuple:
+            return {}, 202
+
+        processor = OrchestrationBatchProcessor(handler, concurrency=2)
+        result = asyncio.run(
+            processor.process([_Message(_envelope({}))], BrokenSettler())
+        )
+
+        assert result.completed == 1
@@ -0,0 +1,74 @@
+"""The shared shutdown hook."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from aos_dispatcher_azure import shutdown
+
+
+@pytest.fixture
+def hooks(monkeypatch) -> List[shutdown.ShutdownHook]:
+    registered: List[shutdown.ShutdownHook] = []
+    monkeypatch.setattr(shutdown, "_hooks", registered)
+    monkeypatch.setattr(shutdown, "_installed", True)
+    return registered
+
+
+class TestShutdownHooks:
+    def test_hooks_run_in_registration_order(self, hooks) -> None:
+        calls: List[str] = []
+        shutdown.on_shutdown(lambda: calls.append("write-behind"))
+        shutdown.on_shutdown(lambda: calls.append("results"))
+
+        shutdown._run_on_sigterm(lambda: calls.append("handed on"))
+
+        assert calls == ["write-behind", "results", "handed on"]
+
+    def test_failing_hook_does_not_stop_the_others(self, hooks) -> None:
+        calls: List[str] = []
+
+        def broken() -> None:
+            raise RuntimeError("boom")
+
+        shutdown.on_shutdown(broken)
+        shutdown.on_shutdown(lambda: calls.append("results"))
+
+        shutdown._run_at_exit()
+
+        assert calls == ["results"]
+
+    def test_signal_is_handed_on_after_awaitables_finish(self, hooks) -> None:
+        calls: List[str] = []
+
+        async def close() -> None:
+            await asyncio.sleep(0.01)
+            calls.append("closed")
+
+        async def scenario() -> None:
+            shutdown.on_shutdown(close)
+            shutdown._run_on_sigterm(lambda: calls.append("handed on"))
+            assert calls == []
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+
+        assert calls == ["closed", "handed on"]
+
+    def test_failed_awaitable_still_hands_the_signal_on(self, hooks) -> None:
+        calls: List[str] = []
+
+        async def close() -> None:
+            raise ConnectionError("broker gone")
+
+        async def scenario() -> None:
+            shutdown.on_shutdown(close)
+            shutdown._run_on_sigterm(lambda: calls.append("handed on"))
+            await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+        assert calls == ["handed on"]
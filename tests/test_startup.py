@@ -0,0 +1,106 @@
+"""Deferred module import and once-only warm-up steps."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import sys
+import threading
+from typing import List
+
+import pytest
+
+from aos_dispatcher_azure.startup import LazyModule, WarmUp
+
+
+class TestLazyModule:
+    def test_module_is_imported_on_first_attribute_access(self, monkeypatch) -> None:
+        monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+        lazy = LazyModule("colorsys")
+
+        assert not lazy.loaded and "colorsys" not in sys.modules
+        assert lazy.rgb_to_hsv(0, 0, 0) == (0.0, 0.0, 0.0)
+        assert lazy.loaded and lazy.load_seconds is not None
+
+    def test_missing_module_fails_on_use_not_on_creation(self) -> None:
+        lazy = LazyModule("aos_no_such_module")
+
+        with pytest.raises(ImportError):
+            lazy.anything
+        assert not lazy.loaded
+
+    def test_concurrent_first_use_imports_once(self, monkeypatch) -> None:
+        imports: List[str] = []
+        real_import = importlib.import_module
+
+        def import_module(name: str):
+            imports.append(name)
+            return real_import(name)
+
+        monkeypatch.setattr(
+            "aos_dispatcher_azure.startup.importlib.import_module", import_module
+        )
+        lazy = LazyModule("json")
+        threads = [threading.Thread(target=lazy.load) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert imports == ["json"]
+
+
+class TestWarmUp:
+    def test_failing_step_is_recorded_and_the_rest_still_run(self) -> None:
+        warmup, ran = WarmUp(), []
+
+        def broken() -> None:
+            raise RuntimeError("no credentials")
+
+        async def session() -> None:
+            ran.append("session")
+
+        warmup.add("dispatcher", broken)
+        warmup.add("session", session, loop_bound=True)
+
+        steps = asyncio.run(warmup.run())["steps"]
+
+        assert steps["dispatcher"]["status"] == "failed"
+        assert steps["dispatcher"]["error"] == "no credentials"
+        assert steps["session"]["status"] == "done" and ran == ["session"]
+
+    def test_steps_run_once_across_callers(self) -> None:
+        warmup, calls = WarmUp(), []
+        warmup.add("import", lambda: calls.append("import"))
+
+        async def scenario() -> None:
+            await asyncio.gather(warmup.run(), warmup.run())
+            await warmup.run()
+
+        asyncio.run(scenario())
+
+        assert calls == ["import"]
+
+    def test_background_thread_skips_loop_bound_steps(self) -> None:
+        warmup, calls = WarmUp(), []
+
+        async def session() -> None:
+            calls.append("session")
+
+        warmup.add("import", lambda: calls.append("import"))
+        warmup.add("session", session, loop_bound=True)
+
+        warmup.start_background()
+        warmup._thread.join()
+
+        assert calls == ["import"]
+        assert warmup.snapshot()["steps"]["session"]["status"] == "pending"
+
+    def test_disabled_warm_up_runs_nothing(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_WARMUP", "false")
+        warmup, calls = WarmUp(), []
+        warmup.add("import", lambda: calls.append("import"))
+
+        snapshot = asyncio.run(warmup.run())
+
+        assert calls == [] and snapshot["enabled"] is False
@@ -0,0 +1,26 @@
+"""Server-Sent Events encoding."""
+
+from __future__ import annotations
+
+from aos_dispatcher_azure.streaming import sse_event, sse_retry
+
+
+class TestSseEvent:
+    def test_event_has_id_type_and_json_data(self) -> None:
+        encoded = sse_event({"status": "completed"}, event="end", event_id="abc-end")
+
+        assert encoded == 'id: abc-end\nevent: end\ndata: {"status":"completed"}\n\n'
+
+    def test_event_without_id_or_type_is_data_only(self) -> None:
+        assert sse_event([1, 2]) == "data: [1,2]\n\n"
+
+    def test_newlines_in_data_do_not_break_the_frame(self) -> None:
+        encoded = sse_event("line one\nline two")
+
+        assert encoded.count("\n\n") == 1
+        assert encoded.startswith("data: ")
+
+
+class TestSseRetry:
+    def test_retry_is_whole_milliseconds(self) -> None:
+        assert sse_retry(250.7) == "retry: 250\n\n"
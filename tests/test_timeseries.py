@@ -0,0 +1,170 @@
+"""Metric query parsing, rollup retention and series re-sync."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, List
+
+import pytest
+
+from aos_dispatcher_azure.timeseries import (
+    MetricQuery,
+    MetricQueryError,
+    Rollup,
+    Series,
+    TimeSeriesStore,
+)
+
+DAY = 86400.0
+
+
+class _Runner:
+    """``DispatcherExecutor.run`` stand-in recording which thread ran each call."""
+
+    def __init__(self) -> None:
+        self.threads: List[int] = []
+
+    async def __call__(self, endpoint: str, fn, *args, **kwargs) -> Any:
+        def call() -> Any:
+            self.threads.append(threading.get_ident())
+            return fn(*args, **kwargs)
+
+        return await asyncio.to_thread(call)
+
+
+class TestMetricQuery:
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"start": "-inf"},
+            {"start": "nan"},
+            {"end": "inf"},
+            {"start": "0", "end": "1e300"},
+            {"start": "not-a-time"},
+        ],
+    )
+    def test_from_params_rejects_unusable_timestamps(self, params) -> None:
+        with pytest.raises(MetricQueryError):
+            MetricQuery.from_params(params, now=DAY)
+
+    def test_from_params_rejects_an_infinite_step(self) -> None:
+        with pytest.raises(MetricQueryError):
+            MetricQuery.from_params({"step": "9" * 400}, now=DAY)
+
+    def test_from_params_rejects_end_before_start(self) -> None:
+        with pytest.raises(MetricQueryError, match="after"):
+            MetricQuery.from_params({"start": "200", "end": "100"})
+
+    def test_from_params_rejects_too_many_buckets(self) -> None:
+        with pytest.raises(MetricQueryError, match="buckets"):
+            MetricQuery.from_params({"start": "0", "end": str(DAY), "step": "1"})
+
+    def test_from_params_defaults_to_a_day_at_five_minutes(self) -> None:
+        query = MetricQuery.from_params({"agg": "MAX"}, now=2 * DAY)
+
+        assert (query.start, query.end, query.step, query.agg) == (
+            DAY,
+            2 * DAY,
+            300.0,
+            "max",
+        )
+
+
+class TestRollup:
+    def test_rollup_drops_buckets_past_its_retention(self) -> None:
+        rollup = Rollup(60, buckets=100)
+        for minute in range(200):
+            rollup.add(minute * 60.0, 1.0)
+
+        assert len(rollup.starts) <= 110
+        assert rollup.starts[-1] == 199 * 60.0
+        assert rollup.trimmed_before == rollup.starts[0]
+        assert all(
+            len(col) == len(rollup.starts) for col in (rollup.counts, rollup.sums)
+        )
+
+    def test_rollup_ignores_late_points_older_than_retention(self) -> None:
+        rollup = Rollup(60, buckets=10)
+        rollup.add(3600.0, 1.0)
+        rollup.add(0.0, 1.0)
+
+        assert list(rollup.starts) == [3600.0]
+
+    def test_query_past_trimmed_rollup_is_partial(self) -> None:
+        store = TimeSeriesStore(raw_retention=DAY, rollup_buckets=100)
+        for minute in range(300):
+            store.add("cpu", minute * 60.0, float(minute))
+        query = MetricQuery(start=0.0, end=300 * 60.0, step=60.0)
+
+        body = store.query("cpu", query)
+
+        assert body["resolution"] == 60
+        assert body["partial"] is True
+        assert body["series"][-1]["value"] == 299.0
+
+    def test_query_within_rollup_retention_is_complete(self) -> None:
+        store = TimeSeriesStore(raw_retention=DAY, rollup_buckets=100)
+        for minute in range(50):
+            store.add("cpu", minute * 60.0, 1.0)
+
+        body = store.query(
+            "cpu", MetricQuery(start=0.0, end=3000.0, step=300.0, agg="sum")
+        )
+
+        assert body["partial"] is False
+        assert [point["value"] for point in body["series"]] == [5.0] * 10
+
+
+class TestTimeSeriesStore:
+    def test_add_rejects_non_finite_samples(self) -> None:
+        store = TimeSeriesStore()
+
+        assert not store.add("cpu", "inf", 1.0)
+        assert not store.add("cpu", 10.0, float("nan"))
+        assert not store.add("cpu", 10.0, True)
+        assert store.get("cpu") is None
+
+    def test_ensure_synced_rebuilds_on_the_thread_pool(self) -> None:
+        store = TimeSeriesStore(raw_retention=DAY)
+        run = _Runner()
+        loop_thread: List[int] = []
+
+        async def fetch(name: str) -> tuple:
+            loop_thread.append(threading.get_ident())
+            store.add(name, 120.0, 7.0)  # written while the fetch is in flight
+            series = [{"timestamp": t, "value": 1.0} for t in (0.0, 60.0, "inf")]
+            return {"series": series}, 200
+
+        assert asyncio.run(store.ensure_synced("cpu", fetch, run)) is None
+
+        assert run.threads and loop_thread[0] not in run.threads
+        series = store.get("cpu")
+        assert list(series.timestamps) == [0.0, 60.0, 120.0]
+        assert not store.needs_sync("cpu")
+
+    def test_failed_sync_keeps_local_points(self) -> None:
+        store = TimeSeriesStore(raw_retention=DAY)
+        store.add("cpu", 60.0, 2.0)
+
+        async def fetch(name: str) -> tuple:
+            return {"error": "unavailable"}, 503
+
+        failed = asyncio.run(store.ensure_synced("cpu", fetch, _Runner()))
+
+        assert failed == ({"error": "unavailable"}, 503)
+        assert list(store.get("cpu").values) == [2.0]
+        store.add("cpu", 120.0, 3.0)
+        assert store.get("cpu")._buffer is None
+
+    def test_series_query_reports_raw_partial_for_p95(self) -> None:
+        series = Series("cpu", raw_retention=DAY)
+        for t in range(10):
+            series.add(1000.0 + t, float(t))
+
+        buckets, resolution, partial = series.query(
+            MetricQuery(start=0.0, end=2000.0, step=1000.0, agg="p95")
+        )
+
+        assert (resolution, partial) == (0, True)
+        assert buckets == [(1000.0, 9.0)]
@@ -0,0 +1,228 @@
+"""Upstream pool retries, circuit breaking, saturation and passthrough."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+from typing import Any, Awaitable, Callable, List
+
+import pytest
+from aiohttp import web
+
+from aos_dispatcher_azure.upstream import (
+    CircuitBreaker,
+    UpstreamPool,
+    _chunks,
+    _setting,
+)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch) -> None:
+    monkeypatch.setenv("AOS_UPSTREAM_BACKOFF", "0")
+    monkeypatch.setenv("AOS_UPSTREAM_QUEUE_TIMEOUT", "0.05")
+
+
+def _serve(
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    scenario: Callable[[UpstreamPool], Awaitable[Any]],
+) -> Any:
+    """Run *scenario* against a local upstream answering with *handler*."""
+
+    async def main() -> Any:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        pool = UpstreamPool("test", f"http://127.0.0.1:{port}/")
+        try:
+            return await scenario(pool)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def _failing(statuses: List[int], seen: List[str]):
+    async def handler(request: web.Request) -> web.Response:
+        seen.append(request.method)
+        status = statuses.pop(0) if statuses else 200
+        return web.Response(status=status, body=b"ok")
+
+    return handler
+
+
+class TestSettings:
+    def test_per_upstream_setting_overrides_the_shared_one(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_UPSTREAM_TIMEOUT", "3")
+        monkeypatch.setenv("AOS_UPSTREAM_MCP_SERVERS_TIMEOUT", "7")
+
+        assert _setting("mcp_servers", "TIMEOUT") == 7.0
+        assert _setting("realm_of_agents", "TIMEOUT") == 3.0
+
+    def test_negative_retries_fall_back_to_the_default(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_UPSTREAM_RETRIES", "-1")
+
+        assert _setting("mcp_servers", "RETRIES") == 2
+
+    def test_unset_url_gives_no_pool(self, monkeypatch) -> None:
+        monkeypatch.delenv("AOS_TEST_URL", raising=False)
+
+        assert UpstreamPool.from_environment("test", "AOS_TEST_URL") is None
+
+
+class TestCircuitBreaker:
+    def test_breaker_opens_at_the_threshold(self) -> None:
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == "open" and not breaker.allow()
+
+    def test_half_open_breaker_allows_a_single_probe(self) -> None:
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    def test_failed_probe_reopens_and_success_closes(self) -> None:
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.opened_at is not None
+        breaker.allow()
+        breaker.record_success()
+
+        assert breaker.state == "closed" and breaker.failures == 0
+
+
+class TestUpstreamPool:
+    def test_idempotent_request_is_retried_on_503(self) -> None:
+        seen: List[str] = []
+
+        async def scenario(pool: UpstreamPool) -> tuple:
+            return await pool.request("GET", "/agents")
+
+        body, status = _serve(_failing([503, 503], seen), scenario)
+
+        assert (body, status) == (b"ok", 200)
+        assert seen == ["GET"] * 3
+
+    def test_post_is_not_retried_after_it_was_sent(self) -> None:
+        seen: List[str] = []
+
+        async def scenario(pool: UpstreamPool) -> tuple:
+            return await pool.request("POST", "/tools/x", body=b"{}")
+
+        _, status = _serve(_failing([503], seen), scenario)
+
+        assert status == 503 and seen == ["POST"]
+
+    def test_open_circuit_short_circuits_without_a_request(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_UPSTREAM_RETRIES", "0")
+        monkeypatch.setenv("AOS_UPSTREAM_BREAKER_THRESHOLD", "1")
+        seen: List[str] = []
+
+        async def scenario(pool: UpstreamPool) -> list:
+            first = await pool.request("GET", "/")
+            second = await pool.request("GET", "/")
+            return [first[1], second, pool.snapshot()["rejected_open"]]
+
+        first, second, rejected = _serve(_failing([502], seen), scenario)
+
+        assert first == 502 and second[1] == 503
+        assert "circuit open" in second[0]["error"]
+        assert (len(seen), rejected) == (1, 1)
+
+    def test_request_without_a_free_slot_is_a_503(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_UPSTREAM_MAX_CONCURRENCY", "1")
+
+        async def slow(request: web.Request) -> web.Response:
+            await asyncio.sleep(0.3)
+            return web.Response(body=b"ok")
+
+        async def scenario(pool: UpstreamPool) -> list:
+            return await asyncio.gather(
+                pool.request("GET", "/"), pool.request("GET", "/")
+            )
+
+        statuses = sorted(status for _, status in _serve(slow, scenario))
+
+        assert statuses == [200, 503]
+
+
+class TestUpstreamForward:
+    def test_forward_keeps_the_encoding_and_compressed_body(self) -> None:
+        compressed = gzip.compress(b'{"result": 1}')
+        received: List[bytes] = []
+
+        async def tool(request: web.Request) -> web.Response:
+            received.append(await request.read())
+            return web.Response(
+                body=compressed,
+                headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip",
+                },
+            )
+
+        async def scenario(pool: UpstreamPool) -> Any:
+            return await pool.forward("POST", "/tools/x", body=b"x" * 200_000)
+
+        response = _serve(tool, scenario)
+
+        assert received == [b"x" * 200_000]
+        assert response.body == compressed
+        assert response.headers["Content-Encoding"] == "gzip"
+
+    def test_only_passthrough_headers_are_kept(self) -> None:
+        async def tool(request: web.Request) -> web.Response:
+            return web.Response(
+                body=b"{}",
+                headers={"ETag": '"v1"', "Set-Cookie": "a=b", "X-Internal": "1"},
+            )
+
+        async def scenario(pool: UpstreamPool) -> Any:
+            return await pool.forward("POST", "/tools/x", body=b"{}")
+
+        headers = _serve(tool, scenario).headers
+
+        assert headers["ETag"] == '"v1"'
+        assert "Set-Cookie" not in headers and "X-Internal" not in headers
+
+    def test_unreachable_upstream_is_an_error_dict(self, monkeypatch) -> None:
+        monkeypatch.setenv("AOS_UPSTREAM_RETRIES", "0")
+
+        async def scenario() -> Any:
+            pool = UpstreamPool("test", "http://127.0.0.1:9")
+            try:
+                return await pool.forward("POST", "/tools/x", body=b"{}")
+            finally:
+                await pool.close()
+
+        response = asyncio.run(scenario())
+
+        assert response.status_code == 502
+        assert response.body == {"error": "Upstream test unreachable"}
+
+    def test_body_is_sliced_without_copying(self) -> None:
+        body = bytes(10)
+
+        async def collect() -> list:
+            return [chunk async for chunk in _chunks(body, 4)]
+
+        chunks = asyncio.run(collect())
+
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+        assert all(chunk.obj is body for chunk in chunks)
@@ -0,0 +1,156 @@
+"""WriteBehindBuffer backpressure, batching, retries and draining."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+
+from aos_dispatcher_azure import shutdown, writebehind
+from aos_dispatcher_azure.bulk import write_items
+from aos_dispatcher_azure.writebehind import WriteBehindBuffer
+
+
+class _Storage:
+    """Dispatcher stand-in answering each item with the status it carries."""
+
+    def __init__(self) -> None:
+        self.batches: List[List[int]] = []
+
+    def write(self, items: List[Dict[str, Any]]) -> tuple:
+        self.batches.append([item["n"] for item in items])
+        return write_items(
+            items, lambda item: ({"n": item["n"]}, item.get("status", 201))
+        )
+
+
+async def _run(endpoint: str, fn, *args: Any) -> Any:
+    """``DispatcherExecutor.run`` stand-in: the call on a worker thread."""
+    return await asyncio.to_thread(fn, *args)
+
+
+def _buffer(monkeypatch, storage: _Storage, **settings: str) -> WriteBehindBuffer:
+    for key, value in settings.items():
+        monkeypatch.setenv(f"AOS_WRITE_BEHIND_{key.upper()}", value)
+    return WriteBehindBuffer("record_metric", storage.write, _run)
+
+
+class TestWriteBehindOffer:
+    def test_full_buffer_refuses_the_item(self, monkeypatch) -> None:
+        buffer = _buffer(monkeypatch, _Storage(), capacity="2", interval="60")
+
+        async def scenario() -> List[bool]:
+            return [buffer.offer({"n": n}) for n in range(3)]
+
+        assert asyncio.run(scenario()) == [True, True, False]
+        assert buffer.stats.rejected_full == 1 and len(buffer) == 2
+
+    def test_retry_after_is_at_least_one_second(self, monkeypatch) -> None:
+        buffer = _buffer(monkeypatch, _Storage(), interval="0.2")
+
+        assert buffer.retry_after == 1
+
+    def test_full_batch_is_written_without_waiting_for_the_interval(
+        self, monkeypatch
+    ) -> None:
+        storage = _Storage()
+        buffer = _buffer(monkeypatch, storage, batch="2", interval="60")
+
+        async def scenario() -> None:
+            buffer.offer({"n": 1})
+            buffer.offer({"n": 2})
+            for _ in range(100):
+                if not len(buffer):
+                    return
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+
+        assert storage.batches == [[1, 2]]
+
+
+class TestWriteBehindFlush:
+    def _fill(self, buffer: WriteBehindBuffer, *items: Dict[str, Any]) -> None:
+        buffer._items.extend((item, 0) for item in items)
+
+    def test_failed_items_are_retried_ahead_of_newer_ones(self, monkeypatch) -> None:
+        storage = _Storage()
+        buffer = _buffer(monkeypatch, storage, batch="2")
+        self._fill(buffer, {"n": 1, "status": 503}, {"n": 2}, {"n": 3})
+
+        buffer.flush()
+
+        assert [item["n"] for item, _ in buffer._items] == [1, 3]
+        assert buffer.stats.retried == 1 and buffer.stats.written == 1
+
+    def test_item_failing_every_attempt_is_dropped(self, monkeypatch) -> None:
+        buffer = _buffer(monkeypatch, _Storage(), max_attempts="2")
+        self._fill(buffer, {"n": 1, "status": 500})
+
+        buffer.flush()
+        buffer.flush()
+
+        assert len(buffer) == 0 and buffer.stats.dropped == 1
+
+    def test_rejected_item_is_not_retried(self, monkeypatch) -> None:
+        buffer = _buffer(monkeypatch, _Storage())
+        self._fill(buffer, {"n": 1, "status": 422})
+
+        buffer.flush()
+
+        assert len(buffer) == 0 and buffer.stats.failed == 1
+
+    def test_written_items_reach_the_callback(self, monkeypatch) -> None:
+        storage, seen = _Storage(), []
+        monkeypatch.setenv("AOS_WRITE_BEHIND_BATCH", "10")
+        buffer = WriteBehindBuffer(
+            "record_metric", storage.write, _run, on_written=seen.extend
+        )
+        self._fill(buffer, {"n": 1}, {"n": 2, "status": 400})
+
+        buffer.flush()
+
+        assert seen == [({"n": 1}, {"n": 1})]
+
+    def test_failing_callback_does_not_requeue_the_items(self, monkeypatch) -> None:
+        def broken(written: List[Tuple[Any, Any]]) -> None:
+            raise RuntimeError("index down")
+
+        buffer = WriteBehindBuffer(
+            "record_metric", _Storage().write, _run, on_written=broken
+        )
+        self._fill(buffer, {"n": 1})
+
+        assert buffer.flush() == 1
+        assert len(buffer) == 0 and buffer.stats.written == 1
+
+
+class TestWriteBehindDrain:
+    def test_drain_writes_every_batch(self, monkeypatch) -> None:
+        storage = _Storage()
+        buffer = _buffer(monkeypatch, storage, batch="2")
+        buffer._items.extend(({"n": n}, 0) for n in range(5))
+
+        assert buffer.drain() == 5
+        assert storage.batches == [[0, 1], [2, 3], [4]]
+
+    def test_drain_gives_up_when_a_flush_does_not_finish(self, monkeypatch) -> None:
+        buffer = _buffer(monkeypatch, _Storage())
+        buffer._items.append(({"n": 1}, 0))
+
+        with buffer._flushing:
+            assert buffer.drain(timeout=0.01) == 0
+        assert len(buffer) == 1
+
+    def test_drain_on_exit_drains_non_empty_buffers(self, monkeypatch) -> None:
+        monkeypatch.setattr(shutdown, "_hooks", [])
+        monkeypatch.setattr(shutdown, "_installed", True)
+        storage = _Storage()
+        empty, full = _buffer(monkeypatch, storage), _buffer(monkeypatch, storage)
+        full._items.append(({"n": 1}, 0))
+
+        writebehind.drain_on_exit([empty, full])
+        shutdown._run_hooks()
+
+        assert storage.batches == [[1]]
+        assert (empty.stats.drained, full.stats.drained) == (0, 1)